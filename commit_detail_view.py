@@ -21,6 +21,7 @@ class CommitDetailView(QTextBrowser):
         self.all_branches = []  # 存储当前提交涉及的所有分支名称
         self.branches_expanded = False  # 标记分支列表是否已展开
         self.current_commit = None  # 存储当前正在显示的提交对象
+        self.current_commit_info = None  # 当前提交的元数据（来自 GitManager 的缓存）
         self.git_manager = None  # 存储 Git 仓库管理器实例
         self.setStyleSheet(
             """
@@ -88,12 +89,15 @@ class CommitDetailView(QTextBrowser):
         # 存储 git_manager 和 commit 对象，以便在点击链接或后续刷新时使用
         self.git_manager = git_manager
         self.current_commit = commit
+        self.current_commit_info = None
 
         if not self.current_commit:
             self.clear()  # 如果没有 commit 对象，则清空视图
             return
 
         try:
+            # 从缓存中读取提交元数据，避免重复解析 commit 对象
+            self.current_commit_info = self.git_manager.get_commit_info(self.current_commit.hexsha)
             # 获取并存储当前 commit 关联的所有分支信息
             self.all_branches = self.get_commit_branches(self.git_manager, self.current_commit)
             # 调用内部方法来渲染提交详情的 HTML 内容
@@ -116,14 +120,23 @@ class CommitDetailView(QTextBrowser):
         # 保存当前滚动位置
         scroll_position = self.verticalScrollBar().value()
 
+        info = self.current_commit_info
+        if info:
+            message, committed_date = info.message, info.committed_date
+            author_name, author_email = info.author_name, info.author_email
+        else:
+            # 缓存不可用时回退到 git.Commit 对象
+            message, committed_date = self.current_commit.message, self.current_commit.committed_date
+            author_name, author_email = self.current_commit.author.name, self.current_commit.author.email
+
         # 准备提交信息：替换换行符为<br>以在 HTML 中正确显示多行消息
-        message = self.current_commit.message.strip().replace("\n", "<br>")
+        message = message.strip().replace("\n", "<br>")
         # 格式化提交日期和作者信息
-        commit_date = datetime.fromtimestamp(self.current_commit.committed_date)
+        commit_date = datetime.fromtimestamp(committed_date)
         # HTML 转义作者邮箱中的 '<' 和 '>' 符号，防止它们被解析为 HTML 标签
         info_line = (
-            f"{self.current_commit.hexsha[:8]} {self.current_commit.author.name} "
-            f"&lt;{self.current_commit.author.email}&gt; on "
+            f"{self.current_commit.hexsha[:8]} {author_name} "
+            f"&lt;{author_email}&gt; on "
             f"{commit_date.strftime('%Y/%m/%d at %H:%M')}"
         )
 
@@ -0,0 +1,208 @@
+"""整个提交的补丁索引
+
+解析 `git diff-tree -p` 的流式输出。补丁原文写入临时文件，这里只保存每个文件、每个 hunk
+以及 hunk 内每 SEGMENT_LINES 行的字节偏移量，界面按需从临时文件读取可见的片段，
+因此即使提交非常大，内存占用也只与文件和 hunk 的数量有关。
+"""
+
+import re
+from array import array
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# hunk 内每隔多少行记录一次偏移量（读取和高亮的最小单位）
+SEGMENT_LINES = 200
+
+_HUNK_HEADER_RE = re.compile(rb"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+@dataclass
+class PatchHunk:
+    """一个 hunk 在补丁文件中的位置"""
+
+    header: str  # "@@ -1,3 +1,4 @@ ..." 行
+    old_start: int
+    new_start: int
+    line_count: int = 0
+    end_offset: int = 0  # 最后一行之后的字节偏移量
+    # 每个片段第一行的字节偏移量，以及该行之前已出现的旧/新行数
+    segment_offsets: array = field(default_factory=lambda: array("q"))
+    segment_old_lines: array = field(default_factory=lambda: array("i"))
+    segment_new_lines: array = field(default_factory=lambda: array("i"))
+
+    @property
+    def segment_count(self) -> int:
+        return len(self.segment_offsets)
+
+    def segment_range(self, segment: int) -> tuple[int, int]:
+        """返回片段的 (起始字节，结束字节)"""
+        end = self.segment_offsets[segment + 1] if segment + 1 < self.segment_count else self.end_offset
+        return self.segment_offsets[segment], end
+
+
+@dataclass
+class PatchFile:
+    """补丁中的一个文件"""
+
+    old_path: str
+    new_path: str
+    status: str = "M"  # A/D/M/R
+    binary: bool = False
+    added: int = 0
+    deleted: int = 0
+    hunks: List[PatchHunk] = field(default_factory=list)
+
+    @property
+    def path(self) -> str:
+        return self.new_path if self.status != "D" else self.old_path
+
+    @property
+    def display_name(self) -> str:
+        if self.status == "R":
+            return f"{self.old_path} -> {self.new_path}"
+        return self.path
+
+
+def _strip_prefix(path: str, prefix: str) -> str:
+    if path.startswith('"') and path.endswith('"'):
+        path = path[1:-1]
+    return path[len(prefix) :] if path.startswith(prefix) else path
+
+
+class PatchParser:
+    """`git diff-tree -p` 输出的增量解析器
+
+    feed() 接收任意切分的字节块，返回已经解析完成的文件；finish() 返回最后一个文件。
+    """
+
+    def __init__(self):
+        self._buffer = b""
+        self._offset = 0  # _buffer 第一个字节在整个输出中的偏移量
+        self._file: Optional[PatchFile] = None
+        self._hunk: Optional[PatchHunk] = None
+        self._old_lines = 0
+        self._new_lines = 0
+
+    def feed(self, data: bytes) -> List[PatchFile]:
+        self._buffer += data
+        completed = []
+        start = 0
+        while True:
+            eol = self._buffer.find(b"\n", start)
+            if eol < 0:
+                break
+            finished_file = self._feed_line(self._buffer[start:eol], self._offset + start, self._offset + eol + 1)
+            if finished_file is not None:
+                completed.append(finished_file)
+            start = eol + 1
+        self._buffer = self._buffer[start:]
+        self._offset += start
+        return completed
+
+    def finish(self) -> List[PatchFile]:
+        completed = []
+        if self._buffer:
+            finished_file = self._feed_line(self._buffer, self._offset, self._offset + len(self._buffer))
+            if finished_file is not None:
+                completed.append(finished_file)
+            self._offset += len(self._buffer)
+            self._buffer = b""
+        if self._file is not None:
+            self._close_hunk()
+            completed.append(self._file)
+            self._file = None
+        return completed
+
+    def _feed_line(self, line: bytes, line_offset: int, next_offset: int) -> Optional[PatchFile]:
+        if line.startswith(b"diff --git "):
+            finished_file = self._file
+            if finished_file is not None:
+                self._close_hunk()
+            a_path, _, b_path = line[len(b"diff --git ") :].decode("utf-8", errors="replace").partition(" b/")
+            self._file = PatchFile(old_path=_strip_prefix(a_path, "a/"), new_path=b_path)
+            return finished_file
+
+        if self._file is None:
+            return None
+
+        if line.startswith(b"@@ "):
+            self._close_hunk()
+            match = _HUNK_HEADER_RE.match(line)
+            old_start, new_start = (int(match.group(1)), int(match.group(3))) if match else (0, 0)
+            self._hunk = PatchHunk(line.decode("utf-8", errors="replace"), old_start, new_start)
+            self._old_lines = self._new_lines = 0
+            return None
+
+        if self._hunk is not None:
+            hunk = self._hunk
+            if hunk.line_count % SEGMENT_LINES == 0:
+                hunk.segment_offsets.append(line_offset)
+                hunk.segment_old_lines.append(self._old_lines)
+                hunk.segment_new_lines.append(self._new_lines)
+            hunk.line_count += 1
+            hunk.end_offset = next_offset
+            prefix = line[:1]
+            if prefix == b"+":
+                self._new_lines += 1
+                self._file.added += 1
+            elif prefix == b"-":
+                self._old_lines += 1
+                self._file.deleted += 1
+            elif prefix in (b" ", b""):
+                # diff.suppressBlankEmpty 打开时空白上下文行没有前导空格
+                self._old_lines += 1
+                self._new_lines += 1
+            return None
+
+        # 文件头部信息
+        text = line.decode("utf-8", errors="replace")
+        if text.startswith("new file mode"):
+            self._file.status = "A"
+        elif text.startswith("deleted file mode"):
+            self._file.status = "D"
+        elif text.startswith("rename from "):
+            self._file.status = "R"
+            self._file.old_path = text[len("rename from ") :]
+        elif text.startswith("rename to "):
+            self._file.status = "R"
+            self._file.new_path = text[len("rename to ") :]
+        elif text.startswith("Binary files ") or text == "GIT binary patch":
+            self._file.binary = True
+        elif text.startswith("--- ") and text != "--- /dev/null":
+            self._file.old_path = _strip_prefix(text[4:], "a/")
+        elif text.startswith("+++ ") and text != "+++ /dev/null":
+            self._file.new_path = _strip_prefix(text[4:], "b/")
+        return None
+
+    def _close_hunk(self):
+        if self._hunk is not None:
+            if self._hunk.line_count:
+                self._file.hunks.append(self._hunk)
+            self._hunk = None
+
+
+def parse_segment_lines(data: bytes, old_line: int, new_line: int) -> List[tuple[str, int, int, str]]:
+    """把片段的原始字节解析为 [(类型，旧行号，新行号，文本)]
+
+    类型为 " "、"+"、"-" 或 "\\"（"\\ No newline at end of file"），行号为 0 表示该侧没有这一行。
+    空行按空白上下文行处理，与 PatchParser 的行数统计一致。
+    """
+    lines = []
+    content = data.decode("utf-8", errors="replace")
+    if not content:
+        return lines
+    for raw in content.removesuffix("\n").split("\n"):
+        kind, text = (raw[0], raw[1:]) if raw else (" ", "")
+        if kind == "+":
+            new_line += 1
+            lines.append((kind, 0, new_line, text))
+        elif kind == "-":
+            old_line += 1
+            lines.append((kind, old_line, 0, text))
+        elif kind == " ":
+            old_line += 1
+            new_line += 1
+            lines.append((kind, old_line, new_line, text))
+        else:
+            lines.append(("\\", 0, 0, raw))
+    return lines
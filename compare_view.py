@@ -2,8 +2,24 @@ import contextlib
 import logging
 import os
 
-from PyQt6.QtWidgets import QPushButton, QStackedWidget, QVBoxLayout, QWidget
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QComboBox, QHBoxLayout, QLabel, QPushButton, QStackedWidget, QVBoxLayout, QWidget
 
+from diff_calculator import DIFF_ALGORITHMS, create_diff_calculator
+from diff_guard import (
+    LOAD_FULL,
+    LOAD_NO_SYNTAX,
+    LOAD_SUMMARY,
+    describe_load_level,
+    format_size,
+    inspect_changed_file,
+    inspect_commit_file,
+    inspect_workspace_file,
+    load_level_for,
+    load_level_for_texts,
+)
+from diff_prefetcher import diff_prefetch_cache
+from settings import settings
 from text_diff_viewer import DiffViewer, MergeDiffViewer
 from unified_diff_viewer import UnifiedDiffViewer
 
@@ -14,6 +30,8 @@ class CompareView(QWidget):
         self.left_text = ""
         self.right_text = ""
         self.file_path = ""
+        self.load_level = LOAD_FULL
+        self._last_diff_args = None  # 最近一次 show_diff 的参数，用于"仍然加载"
         self.setup_ui()
 
     def setup_ui(self):
@@ -23,9 +41,25 @@ class CompareView(QWidget):
         layout.setContentsMargins(0, 0, 0, 0)
         self.setLayout(layout)
 
+        toolbar_layout = QHBoxLayout()
         self.view_mode_button = QPushButton("切换到统一视图")
         self.view_mode_button.clicked.connect(self.toggle_view_mode)
-        layout.addWidget(self.view_mode_button)
+        toolbar_layout.addWidget(self.view_mode_button, 1)
+
+        # 当前视图使用的差异算法
+        self.diff_algorithm_combo = QComboBox()
+        self.diff_algorithm_combo.addItems(DIFF_ALGORITHMS)
+        self.diff_algorithm_combo.setCurrentText(settings.get_diff_algorithm())
+        self.diff_algorithm_combo.setToolTip("差异算法")
+        self.diff_algorithm_combo.currentTextChanged.connect(self.set_diff_algorithm)
+        toolbar_layout.addWidget(self.diff_algorithm_combo)
+        layout.addLayout(toolbar_layout)
+
+        # 大文件降级提示
+        self.load_level_label = QLabel()
+        self.load_level_label.setStyleSheet("color: #8a6d3b; background-color: #fcf8e3; padding: 2px;")
+        self.load_level_label.setVisible(False)
+        layout.addWidget(self.load_level_label)
 
         self.stacked_widget = QStackedWidget()
         layout.addWidget(self.stacked_widget)
@@ -38,6 +72,18 @@ class CompareView(QWidget):
         self.stacked_widget.addWidget(self.unified_diff_viewer)
         self.stacked_widget.addWidget(self.merge_diff_viewer)
 
+        # 过大或二进制文件的摘要页
+        self.summary_widget = QWidget()
+        summary_layout = QVBoxLayout(self.summary_widget)
+        summary_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.summary_label = QLabel()
+        self.summary_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        summary_layout.addWidget(self.summary_label)
+        self.load_anyway_button = QPushButton("仍然加载")
+        self.load_anyway_button.clicked.connect(self.load_anyway)
+        summary_layout.addWidget(self.load_anyway_button, alignment=Qt.AlignmentFlag.AlignCenter)
+        self.stacked_widget.addWidget(self.summary_widget)
+
         parent_widget = self.parent()
         git_manager_window_instance = None
         while parent_widget:
@@ -76,10 +122,115 @@ class CompareView(QWidget):
             self.view_mode_button.setText("切换到统一视图")
             self.diff_viewer.set_texts(self.left_text, self.right_text, self.file_path)
 
-    def show_diff(self, git_manager, commit, file_path, other_commit=None, is_comparing_with_workspace=False):
-        """显示文件差异"""
+    def set_diff_algorithm(self, algorithm: str):
+        """切换该比较视图的差异算法并重新显示当前差异"""
+        for viewer in (self.diff_viewer, self.unified_diff_viewer, self.merge_diff_viewer):
+            viewer.set_diff_calculator(create_diff_calculator(algorithm))
+        if self._last_diff_args and self.stacked_widget.currentWidget() is not self.summary_widget:
+            git_manager, commit, file_path, other_commit, is_comparing_with_workspace, changed_file = (
+                self._last_diff_args
+            )
+            self.show_diff(
+                git_manager,
+                commit,
+                file_path,
+                other_commit,
+                is_comparing_with_workspace,
+                force_load=self.load_level != LOAD_FULL,
+                changed_file=changed_file,
+            )
+
+    def _set_load_level(self, level: int):
+        """把降级级别应用到所有差异视图，并更新提示"""
+        self.load_level = level
+        self.diff_viewer.set_load_level(level)
+        self.unified_diff_viewer.set_load_level(level)
+        self.merge_diff_viewer.set_load_level(level)
+        self.load_level_label.setText(describe_load_level(level))
+        self.load_level_label.setVisible(level != LOAD_FULL)
+
+    def _apply_text_load_level(self, *texts):
+        """读取内容后根据超长行再次调整降级级别"""
+        level = load_level_for_texts(self.load_level, texts)
+        if level != self.load_level:
+            self._set_load_level(level)
+
+    def _inspect_file(self, git_manager, commit, file_path, other_commit, is_comparing_with_workspace, changed_file):
+        """在读取内容之前检查文件大小和是否为二进制
+
+        changed_file 为变化文件列表中该文件的记录（提交与第一个父提交的比较），已有 numstat 时直接使用。
+        """
+        if is_comparing_with_workspace:
+            return inspect_workspace_file(git_manager, commit.hexsha, file_path)
+        if other_commit:
+            return inspect_commit_file(git_manager, [commit.hexsha, other_commit.hexsha], file_path)
+        if changed_file is not None and changed_file.has_numstat and len(commit.parents) <= 1:
+            return inspect_changed_file(git_manager, changed_file, diff_prefetch_cache.get(commit.hexsha, file_path))
+        parents = [parent.hexsha for parent in commit.parents]
+        revs = [parents[0] if parents else None, commit.hexsha, *parents[1:2]]
+        return inspect_commit_file(git_manager, revs, file_path)
+
+    def _show_summary(self, info):
+        """文件过大或为二进制时只显示摘要"""
+        sizes = " / ".join(format_size(size) for size in info.sizes) or "0 B"
+        kind = "二进制文件" if info.binary else "文件过大"
+        self.summary_label.setText(f"{info.file_path}\n{kind}（{sizes}），已跳过差异计算。")
+        self.load_level_label.setVisible(False)
+        self.stacked_widget.setCurrentWidget(self.summary_widget)
+        self.view_mode_button.setVisible(False)
+
+    def load_anyway(self):
+        """忽略大小限制加载最近一次请求的差异"""
+        if self._last_diff_args:
+            git_manager, commit, file_path, other_commit, is_comparing_with_workspace, changed_file = (
+                self._last_diff_args
+            )
+            self.show_diff(
+                git_manager,
+                commit,
+                file_path,
+                other_commit,
+                is_comparing_with_workspace,
+                force_load=True,
+                changed_file=changed_file,
+            )
+
+    def show_diff(
+        self,
+        git_manager,
+        commit,
+        file_path,
+        other_commit=None,
+        is_comparing_with_workspace=False,
+        force_load=False,
+        changed_file=None,
+    ):
+        """显示文件差异
+
+        force_load: 为 True 时即使文件过大或为二进制也加载（此时关闭语法高亮和字符级差异）
+        changed_file: 变化文件列表中该文件的 ChangedFile，用于跳过大小和二进制检查中的 git 调用
+        """
         try:
             self.file_path = file_path
+            self._last_diff_args = (
+                git_manager,
+                commit,
+                file_path,
+                other_commit,
+                is_comparing_with_workspace,
+                changed_file,
+            )
+            info = self._inspect_file(
+                git_manager, commit, file_path, other_commit, is_comparing_with_workspace, changed_file
+            )
+            level = load_level_for(info)
+            if level == LOAD_SUMMARY:
+                if not force_load:
+                    self._show_summary(info)
+                    return
+                level = LOAD_NO_SYNTAX
+            self._set_load_level(level)
+
             if is_comparing_with_workspace:
                 try:
                     self.left_text = commit.tree[file_path].data_stream.read().decode("utf-8", errors="replace")
@@ -91,6 +242,7 @@ class CompareView(QWidget):
                         self.right_text = f.read()
                 else:
                     self.right_text = ""
+                self._apply_text_load_level(self.left_text, self.right_text)
                 self.diff_viewer.right_edit.set_editable()
                 self.diff_viewer.set_texts(
                     self.left_text,
@@ -105,6 +257,14 @@ class CompareView(QWidget):
                 return
 
             parents = commit.parents
+            if (
+                not other_commit
+                and len(parents) <= 1
+                and self.load_level == LOAD_FULL
+                and self._show_prefetched_diff(commit, file_path)
+            ):
+                return
+
             try:
                 content = commit.tree[file_path].data_stream.read().decode("utf-8", errors="replace")
             except KeyError:
@@ -114,6 +274,7 @@ class CompareView(QWidget):
                 other_commit_content = other_commit.tree[file_path].data_stream.read().decode("utf-8", errors="replace")
                 self.left_text = content
                 self.right_text = other_commit_content
+                self._apply_text_load_level(self.left_text, self.right_text)
                 self.diff_viewer.set_texts(
                     self.left_text,
                     self.right_text,
@@ -126,14 +287,19 @@ class CompareView(QWidget):
                 self.view_mode_button.setVisible(True)
                 return
 
+            # 重命名的文件在父提交中位于旧路径下，与预取线程按 old_sha 读取的内容保持一致
+            parent_path = file_path
+            if changed_file is not None and changed_file.old_path and len(parents) <= 1:
+                parent_path = changed_file.old_path
             parent_content = ""
             if parents:
                 with contextlib.suppress(KeyError):
-                    parent_content = parents[0].tree[file_path].data_stream.read().decode("utf-8", errors="replace")
+                    parent_content = parents[0].tree[parent_path].data_stream.read().decode("utf-8", errors="replace")
 
             if len(parents) <= 1:
                 self.left_text = parent_content
                 self.right_text = content
+                self._apply_text_load_level(self.left_text, self.right_text)
                 parent_commit_hash = parents[0].hexsha if parents else None
                 self.diff_viewer.set_texts(
                     self.left_text, self.right_text, file_path, file_path, parent_commit_hash, commit.hexsha
@@ -146,6 +312,7 @@ class CompareView(QWidget):
                 parent2_content = ""
                 with contextlib.suppress(KeyError):
                     parent2_content = parents[1].tree[file_path].data_stream.read().decode("utf-8", errors="replace")
+                self._apply_text_load_level(parent_content, content, parent2_content)
                 parent1_commit_hash = parents[0].hexsha
                 parent2_commit_hash = parents[1].hexsha
                 self.merge_diff_viewer.set_texts(
@@ -159,3 +326,25 @@ class CompareView(QWidget):
                 )
         except Exception:
             logging.exception("显示文件差异时出错")
+
+    def _show_prefetched_diff(self, commit, file_path) -> bool:
+        """如果预取缓存中已有该文件的差异，直接显示并返回 True"""
+        prefetched = diff_prefetch_cache.get(commit.hexsha, file_path)
+        if prefetched is None or prefetched.algorithm != type(self.diff_viewer.diff_calculator).__name__:
+            return False
+        self.left_text = prefetched.left_text
+        self.right_text = prefetched.right_text
+        self._apply_text_load_level(self.left_text, self.right_text)
+        parent_commit_hash = commit.parents[0].hexsha if commit.parents else None
+        self.diff_viewer.set_texts(
+            self.left_text,
+            self.right_text,
+            file_path,
+            file_path,
+            parent_commit_hash,
+            commit.hexsha,
+            diff_chunks=prefetched.diff_chunks,
+        )
+        self.stacked_widget.setCurrentWidget(self.diff_viewer)
+        self.view_mode_button.setVisible(True)
+        return True
@@ -46,45 +46,43 @@ class DAGItemDelegate(QStyledItemDelegate):
         # 收集所有可见的提交信息
         commits = []
         self.row_commit_map.clear()
-        
+
+        visible_items = []
         for i in range(tree_widget.topLevelItemCount()):
             item = tree_widget.topLevelItem(i)
             if item and not item.isHidden():
                 commit_hash = item.data(1, Qt.ItemDataRole.UserRole)
                 if commit_hash:
-                    # 创建 CommitNode
-                    commit_node = CommitNode(
-                        sha=commit_hash,
-                        message=item.text(1),
-                        author_name=item.text(3),
-                        author_email="",
-                        author_date=item.text(4)
-                    )
-                    
-                    # 从 Git 仓库获取父提交信息和引用信息
-                    try:
-                        repo_commit = self.git_manager.repo.commit(commit_hash)
-                        commit_node.parents = [parent.hexsha for parent in repo_commit.parents]
-                        
-                        # 获取引用信息（分支和标签）
-                        refs = []
-                        for ref in self.git_manager.repo.refs:
-                            if ref.commit.hexsha == commit_hash:
-                                refs.append(ref.name)
-                        commit_node.references = refs
-                        
-                        print(f"提交 {commit_hash[:7]}: {len(commit_node.parents)} 个父提交, {len(refs)} 个引用")
-                        
-                    except Exception as e:
-                        print(f"获取提交信息失败 {commit_hash[:7]}: {e}")
-                        commit_node.parents = []
-                    
-                    commits.append(commit_node)
-                    
-                    # 记录行索引到提交的映射
-                    visual_row = len([c for c in commits])  # 当前可见的行数
-                    self.row_commit_map[visual_row - 1] = commit_hash
-        
+                    visible_items.append((item, commit_hash))
+
+        # 一次性批量读取父提交信息，并一次性建立 sha -> 引用 的映射
+        commit_infos = self.git_manager.load_commits([commit_hash for _, commit_hash in visible_items])
+        refs_map = self.git_manager.get_refs_map()
+
+        for item, commit_hash in visible_items:
+            # 创建 CommitNode
+            commit_node = CommitNode(
+                sha=commit_hash,
+                message=item.text(1),
+                author_name=item.text(3),
+                author_email="",
+                author_date=item.text(4)
+            )
+
+            info = commit_infos.get(commit_hash)
+            if info:
+                commit_node.parents = list(info.parents)
+            else:
+                print(f"获取提交信息失败 {commit_hash[:7]}")
+                commit_node.parents = []
+            # 获取引用信息（分支和标签）
+            commit_node.references = refs_map.get(commit_hash, [])
+
+            commits.append(commit_node)
+
+            # 记录行索引到提交的映射
+            self.row_commit_map[len(commits) - 1] = commit_hash
+
         # 建立子提交关系
         commits_map = {c.sha: c for c in commits}
         for commit in commits:
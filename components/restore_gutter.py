@@ -0,0 +1,130 @@
+from bisect import bisect_left, bisect_right
+from typing import Optional
+
+from PyQt6.QtCore import QPoint, QRectF, QSize, Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QFont, QMouseEvent, QPainter
+from PyQt6.QtWidgets import QPlainTextEdit, QWidget
+
+MARKER_SIZE = 20
+MARKER_COLOR = QColor("#4CAF50")
+MARKER_HOVER_COLOR = QColor("#45a049")
+
+
+class RestoreGutter(QWidget):
+    """左右编辑器之间的还原栏
+
+    只绘制左侧编辑器视口内可见的差异块的还原标记，点击时按标记位置二分查找对应的差异块，
+    而不是为每个差异块创建一个按钮控件。
+    """
+
+    restore_requested = pyqtSignal(object)  # 被点击的差异块
+
+    def __init__(self, editor: QPlainTextEdit, parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.editor = editor
+        self._chunks = []
+        self._starts = []  # 各差异块在左侧的起始行，用于二分查找可见的块
+        self._marker_tops = []  # 最近一次绘制的标记顶部位置（与 _marker_chunks 一一对应）
+        self._marker_chunks = []
+        self._hover_chunk = None
+        self.setFixedWidth(MARKER_SIZE + 4)
+        self.setMouseTracking(True)
+        self.setToolTip("点击将左侧内容还原到右侧")
+
+        editor.verticalScrollBar().valueChanged.connect(self.update)
+        editor.blockCountChanged.connect(self.update)
+
+    def sizeHint(self):
+        return QSize(MARKER_SIZE + 4, 0)
+
+    def set_chunks(self, chunks: list):
+        """设置可还原的差异块（按左侧起始行排序的非 equal 块）"""
+        self._chunks = list(chunks)
+        self._starts = [chunk.left_start for chunk in self._chunks]
+        self._hover_chunk = None
+        self.update()
+
+    def _visible_markers(self):
+        """返回视口内可见的差异块及其标记在本控件中的顶部位置"""
+        if not self._chunks:
+            return [], []
+        doc = self.editor.document()
+        viewport = self.editor.viewport()
+        first = self.editor.firstVisibleBlock().blockNumber()
+        last = self.editor.cursorForPosition(QPoint(0, viewport.height())).blockNumber()
+        # 视口坐标到本控件坐标的偏移（两者是同一个父控件下的兄弟控件）
+        offset = viewport.mapTo(self.editor, QPoint(0, 0)).y() + self.editor.y() - self.y()
+        content_offset = self.editor.contentOffset()
+
+        tops = []
+        chunks = []
+        for index in range(bisect_left(self._starts, first), bisect_right(self._starts, last + 1)):
+            chunk = self._chunks[index]
+            if chunk.left_start < doc.blockCount():
+                block = doc.findBlockByNumber(chunk.left_start)
+                top = self.editor.blockBoundingGeometry(block).translated(content_offset).top()
+            else:
+                # 插入在文件末尾的块，标记放在最后一行的下方
+                block = doc.lastBlock()
+                top = self.editor.blockBoundingGeometry(block).translated(content_offset).bottom()
+            tops.append(int(top) + offset)
+            chunks.append(chunk)
+        return tops, chunks
+
+    def _chunk_at(self, y: int):
+        """按最近一次绘制的标记位置查找 y 处的差异块"""
+        index = bisect_right(self._marker_tops, y) - 1
+        if index >= 0 and y < self._marker_tops[index] + MARKER_SIZE:
+            return self._marker_chunks[index]
+        return None
+
+    def paintEvent(self, event):
+        self._marker_tops, self._marker_chunks = self._visible_markers()
+        if not self._marker_chunks:
+            return
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        font = QFont(self.font())
+        font.setBold(True)
+        painter.setFont(font)
+        x = (self.width() - MARKER_SIZE) / 2
+        for top, chunk in zip(self._marker_tops, self._marker_chunks):
+            rect = QRectF(x, top, MARKER_SIZE, MARKER_SIZE)
+            if not rect.intersects(QRectF(event.rect())):
+                continue
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(MARKER_HOVER_COLOR if chunk is self._hover_chunk else MARKER_COLOR)
+            painter.drawEllipse(rect)
+            painter.setPen(QColor("white"))
+            painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, "→")
+        painter.end()
+
+    def mouseMoveEvent(self, event: QMouseEvent):
+        chunk = self._chunk_at(int(event.position().y()))
+        if chunk is not self._hover_chunk:
+            self._hover_chunk = chunk
+            if chunk is None:
+                self.unsetCursor()
+            else:
+                self.setCursor(Qt.CursorShape.PointingHandCursor)
+            self.update()
+        super().mouseMoveEvent(event)
+
+    def leaveEvent(self, event):
+        if self._hover_chunk is not None:
+            self._hover_chunk = None
+            self.unsetCursor()
+            self.update()
+        super().leaveEvent(event)
+
+    def mousePressEvent(self, event: QMouseEvent):
+        if event.button() == Qt.MouseButton.LeftButton:
+            chunk = self._chunk_at(int(event.position().y()))
+            if chunk is not None:
+                self.restore_requested.emit(chunk)
+                return
+        super().mousePressEvent(event)
+
+    def wheelEvent(self, event):
+        # 在还原栏上滚动时滚动左侧编辑器
+        self.editor.wheelEvent(event)
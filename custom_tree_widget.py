@@ -239,7 +239,7 @@ class CustomTreeWidget(HoverRevealTreeWidget):
                 # 获取 WorkspaceExplorer 实例
                 if workspace_explorer:
                     # 清空现有文件树
-                    workspace_explorer.file_changes_view.changes_tree.clear()
+                    workspace_explorer.file_changes_view.clear_changes()
                     # 添加变更文件到 file_changes_view
                     for file in changed_files:
                         workspace_explorer.file_changes_view.add_file_to_tree(
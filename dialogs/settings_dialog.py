@@ -8,6 +8,8 @@ if TYPE_CHECKING:
 
 from pygments.styles import get_all_styles
 
+from diff_calculator import DIFF_ALGORITHMS
+
 
 class SettingsDialog(QDialog):
     def __init__(self, parent=None):
@@ -66,6 +68,15 @@ class SettingsDialog(QDialog):
         code_style_layout.addWidget(self.code_style_combo, 1)
         layout.addRow(code_style_layout)
 
+        # 创建差异算法下拉框
+        self.diff_algorithm_combo = QComboBox()
+        self.diff_algorithm_combo.addItems(DIFF_ALGORITHMS)
+        self.diff_algorithm_combo.setCurrentText(self.settings.get_diff_algorithm())
+        diff_algorithm_layout = QHBoxLayout()
+        diff_algorithm_layout.addWidget(QLabel(self.tr("Diff Algorithm:")))
+        diff_algorithm_layout.addWidget(self.diff_algorithm_combo, 1)
+        layout.addRow(diff_algorithm_layout)
+
         # 创建 API 设置输入框
         self.api_url_edit = QLineEdit()
         self.api_url_edit.setText(self.settings.settings.get("api_url", ""))
@@ -123,6 +134,9 @@ class SettingsDialog(QDialog):
         # 保存代码风格设置
         self.settings.set_code_style(self.code_style_combo.currentText())
 
+        # 保存差异算法设置
+        self.settings.settings["diff_algorithm"] = self.diff_algorithm_combo.currentText()
+
         # 保存 API 相关设置
         self.settings.settings["api_url"] = self.api_url_edit.text()
         self.settings.settings["api_secret"] = self.api_secret_edit.text()
@@ -0,0 +1,303 @@
+"""差异结果缓存
+
+按 (左侧 blob id, 右侧 blob id, 算法, 选项) 缓存行级差异块和字符级差异，结果以紧凑的整数数组保存，
+在内存中按 LRU 淘汰；开启磁盘溢出后，被淘汰的条目写入配置目录下的 diff_cache 目录，之后命中时再读回内存。
+
+blob id 可以直接使用 git 的 blob sha；只有文本时按 git 的方式计算文本内容的 sha，两者对相同内容一致。
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+
+import diff_match_patch
+
+from diff_calculator import DiffCalculator, DiffChunk
+from settings import settings
+
+# 字符级差异只在行级差异的块内计算，单个块超过该字符数时不再计算（整块标记为删除和插入）
+CHAR_DIFF_CHUNK_MAX_CHARS = 20000
+# 单个块的字符级差异计算时间上限（秒），超时后 diff_match_patch 返回较粗的结果
+CHAR_DIFF_CHUNK_TIMEOUT = 0.2
+
+# 行级差异块类型与整数编码
+_CHUNK_TYPES = ("equal", "insert", "delete", "replace")
+_CHUNK_TYPE_CODES = {chunk_type: code for code, chunk_type in enumerate(_CHUNK_TYPES)}
+
+
+def text_blob_id(text: str) -> str:
+    """按 git hash-object 的方式计算文本（UTF-8 编码）的 blob sha"""
+    data = text.encode("utf-8", errors="surrogatepass")
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def create_char_differ() -> diff_match_patch.diff_match_patch:
+    """创建用于字符级差异的 diff_match_patch（缓存键包含其超时设置，各处应使用相同的配置）"""
+    dmp = diff_match_patch.diff_match_patch()
+    dmp.Diff_Timeout = CHAR_DIFF_CHUNK_TIMEOUT
+    return dmp
+
+
+def _chunks_cover(chunks: List[DiffChunk], left_count: int, right_count: int) -> bool:
+    """差异块是否依次连续覆盖了两侧的所有行"""
+    left = right = 0
+    for chunk in chunks:
+        if chunk.left_start != left or chunk.right_start != right:
+            return False
+        left, right = chunk.left_end, chunk.right_end
+    return left == left_count and right == right_count
+
+
+def encode_chunks(chunks: List[DiffChunk]) -> bytes:
+    """把 DiffChunk 列表编码为 [left_start, left_end, right_start, right_end, 类型] 的整数数组"""
+    values = array("i")
+    for chunk in chunks:
+        values.extend(
+            (chunk.left_start, chunk.left_end, chunk.right_start, chunk.right_end, _CHUNK_TYPE_CODES[chunk.type])
+        )
+    return values.tobytes()
+
+
+def decode_chunks(data: bytes) -> List[DiffChunk]:
+    values = array("i")
+    values.frombytes(data)
+    return [
+        DiffChunk(values[i], values[i + 1], values[i + 2], values[i + 3], _CHUNK_TYPES[values[i + 4]])
+        for i in range(0, len(values), 5)
+    ]
+
+
+def encode_char_diff(diff_list) -> bytes:
+    """把 diff_match_patch 的 [(op, text)] 编码为 [op, 长度] 的整数数组，文本内容在解码时从原文中取回"""
+    values = array("i")
+    for op, text in diff_list:
+        values.extend((op, len(text)))
+    return values.tobytes()
+
+
+def decode_char_diff(data: bytes, left_text: str, right_text: str) -> list:
+    """根据左右原文还原 [(op, text)]：删除和相同的片段来自左侧，插入的片段来自右侧"""
+    values = array("i")
+    values.frombytes(data)
+    diff_list = []
+    left_pos = right_pos = 0
+    for i in range(0, len(values), 2):
+        op, length = values[i], values[i + 1]
+        if op > 0:
+            diff_list.append((op, right_text[right_pos : right_pos + length]))
+            right_pos += length
+        else:
+            diff_list.append((op, left_text[left_pos : left_pos + length]))
+            left_pos += length
+            if op == 0:
+                right_pos += length
+    return diff_list
+
+
+class DiffResultCache:
+    """差异结果的 LRU 缓存，条目为编码后的字节串，按总字节数限制内存占用"""
+
+    def __init__(self, memory_budget: int = 64 * 1024 * 1024, spill_dir: Optional[str] = None, disk_budget: int = 0):
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir  # 为 None 时不溢出到磁盘
+        self.disk_budget = disk_budget
+        self._entries: OrderedDict[tuple, bytes] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes: Optional[int] = None  # 首次写磁盘时统计
+        self._lock = threading.Lock()
+
+    # ---- 底层存取 ----
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                return data
+        data = self._read_spilled(key)
+        if data is not None:
+            self.put(key, data)
+        return data
+
+    def put(self, key: tuple, data: bytes) -> None:
+        if len(data) > self.memory_budget:
+            return
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old)
+            self._entries[key] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.memory_budget:
+                evicted_key, evicted_data = self._entries.popitem(last=False)
+                self._memory_bytes -= len(evicted_data)
+                evicted.append((evicted_key, evicted_data))
+        for evicted_key, evicted_data in evicted:
+            self._spill(evicted_key, evicted_data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._memory_bytes
+
+    # ---- 磁盘溢出 ----
+
+    def _spill_path(self, key: tuple) -> str:
+        return os.path.join(self.spill_dir, hashlib.sha1(repr(key).encode("utf-8")).hexdigest())
+
+    def _spill(self, key: tuple, data: bytes) -> None:
+        if not self.spill_dir or len(data) > self.disk_budget:
+            return
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            path = self._spill_path(key)
+            if os.path.exists(path):
+                return
+            with open(path, "wb") as f:
+                f.write(data)
+            with self._lock:
+                if self._disk_bytes is None:
+                    self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(self.spill_dir))
+                else:
+                    self._disk_bytes += len(data)
+                if self._disk_bytes > self.disk_budget:
+                    self._prune_disk()
+        except OSError:
+            logging.exception("写入差异缓存文件失败")
+
+    def _prune_disk(self) -> None:
+        """删除最旧的缓存文件，直到低于磁盘预算的一半"""
+        entries = sorted(os.scandir(self.spill_dir), key=lambda entry: entry.stat().st_mtime)
+        for entry in entries:
+            if self._disk_bytes <= self.disk_budget // 2:
+                break
+            size = entry.stat().st_size
+            os.remove(entry.path)
+            self._disk_bytes -= size
+
+    def _read_spilled(self, key: tuple) -> Optional[bytes]:
+        if not self.spill_dir:
+            return None
+        try:
+            with open(self._spill_path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError:
+            logging.exception("读取差异缓存文件失败")
+            return None
+
+    # ---- 差异计算 ----
+
+    @staticmethod
+    def _chunks_key(calculator, left_text, right_text, left_id=None, right_id=None) -> tuple:
+        return (
+            left_id or text_blob_id(left_text),
+            right_id or text_blob_id(right_text),
+            type(calculator).__name__,
+            (),
+        )
+
+    @staticmethod
+    def _char_diff_key(dmp, left_text, right_text) -> tuple:
+        return (text_blob_id(left_text), text_blob_id(right_text), "diff_match_patch", ("semantic", dmp.Diff_Timeout))
+
+    def lookup_diff(self, calculator: DiffCalculator, left_text: str, right_text: str) -> Optional[List[DiffChunk]]:
+        """只查询缓存中的行级差异，未命中时返回 None"""
+        data = self.get(self._chunks_key(calculator, left_text, right_text))
+        return None if data is None else decode_chunks(data)
+
+    def lookup_char_diff(self, dmp, left_text: str, right_text: str) -> Optional[list]:
+        """只查询缓存中的字符级差异，未命中时返回 None"""
+        data = self.get(self._char_diff_key(dmp, left_text, right_text))
+        return None if data is None else decode_char_diff(data, left_text, right_text)
+
+    def chunked_char_diff(
+        self, dmp, left_text: str, right_text: str, chunks: List[DiffChunk], cached_only: bool = False
+    ) -> Optional[list]:
+        """只在行级差异块内计算字符级差异，拼接为整个文件的 [(op, text)]
+
+        相同的块直接作为 EQUAL，插入和删除块整体作为 INSERT/DELETE，只有 replace 块（以及行尾不同的块）
+        才调用 diff_match_patch，并且每个块单独缓存，因此计算量与修改的大小相关，而与文件大小无关。
+        cached_only 为 True 时只使用缓存，有块未命中时返回 None。
+        """
+        left_lines = left_text.splitlines(keepends=True)
+        right_lines = right_text.splitlines(keepends=True)
+        if not _chunks_cover(chunks, len(left_lines), len(right_lines)):
+            # 差异块与文本不一致时退回整个文件的字符级差异
+            if cached_only:
+                return self.lookup_char_diff(dmp, left_text, right_text)
+            return self.char_diff(dmp, left_text, right_text)
+
+        diff_list = []
+        for chunk in chunks:
+            left = "".join(left_lines[chunk.left_start : chunk.left_end])
+            right = "".join(right_lines[chunk.right_start : chunk.right_end])
+            if left == right:
+                if left:
+                    diff_list.append((dmp.DIFF_EQUAL, left))
+            elif not right:
+                diff_list.append((dmp.DIFF_DELETE, left))
+            elif not left:
+                diff_list.append((dmp.DIFF_INSERT, right))
+            elif len(left) + len(right) > CHAR_DIFF_CHUNK_MAX_CHARS:
+                diff_list.extend(((dmp.DIFF_DELETE, left), (dmp.DIFF_INSERT, right)))
+            else:
+                chunk_diff = (
+                    self.lookup_char_diff(dmp, left, right) if cached_only else self.char_diff(dmp, left, right)
+                )
+                if chunk_diff is None:
+                    return None
+                diff_list.extend(chunk_diff)
+        return diff_list
+
+    def compute_diff(
+        self,
+        calculator: DiffCalculator,
+        left_text: str,
+        right_text: str,
+        left_id: Optional[str] = None,
+        right_id: Optional[str] = None,
+    ) -> List[DiffChunk]:
+        """返回行级差异块，缓存未命中时用 calculator 计算；left_id/right_id 为已知的 blob sha"""
+        key = self._chunks_key(calculator, left_text, right_text, left_id, right_id)
+        data = self.get(key)
+        if data is not None:
+            return decode_chunks(data)
+        chunks = calculator.compute_diff(left_text, right_text)
+        self.put(key, encode_chunks(chunks))
+        return chunks
+
+    def char_diff(self, dmp, left_text: str, right_text: str) -> list:
+        """返回 diff_match_patch 的字符级差异（已做 cleanupSemantic）"""
+        key = self._char_diff_key(dmp, left_text, right_text)
+        data = self.get(key)
+        if data is not None:
+            return decode_char_diff(data, left_text, right_text)
+        diff_list = dmp.diff_main(left_text, right_text)
+        dmp.diff_cleanupSemantic(diff_list)
+        self.put(key, encode_char_diff(diff_list))
+        return diff_list
+
+
+def _create_diff_result_cache() -> DiffResultCache:
+    options = settings.get_diff_cache_options()
+    spill_dir = os.path.join(settings.config_dir, "diff_cache") if options["disk_spill"] else None
+    return DiffResultCache(
+        memory_budget=options["memory_mb"] * 1024 * 1024,
+        spill_dir=spill_dir,
+        disk_budget=options["disk_mb"] * 1024 * 1024,
+    )
+
+
+# 进程内共享的差异结果缓存
+diff_result_cache = _create_diff_result_cache()
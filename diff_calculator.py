@@ -1,3 +1,4 @@
+import bisect
 import difflib
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
@@ -29,6 +30,37 @@ class DiffCalculator(ABC):
         """
         pass
 
+    def get_diff(self, left_text: str, right_text: str) -> dict:
+        """获取文件差异（转换为 git_manager 格式）
+
+        返回：
+            {行号：修改类型} 的字典，修改类型为 "added", "modified", "deleted"
+        """
+        return diff_dict_from_chunks(self.compute_diff(left_text, right_text))
+
+
+def diff_dict_from_chunks(chunks: List[DiffChunk]) -> dict:
+    """把差异块转换为 {行号：修改类型} 的字典（见 DiffCalculator.get_diff）"""
+    diff_dict = {}
+
+    for chunk in chunks:
+        if chunk.type == "insert":
+            # 新增行：行号范围 [right_start+1, right_end]
+            for line in range(chunk.right_start, chunk.right_end):
+                diff_dict[line + 1] = "added"
+
+        elif chunk.type == "delete":
+            # 删除行：行号对应删除位置（使用新文件行号）
+            # 删除发生在当前行号位置（新文件中的行号）
+            diff_dict[chunk.right_start + 1] = "deleted"
+
+        elif chunk.type == "replace":
+            # 修改行：行号范围 [right_start+1, right_end]
+            for line in range(chunk.right_start, chunk.right_end):
+                diff_dict[line + 1] = "modified"
+
+    return diff_dict
+
 
 class DifflibCalculator(DiffCalculator):
     """基于 difflib 的差异计算器"""
@@ -47,29 +79,280 @@ class DifflibCalculator(DiffCalculator):
 
         return chunks
 
-    def get_diff(self, left_text: str, right_text: str) -> dict:
-        """获取文件差异（转换为 git_manager 格式）
 
-        返回：
-            {行号：修改类型} 的字典，修改类型为 "added", "modified", "deleted"
-        """
-        chunks = self.compute_diff(left_text, right_text)
-        diff_dict = {}
-
-        for chunk in chunks:
-            if chunk.type == "insert":
-                # 新增行：行号范围 [right_start+1, right_end]
-                for line in range(chunk.right_start, chunk.right_end):
-                    diff_dict[line + 1] = "added"
-
-            elif chunk.type == "delete":
-                # 删除行：行号对应删除位置（使用新文件行号）
-                # 删除发生在当前行号位置（新文件中的行号）
-                diff_dict[chunk.right_start + 1] = "deleted"
-
-            elif chunk.type == "replace":
-                # 修改行：行号范围 [right_start+1, right_end]
-                for line in range(chunk.right_start, chunk.right_end):
-                    diff_dict[line + 1] = "modified"
-
-        return diff_dict
+def _intern_lines(left_lines: List[str], right_lines: List[str]) -> tuple[List[int], List[int]]:
+    """把行内容映射为整数 id，后续比较只比较整数"""
+    ids: dict[str, int] = {}
+    left = [ids.setdefault(line, len(ids)) for line in left_lines]
+    right = [ids.setdefault(line, len(ids)) for line in right_lines]
+    return left, right
+
+
+# Myers 算法的最小代价上限（与 git xdiff 的 XDL_MAX_COST_MIN 相同）
+MYERS_MIN_MAX_COST = 256
+
+
+def _myers_max_cost(n: int, m: int) -> int:
+    """编辑距离的搜索上限，约为对角线数的平方根（与 git xdiff 相同）"""
+    return max(MYERS_MIN_MAX_COST, int((n + m + 3) ** 0.5))
+
+
+def _myers_middle_snake(a, a_lo, a_hi, b, b_lo, b_hi, max_cost: int) -> tuple[int, int, int, int]:
+    """Myers 线性空间算法的中间蛇，返回 (x_start, y_start, x_end, y_end)（相对区间起点）
+
+    编辑距离超过 max_cost 时不再寻找最优解：与 git xdiff 相同，取前向或后向搜索走得最远的对角线上的点
+    作为划分点（此时返回的蛇长度为 0），使整体代价约为 O((N + M) * max_cost)。
+    """
+    n = a_hi - a_lo
+    m = b_hi - b_lo
+    delta = n - m
+    odd = delta & 1
+    max_d = min((n + m + 1) // 2, max_cost)
+    offset = max_d + 1
+    forward = [0] * (2 * max_d + 3)
+    backward = [0] * (2 * max_d + 3)
+    for d in range(max_d + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and forward[offset + k - 1] < forward[offset + k + 1]):
+                x = forward[offset + k + 1]
+            else:
+                x = forward[offset + k - 1] + 1
+            y = x - k
+            x_start, y_start = x, y
+            while x < n and y < m and a[a_lo + x] == b[b_lo + y]:
+                x += 1
+                y += 1
+            forward[offset + k] = x
+            reverse_k = delta - k
+            if odd and -(d - 1) <= reverse_k <= d - 1 and x + backward[offset + reverse_k] >= n:
+                return x_start, y_start, x, y
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and backward[offset + k - 1] < backward[offset + k + 1]):
+                x = backward[offset + k + 1]
+            else:
+                x = backward[offset + k - 1] + 1
+            y = x - k
+            x_start, y_start = x, y
+            while x < n and y < m and a[a_hi - 1 - x] == b[b_hi - 1 - y]:
+                x += 1
+                y += 1
+            backward[offset + k] = x
+            forward_k = delta - k
+            if not odd and -d <= forward_k <= d and forward[offset + forward_k] + x >= n:
+                return n - x, m - y, n - x_start, m - y_start
+        if d >= max_cost:
+            return _myers_furthest_point(forward, backward, offset, d, n, m)
+    raise AssertionError("middle snake not found")
+
+
+def _myers_furthest_point(forward, backward, offset, d, n, m) -> tuple[int, int, int, int]:
+    """代价超限时的划分点：前向或后向搜索中离各自起点最远的有效点"""
+    best = None
+    best_distance = 0
+    for k in range(-d, d + 1, 2):
+        x = forward[offset + k]
+        y = x - k
+        if 0 <= x <= n and 0 <= y <= m and 0 < x + y < n + m and x + y > best_distance:
+            best, best_distance = (x, y), x + y
+        x = backward[offset + k]
+        y = x - k
+        if 0 <= x <= n and 0 <= y <= m and 0 < x + y < n + m and x + y > best_distance:
+            best, best_distance = (n - x, m - y), x + y
+    if best is None:
+        # 没有可用的点时（不会出现）退化为只删除第一行
+        best = (1, 0) if n else (0, 1)
+    x, y = best
+    return x, y, x, y
+
+
+class HistogramCalculator(DiffCalculator):
+    """基于 patience/histogram 锚点的差异计算器（思路与 git diff --histogram 相同）
+
+    先把行内容映射为整数并去掉公共前后缀，然后在剩余区间中选择锚点递归划分：
+    1. 两侧出现次数相同且次数最少的行按顺序配对，取最长递增子序列作为一批锚点（patience）；
+    2. 没有这样的行时，选择左侧出现次数最少的公共行并向两侧扩展为最长匹配区域（histogram）；
+    3. 锚点行出现太多次时，改用线性空间的 Myers 算法，编辑距离超过上限时与 git 一样放弃最优解。
+    与 difflib 相比不会因为 autojunk 启发式在大量重复行的文件上产生错位，大文件上也快得多。
+    """
+
+    # 出现次数超过该值的行不作为锚点
+    MAX_CHAIN_LENGTH = 64
+
+    def compute_diff(self, left_text: str, right_text: str) -> List[DiffChunk]:
+        left, right = _intern_lines(left_text.splitlines(), right_text.splitlines())
+        return self._chunks_from_blocks(self._matching_blocks(left, right), len(left), len(right))
+
+    def _matching_blocks(self, a: List[int], b: List[int]) -> List[tuple[int, int, int]]:
+        """返回按位置排序的匹配块 [(左起点，右起点，长度)]"""
+        max_cost = _myers_max_cost(len(a), len(b))
+        blocks = []
+        # 使用显式栈代替递归，避免锚点很多时递归过深
+        stack = [(0, len(a), 0, len(b), False)]
+        while stack:
+            a_lo, a_hi, b_lo, b_hi, use_myers = stack.pop()
+            # 去掉公共前缀和后缀
+            start = 0
+            while a_lo + start < a_hi and b_lo + start < b_hi and a[a_lo + start] == b[b_lo + start]:
+                start += 1
+            if start:
+                blocks.append((a_lo, b_lo, start))
+                a_lo += start
+                b_lo += start
+            end = 0
+            while a_lo < a_hi - end and b_lo < b_hi - end and a[a_hi - 1 - end] == b[b_hi - 1 - end]:
+                end += 1
+            if end:
+                a_hi -= end
+                b_hi -= end
+                blocks.append((a_hi, b_hi, end))
+            if a_lo == a_hi or b_lo == b_hi:
+                continue
+
+            if not use_myers:
+                anchors = self._patience_anchors(a, a_lo, a_hi, b, b_lo, b_hi)
+                if anchors:
+                    # 锚点之间的区间继续划分
+                    prev_i, prev_j = a_lo, b_lo
+                    for i, j in anchors:
+                        blocks.append((i, j, 1))
+                        stack.append((prev_i, i, prev_j, j, False))
+                        prev_i, prev_j = i + 1, j + 1
+                    stack.append((prev_i, a_hi, prev_j, b_hi, False))
+                    continue
+                anchor = self._find_anchor(a, a_lo, a_hi, b, b_lo, b_hi)
+                if anchor is not None:
+                    i, j, length = anchor
+                    blocks.append(anchor)
+                    stack.append((i + length, a_hi, j + length, b_hi, False))
+                    stack.append((a_lo, i, b_lo, j, False))
+                    continue
+
+            x_start, y_start, x_end, y_end = _myers_middle_snake(a, a_lo, a_hi, b, b_lo, b_hi, max_cost)
+            if x_end > x_start:
+                blocks.append((a_lo + x_start, b_lo + y_start, x_end - x_start))
+            stack.append((a_lo + x_end, a_hi, b_lo + y_end, b_hi, True))
+            stack.append((a_lo, a_lo + x_start, b_lo, b_lo + y_start, True))
+
+        blocks.sort()
+        return blocks
+
+    def _patience_anchors(self, a, a_lo, a_hi, b, b_lo, b_hi) -> List[tuple[int, int]]:
+        """两侧出现次数相同且最少的行按出现顺序配对，返回其中最长递增子序列的 [(左位置，右位置)]"""
+        left_positions: dict[int, list[int]] = {}
+        for i in range(a_lo, a_hi):
+            left_positions.setdefault(a[i], []).append(i)
+        right_positions: dict[int, list[int]] = {}
+        for j in range(b_lo, b_hi):
+            if b[j] in left_positions:
+                right_positions.setdefault(b[j], []).append(j)
+
+        min_count = self.MAX_CHAIN_LENGTH + 1
+        for line, positions in right_positions.items():
+            if len(positions) == len(left_positions[line]) and len(positions) < min_count:
+                min_count = len(positions)
+        if min_count > self.MAX_CHAIN_LENGTH:
+            return []
+
+        pairs = []
+        for line, positions in right_positions.items():
+            if len(positions) == min_count and len(left_positions[line]) == min_count:
+                pairs.extend(zip(left_positions[line], positions))
+        pairs.sort()
+
+        # 最长递增子序列（按右侧位置），tails[k] 为长度 k+1 的子序列的最后一个下标
+        tails: list[int] = []
+        tail_values: list[int] = []
+        previous = [-1] * len(pairs)
+        for index, (_, j) in enumerate(pairs):
+            k = bisect.bisect_left(tail_values, j)
+            previous[index] = tails[k - 1] if k else -1
+            if k == len(tails):
+                tails.append(index)
+                tail_values.append(j)
+            else:
+                tails[k] = index
+                tail_values[k] = j
+        anchors = []
+        index = tails[-1] if tails else -1
+        while index >= 0:
+            anchors.append(pairs[index])
+            index = previous[index]
+        anchors.reverse()
+        return anchors
+
+    def _find_anchor(self, a, a_lo, a_hi, b, b_lo, b_hi) -> tuple[int, int, int] | None:
+        """在区间中寻找出现次数最少的公共行，并向两侧扩展为最长的匹配区域"""
+        occurrences: dict[int, list[int]] = {}
+        for i in range(a_lo, a_hi):
+            occurrences.setdefault(a[i], []).append(i)
+
+        best = None
+        best_count = self.MAX_CHAIN_LENGTH + 1
+        best_length = 0
+        j = b_lo
+        while j < b_hi:
+            positions = occurrences.get(b[j])
+            next_j = j + 1
+            if positions is not None and len(positions) <= best_count:
+                for i in positions:
+                    start_i, start_j = i, j
+                    while start_i > a_lo and start_j > b_lo and a[start_i - 1] == b[start_j - 1]:
+                        start_i -= 1
+                        start_j -= 1
+                    end_i, end_j = i + 1, j + 1
+                    while end_i < a_hi and end_j < b_hi and a[end_i] == b[end_j]:
+                        end_i += 1
+                        end_j += 1
+                    # 区域的权重为其中各行在左侧出现次数的最小值
+                    count = min(len(occurrences[a[k]]) for k in range(start_i, end_i))
+                    length = end_i - start_i
+                    if count < best_count or (count == best_count and length > best_length):
+                        best = (start_i, start_j, length)
+                        best_count = count
+                        best_length = length
+                    next_j = max(next_j, end_j)
+            j = next_j
+        return best
+
+    @staticmethod
+    def _chunks_from_blocks(blocks, left_count: int, right_count: int) -> List[DiffChunk]:
+        """把匹配块转换为与 difflib opcodes 相同形式的 DiffChunk 列表"""
+        chunks = []
+        i = j = 0
+        for block_i, block_j, length in [*blocks, (left_count, right_count, 0)]:
+            if i < block_i and j < block_j:
+                chunks.append(DiffChunk(i, block_i, j, block_j, "replace"))
+            elif i < block_i:
+                chunks.append(DiffChunk(i, block_i, j, block_j, "delete"))
+            elif j < block_j:
+                chunks.append(DiffChunk(i, block_i, j, block_j, "insert"))
+            if length:
+                # 相邻的匹配块合并为一个 equal 块
+                if chunks and chunks[-1].type == "equal" and chunks[-1].left_end == block_i:
+                    chunks[-1].left_end += length
+                    chunks[-1].right_end += length
+                else:
+                    chunks.append(DiffChunk(block_i, block_i + length, block_j, block_j + length, "equal"))
+            i, j = block_i + length, block_j + length
+        return chunks
+
+
+# 可选的差异算法，名称用于设置和界面
+DIFF_ALGORITHMS = {
+    "histogram": HistogramCalculator,
+    "difflib": DifflibCalculator,
+}
+DEFAULT_DIFF_ALGORITHM = "histogram"
+
+
+def create_diff_calculator(name: str | None = None) -> DiffCalculator:
+    """按名称创建差异计算器，未知名称时使用默认算法"""
+    return DIFF_ALGORITHMS.get(name, DIFF_ALGORITHMS[DEFAULT_DIFF_ALGORITHM])()
+
+
+def diff_algorithm_name(calculator: DiffCalculator) -> str:
+    """差异计算器对应的算法名称"""
+    for name, calculator_class in DIFF_ALGORITHMS.items():
+        if type(calculator) is calculator_class:
+            return name
+    return type(calculator).__name__
@@ -0,0 +1,125 @@
+"""大文件和二进制文件的差异显示保护
+
+在读取文件内容之前，先根据对象大小（`cat-file -s`）、gitattributes 和 numstat 判断文件是否过大或为二进制，
+然后按阈值逐级降级：关闭字符级差异 -> 关闭语法高亮 -> 只显示摘要并提供"仍然加载"按钮。
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from settings import settings
+
+# 加载级别，数值越大降级越多
+LOAD_FULL = 0
+LOAD_NO_CHAR_DIFF = 1
+LOAD_NO_SYNTAX = 2
+LOAD_SUMMARY = 3
+
+# git 判断二进制文件时检查的字节数
+BINARY_SNIFF_SIZE = 8000
+# git 的空树对象，只有一侧存在时用它作为 numstat 的另一侧
+EMPTY_TREE_SHA = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+
+
+@dataclass
+class DiffFileInfo:
+    """待比较文件的大小和二进制信息"""
+
+    file_path: str
+    sizes: tuple = ()  # 各个版本的字节数，不存在的版本不计入
+    binary: bool = False
+
+    @property
+    def max_size(self) -> int:
+        return max(self.sizes, default=0)
+
+
+def load_level_for(info: DiffFileInfo, thresholds: Optional[dict] = None) -> int:
+    """根据文件信息和阈值计算加载级别"""
+    thresholds = thresholds or settings.get_diff_size_thresholds()
+    if info.binary or info.max_size > thresholds["summary"]:
+        return LOAD_SUMMARY
+    if info.max_size > thresholds["syntax_highlight"]:
+        return LOAD_NO_SYNTAX
+    if info.max_size > thresholds["char_diff"]:
+        return LOAD_NO_CHAR_DIFF
+    return LOAD_FULL
+
+
+def load_level_for_texts(level: int, texts, thresholds: Optional[dict] = None) -> int:
+    """读取内容后，如果存在超长行（例如压缩后的 js），至少降级到不做语法高亮"""
+    if level >= LOAD_NO_SYNTAX:
+        return level
+    thresholds = thresholds or settings.get_diff_size_thresholds()
+    max_line_length = thresholds["max_line_length"]
+    for text in texts:
+        # 只有总长度超过阈值时才需要逐行检查
+        if len(text) > max_line_length and any(len(line) > max_line_length for line in text.splitlines()):
+            return LOAD_NO_SYNTAX
+    return level
+
+
+def inspect_commit_file(git_manager, revs, file_path: str) -> DiffFileInfo:
+    """检查文件在多个提交中的版本
+
+    revs 为提交 sha 列表（None 表示该侧不存在），二进制判断依次使用 gitattributes 和 numstat。
+    """
+    revs = [rev for rev in revs if rev]
+    sizes = git_manager.get_blob_sizes(f"{rev}:{file_path}" for rev in revs)
+    info = DiffFileInfo(file_path, tuple(sizes.values()))
+    info.binary = git_manager.is_binary_by_attributes(file_path)
+    if not info.binary and sizes and load_level_for(info) < LOAD_SUMMARY:
+        left_rev, right_rev = (revs[0], revs[1]) if len(revs) >= 2 else (EMPTY_TREE_SHA, revs[0])
+        info.binary = git_manager.is_binary_by_numstat(left_rev, right_rev, file_path)
+    return info
+
+
+def inspect_changed_file(git_manager, changed_file, prefetched=None) -> DiffFileInfo:
+    """根据变化文件列表中已有的信息检查文件，不再读取 gitattributes 和计算 numstat
+
+    diff-tree 的 numstat 已经考虑了 gitattributes（二进制文件的行数为 "-"）；
+    已经预取了内容时直接用内容计算大小，不启动 git 进程。
+    """
+    info = DiffFileInfo(changed_file.path, binary=changed_file.binary)
+    if prefetched is not None:
+        info.sizes = (len(prefetched.left_text.encode("utf-8")), len(prefetched.right_text.encode("utf-8")))
+    else:
+        info.sizes = tuple(git_manager.get_blob_sizes([changed_file.old_sha, changed_file.new_sha]).values())
+    return info
+
+
+def inspect_workspace_file(git_manager, rev: str, file_path: str) -> DiffFileInfo:
+    """检查提交中的版本和工作区中的文件"""
+    info = inspect_commit_file(git_manager, [rev], file_path)
+    working_file_path = os.path.join(git_manager.repo.working_dir, file_path)
+    if os.path.exists(working_file_path):
+        info.sizes = (*info.sizes, os.path.getsize(working_file_path))
+        if not info.binary and load_level_for(info) < LOAD_SUMMARY:
+            # 与 git 相同：前 8000 字节中出现 NUL 即视为二进制
+            with open(working_file_path, "rb") as f:
+                info.binary = b"\0" in f.read(BINARY_SNIFF_SIZE)
+    return info
+
+
+def apply_load_level(highlighter, level: int):
+    """把加载级别应用到 MultiHighlighter 上"""
+    if hasattr(highlighter, "set_degradation"):
+        highlighter.set_degradation(char_diff=level < LOAD_NO_CHAR_DIFF, syntax=level < LOAD_NO_SYNTAX)
+
+
+def describe_load_level(level: int) -> str:
+    """加载级别的提示文字"""
+    if level == LOAD_NO_CHAR_DIFF:
+        return "文件较大，已关闭字符级差异高亮"
+    if level >= LOAD_NO_SYNTAX:
+        return "文件较大或包含超长行，已关闭字符级差异和语法高亮"
+    return ""
+
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
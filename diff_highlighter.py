@@ -1,14 +1,79 @@
+import bisect
 import difflib
+import functools
 import logging
 
 import diff_match_patch
 from PyQt6.QtGui import QColor, QSyntaxHighlighter, QTextCharFormat
 
+from diff_cache import create_char_differ, diff_result_cache
 from diff_calculator import DiffChunk
+from highlight_scheduler import highlight_scheduler
+from merge_diff import REGION_BOTH, REGION_CONFLICT, REGION_EQUAL, REGION_PARENT1, REGION_PARENT2
 from syntax_highlighter import PygmentsHighlighterEngine
 from utils import count_utf16_code_units
 
 
+def _create_format(background_color, text_color) -> QTextCharFormat:
+    """创建高亮格式，包含文字颜色和背景颜色"""
+    fmt = QTextCharFormat()
+    if background_color is not None:
+        fmt.setBackground(QColor(background_color))
+    if text_color is not None:
+        fmt.setForeground(QColor(text_color))
+    return fmt
+
+
+# 所有 DiffHighlighterEngine 共享的格式表（只读，首次使用时创建）
+_SHARED_FORMATS: dict[str, QTextCharFormat] = {}
+
+
+def _shared_formats() -> dict[str, QTextCharFormat]:
+    if not _SHARED_FORMATS:
+        _SHARED_FORMATS.update(
+            {
+                "delete": _create_format("#ffcccc", "#cc0000"),  # 更深的红色
+                "insert": _create_format("#ccffcc", "#00cc00"),  # 更深的绿色
+                "replace": _create_format("#ffffcc", "#cccc00"),  # 更深的黄色
+                "conflict": _create_format("#ffccff", "#cc00cc"),  # 紫色，与两个父版本都不同
+                # 互相包含差异的高亮格式
+                "inline_insert": _create_format("#ccffcc", "#cccc00"),
+                "inline_delete": _create_format("#800080", "#cccc00"),
+            }
+        )
+    return _SHARED_FORMATS
+
+
+@functools.lru_cache(maxsize=4096)
+def _inline_diff(left_line_text: str, right_line_text: str) -> tuple[float, tuple]:
+    """两行文本的相似度和字符级 opcodes（同一对行在重新高亮时会反复用到）"""
+    matcher = difflib.SequenceMatcher(None, left_line_text, right_line_text)
+    return matcher.ratio(), tuple(matcher.get_opcodes())
+
+
+class _ChunkIndex:
+    """差异块在某一侧的区间索引，按块号二分查找所在的差异块"""
+
+    def __init__(self, chunks, side: str):
+        # 差异块按顺序排列且互不重叠，空区间（如左侧的 insert）不会包含任何块
+        self.starts = []
+        self.ends = []
+        self.chunks = []
+        for chunk in chunks:
+            start = chunk.left_start if side == "left" else chunk.right_start
+            end = chunk.left_end if side == "left" else chunk.right_end
+            if end > start:
+                self.starts.append(start)
+                self.ends.append(end)
+                self.chunks.append(chunk)
+
+    def find(self, block_number: int):
+        index = bisect.bisect_right(self.starts, block_number) - 1
+        if index >= 0 and block_number < self.ends[index]:
+            return self.chunks[index]
+        return None
+
+
 class DiffHighlighterEngine:
     SIMILARITY_THRESHOLD_FOR_DETAILED_DIFF = 0.8
 
@@ -16,180 +81,114 @@ class DiffHighlighterEngine:
         self.highlighter = highlighter
         self.editor_type = editor_type
         self.diff_chunks: list[DiffChunk] = []
-        logging.debug("\n=== 初始化 DiffHighlighter ===")
-        logging.debug("编辑器类型：%s", editor_type)
+        self._left_index = _ChunkIndex([], "left")
+        self._right_index = _ChunkIndex([], "right")
+        logging.debug("初始化 DiffHighlighter，编辑器类型：%s", editor_type)
 
         # 定义差异高亮的颜色
+        formats = _shared_formats()
         self.diff_formats = {
-            "delete": self.create_format("#ffcccc", "#cc0000"),  # 更深的红色
-            "insert": self.create_format("#ccffcc", "#00cc00"),  # 更深的绿色
-            "replace": self.create_format("#ffffcc", "#cccc00"),  # 更深的黄色
+            "delete": formats["delete"],
+            "insert": formats["insert"],
+            "replace": formats["replace"],
             "equal": None,
         }
+        self.conflict_format = formats["conflict"]
         # 新增：互相包含差异的高亮格式
-        self.inline_contained_insert_format = self.create_format("#ccffcc", "#cccc00")
-        self.inline_contained_delete_format = self.create_format("#800080", "#cccc00")
-
-        logging.debug("差异格式已创建：%s", self.diff_formats)
+        self.inline_contained_insert_format = formats["inline_insert"]
+        self.inline_contained_delete_format = formats["inline_delete"]
 
     def create_format(self, background_color, text_color):
         """创建高亮格式，包含文字颜色和背景颜色"""
-        logging.debug("\n创建格式 - 背景：%s, 文字：%s", background_color, text_color)
-        fmt = QTextCharFormat()
-        if background_color is not None:
-            fmt.setBackground(QColor(background_color))
-        if text_color is not None:
-            fmt.setForeground(QColor(text_color))
-        return fmt
+        return _create_format(background_color, text_color)
 
     def set_diff_chunks(self, chunks):
-        """设置差异块"""
-        logging.debug("\n=== 设置差异块到高亮器 ===")
-        logging.debug("高亮器类型：%s", self.editor_type)
-        logging.debug("块数量：%d", len(chunks))
-        for i, chunk in enumerate(chunks):
-            logging.debug("\n差异块 %d:", i + 1)
-            logging.debug("类型：%s", chunk.type)
-            logging.debug("左侧范围：%d-%d", chunk.left_start, chunk.left_end)
-            logging.debug("右侧范围：%d-%d", chunk.right_start, chunk.right_end)
+        """设置差异块，并为左右两侧建立区间索引"""
+        logging.debug("设置差异块到高亮器 %s，块数量：%d", self.editor_type, len(chunks))
         self.diff_chunks = chunks
+        self._left_index = _ChunkIndex(chunks, "left")
+        self._right_index = _ChunkIndex(chunks, "right")
 
     def highlightBlock(self, text):
         """高亮当前文本块"""
         block_number = self.highlighter.currentBlock().blockNumber()
-        logging.debug("\n=== 高亮块详细信息 ===")
-        logging.debug("高亮器类型：%s", self.editor_type)
-        logging.debug("当前块号：%d", block_number)
-        logging.debug("文本内容：%s", text)
-        logging.debug("差异块数量：%d", len(self.diff_chunks))
 
         # 找到当前行所在的差异块
         current_chunk = None
-        for chunk in self.diff_chunks:
-            # 根据编辑器类型决定如何处理差异
-            if self.editor_type in ["left", "parent1_edit"]:
-                if chunk.left_start <= block_number < chunk.left_end:
-                    current_chunk = chunk
-                    logging.debug("找到左侧差异块：%s", chunk.type)
-                    break
-            elif self.editor_type in ["right", "parent2_edit"]:
-                if chunk.right_start <= block_number < chunk.right_end:
-                    current_chunk = chunk
-                    logging.debug("找到右侧差异块：%s", chunk.type)
-                    break
-            elif self.editor_type == "result_edit":
-                # 对于三向合并中的结果编辑器，需要同时检查与两个父版本的差异
-                parent1_chunk = None
-                parent2_chunk = None
-
-                # 查找与 parent1 的差异
-                for chunk in self.diff_chunks:
-                    if chunk.right_start <= block_number < chunk.right_end:
-                        parent1_chunk = chunk
-                        break
-
-                # 查找与 parent2 的差异
-                for chunk in self.diff_chunks:
-                    if chunk.left_start <= block_number < chunk.left_end:
-                        parent2_chunk = chunk
-                        break
-
-                # 根据差异情况设置不同的高亮
-                if parent1_chunk and parent2_chunk:
-                    # 与两个父版本都不同
-                    if parent1_chunk.type != "equal" and parent2_chunk.type != "equal":
-                        current_chunk = parent1_chunk
-                        # 使用特殊的冲突颜色
-                        conflict_format = self.create_format("#ffccff", "#cc00cc")  # 紫色
-                        self.highlighter.setFormat(0, len(text), conflict_format)
-                        return
-                    elif parent1_chunk.type != "equal":
-                        current_chunk = parent1_chunk
-                    else:
-                        current_chunk = parent2_chunk
-                elif parent1_chunk:
+        if self.editor_type in ["left", "parent1_edit"]:
+            current_chunk = self._left_index.find(block_number)
+        elif self.editor_type in ["right", "parent2_edit"]:
+            current_chunk = self._right_index.find(block_number)
+        elif self.editor_type == "result_edit" and self.diff_chunks:
+            # 对于三向合并中的结果编辑器，需要同时检查与两个父版本的差异
+            parent1_chunk = self._right_index.find(block_number)  # 与 parent1 的差异
+            parent2_chunk = self._left_index.find(block_number)  # 与 parent2 的差异
+
+            # 根据差异情况设置不同的高亮
+            if parent1_chunk and parent2_chunk:
+                # 与两个父版本都不同
+                if parent1_chunk.type != "equal" and parent2_chunk.type != "equal":
+                    # 使用特殊的冲突颜色
+                    self.highlighter.setFormat(0, len(text), self.conflict_format)
+                    return
+                elif parent1_chunk.type != "equal":
                     current_chunk = parent1_chunk
-                elif parent2_chunk:
+                else:
                     current_chunk = parent2_chunk
+            elif parent1_chunk:
+                current_chunk = parent1_chunk
+            elif parent2_chunk:
+                current_chunk = parent2_chunk
 
         # 如果找到差异块，应用相应的格式
         if current_chunk and current_chunk.type != "equal":
-            logging.debug("应用差异块格式：%s", current_chunk.type)
-            format_type = current_chunk.type
-
-            if format_type in self.diff_formats:
-                format = self.diff_formats[format_type]
-                if format:
-                    logging.debug("应用格式：%s", format_type)
-                    self.highlighter.setFormat(0, len(text), format)
-                    logging.debug("格式已应用")
-
-                # 新增：处理互相包含的情况
-                if current_chunk.type == "replace":
-                    try:
-                        # 获取当前行的左右文本
-                        if self.editor_type in ["left", "parent1_edit"]:
-                            left_line_text = self.highlighter.document().findBlockByNumber(block_number).text()
-                            right_line_text = self.highlighter.other_document.findBlockByNumber(
-                                current_chunk.right_start + (block_number - current_chunk.left_start)
-                            ).text()
-                        elif self.editor_type in ["right", "parent2_edit"]:
-                            right_line_text = self.highlighter.document().findBlockByNumber(block_number).text()
-                            left_line_text = self.highlighter.other_document.findBlockByNumber(
-                                current_chunk.left_start + (block_number - current_chunk.right_start)
-                            ).text()
-                        else:
-                            return
-
-                        # === BEGIN NEW DETAILED DIFF LOGIC ===
-                        if (
-                            left_line_text != right_line_text
-                        ):  # Ensure they are actually different before calculating ratio
-                            s = difflib.SequenceMatcher(None, left_line_text, right_line_text)
-                            similarity_ratio = s.ratio()
-
-                            if similarity_ratio > self.SIMILARITY_THRESHOLD_FOR_DETAILED_DIFF:
-                                # The base "replace" format for the line is applied by the code just before this 'replace' handling.
-                                # Now, apply character-level highlights on top.
-
-                                if self.editor_type in ["left", "parent1_edit"]:
-                                    # We are in the left editor, text is left_line_text.
-                                    # Highlight parts of left_line_text that are changed or deleted compared to right_line_text.
-                                    for tag, i1, i2, j1, j2 in s.get_opcodes():
-                                        if (
-                                            tag == "replace"
-                                        ):  # Characters in left_line_text[i1:i2] are replaced by right_line_text[j1:j2]
-                                            self.highlighter.setFormat(
-                                                i1, i2 - i1, self.inline_contained_delete_format
-                                            )  # Style for text being replaced in left view
-                                        elif (
-                                            tag == "delete"
-                                        ):  # Characters in left_line_text[i1:i2] are not in right_line_text
-                                            self.highlighter.setFormat(i1, i2 - i1, self.inline_contained_delete_format)
-                                        # 'insert' (char in right but not left) means a gap in left, nothing to format in left_line_text itself.
-
-                                elif self.editor_type in ["right", "parent2_edit"]:
-                                    # We are in the right editor, text is right_line_text.
-                                    # Highlight parts of right_line_text that are changed or inserted compared to left_line_text.
-                                    for tag, i1, i2, j1, j2 in s.get_opcodes():
-                                        if (
-                                            tag == "replace"
-                                        ):  # Characters in right_line_text[j1:j2] replace left_line_text[i1:i2]
-                                            self.highlighter.setFormat(
-                                                j1, j2 - j1, self.inline_contained_insert_format
-                                            )  # Style for text that is replacing in right view
-                                        elif (
-                                            tag == "insert"
-                                        ):  # Characters in right_line_text[j1:j2] are not in left_line_text
-                                            self.highlighter.setFormat(j1, j2 - j1, self.inline_contained_insert_format)
-                                        # 'delete' (char in left but not right) means a gap in right, nothing to format in right_line_text itself.
-
-                                # If detailed diff was applied, we 'return' from highlightBlock for this line to skip old logic.
-                                return
-                        # === END NEW DETAILED DIFF LOGIC ===
-
-                    except IndexError:
-                        logging.warning("获取行文本时发生索引错误")
+            format = self.diff_formats.get(current_chunk.type)
+            if format:
+                self.highlighter.setFormat(0, len(text), format)
+
+            # 新增：处理互相包含的情况
+            if current_chunk.type == "replace":
+                try:
+                    self._highlight_inline_diff(block_number, current_chunk)
+                except IndexError:
+                    logging.warning("获取行文本时发生索引错误")
+
+    def _highlight_inline_diff(self, block_number: int, current_chunk: DiffChunk):
+        """相似度足够高的 replace 行再做字符级高亮"""
+        # 获取当前行的左右文本
+        if self.editor_type in ["left", "parent1_edit"]:
+            left_line_text = self.highlighter.document().findBlockByNumber(block_number).text()
+            right_line_text = self.highlighter.other_document.findBlockByNumber(
+                current_chunk.right_start + (block_number - current_chunk.left_start)
+            ).text()
+        elif self.editor_type in ["right", "parent2_edit"]:
+            right_line_text = self.highlighter.document().findBlockByNumber(block_number).text()
+            left_line_text = self.highlighter.other_document.findBlockByNumber(
+                current_chunk.left_start + (block_number - current_chunk.right_start)
+            ).text()
+        else:
+            return
+
+        # Ensure they are actually different before calculating ratio
+        if left_line_text == right_line_text:
+            return
+        similarity_ratio, opcodes = _inline_diff(left_line_text, right_line_text)
+        if similarity_ratio <= self.SIMILARITY_THRESHOLD_FOR_DETAILED_DIFF:
+            return
+
+        # The base "replace" format for the line has already been applied; apply character-level highlights on top.
+        if self.editor_type in ["left", "parent1_edit"]:
+            # Highlight parts of left_line_text that are changed or deleted compared to right_line_text.
+            # 'insert' (char in right but not left) means a gap in left, nothing to format in left_line_text itself.
+            for tag, i1, i2, j1, j2 in opcodes:
+                if tag in ("replace", "delete"):
+                    self.highlighter.setFormat(i1, i2 - i1, self.inline_contained_delete_format)
+        else:
+            # Highlight parts of right_line_text that are changed or inserted compared to left_line_text.
+            # 'delete' (char in left but not right) means a gap in right, nothing to format in right_line_text itself.
+            for tag, i1, i2, j1, j2 in opcodes:
+                if tag in ("replace", "insert"):
+                    self.highlighter.setFormat(j1, j2 - j1, self.inline_contained_insert_format)
 
 
 class DiffHighlighter(QSyntaxHighlighter):
@@ -213,28 +212,63 @@ class MultiHighlighter(QSyntaxHighlighter):
         self.other_document = other_document
         self.diff_chunks: list[DiffChunk] = []
         self.empty_block_numbers = set()
+        # 大文件降级开关（见 diff_guard）
+        self.char_diff_enabled = True
+        self.syntax_enabled = True
+
+    def set_degradation(self, char_diff: bool = True, syntax: bool = True):
+        """设置是否计算字符级差异和是否做语法高亮"""
+        self.char_diff_enabled = char_diff
+        self.syntax_enabled = syntax
+        self.pygments_engine.set_enabled(syntax)
 
     def set_language(self, language_name):
         self.pygments_engine.set_language(language_name)
-        self.rehighlight()
+        highlight_scheduler.rehighlight(self)
 
     def set_diff_chunks(self, chunks):
         self.diff_engine.set_diff_chunks(chunks)
         self.diff_chunks = chunks
 
     def set_texts(self, left_text: str, right_text: str):
+        if not self.char_diff_enabled:
+            # 字符级差异被关闭时传入空文本，清空已有的差异结果
+            left_text = right_text = ""
         if hasattr(self.diff_engine, "set_texts"):
             self.diff_engine.set_texts(left_text, right_text)
 
-    def set_merge_texts(self, left_text: str, right_text: str, result_text: str):
+    def set_char_diff(self, diff_list):
+        """设置已经计算好的字符级差异（来自后台线程或缓存）"""
+        if not self.char_diff_enabled:
+            diff_list = []
+        self.empty_block_numbers.clear()
+        if hasattr(self.diff_engine, "set_diff_list"):
+            self.diff_engine.set_diff_list(diff_list)
+            # 高亮是分片进行的，不能等高亮完所有块再收集被删除的空行
+            self.empty_block_numbers.update(self.diff_engine.empty_deleted_blocks)
+
+    def set_merge_texts(self, left_text: str, right_text: str, result_text: str, left_chunks=None, right_chunks=None):
+        if not self.char_diff_enabled:
+            left_text = right_text = result_text = ""
+            left_chunks = right_chunks = None
         if hasattr(self.diff_engine, "set_merge_texts"):
-            self.diff_engine.set_merge_texts(left_text, right_text, result_text)
+            self.diff_engine.set_merge_texts(left_text, right_text, result_text, left_chunks, right_chunks)
+
+    def set_merge_regions(self, regions):
+        """设置三向合并区域（merge_diff.MergeRegion），result 中的行按区域类型整行着色"""
+        self.diff_engine.set_merge_regions(regions)
 
     def highlightBlock(self, text):
-        self.pygments_engine.highlightBlock(text)
+        if self.syntax_enabled:
+            self.pygments_engine.highlightBlock(text)
         self.diff_engine.highlightBlock(text)
 
 
+def _utf16_length(text: str) -> int:
+    """字符串的 UTF-16 长度（与 QTextBlock 中的位置单位一致），纯 ASCII 时不需要编码"""
+    return len(text) if text.isascii() else count_utf16_code_units(text)
+
+
 # new DiffHighlighterEngine
 class NewDiffHighlighterEngine:
     def __init__(self, highlighter: QSyntaxHighlighter, editor_type=""):
@@ -243,11 +277,18 @@ class NewDiffHighlighterEngine:
         self.diff_chunks: list[DiffChunk] = []
         self.diff_list = []
         self.other_diff_list = []
-        self._diff_cache = {}  # 缓存计算结果
+        # 块号 -> [(块内起点，长度，格式)]，在设置差异时一次性计算，位置已换算为 UTF-16
+        self._block_runs: dict[int, list] = {}
+        # 被删除的空白行（只能整行高亮，见 MultiHighlighter.empty_block_numbers）
+        self._empty_deleted_blocks: set[int] = set()
+        # 三向合并中 result 的非 equal 区域：起始行、终止行、类型，按起始行排序
+        self._region_starts: list[int] = []
+        self._region_ends: list[int] = []
+        self._region_types: list[str] = []
         logging.debug("\n=== 初始化 DiffHighlighter ===")
         logging.debug("编辑器类型：%s", editor_type)
 
-        self.dmp = diff_match_patch.diff_match_patch()
+        self.dmp = create_char_differ()
 
         # 定义不同类型差异的格式
         self.deleted_format = QTextCharFormat()
@@ -262,27 +303,59 @@ class NewDiffHighlighterEngine:
         self.equal_format.setBackground(QColor(255, 255, 255))  # 白色背景
         self.equal_format.setForeground(QColor(0, 0, 0))  # 黑色文字
 
+        # 合并区域的整行背景，只设置背景色，叠加在语法高亮之上
+        self.region_formats = {
+            REGION_CONFLICT: _create_format("#ffd8ff", None),  # 紫色，两个父版本都修改了此处
+            REGION_BOTH: _create_format("#fff2c0", None),  # 黄色，与两个父版本都不同
+            REGION_PARENT1: _create_format("#dcebff", None),  # 蓝色，只与 parent1 不同
+            REGION_PARENT2: _create_format("#d8f5ef", None),  # 青色，只与 parent2 不同
+        }
+
     def set_diff_chunks(self, chunks):
         self.diff_chunks = chunks
-        self._diff_cache.clear()  # 清除缓存
+
+    def set_merge_regions(self, regions):
+        """记录 result 中每个非 equal 合并区域覆盖的行，highlightBlock 按块号二分查找"""
+        changed = [
+            region for region in regions if region.type != REGION_EQUAL and region.result_end > region.result_start
+        ]
+        self._region_starts = [region.result_start for region in changed]
+        self._region_ends = [region.result_end for region in changed]
+        self._region_types = [region.type for region in changed]
+
+    def region_type(self, block_number: int):
+        """result 中该行所在合并区域的类型，不在任何修改区域内时返回 None"""
+        index = bisect.bisect_right(self._region_starts, block_number) - 1
+        if index >= 0 and block_number < self._region_ends[index]:
+            return self._region_types[index]
+        return None
 
     def set_texts(self, left_text: str, right_text: str):
         """设置要对比的文本"""
         # 计算差异
-        self.diff_list = self.dmp.diff_main(left_text, right_text)
-        self.dmp.diff_cleanupSemantic(self.diff_list)
-        self._diff_cache.clear()  # 清除缓存
+        self.diff_list = diff_result_cache.chunked_char_diff(self.dmp, left_text, right_text, self.diff_chunks)
+        self.other_diff_list = []
+        self._build_block_runs()
 
-    def set_merge_texts(self, left_text: str, right_text: str, result_text: str):
-        """设置要对比的文本"""
+    def set_diff_list(self, diff_list):
+        """直接设置字符级差异结果"""
+        self.diff_list = diff_list
+        self.other_diff_list = []
+        self._build_block_runs()
+
+    def set_merge_texts(self, left_text: str, right_text: str, result_text: str, left_chunks=None, right_chunks=None):
+        """设置要对比的文本
+
+        left_chunks/right_chunks 为 left -> result 和 right -> result 的行级差异，提供时只在差异块内计算字符级差异
+        """
         # 计算差异
-        self.diff_list = self.dmp.diff_main(left_text, result_text)
-        self.other_diff_list = self.dmp.diff_main(right_text, result_text)
-        # merge the two lists
-        # self.diff_list.extend(diff_list)
-        self.dmp.diff_cleanupSemantic(self.diff_list)
-        self.dmp.diff_cleanupSemantic(self.other_diff_list)
-        self._diff_cache.clear()  # 清除缓存
+        if left_chunks is None or right_chunks is None:
+            self.diff_list = diff_result_cache.char_diff(self.dmp, left_text, result_text)
+            self.other_diff_list = diff_result_cache.char_diff(self.dmp, right_text, result_text)
+        else:
+            self.diff_list = diff_result_cache.chunked_char_diff(self.dmp, left_text, result_text, left_chunks)
+            self.other_diff_list = diff_result_cache.chunked_char_diff(self.dmp, right_text, result_text, right_chunks)
+        self._build_block_runs()
 
     # left side property
     @property
@@ -298,78 +371,89 @@ class NewDiffHighlighterEngine:
     def is_result_side(self):
         return self.editor_type == "result_edit"
 
-    def highlightBlock(self, text: str):
-        """重写高亮方法"""
-        self._highlightBlock(text, self.diff_list)
-        if hasattr(self, "other_diff_list"):
-            self._highlightBlock(text, self.other_diff_list)
-
-    def _highlightBlock(self, text: str, diff_list):
-        """重写高亮方法"""
-
-        # 获取当前块在整个文档中的位置
-        current_block = self.highlighter.currentBlock()
-        block_number = current_block.blockNumber()
-        block_start = current_block.position()
-        block_length = count_utf16_code_units(text)
-
-        # 使用缓存优化性能
-        cache_key = (block_number, id(diff_list))
-        if cache_key in self._diff_cache:
-            cached_formats = self._diff_cache[cache_key]
-            for start_pos, length, format_obj in cached_formats:
-                self.highlighter.setFormat(start_pos, length, format_obj)
-            return
+    @property
+    def empty_deleted_blocks(self) -> set[int]:
+        """被删除的空白行的块号，设置差异时计算，使用方不能修改"""
+        return self._empty_deleted_blocks
+
+    def _build_block_runs(self):
+        """把差异列表换算为每个块的格式区间表，highlightBlock 只需按块号查表"""
+        self._block_runs = {}
+        self._empty_deleted_blocks = set()
+        for diff_list in (self.diff_list, self.other_diff_list):
+            if diff_list:
+                self._add_block_runs(diff_list)
+
+    def _add_block_runs(self, diff_list):
+        DIFF_DELETE = diff_match_patch.diff_match_patch.DIFF_DELETE
+        DIFF_INSERT = diff_match_patch.diff_match_patch.DIFF_INSERT
+        # 左侧文档由删除和相同的片段组成，其它文档由插入和相同的片段组成
+        skipped_op = DIFF_INSERT if self.is_left_side else DIFF_DELETE
+        lines = "".join(data for op, data in diff_list if op != skipped_op).split("\n")
+
+        # 每个块在文档中的起点和终点（不含换行符）
+        block_starts = []
+        block_ends = []
+        position = 0
+        for line in lines:
+            block_starts.append(position)
+            position += _utf16_length(line)
+            block_ends.append(position)
+            position += 1  # 换行符
 
-        # 计算并缓存结果
-        formats_to_apply = []
         current_pos = 0
-
         for op, data in diff_list:
-            data_length = count_utf16_code_units(data)
-
-            # 检查这个差异是否与当前块重叠
-            if current_pos + data_length >= block_start and current_pos < block_start + block_length:
-                # 计算在当前块中的相对位置
-                start_in_block = max(0, current_pos - block_start)
-                end_in_block = min(block_length, current_pos + data_length - block_start)
-
-                if end_in_block >= start_in_block:
-                    format_to_apply = None
-
-                    if op == diff_match_patch.diff_match_patch.DIFF_DELETE:
-                        if self.is_left_side or self.is_result_side:
-                            format_to_apply = self.deleted_format
-                    elif op == diff_match_patch.diff_match_patch.DIFF_INSERT:
-                        if not self.is_left_side:
-                            format_to_apply = self.inserted_format
-                    # else:  # DIFF_EQUAL
-                    # format_to_apply = self.equal_format
-
-                    if format_to_apply:
-                        if format_to_apply == self.deleted_format and not text.strip():
-                            # this is a line deletion, we need to highlight the whole line
-                            if hasattr(self.highlighter, "empty_block_numbers"):
-                                self.highlighter.empty_block_numbers.add(block_number)
-                        else:
-                            formats_to_apply.append((start_in_block, end_in_block - start_in_block, format_to_apply))
+            data_length = _utf16_length(data)
+            format_to_apply = None
+            if op == DIFF_DELETE:
+                if self.is_left_side or self.is_result_side:
+                    format_to_apply = self.deleted_format
+            elif op == DIFF_INSERT:
+                if not self.is_left_side:
+                    format_to_apply = self.inserted_format
+
+            if format_to_apply is not None:
+                # 与 [current_pos, current_pos + data_length] 重叠的块：块终点 > current_pos 且块起点 <= 区间终点
+                end_pos = current_pos + data_length
+                block_number = bisect.bisect_right(block_ends, current_pos)
+                while block_number < len(lines) and block_starts[block_number] <= end_pos:
+                    block_start = block_starts[block_number]
+                    block_length = block_ends[block_number] - block_start
+                    start_in_block = max(0, current_pos - block_start)
+                    end_in_block = min(block_length, end_pos - block_start)
+                    if format_to_apply is self.deleted_format and not lines[block_number].strip():
+                        # this is a line deletion, we need to highlight the whole line
+                        self._empty_deleted_blocks.add(block_number)
+                    elif end_in_block > start_in_block:
+                        self._block_runs.setdefault(block_number, []).append(
+                            (start_in_block, end_in_block - start_in_block, format_to_apply)
+                        )
+                    block_number += 1
 
             # 只有在 DELETE 和 EQUAL 时才移动左侧位置，INSERT 和 EQUAL 时才移动右侧位置
-            if self.is_left_side:
-                if op != diff_match_patch.diff_match_patch.DIFF_INSERT:
-                    current_pos += data_length
-            elif op != diff_match_patch.diff_match_patch.DIFF_DELETE:
+            if op != skipped_op:
                 current_pos += data_length
 
-        # 缓存结果 (限制缓存大小以避免内存泄漏)
-        if len(self._diff_cache) > 1000:  # 限制缓存大小
-            # 清理最老的一半缓存
-            keys_to_remove = list(self._diff_cache.keys())[:500]
-            for key in keys_to_remove:
-                del self._diff_cache[key]
-
-        self._diff_cache[cache_key] = formats_to_apply
-
-        # 应用格式
-        for start_pos, length, format_obj in formats_to_apply:
+    def highlightBlock(self, text: str):
+        """重写高亮方法：按块号查表应用格式"""
+        block_number = self.highlighter.currentBlock().blockNumber()
+        region_format = self.region_formats.get(self.region_type(block_number))
+        if region_format is not None:
+            self._merge_line_format(text, region_format)
+        if block_number in self._empty_deleted_blocks and hasattr(self.highlighter, "empty_block_numbers"):
+            self.highlighter.empty_block_numbers.add(block_number)
+        for start_pos, length, format_obj in self._block_runs.get(block_number, ()):
             self.highlighter.setFormat(start_pos, length, format_obj)
+
+    def _merge_line_format(self, text: str, line_format: QTextCharFormat):
+        """把整行格式叠加到已有格式（语法高亮）上，按格式相同的连续区间分段设置"""
+        length = _utf16_length(text)
+        start = 0
+        current = self.highlighter.format(0)
+        for pos in range(1, length + 1):
+            next_format = self.highlighter.format(pos) if pos < length else None
+            if next_format != current:
+                merged = QTextCharFormat(current)
+                merged.merge(line_format)
+                self.highlighter.setFormat(start, pos - start, merged)
+                start, current = pos, next_format
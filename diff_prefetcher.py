@@ -0,0 +1,76 @@
+"""提交文件差异的预取缓存
+
+选中提交后，后台线程（threads.DiffPrefetchThread）会提前读取变化文件的新旧内容并计算 DiffChunk，
+结果放在这里的有界 LRU 缓存中，CompareView.show_diff 命中缓存时可以跳过读取和计算。
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+
+from diff_calculator import DiffChunk
+
+# 选中提交后预取的文件数量
+PREFETCH_FIRST_N = 20
+# 选中文件时预取的前后相邻文件数量
+PREFETCH_NEIGHBOURS = 3
+# 超过该大小的 blob 不预取
+PREFETCH_MAX_BLOB_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class PrefetchedDiff:
+    """预取的差异结果"""
+
+    left_text: str
+    right_text: str
+    diff_chunks: List[DiffChunk]
+    algorithm: str  # 计算 diff_chunks 所用的算法（DiffCalculator 类名）
+
+    @property
+    def size(self) -> int:
+        return len(self.left_text) + len(self.right_text)
+
+
+class DiffPrefetchCache:
+    """按 (提交 sha, 文件路径) 缓存预取结果，按条目数和文本总大小限制容量"""
+
+    def __init__(self, max_entries: int = 200, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple[str, str], PrefetchedDiff] = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, commit_sha: str, file_path: str) -> Optional[PrefetchedDiff]:
+        with self._lock:
+            entry = self._entries.get((commit_sha, file_path))
+            if entry is not None:
+                self._entries.move_to_end((commit_sha, file_path))
+            return entry
+
+    def contains(self, commit_sha: str, file_path: str) -> bool:
+        with self._lock:
+            return (commit_sha, file_path) in self._entries
+
+    def put(self, commit_sha: str, file_path: str, entry: PrefetchedDiff) -> None:
+        key = (commit_sha, file_path)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old.size
+            self._entries[key] = entry
+            self._total_bytes += entry.size
+            while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= evicted.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+
+# 进程内共享的预取缓存
+diff_prefetch_cache = DiffPrefetchCache()
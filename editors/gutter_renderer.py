@@ -0,0 +1,160 @@
+"""行号区域（行号、blame、修改标记）的绘制
+
+一次遍历可见的块同时绘制行号、blame 色带和修改标记，结果缓存在一张覆盖可见区域及其上下
+STRIP_MARGIN_LINES 行的图片（条带）中。滚动时只要可见的块仍在条带内且内容未变化（版本号相同），
+就直接按偏移贴图，不再逐行绘制。行号和 blame 文字使用缓存的 QStaticText，颜色和画笔预先创建。
+"""
+
+import typing
+
+from PyQt6.QtCore import QPoint, QRectF, Qt
+from PyQt6.QtGui import QColor, QPainter, QPixmap, QStaticText
+
+if typing.TYPE_CHECKING:
+    from editors.text_edit import SyncedTextEdit
+
+# 条带在可见区域上下额外绘制的行数
+STRIP_MARGIN_LINES = 50
+# 行号文字缓存的最大条目数
+MAX_CACHED_TEXTS = 4096
+
+BACKGROUND_COLOR = QColor("#f0f0f0")
+LINE_NUMBER_COLOR = QColor("#808080")
+HIGHLIGHTED_LINE_COLOR = QColor(Qt.GlobalColor.yellow).lighter(120)
+BLAME_DEFAULT_COLOR = QColor(Qt.GlobalColor.lightGray)
+BLAME_TEXT_COLOR = QColor("#333333")
+
+
+class _Strip:
+    def __init__(self, pixmap: QPixmap, first: int, row_tops: list, key: tuple):
+        self.pixmap = pixmap
+        self.first = first  # 条带第一行的块号
+        self.row_tops = row_tops  # 每个块在条带中的 y 坐标（多一项为条带底部）
+        self.key = key
+
+    @property
+    def last(self) -> int:
+        return self.first + len(self.row_tops) - 2
+
+
+class GutterRenderer:
+    """绘制并缓存编辑器的行号区域"""
+
+    def __init__(self, editor: "SyncedTextEdit"):
+        self.editor = editor
+        self.version = 0
+        self._strip = None
+        self._texts = {}  # 文字 -> QStaticText
+
+    def invalidate(self):
+        """行号区域的内容（blame、修改标记、高亮行、文档行数或行高）改变后调用"""
+        self.version += 1
+        self._strip = None
+
+    def clear_text_cache(self):
+        """字体改变后调用"""
+        self._texts.clear()
+        self.invalidate()
+
+    def _static_text(self, text: str) -> QStaticText:
+        static_text = self._texts.get(text)
+        if static_text is None:
+            if len(self._texts) >= MAX_CACHED_TEXTS:
+                self._texts.clear()
+            static_text = QStaticText(text)
+            static_text.setTextFormat(Qt.TextFormat.PlainText)
+            static_text.prepare(font=self.editor.font())
+            self._texts[text] = static_text
+        return static_text
+
+    def paint(self, event):
+        editor = self.editor
+        area = editor.line_number_area
+        block = editor.firstVisibleBlock()
+        if not block.isValid():
+            QPainter(area).fillRect(event.rect(), BACKGROUND_COLOR)
+            return
+        first = block.blockNumber()
+        last = editor.cursorForPosition(QPoint(0, editor.viewport().height())).blockNumber()
+        key = (self.version, area.width(), area.devicePixelRatioF(), editor.blockCount())
+        strip = self._strip
+        if strip is None or strip.key != key or first < strip.first or last > strip.last:
+            strip = self._strip = self._render_strip(max(0, first - STRIP_MARGIN_LINES), last + STRIP_MARGIN_LINES, key)
+
+        top = editor.blockBoundingGeometry(block).translated(editor.contentOffset()).top()
+        origin = top - strip.row_tops[first - strip.first]
+        painter = QPainter(area)
+        painter.fillRect(event.rect(), BACKGROUND_COLOR)
+        painter.drawPixmap(QPoint(0, int(round(origin))), strip.pixmap)
+
+    def _render_strip(self, first: int, last: int, key: tuple) -> _Strip:
+        editor = self.editor
+        area = editor.line_number_area
+        document = editor.document()
+
+        # 先收集各块的高度，确定条带的大小
+        blocks = []
+        row_tops = [0.0]
+        block = document.findBlockByNumber(first)
+        while block.isValid() and block.blockNumber() <= last:
+            height = editor.blockBoundingRect(block).height() if block.isVisible() else 0.0
+            blocks.append((block, height))
+            row_tops.append(row_tops[-1] + height)
+            block = block.next()
+
+        ratio = area.devicePixelRatioF()
+        width = max(1, area.width())
+        height = max(1, int(row_tops[-1]) + 1)
+        pixmap = QPixmap(int(width * ratio), int(height * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(BACKGROUND_COLOR)
+
+        painter = QPainter(pixmap)
+        painter.setFont(editor.font())
+        font_metrics = editor.fontMetrics()
+        line_digits = len(str(max(1, editor.blockCount())))
+        line_num_text_width = font_metrics.horizontalAdvance("9" * line_digits)
+        number_x = width - editor.PADDING_RIGHT_OF_LINENUM - line_num_text_width
+
+        # blame 相关的值每个条带只取一次
+        showing_blame = editor.showing_blame and len(editor.blame_table) > 0
+        blame_table = editor.blame_table
+        line_colors = editor.line_final_color_indices
+        palette = editor.blame_color_palette
+        blame_text_width = editor.max_blame_display_width
+        blame_fill_width = editor.PADDING_LEFT_OF_BLAME + blame_text_width + editor.PADDING_AFTER_BLAME
+
+        for index, (block, block_height) in enumerate(blocks):
+            if block_height <= 0:
+                continue
+            block_number = first + index
+            top = row_tops[index]
+
+            if block_number == editor.highlighted_line_number:
+                painter.fillRect(QRectF(number_x, top, line_num_text_width, block_height), HIGHLIGHTED_LINE_COLOR)
+            number_text = self._static_text(str(block_number + 1))
+            text_size = number_text.size()
+            painter.setPen(LINE_NUMBER_COLOR)
+            painter.drawStaticText(
+                int(number_x + line_num_text_width - text_size.width()),
+                int(top + (block_height - text_size.height()) / 2),
+                number_text,
+            )
+
+            if showing_blame:
+                commit = blame_table.commit_at(block_number)
+                if commit:
+                    color_index = line_colors[block_number] if block_number < len(line_colors) else -1
+                    color = palette[color_index] if 0 <= color_index < len(palette) else BLAME_DEFAULT_COLOR
+                    painter.fillRect(QRectF(0, top, blame_fill_width, block_height), color)
+                    blame_text = self._static_text(commit.display_string)
+                    painter.setPen(BLAME_TEXT_COLOR)
+                    painter.drawStaticText(
+                        editor.PADDING_LEFT_OF_BLAME,
+                        int(top + (block_height - blame_text.size().height()) / 2),
+                        blame_text,
+                    )
+
+            editor.paint_line_marks(painter, block_number, top, block_height, number_x)
+        painter.end()
+        return _Strip(pixmap, first, row_tops, key)
@@ -1,17 +1,26 @@
 import logging
 import os
+import time
 import typing
 
-from PyQt6.QtCore import Qt, pyqtSignal  # 引入 pyqtSignal
-from PyQt6.QtGui import QColor, QFocusEvent, QPainter, QPen
-from PyQt6.QtWidgets import QSizePolicy, QWidget
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal  # 引入 pyqtSignal
+from PyQt6.QtGui import QColor, QFocusEvent, QPainter, QPen, QPixmap, QTextCursor
+from PyQt6.QtWidgets import QLabel, QSizePolicy, QWidget
 
-from diff_calculator import DifflibCalculator
+from diff_cache import diff_result_cache
+from diff_calculator import create_diff_calculator, diff_dict_from_chunks
 from editors.text_edit import SyncedTextEdit
+from large_file import describe_large_file, split_long_lines
+from line_modification_tracker import LineModificationTracker
+from settings import settings
+from threads import FileLoadThread, ThreadTracker
 
 if typing.TYPE_CHECKING:
     from git_manager import GitManager
 
+# 文件修改时间距离记录指纹的时间小于该值时不信任指纹：同一时间戳内再次写入且大小不变时 stat 无法区分
+RACY_FINGERPRINT_NS = 2 * 1000 * 1000 * 1000
+
 
 # <new_class>
 # 普通编辑器 主要专注于修改的文字部分
@@ -26,12 +35,37 @@ class ModifiedTextEdit(SyncedTextEdit):
         "modified": QColor("#FFC107"),  # yellow for modified
         "deleted": QColor("#F44336"),  # red for deleted
     }
+    LINE_STATUS_PENS: typing.ClassVar[dict] = {
+        status: QPen(color, 2) for status, color in LINE_STATUS_COLORS.items()
+    }  # 2 pixels wide
     MODIFICATION_MARK_WIDTH: typing.ClassVar[int] = 10
     MODIFICATION_MARK_SIZE: typing.ClassVar[int] = 6
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.line_modifications = {}  # Store modification status for each line
+        # 大文件模式（见 large_file）
+        self.large_file_label = QLabel(self)
+        self.large_file_label.setStyleSheet("color: #8a6d3b; background-color: #fcf8e3; padding: 2px;")
+        self.large_file_label.hide()
+        self._loading = False  # 正在追加分块读取的内容，此时文档的修改状态不是用户编辑造成的
+        self._load_generation = 0
+        self._load_thread = None
+        self._load_threads = ThreadTracker(self)
+        # 上次计算修改标记时的 (mtime_ns, 大小, inode, 暂存区 blob sha)，未变化时获得焦点不再刷新
+        self._fingerprint: tuple | None = None
+        self._index_state: tuple | None = None  # (暂存区文件的 stat, 相对路径, blob sha)
+        self._index_content: tuple | None = None  # (blob sha, 内容, 行)
+        # 编辑时增量更新修改标记
+        self._modification_tracker = LineModificationTracker()
+        self._tracked_char_count = 0
+        self._tracked_modifications = None  # 由跟踪的差异块得到的修改标记，概览条据此按块绘制
+        self._search_key = None  # 概览条中搜索命中对应的 (搜索文字, 区分大小写, 文档版本)
+        self._modification_timer = QTimer(self)
+        self._modification_timer.setSingleShot(True)
+        self._modification_timer.setInterval(0)
+        self._modification_timer.timeout.connect(self._update_line_modifications)
+        self.document().contentsChange.connect(self._on_contents_change)
         self.overview_bar = OverViewBar(self, parent=self)  # 绘制在最右边
         self.overview_bar.setParent(self)
         # 连接文档内容修改信号
@@ -90,6 +124,19 @@ QPlainTextEdit QScrollBar::handle:vertical:pressed {
             logging.debug("in focusInEvent highlight_file_item: %s", self.file_path)
             parent.file_tree.highlight_file_item(self.file_path)
 
+        if self.large_file:
+            # 大文件不在获得焦点时重新读取和计算修改标记，文件变化由文件监视重新加载
+            return
+
+        git_manager = self._find_git_manager()
+        if (
+            git_manager is not None
+            and self._fingerprint is not None
+            and self.file_fingerprint(git_manager) == self._fingerprint
+        ):
+            logging.debug("文件和暂存区均未变化，不刷新：%s", self.file_path)
+            return
+
         current_content = self.toPlainText()
         try:
             with open(self.file_path, "r", encoding="utf-8") as f:
@@ -108,26 +155,233 @@ QPlainTextEdit QScrollBar::handle:vertical:pressed {
             # 恢复滚动条位置，避免不必要的滚动到顶部
             scrollbar.setValue(stored_value)
 
-        parent = self.parent()
-        while parent and not hasattr(parent, "git_manager"):  # Check parent exists
-            parent = parent.parent()
-        if parent and hasattr(parent, "git_manager"):
+        if git_manager is not None:
             # todo should check if it's under git version
             # 获取仓库路径
-            diffs = self.get_diffs(parent.git_manager, self.toPlainText())
+            diffs = self.get_diffs(git_manager, self.toPlainText())
             # print(f"focusInEvent diffs: {diffs}") # TODO remove this print
             self.set_line_modifications(diffs)
 
+    def _find_git_manager(self) -> typing.Optional["GitManager"]:
+        parent = self.parent()
+        while parent and not hasattr(parent, "git_manager"):  # Check parent exists
+            parent = parent.parent()
+        return parent.git_manager if parent else None
+
+    # ---- 文件指纹 ----
+
+    def file_fingerprint(self, git_manager: "GitManager") -> tuple | None:
+        """返回文件的 (mtime_ns, 大小, inode, 暂存区 blob sha)，文件不存在时返回 None"""
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return None
+        repo = git_manager.repo
+        relative_path = os.path.relpath(self.file_path, repo.working_dir)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino, self._index_blob_sha(repo, relative_path)
+
+    def invalidate_fingerprint(self):
+        """文件监视发现文件变化时调用，下次获得焦点时重新读取文件和计算修改标记"""
+        self._fingerprint = None
+
+    def _index_blob_sha(self, repo, relative_path: str) -> str | None:
+        """暂存区中该文件的 blob sha，不在暂存区（未跟踪）时返回 None
+
+        暂存区文件（.git/index）的 stat 未变化时沿用上次的结果，不启动 git 进程。
+        """
+        try:
+            stat = os.stat(os.path.join(repo.git_dir, "index"))
+            index_stat = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except OSError:
+            index_stat = None
+        if (
+            index_stat is not None
+            and self._index_state is not None
+            and self._index_state[:2] == (index_stat, relative_path)
+        ):
+            return self._index_state[2]
+        try:
+            # 输出为 "<mode> <sha> <stage>\t<path>"，冲突时有多行，取第一行
+            output = repo.git.ls_files("-s", "--", relative_path)
+        except Exception:
+            logging.exception("Error reading index entry")
+            self._index_state = None
+            return None
+        sha = output.split()[1] if output else None
+        self._index_state = (index_stat, relative_path, sha) if index_stat is not None else None
+        return sha
+
+    # ---- 编辑时的修改标记 ----
+
+    def _on_contents_change(self, position: int, removed: int, added: int):
+        """记录修改的行范围，在下一次事件循环中只对该范围重新计算差异"""
+        document = self.document()
+        char_count = document.characterCount()
+        expected = self._tracked_char_count - removed + added
+        self._tracked_char_count = char_count
+        tracker = self._modification_tracker
+        if not tracker.active or self.large_file:
+            return
+        if expected != char_count:
+            # setPlainText 等操作给出的修改范围不准确
+            tracker.mark_all()
+        else:
+            first = document.findBlock(position).blockNumber()
+            last = document.findBlock(position + added).blockNumber()
+            # 最后一个空块不算一行（与 str.splitlines 相同）
+            suffix = document.blockCount() - 1 - last
+            if suffix and not document.lastBlock().text():
+                suffix -= 1
+            tracker.note_change(first, suffix)
+        self._modification_timer.start()
+
+    def _document_lines(self, start: int, end: int) -> list:
+        lines = []
+        block = self.document().findBlockByNumber(start)
+        while len(lines) < end - start and block.isValid():
+            lines.append(block.text())
+            block = block.next()
+        return lines
+
+    def _update_line_modifications(self):
+        document = self.document()
+        line_count = document.blockCount() - (0 if document.lastBlock().text() else 1)
+        calculator = create_diff_calculator(settings.get_diff_algorithm())
+        if self._modification_tracker.update(line_count, self._document_lines, calculator):
+            self._tracked_modifications = self._modification_tracker.modifications()
+            self.set_line_modifications(self._tracked_modifications)
+
     # <new_method>
     # 当文档内容修改状态改变时调用
     def _on_modification_changed(self, modified: bool):
         """当文档内容修改状态改变时调用，发出 dirty_status_changed 信号。"""
+        if self._loading:
+            return
         if self.file_path:
             self.dirty_status_changed.emit(self.file_path, modified)
             logging.debug("Emitted dirty_status_changed for %s: %s", self.file_path, modified)
 
     # </new_method>
 
+    # ---- 概览条中的搜索命中 ----
+
+    def find_text(self, search_text: str, direction: str = "next", case_sensitive: bool = False) -> bool:
+        found = super().find_text(search_text, direction, case_sensitive)
+        self._update_search_overview(search_text, case_sensitive)
+        return found
+
+    def clear_search_highlights(self):
+        super().clear_search_highlights()
+        self._search_key = None
+        self.overview_bar.set_search_lines([])
+
+    def _update_search_overview(self, search_text: str, case_sensitive: bool):
+        """收集所有包含搜索文字的行显示在概览条中；搜索文字和文档都未变化时（查找下一个）不重新收集"""
+        key = (search_text, case_sensitive, self.document().revision())
+        if self.large_file or key == self._search_key:
+            return
+        self._search_key = key
+        if not search_text:
+            self.overview_bar.set_search_lines([])
+            return
+        text = self.toPlainText()
+        if not case_sensitive:
+            search_text = search_text.lower()
+            text = text.lower()
+        lines = [index for index, line in enumerate(text.split("\n")) if search_text in line]
+        self.overview_bar.set_search_lines(lines)
+
+    # ---- 大文件模式 ----
+
+    def load_large_file(self, file_path: str, content: str | None = None):
+        """以大文件模式显示文件
+
+        content 为 None 时在后台线程中分块读取并逐块追加，否则直接显示已读入的内容（超长行折断）。
+        """
+        self._enter_large_file_mode()
+        self._load_generation += 1
+        self._cancel_load_thread()
+        max_line_length = settings.get_large_file_thresholds()["max_line_length"]
+        if content is not None:
+            content, split_count = split_long_lines(content, max_line_length)
+            self._set_loaded_text(content)
+            self._show_large_file_label(split_count > 0)
+            return
+
+        self._set_loaded_text("")
+        self._show_large_file_label(False)
+        thread = FileLoadThread(self._load_generation, file_path, max_line_length, self)
+        thread.chunk_loaded.connect(self._on_chunk_loaded)
+        thread.loaded.connect(self._on_file_loaded)
+        thread.finished.connect(self._on_load_thread_finished)
+        self._load_thread = thread
+        self._load_threads.start(thread)
+
+    def _enter_large_file_mode(self):
+        if self.large_file:
+            return
+        self.large_file = True
+        self.setReadOnly(True)
+        self.edit_mode = False
+        # 不保留撤销记录，分块追加的内容不需要撤销
+        self.document().setUndoRedoEnabled(False)
+        self.line_modifications = {}
+        self.gutter_renderer.invalidate()
+        self.overview_bar.hide()
+
+    def _set_loaded_text(self, text: str):
+        self._loading = True
+        try:
+            self.setPlainText(text)
+            self.document().setModified(False)
+        finally:
+            self._loading = False
+
+    def _show_large_file_label(self, split_lines: bool):
+        self.large_file_label.setText(describe_large_file(split_lines))
+        self.large_file_label.setToolTip(self.large_file_label.text())
+        self.large_file_label.adjustSize()
+        self.large_file_label.show()
+        self._update_overview_bar_geometry()
+
+    def _cancel_load_thread(self):
+        if self._load_thread is not None:
+            self._load_thread.cancel()
+            self._load_thread = None
+
+    def _on_chunk_loaded(self, generation: int, text: str):
+        if generation != self._load_generation:
+            return
+        # 追加到文档末尾，不移动用户的光标和滚动位置
+        self._loading = True
+        try:
+            # 光标位于文档末尾时（例如第一块之前文档为空）插入会把它推到新的末尾，插入后恢复
+            editor_cursor = self.textCursor()
+            position, anchor = editor_cursor.position(), editor_cursor.anchor()
+            cursor = QTextCursor(self.document())
+            cursor.movePosition(QTextCursor.MoveOperation.End)
+            cursor.insertText(text)
+            if editor_cursor.position() != position:
+                editor_cursor.setPosition(anchor)
+                editor_cursor.setPosition(position, QTextCursor.MoveMode.KeepAnchor)
+                self.setTextCursor(editor_cursor)
+            self.document().setModified(False)
+        finally:
+            self._loading = False
+
+    def _on_file_loaded(self, generation: int, split_lines: bool):
+        if generation == self._load_generation:
+            self._show_large_file_label(split_lines)
+
+    def _on_load_thread_finished(self, generation: int):
+        thread = self.sender()
+        if thread is self._load_thread:
+            self._load_thread = None
+
+    def is_loading(self) -> bool:
+        """大文件是否仍在后台读取"""
+        return self._load_thread is not None
+
     def resizeEvent(self, event):
         super().resizeEvent(event)
         self._update_overview_bar_geometry()
@@ -141,92 +395,55 @@ QPlainTextEdit QScrollBar::handle:vertical:pressed {
                 viewport.width() + self.line_number_area_width(), 0, bar_width, viewport.height()
             )
             self.overview_bar.raise_()
+            if not self.large_file_label.isHidden():
+                # 提示放在视口右上角
+                self.large_file_label.move(
+                    max(0, viewport.width() + self.line_number_area_width() - self.large_file_label.width() - 2), 2
+                )
+                self.large_file_label.raise_()
 
     def set_line_modifications(self, modifications: dict):
+        if self.large_file:
+            return
         self.line_modifications = modifications
+        self.gutter_renderer.invalidate()
         self.update_line_number_area_width()
         self.line_number_area.update()
-        self.overview_bar.update_overview()
+        if self._modification_tracker.active and modifications is self._tracked_modifications:
+            # 与跟踪的差异块一致，每个块只需一个范围
+            ranges = OverViewBar._ranges_from_chunks(self._modification_tracker.chunks)
+        else:
+            ranges = OverViewBar._ranges_from_modifications(modifications)
+        self.overview_bar.set_line_ranges(ranges)
 
     def line_number_area_width(self):
         """Reimplement the line number area width calculation method, including modification mark space"""
         base_width = super().line_number_area_width()
         return base_width + self.MODIFICATION_MARK_WIDTH
 
-    def line_number_area_paint_event(self, event):
-        """Reimplement the line number area paint event, add modification mark handling"""
-        # First, call the parent class to draw the basic background, line numbers, and blame comments
-        super().line_number_area_paint_event(event)
-
-        # If there are no modification marks, return directly
-        if not self.line_modifications:
+    def paint_line_marks(self, painter: QPainter, block_number: int, top: float, height: float, number_x: float):
+        """Draw the modification mark of one line to the left of the line number (called by GutterRenderer)"""
+        block_line_number = block_number + 1
+        mod_status = self.line_modifications.get(block_line_number)
+        if not mod_status:
             return
-
-        painter = QPainter(self.line_number_area)
-
-        # Calculate the position of the modification mark (to the left of the line number)
-        line_digits = len(str(max(1, self.blockCount())))
-        line_num_text_width = self.fontMetrics().horizontalAdvance("9" * line_digits)
-        modification_mark_x = int(
-            self.line_number_area.width()
-            - line_num_text_width
-            - self.PADDING_RIGHT_OF_LINENUM
-            - self.MODIFICATION_MARK_WIDTH
-            + 2  # left margin
-        )
-
-        # Traverse all visible blocks to draw modification marks
-        block = self.firstVisibleBlock()
-        block_number = block.blockNumber()
-        top = self.blockBoundingGeometry(block).translated(self.contentOffset()).top()
-        bottom = top + self.blockBoundingRect(block).height()
-
-        while block.isValid() and top <= event.rect().bottom():
-            if block.isVisible() and bottom >= event.rect().top():
-                current_block_height = self.blockBoundingRect(block).height()
-                block_line_number = block_number + 1
-
-                # Draw modification status mark
-                mod_status = self.line_modifications.get(block_line_number)
-                if mod_status:  # Process only when there is a status
-                    color = self.LINE_STATUS_COLORS.get(mod_status)
-                    if color:  # Ensure the color exists
-                        # logging.debug(
-                        #     "block_line_number %d, mod_status: %s, color: %s", block_line_number, mod_status, color
-                        # )
-                        painter.setBrush(color)
-                        painter.setPen(Qt.PenStyle.NoPen)
-
-                        # Calculate the vertical center position of the mark
-                        mark_y = int(top + (current_block_height - self.MODIFICATION_MARK_SIZE) / 2)
-
-                        if mod_status == "deleted":
-                            last_mod_status = self.line_modifications.get(block_line_number - 1)
-                            if not last_mod_status or not last_mod_status == "deleted":
-                                # Draw a red dot to indicate deletion
-                                # Calculate the x position of the circle center (in the center of the mark area)
-                                dot_center_x = modification_mark_x + self.MODIFICATION_MARK_SIZE // 2
-                                # Draw the dot
-                                painter.drawEllipse(
-                                    int(dot_center_x - self.MODIFICATION_MARK_SIZE / 2),
-                                    int(top),
-                                    int(self.MODIFICATION_MARK_SIZE),
-                                    int(self.MODIFICATION_MARK_SIZE),
-                                )
-                        elif mod_status in ("added", "modified"):
-                            # Draw a vertical line to indicate addition or modification
-                            # Set the pen for drawing the line
-                            painter.setPen(QPen(color, 2))  # Set the line width to 2 pixels
-                            # Calculate the x position of the vertical line (in the center of the mark area)
-                            line_x = modification_mark_x + self.MODIFICATION_MARK_SIZE // 2
-                            # Draw the line, from the top to the bottom of the current line
-                            # Ensure the coordinate values are integers
-                            painter.drawLine(int(line_x), int(top), int(line_x), int(top + current_block_height))
-
-            block = block.next()
-            top = bottom
-            bottom = top + self.blockBoundingRect(block).height()
-            block_number += 1
+        color = self.LINE_STATUS_COLORS.get(mod_status)
+        if not color:  # Ensure the color exists
+            return
+        modification_mark_x = int(number_x - self.MODIFICATION_MARK_WIDTH + 2)  # left margin
+        if mod_status == "deleted":
+            last_mod_status = self.line_modifications.get(block_line_number - 1)
+            if last_mod_status != "deleted":
+                # Draw a red dot to indicate deletion
+                painter.setBrush(color)
+                painter.setPen(Qt.PenStyle.NoPen)
+                size = self.MODIFICATION_MARK_SIZE
+                painter.drawEllipse(modification_mark_x, int(top), size, size)
+        elif mod_status in ("added", "modified"):
+            # Draw a vertical line to indicate addition or modification, in the center of the mark area
+            painter.setPen(self.LINE_STATUS_PENS[mod_status])
+            line_x = modification_mark_x + self.MODIFICATION_MARK_SIZE // 2
+            painter.drawLine(line_x, int(top), line_x, int(top + height))
 
     def save_content(self):
         super().save_content()
@@ -249,18 +466,24 @@ QPlainTextEdit QScrollBar::handle:vertical:pressed {
             pass  # No git manager found, nothing to do for diffs
 
     def get_diffs(self, git_manager: "GitManager", new_content: str | None = None) -> dict:
-        repo_path = git_manager.repo.working_dir
-        relative_path = os.path.relpath(self.file_path, repo_path)
         repo = git_manager.repo
-        is_untracked = relative_path in repo.untracked_files
-        if is_untracked:
+        fingerprint = self.file_fingerprint(git_manager)
+        blob_sha = fingerprint[3] if fingerprint else None
+        if blob_sha is None:
+            # 不在暂存区中（未跟踪的文件）
             diffs = {}
         else:
-            try:
-                old_content = repo.git.show(f":{relative_path}")  # 暂存区内容
-            except Exception:
-                old_content = ""
-                logging.exception("Error getting old content")
+            if self._index_content is not None and self._index_content[0] == blob_sha:
+                old_content, old_lines = self._index_content[1:]
+            else:
+                try:
+                    old_content = repo.git.cat_file("-p", blob_sha)  # 暂存区内容
+                    old_lines = old_content.splitlines()
+                    self._index_content = (blob_sha, old_content, old_lines)
+                except Exception:
+                    old_content = ""
+                    old_lines = []
+                    logging.exception("Error getting old content")
             if new_content is None:
                 try:
                     with open(self.file_path, "r", encoding="utf-8") as f:
@@ -274,42 +497,154 @@ QPlainTextEdit QScrollBar::handle:vertical:pressed {
             if new_content == old_content + "\n":
                 new_content = old_content
 
-            diffs = DifflibCalculator().get_diff(old_content, new_content)
+            calculator = create_diff_calculator(settings.get_diff_algorithm())
+            chunks = diff_result_cache.compute_diff(calculator, old_content, new_content)
+            diffs = diff_dict_from_chunks(chunks)
+            self._tracked_modifications = diffs
+            self._modification_tracker.reset(old_lines, chunks, len(new_content.splitlines()))
+            self._tracked_char_count = self.document().characterCount()
+            if self.document().isModified():
+                # 编辑器中有未保存的修改，与文件内容不同，之后按编辑器内容整篇更新
+                self._modification_tracker.mark_all()
+                self._modification_timer.start()
+
+        if blob_sha is None:
+            self._modification_tracker.clear()
+        if fingerprint is not None and time.time_ns() - fingerprint[0] < RACY_FINGERPRINT_NS:
+            # 刚刚修改过的文件可能在同一时间戳内再次被写入，不记录指纹
+            fingerprint = None
+        self._fingerprint = fingerprint
         return diffs
 
 
 class OverViewBar(QWidget):
-    """Overview bar widget for showing file modification summary on the right side of the editor."""
+    """Overview bar widget for showing file modification summary on the right side of the editor.
+
+    标记先按像素行归并（每个像素行只保留优先级最高的状态），再绘制成一张图片缓存起来；
+    只有标记、控件高度或文档行数变化时才重新归并，滚动和重绘只贴图，与修改的行数无关。
+    """
 
     BAR_WIDTH: typing.ClassVar[int] = 10
     LINE_MARK_WIDTH: typing.ClassVar[int] = 6
+    SEARCH_MARK_WIDTH: typing.ClassVar[int] = 2
+    MIN_MARK_HEIGHT: typing.ClassVar[int] = 3
     LINE_MARK_COLOR: typing.ClassVar[dict] = {
         "added": QColor("#4CAF50"),
         "modified": QColor("#FFC107"),
         "deleted": QColor("#F44336"),
     }
+    SEARCH_MARK_COLOR = QColor("#2196F3")
+    # 同一像素行中有多种状态时显示优先级最高（编号最大）的
+    STATUS_CODES: typing.ClassVar[dict] = {"added": 1, "modified": 2, "deleted": 3}
 
     def __init__(self, text_edit: "ModifiedTextEdit", parent=None):
         super().__init__(parent)
         self.text_edit = text_edit
         self.setFixedWidth(self.BAR_WIDTH)
         self.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Expanding)
+        self._line_ranges = []  # [(起始行, 结束行（不含）, 状态)]，行号从 0 开始
+        self._search_lines = []  # 搜索命中的行，行号从 0 开始
+        self._version = 0
+        self._pixmap = None
+        self._pixmap_key = None
+
+    def set_line_ranges(self, ranges: list):
+        """设置修改标记，ranges 为 [(起始行, 结束行（不含）, 状态)]"""
+        self._line_ranges = ranges
+        self.invalidate()
+
+    def set_search_lines(self, lines: list):
+        """设置搜索命中的行"""
+        if not lines and not self._search_lines:
+            return
+        self._search_lines = lines
+        self.invalidate()
+
+    def invalidate(self):
+        self._version += 1
+        self._pixmap = None
+        self.update()
+
+    @staticmethod
+    def _ranges_from_modifications(modifications: dict) -> list:
+        """{行号（从 1 开始）: 状态} 转为每行一个范围"""
+        return [(line_num - 1, line_num, status) for line_num, status in modifications.items()]
+
+    @staticmethod
+    def _ranges_from_chunks(chunks: list) -> list:
+        """差异块转为范围，与 diff_dict_from_chunks 的结果一致，但每个块只有一项"""
+        ranges = []
+        for chunk in chunks:
+            if chunk.type == "replace":
+                ranges.append((chunk.right_start, chunk.right_end, "modified"))
+            elif chunk.type == "insert":
+                ranges.append((chunk.right_start, chunk.right_end, "added"))
+            elif chunk.type == "delete":
+                ranges.append((chunk.right_start, chunk.right_start + 1, "deleted"))
+        return ranges
+
+    def _row_span(self, start: int, end: int, total_lines: int, height: int) -> tuple:
+        y0 = min(height - 1, int(start / total_lines * height))
+        y1 = max(int(end / total_lines * height), y0 + self.MIN_MARK_HEIGHT)
+        return max(0, y0), min(height, y1)
+
+    def compute_buckets(self, height: int, total_lines: int) -> tuple:
+        """按像素行归并标记，返回 (修改状态编号, 是否有搜索命中)，均为长度为 height 的 bytearray"""
+        statuses = bytearray(height)
+        search = bytearray(height)
+        if height <= 0:
+            return statuses, search
+        total_lines = max(1, total_lines)
+        # 按优先级从低到高写入，后写入的覆盖先写入的
+        for status, code in sorted(self.STATUS_CODES.items(), key=lambda item: item[1]):
+            fill = bytes((code,))
+            for start, end, range_status in self._line_ranges:
+                if range_status == status:
+                    y0, y1 = self._row_span(start, end, total_lines, height)
+                    statuses[y0:y1] = fill * (y1 - y0)
+        for line in self._search_lines:
+            y0, y1 = self._row_span(line, line + 1, total_lines, height)
+            search[y0:y1] = b"\x01" * (y1 - y0)
+        return statuses, search
+
+    @staticmethod
+    def _runs(buckets: bytearray):
+        """连续相同值的像素行 (起始行, 行数, 值)，值为 0 的跳过"""
+        y = 0
+        height = len(buckets)
+        while y < height:
+            value = buckets[y]
+            end = y + 1
+            while end < height and buckets[end] == value:
+                end += 1
+            if value:
+                yield y, end - y, value
+            y = end
+
+    def _render(self, key: tuple) -> QPixmap:
+        height = max(1, self.height())
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(int(self.BAR_WIDTH * ratio), int(height * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        statuses, search = self.compute_buckets(self.height(), self.text_edit.blockCount())
+        colors = {code: self.LINE_MARK_COLOR[status] for status, code in self.STATUS_CODES.items()}
+        painter = QPainter(pixmap)
+        mark_x = (self.BAR_WIDTH - self.LINE_MARK_WIDTH) // 2
+        for y, count, code in self._runs(statuses):
+            painter.fillRect(mark_x, y, self.LINE_MARK_WIDTH, count, colors[code])
+        search_x = self.BAR_WIDTH - self.SEARCH_MARK_WIDTH
+        for y, count, _value in self._runs(search):
+            painter.fillRect(search_x, y, self.SEARCH_MARK_WIDTH, count, self.SEARCH_MARK_COLOR)
+        painter.end()
+        return pixmap
 
     def paintEvent(self, event):
-        painter = QPainter(self)
-        modifications = self.text_edit.line_modifications
-        total_lines = max(1, self.text_edit.blockCount())
-        height = self.height()
-        for line_num, status in modifications.items():
-            if status not in self.LINE_MARK_COLOR:
-                continue
-            y = int((line_num - 1) / total_lines * height)
-            color = self.LINE_MARK_COLOR[status]
-            painter.setPen(Qt.PenStyle.NoPen)
-            painter.setBrush(color)
-            painter.drawRect(
-                (self.BAR_WIDTH - self.LINE_MARK_WIDTH) // 2, y, self.LINE_MARK_WIDTH, max(3, int(height / total_lines))
-            )
+        key = (self._version, self.height(), self.devicePixelRatioF(), self.text_edit.blockCount())
+        if self._pixmap is None or self._pixmap_key != key:
+            self._pixmap = self._render(key)
+            self._pixmap_key = key
+        QPainter(self).drawPixmap(0, 0, self._pixmap)
 
     def update_overview(self):
         self.update()
@@ -1,5 +1,6 @@
 import logging
 import os
+from array import array
 from typing import TYPE_CHECKING, Optional
 
 from PyQt6.QtCore import QEvent, QPointF, QRect, QSize, Qt, QTimer, pyqtSignal
@@ -25,8 +26,11 @@ from PyQt6.QtWidgets import (
     QWidget,
 )
 
+from blame_table import BlameTable
 from components.find_dialog import FindDialog
 from diff_highlighter import DiffHighlighter
+from editors.gutter_renderer import GutterRenderer
+from highlight_scheduler import highlight_scheduler
 from settings import BLAME_COLOR_PALETTE, settings
 
 if TYPE_CHECKING:
@@ -68,12 +72,11 @@ class LineNumberArea(QWidget):
 
         line_index = block_number + int((y_pos - block_top) / block_height)
 
-        if 0 <= line_index < len(self.editor.blame_annotations_per_line):
-            annotation = self.editor.blame_annotations_per_line[line_index]
-            if annotation and "commit_hash" in annotation:
-                # get clipboard pyqt6
-                clipboard = QApplication.clipboard()
-                clipboard.setText(annotation["commit_hash"])
+        commit = self.editor.blame_table.commit_at(line_index)
+        if commit:
+            # get clipboard pyqt6
+            clipboard = QApplication.clipboard()
+            clipboard.setText(commit.commit_hash)
 
     def __init__(self, editor: "SyncedTextEdit"):
         super().__init__(editor)
@@ -97,7 +100,7 @@ class LineNumberArea(QWidget):
             Qt.KeyboardModifier.NoModifier,
         )
 
-        if self.editor.showing_blame and self.editor.blame_annotations_per_line:
+        if self.editor.showing_blame and self.editor.blame_table:
             blame_area_width = self.editor.PADDING_LEFT_OF_BLAME + getattr(self.editor, "max_blame_display_width", 0)
             if event.pos().x() < blame_area_width:
                 y_pos = event.pos().y()
@@ -109,24 +112,21 @@ class LineNumberArea(QWidget):
                 if block_height > 0:
                     line_index = block_number + int((y_pos - block_top) / block_height)
 
-                    if 0 <= line_index < len(self.editor.blame_annotations_per_line):
-                        annotation = self.editor.blame_annotations_per_line[line_index]
-                        if annotation and "commit_hash" in annotation:
-                            if line_index < len(self.editor.blame_data_full):
-                                full_data = self.editor.blame_data_full[line_index]
-                                tooltip_text = (
-                                    f"commit {full_data['commit_hash']}\n"
-                                    f"Author: {full_data['author_name']}\n"
-                                    f"Date: {full_data['committed_date']}\n\n"
-                                    f"{full_data.get('message', 'No commit message')}"
-                                )
-                                QToolTip.showText(event.globalPosition().toPoint(), tooltip_text)
-                                return
+                    commit = self.editor.blame_table.commit_at(line_index)
+                    if commit:
+                        tooltip_text = (
+                            f"commit {commit.commit_hash}\n"
+                            f"Author: {commit.author_name}\n"
+                            f"Date: {commit.committed_date}\n\n"
+                            f"{commit.message}"
+                        )
+                        QToolTip.showText(event.globalPosition().toPoint(), tooltip_text)
+                        return
             QToolTip.hideText()
 
     def mouseMoveEvent(self, event: QMouseEvent):
         """处理鼠标移动事件，显示 blame 信息的工具提示"""
-        if self.editor.showing_blame and self.editor.blame_annotations_per_line:
+        if self.editor.showing_blame and self.editor.blame_table:
             # 检查鼠标是否在 blame 注释区域内
             blame_area_width = self.editor.PADDING_LEFT_OF_BLAME + getattr(self.editor, "max_blame_display_width", 0)
             if event.pos().x() < blame_area_width:
@@ -141,11 +141,7 @@ class LineNumberArea(QWidget):
 
     def mousePressEvent(self, event: QMouseEvent):
         # 如果是左键点击，定位到对应的 commit
-        if (
-            event.button() == Qt.MouseButton.LeftButton
-            and self.editor.showing_blame
-            and self.editor.blame_annotations_per_line
-        ):
+        if event.button() == Qt.MouseButton.LeftButton and self.editor.showing_blame and self.editor.blame_table:
             y_pos = event.pos().y()
             block = self.editor.firstVisibleBlock()
             block_number = block.blockNumber()
@@ -158,20 +154,17 @@ class LineNumberArea(QWidget):
 
             line_index = block_number + int((y_pos - block_top) / block_height)
 
-            if 0 <= line_index < len(self.editor.blame_annotations_per_line):
-                annotation = self.editor.blame_annotations_per_line[line_index]
-                if annotation and "commit_hash" in annotation:
-                    # Check if the click is within the blame annotation area
-                    # This is a simplified check, assuming blame text starts from PADDING_LEFT_OF_BLAME
-                    # and extends up to max_blame_display_width
-                    blame_area_width = self.editor.PADDING_LEFT_OF_BLAME + getattr(
-                        self.editor, "max_blame_display_width", 0
-                    )
-                    if event.pos().x() < blame_area_width:
-                        full_hash = annotation.get("commit_hash", "")
-                        if full_hash:
-                            self.editor.blame_annotation_clicked.emit(full_hash)
-                            return  # Event handled
+            commit = self.editor.blame_table.commit_at(line_index)
+            if commit:
+                # Check if the click is within the blame annotation area
+                # This is a simplified check, assuming blame text starts from PADDING_LEFT_OF_BLAME
+                # and extends up to max_blame_display_width
+                blame_area_width = self.editor.PADDING_LEFT_OF_BLAME + getattr(
+                    self.editor, "max_blame_display_width", 0
+                )
+                if event.pos().x() < blame_area_width:
+                    self.editor.blame_annotation_clicked.emit(commit.commit_hash)
+                    return  # Event handled
 
         super().mousePressEvent(event)
 
@@ -190,11 +183,14 @@ class SyncedTextEdit(QPlainTextEdit):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.highlighted_line_number = -1
+        # 行号区域的绘制和缓存，文档内容改变后缓存失效
+        self.gutter_renderer = GutterRenderer(self)
+        self.document().contentsChange.connect(self.gutter_renderer.invalidate)
 
         # Initialize blame color palette and commit hash color store
         self.blame_color_palette = BLAME_COLOR_PALETTE
         self.assigned_commit_base_colors = {}
-        self.line_final_color_indices = []
+        self.line_final_color_indices = array("b")  # 每行的颜色下标，-1 表示不着色
         # self.commit_hash_colors removed
 
         self.setFont(QFont(settings.get_font_family(), settings.get_font_size()))
@@ -204,13 +200,13 @@ class SyncedTextEdit(QPlainTextEdit):
         logging.debug("\n=== 初始化 SyncedTextEdit ===")
         logging.debug("默认只读模式：%s", self.isReadOnly())
 
-        # Blame data storage
-        # self.blame_data_full will store the original dicts with full hashes
-        self.blame_data_full = []
-        self.blame_annotations_per_line = []  # Will store annotations with _display_string for painting
+        # Blame data storage：每个提交一条记录，每行只保存提交下标（见 BlameTable）
+        self.blame_table = BlameTable()
+        self.max_blame_display_width = 0
         self.showing_blame = False
         self.file_path = None  # Initialize file_path, can be set externally
         self.current_commit_hash: Optional[str] = None  # Ensured Optional[str]
+        self.large_file = False  # 大文件模式下关闭 blame 等功能（见 ModifiedTextEdit.load_large_file）
 
         # 编辑状态变量
         self.edit_mode = False
@@ -222,6 +218,8 @@ class SyncedTextEdit(QPlainTextEdit):
 
         # 初始化差异信息
         self.highlighter = None
+        # 重新高亮时优先处理本编辑器视口内的块
+        highlight_scheduler.register_editor(self)
 
         self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.customContextMenuRequested.connect(self.show_context_menu)
@@ -238,12 +236,14 @@ class SyncedTextEdit(QPlainTextEdit):
         # Convert to 0-indexed if it's not already clear from usage context
         # Assuming line_number is passed as 0-indexed from DiffViewer
         self.highlighted_line_number = line_number
+        self.gutter_renderer.invalidate()
         if hasattr(self, "line_number_area") and self.line_number_area:
             self.line_number_area.update()
 
     def clear_highlighted_line(self):
         """Clears any highlighted line number."""
         self.highlighted_line_number = -1
+        self.gutter_renderer.invalidate()
         if hasattr(self, "line_number_area") and self.line_number_area:
             self.line_number_area.update()
 
@@ -478,11 +478,14 @@ class SyncedTextEdit(QPlainTextEdit):
 
         menu.addSeparator()
 
-        # if self.isReadOnly() or not self.blame_annotations_per_line:
+        # if self.isReadOnly() or not self.blame_table:
         blame_action = menu.addAction("Show Blame")
         blame_action.triggered.connect(self.show_blame)
         clear_blame_action = menu.addAction("Clear Blame")
         clear_blame_action.triggered.connect(self.clear_blame_data)
+        if self.large_file:
+            blame_action.setEnabled(False)
+            clear_blame_action.setEnabled(False)
 
         # Fix for menu position when blame info is shown
         # Convert position from viewport coordinates to global coordinates
@@ -537,112 +540,73 @@ class SyncedTextEdit(QPlainTextEdit):
             logging.error("文件保存失败：%s", str(e))
             QMessageBox.critical(self, "保存错误", f"无法保存文件：{e!s}", QMessageBox.StandardButton.Ok)
 
-    def set_blame_data(self, blame_data_list: list):
+    def set_blame_data(self, blame_data: "BlameTable | list"):
+        """显示 blame 信息，blame_data 为 BlameTable 或每行一个字典的列表（见 BlameTable.from_blame_data）"""
+        if not isinstance(blame_data, BlameTable):
+            blame_data = BlameTable.from_blame_data(blame_data)
+        self.blame_table = blame_data
         self.assigned_commit_base_colors = {}
         self.max_blame_display_width = 0
-        # Store the full data separately, ensuring original commit_hash is preserved.
-        self.blame_data_full = list(blame_data_list)  # Make a copy
-        logging.debug(f"blame_data_full: {self.blame_data_full}")
-
-        processed_for_display = []
-        if blame_data_list:
-            for original_annotation in self.blame_data_full:
-                if original_annotation:  # Ensure annotation is not None
-                    # Create a copy for display purposes to avoid altering blame_data_full's dicts
-                    display_annotation = dict(original_annotation)
-
-                    commit_hash_full = display_annotation.get("commit_hash", "")
-                    author_name = display_annotation.get("author_name", "Unknown Author")
-                    committed_date = display_annotation.get("committed_date", "Unknown Date")
-
-                    # Display only author and date, no git hash
-                    display_string = f"{committed_date} {author_name}"
-                    display_annotation["_display_string"] = display_string
-
-                    calculated_width = self.fontMetrics().horizontalAdvance(display_string)
-                    self.max_blame_display_width = max(self.max_blame_display_width, calculated_width)
-
-                    processed_for_display.append(display_annotation)
-                else:
-                    # Handle cases where an annotation might be None in the list
-                    processed_for_display.append(None)
-
-        self.blame_annotations_per_line = processed_for_display  # This list is for display and click handling
-        self.showing_blame = True
-        # self.commit_hash_colors removed
 
-        # Clear and prepare for pre-calculating line colors
-        self.line_final_color_indices = []
-        # self.assigned_commit_base_colors is already initialized above - good.
+        # 显示的文字和宽度每个提交只计算一次
+        font_metrics = self.fontMetrics()
+        for commit in blame_data.commits:
+            # Display only author and date, no git hash
+            commit.display_string = f"{commit.committed_date} {commit.author_name}"
+            commit.display_width = font_metrics.horizontalAdvance(commit.display_string)
+            self.max_blame_display_width = max(self.max_blame_display_width, commit.display_width)
+        self.showing_blame = True
 
+        # Pre-calculate line colors
         num_colors = len(self.blame_color_palette)
-        loop_previous_hash = None
-        loop_previous_color_index = -1
-
-        for line_idx in range(len(self.blame_annotations_per_line)):
-            annotation_data = self.blame_annotations_per_line[line_idx]
-            current_commit_hash = None
-            final_color_index_for_line = -1  # Default for lines with no blame or if coloring fails
-
-            if annotation_data and isinstance(annotation_data, dict):  # Ensure annotation_data is a dict
-                current_commit_hash = annotation_data.get("commit_hash")
-
-            if num_colors > 0 and current_commit_hash:
-                # 1. Determine base color for the current hash
-                current_hash_base_color_index = self.assigned_commit_base_colors.get(current_commit_hash)
-                if current_hash_base_color_index is None:
-                    current_hash_base_color_index = abs(hash(current_commit_hash)) % num_colors
-                    self.assigned_commit_base_colors[current_commit_hash] = current_hash_base_color_index
-
-                calculated_color_index = current_hash_base_color_index
-
-                # 2. Adjacency Rule for Different Hashes
-                if (
-                    loop_previous_hash
-                    and current_commit_hash != loop_previous_hash
-                    and calculated_color_index == loop_previous_color_index
-                ):
-                    for i in range(1, num_colors):
-                        candidate_color_index = (calculated_color_index + i) % num_colors
-                        if candidate_color_index != loop_previous_color_index:
-                            calculated_color_index = candidate_color_index
-                            break
-
-                # 3. Consistency Rule for Same Hashes
-                elif (
-                    loop_previous_hash and current_commit_hash == loop_previous_hash and loop_previous_color_index != -1
-                ):
-                    calculated_color_index = loop_previous_color_index
-
-                final_color_index_for_line = calculated_color_index
-
-                # Update trackers for the next iteration of this loop
-                loop_previous_hash = current_commit_hash
-                loop_previous_color_index = final_color_index_for_line
+        commit_base_colors = []
+        for commit in blame_data.commits:
+            base_color_index = abs(hash(commit.commit_hash)) % num_colors if num_colors > 0 else -1
+            self.assigned_commit_base_colors[commit.commit_hash] = base_color_index
+            commit_base_colors.append(base_color_index)
+
+        line_colors = array("b", bytes(len(blame_data)))
+        previous_commit = -1
+        previous_color_index = -1
+        for line_idx, commit_index in enumerate(blame_data.line_commits):
+            if num_colors == 0 or commit_index < 0:
+                # Line has no blame data, or no colors defined. Reset for next valid line.
+                previous_commit = -1
+                previous_color_index = -1
+                line_colors[line_idx] = -1
+                continue
+
+            if commit_index == previous_commit:
+                # Consistency Rule for Same Hashes
+                color_index = previous_color_index
             else:
-                # Line has no blame data, or no hash, or no colors defined. Reset for next valid line.
-                loop_previous_hash = None
-                loop_previous_color_index = -1
-
-            self.line_final_color_indices.append(final_color_index_for_line)
-
-        # Ensure viewport updates after colors are calculated, if not already done by subsequent calls.
-        # The existing self.viewport().update() at the end of the original set_blame_data might be sufficient.
+                color_index = commit_base_colors[commit_index]
+                # Adjacency Rule for Different Hashes
+                if previous_commit >= 0 and color_index == previous_color_index:
+                    color_index = (color_index + 1) % num_colors
+            line_colors[line_idx] = color_index
+            previous_commit = commit_index
+            previous_color_index = color_index
+        self.line_final_color_indices = line_colors
+
+        self.gutter_renderer.invalidate()
         self.update_line_number_area_width()
         self.viewport().update()
 
     def clear_blame_data(self):
-        self.blame_annotations_per_line = []
-        self.blame_data_full = []  # Also clear the full data
+        self.blame_table = BlameTable()
         self.max_blame_display_width = 0  # Reset max width when clearing blame
         self.showing_blame = False
         self.assigned_commit_base_colors = {}
-        self.line_final_color_indices = []
-        # self.commit_hash_colors removed
+        self.line_final_color_indices = array("b")
+        self.gutter_renderer.invalidate()
         self.update_line_number_area_width()
         self.viewport().update()
 
     def show_blame(self):
+        if self.large_file:
+            logging.info("大文件模式下不显示 blame：%s", self.file_path)
+            return
         main_window = self.parent()
         while main_window and not hasattr(main_window, "git_manager"):
             main_window = main_window.parent()
@@ -666,7 +630,7 @@ class SyncedTextEdit(QPlainTextEdit):
         relative_file_path = os.path.relpath(file_path, git_manager.repo_path)
         commit_to_blame = self.current_commit_hash if self.current_commit_hash else None
 
-        blame_data = git_manager.get_blame_data(relative_file_path, commit_to_blame)
+        blame_data = git_manager.get_blame_table(relative_file_path, commit_to_blame)
         if blame_data:
             self.set_blame_data(blame_data)
         else:
@@ -687,7 +651,7 @@ class SyncedTextEdit(QPlainTextEdit):
         line_num_text_width = self.fontMetrics().horizontalAdvance("9" * line_digits)
         total_line_number_component_width = line_num_text_width + self.PADDING_RIGHT_OF_LINENUM
 
-        if self.showing_blame and self.blame_annotations_per_line:
+        if self.showing_blame and self.blame_table:
             # Ensure max_blame_display_width is available and is a number
             current_max_blame_width = getattr(self, "max_blame_display_width", 0)
             if not isinstance(current_max_blame_width, (int, float)):
@@ -719,109 +683,16 @@ class SyncedTextEdit(QPlainTextEdit):
         self.line_number_area.setGeometry(QRect(cr.left(), cr.top(), self.line_number_area_width(), cr.height()))
 
     def line_number_area_paint_event(self, event):
-        """绘制行号区域"""
-        painter = QPainter(self.line_number_area)
-        painter.fillRect(event.rect(), QColor("#f0f0f0"))  # Paint background
+        """绘制行号区域（见 GutterRenderer）"""
+        self.gutter_renderer.paint(event)
 
-        line_digits = len(str(max(1, self.blockCount())))
-        line_num_text_width = self.fontMetrics().horizontalAdvance("9" * line_digits)
+    def paint_line_marks(self, painter: QPainter, block_number: int, top: float, height: float, number_x: float):
+        """绘制行号左侧的标记，子类重写（number_x 为行号文字区域的左边界）"""
 
-        block = self.firstVisibleBlock()
-        block_number = block.blockNumber()
-        top = self.blockBoundingGeometry(block).translated(self.contentOffset()).top()
-        bottom = top + self.blockBoundingRect(block).height()
-
-        # previous_blamed_commit_hash and previous_drawn_color_index removed as color calculation is now pre-done.
-
-        while block.isValid() and top <= event.rect().bottom():
-            if block.isVisible() and bottom >= event.rect().top():
-                current_block_height = self.blockBoundingRect(block).height()
-
-                # Line Number Drawing
-                line_number_string = str(block_number + 1)
-                x_start_for_linenum = (
-                    self.line_number_area.width() - self.PADDING_RIGHT_OF_LINENUM - line_num_text_width
-                )
-                line_num_rect = QRect(
-                    int(x_start_for_linenum), int(top), int(line_num_text_width), int(current_block_height)
-                )
-
-                # Highlight background for the current line number if it's the highlighted one
-                if block_number == self.highlighted_line_number:
-                    highlight_color = QColor(Qt.GlobalColor.yellow).lighter(120)  # A light yellow
-                    # Define the rectangle for the line number highlight more precisely
-                    # It should cover the area for this specific line number.
-                    # line_num_rect is already calculated for drawing text, so we can reuse its geometry.
-                    painter.fillRect(line_num_rect, highlight_color)
-
-                # Line Number Drawing (existing code)
-                line_number_string = str(block_number + 1)
-                # x_start_for_linenum and line_num_text_width are defined above
-                painter.setPen(QColor("#808080"))  # Color for line numbers
-                painter.drawText(
-                    line_num_rect, Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, line_number_string
-                )
-
-                # Blame Annotation Drawing
-                if self.showing_blame:
-                    annotation_data = None
-                    if block_number < len(self.blame_annotations_per_line):
-                        annotation_data = self.blame_annotations_per_line[block_number]
-
-                    # Default color for the blame rectangle background
-                    blame_qcolor = QColor(Qt.GlobalColor.lightGray)  # Or your desired default/non-blamed line color
-
-                    if annotation_data and isinstance(annotation_data, dict) and "_display_string" in annotation_data:
-                        # Retrieve the pre-calculated color index for this line
-                        # An index of -1 (or other chosen default) means "no specific blame color"
-                        color_idx_for_line = -1
-                        if block_number < len(self.line_final_color_indices):
-                            color_idx_for_line = self.line_final_color_indices[block_number]
-
-                        if color_idx_for_line != -1 and 0 <= color_idx_for_line < len(self.blame_color_palette):
-                            blame_qcolor = self.blame_color_palette[color_idx_for_line]
-                        # else: line will use the default blame_qcolor (e.g., lightGray or transparent)
-
-                        # The rest of the drawing logic for the annotation text and rectangle fill remains
-                        annotation_display_string = annotation_data["_display_string"]
-                        max_width_for_blame_area = getattr(self, "max_blame_display_width", 0)
-                        if not isinstance(max_width_for_blame_area, (int, float)):
-                            max_width_for_blame_area = 0
-
-                        blame_text_rect = QRect(
-                            int(self.PADDING_LEFT_OF_BLAME),
-                            int(top),
-                            int(max_width_for_blame_area),
-                            int(current_block_height),
-                        )
-
-                        blame_fill_rect = QRect(
-                            0,
-                            int(top),
-                            int(self.PADDING_LEFT_OF_BLAME + max_width_for_blame_area + self.PADDING_AFTER_BLAME),
-                            int(current_block_height),
-                        )
-                        painter.fillRect(blame_fill_rect, blame_qcolor)
-
-                        painter.setPen(QColor("#333333"))  # Color for annotation text
-                        painter.drawText(
-                            blame_text_rect,
-                            Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
-                            annotation_display_string,
-                        )
-                    # The 'else' case for 'if annotation_data and ...' (where no valid annotation for this line)
-                    # implicitly means the default background of the line number area will show,
-                    # or if you want a specific fill for non-annotated lines within the blame area,
-                    # that could be added here. For now, it will just not draw a specific blame colored box.
-
-                    # Note: The old 'else' that reset previous_blamed_commit_hash and previous_drawn_color_index
-                    # is no longer needed here because these variables are entirely removed from this method's scope
-                    # for color calculation.
-
-            block = block.next()
-            top = bottom
-            bottom = top + self.blockBoundingRect(block).height()
-            block_number += 1
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.Type.FontChange:
+            self.gutter_renderer.clear_text_cache()
 
     def paintEvent(self, event):
         super().paintEvent(event)
@@ -0,0 +1,212 @@
+"""提交文件变化的数据模型
+
+解析 `git diff-tree -r -z -M --raw --numstat` 的流式输出，
+并构建一个按目录组织的轻量模型，供 FileChangesView 按需（懒加载）创建树节点。
+"""
+
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Union
+
+
+@dataclass
+class ChangedFile:
+    """单个变化的文件"""
+
+    path: str  # 变化后的路径（重命名时为新路径）
+    status: str  # A/M/D/R/C/T 等状态字母
+    old_path: Optional[str] = None  # 变化前的路径
+    old_sha: str = ""
+    new_sha: str = ""
+    added: Optional[int] = None  # 新增行数，二进制文件为 None
+    deleted: Optional[int] = None  # 删除行数，二进制文件为 None
+    binary: bool = False
+    item: object = field(default=None, repr=False, compare=False)  # 对应的 QTreeWidgetItem
+
+    @property
+    def has_numstat(self) -> bool:
+        """是否已合并 numstat 记录（之后 binary 才可信）"""
+        return self.added is not None or self.binary
+
+
+@dataclass
+class NumStat:
+    """numstat 记录，二进制文件的行数为 None"""
+
+    path: str
+    added: Optional[int]
+    deleted: Optional[int]
+
+
+class DiffTreeParser:
+    """`git diff-tree -z --raw --numstat` 输出的增量解析器
+
+    可以分块喂入字节数据，每次返回已经完整解析出的记录。
+    raw 记录总是先于 numstat 记录输出。
+    """
+
+    def __init__(self):
+        self._buffer = b""
+        self._pending_raw: Optional[List[str]] = None  # [meta, path1, (path2)]
+        self._pending_rename_stat: Optional[List[str]] = None  # [added, deleted, (old)]
+
+    def feed(self, data: bytes) -> List[Union[ChangedFile, NumStat]]:
+        self._buffer += data
+        *tokens, self._buffer = self._buffer.split(b"\0")
+        records = []
+        for token in tokens:
+            record = self._feed_token(token.decode("utf-8", errors="replace"))
+            if record is not None:
+                records.append(record)
+        return records
+
+    def _feed_token(self, token: str) -> Optional[Union[ChangedFile, NumStat]]:
+        if self._pending_raw is not None:
+            self._pending_raw.append(token)
+            status = self._pending_raw[0].rsplit(" ", 1)[-1]
+            # 重命名和复制记录后面跟两个路径
+            needed = 3 if status[:1] in ("R", "C") else 2
+            if len(self._pending_raw) < needed:
+                return None
+            raw, self._pending_raw = self._pending_raw, None
+            return self._make_changed_file(raw)
+
+        if self._pending_rename_stat is not None:
+            self._pending_rename_stat.append(token)
+            if len(self._pending_rename_stat) < 4:
+                return None
+            added, deleted, _old_path, new_path = self._pending_rename_stat
+            self._pending_rename_stat = None
+            return self._make_numstat(added, deleted, new_path)
+
+        if not token:
+            return None
+        if token.startswith(":"):
+            self._pending_raw = [token]
+            return None
+
+        added, deleted, path = token.split("\t", 2)
+        if not path:
+            # 重命名的 numstat 记录：路径为空，后面跟旧路径和新路径
+            self._pending_rename_stat = [added, deleted]
+            return None
+        return self._make_numstat(added, deleted, path)
+
+    @staticmethod
+    def _make_changed_file(raw: List[str]) -> ChangedFile:
+        _old_mode, _new_mode, old_sha, new_sha, status = raw[0][1:].split(" ")
+        if len(raw) == 3:
+            return ChangedFile(path=raw[2], status=status[0], old_path=raw[1], old_sha=old_sha, new_sha=new_sha)
+        return ChangedFile(path=raw[1], status=status[0], old_path=raw[1], old_sha=old_sha, new_sha=new_sha)
+
+    @staticmethod
+    def _make_numstat(added: str, deleted: str, path: str) -> NumStat:
+        if added == "-" or deleted == "-":
+            return NumStat(path, None, None)
+        return NumStat(path, int(added), int(deleted))
+
+
+@dataclass
+class ChangesDirNode:
+    """目录节点，子目录与文件按首次出现的顺序保存"""
+
+    name: str
+    parent: Optional["ChangesDirNode"] = None
+    dirs: dict = field(default_factory=dict)  # name -> ChangesDirNode
+    files: List[ChangedFile] = field(default_factory=list)
+    file_count: int = 0  # 子树中的文件总数
+    added: int = 0  # 子树中的新增行数
+    deleted: int = 0  # 子树中的删除行数
+    item: object = None  # 对应的 QTreeWidgetItem（懒创建）
+    populated: bool = False  # 子节点是否已经创建了树节点
+
+    @property
+    def path(self) -> str:
+        parts = []
+        node = self
+        while node is not None and node.parent is not None:
+            parts.append(node.name)
+            node = node.parent
+        return "/".join(reversed(parts))
+
+
+class ChangesTreeModel:
+    """按目录组织的变化文件模型"""
+
+    def __init__(self):
+        self.root = ChangesDirNode("")
+        self.files_by_path: dict[str, ChangedFile] = {}
+        self.files: List[ChangedFile] = []  # 按 diff 输出顺序排列的文件
+        self._file_indexes: dict[str, int] = {}
+        self._file_parents: dict[str, ChangesDirNode] = {}
+
+    def add_file(self, changed_file: ChangedFile) -> tuple[ChangesDirNode, Optional[ChangesDirNode]]:
+        """添加一个文件
+
+        返回 (文件所在目录，新创建的最上层目录)；
+        新创建的最上层目录用于让界面只插入一个新节点，其余子节点懒加载。
+        """
+        parts = changed_file.path.split("/")
+        node = self.root
+        first_new_dir = None
+        for part in parts[:-1]:
+            child = node.dirs.get(part)
+            if child is None:
+                child = ChangesDirNode(part, parent=node)
+                node.dirs[part] = child
+                if first_new_dir is None:
+                    first_new_dir = child
+            node = child
+        node.files.append(changed_file)
+        self.files_by_path[changed_file.path] = changed_file
+        self._file_indexes[changed_file.path] = len(self.files)
+        self.files.append(changed_file)
+        self._file_parents[changed_file.path] = node
+
+        ancestor = node
+        while ancestor is not None:
+            ancestor.file_count += 1
+            ancestor = ancestor.parent
+        return node, first_new_dir
+
+    def apply_numstat(self, stat: NumStat) -> Optional[ChangedFile]:
+        """把 numstat 记录合并进对应文件，并累加到所有上层目录"""
+        changed_file = self.files_by_path.get(stat.path)
+        if changed_file is None:
+            return None
+        changed_file.added = stat.added
+        changed_file.deleted = stat.deleted
+        changed_file.binary = stat.added is None
+        if not changed_file.binary:
+            ancestor = self._file_parents[stat.path]
+            while ancestor is not None:
+                ancestor.added += stat.added
+                ancestor.deleted += stat.deleted
+                ancestor = ancestor.parent
+        return changed_file
+
+    def neighbours(self, path: str, count: int) -> List[ChangedFile]:
+        """返回文件前后各 count 个相邻文件，距离近的排在前面"""
+        index = self._file_indexes.get(path)
+        if index is None:
+            return []
+        result = []
+        for offset in range(1, count + 1):
+            if index + offset < len(self.files):
+                result.append(self.files[index + offset])
+            if index - offset >= 0:
+                result.append(self.files[index - offset])
+        return result
+
+    def iter_children(self, node: ChangesDirNode) -> Iterator[Union[ChangesDirNode, ChangedFile]]:
+        """先目录后文件地遍历直接子节点"""
+        yield from node.dirs.values()
+        yield from node.files
+
+
+def format_line_stats(added: Optional[int], deleted: Optional[int], binary: bool = False) -> str:
+    """格式化 +/- 行数统计"""
+    if binary:
+        return "二进制"
+    if added is None or deleted is None:
+        return ""
+    return f"+{added} -{deleted}"
@@ -1,73 +1,279 @@
 import logging
+from collections import deque
 
-from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
 from PyQt6.QtGui import QAction
 from PyQt6.QtWidgets import (
+    QHBoxLayout,
     QLabel,
     QMenu,
+    QPushButton,
     QTreeWidget,
     QTreeWidgetItem,
     QVBoxLayout,
     QWidget,
 )
 
+from diff_prefetcher import PREFETCH_FIRST_N, PREFETCH_NEIGHBOURS
+from file_changes_model import ChangedFile, ChangesDirNode, ChangesTreeModel, format_line_stats
+from threads import DiffPrefetchThread, DiffTreeThread, ThreadTracker
+
+# 标记目录节点的数据角色（懒加载的目录在展开前没有子节点）
+DIR_ROLE = Qt.ItemDataRole.UserRole + 1
+# 每次定时器回调最多插入的树节点数量
+PAGE_SIZE = 300
+# 文件总数不超过该值时自动展开目录，保持小提交的原有体验
+AUTO_EXPAND_FILE_LIMIT = 500
+
 
 class FileChangesView(QWidget):
-    file_selected = pyqtSignal(str, str, str, bool)  # 当选择文件时发出信号
+    file_selected = pyqtSignal(str, str, str, bool, object)  # 当选择文件时发出信号，最后一个参数为 ChangedFile 或 None
     compare_with_working_requested = pyqtSignal(str, str)  # 请求与工作区比较
     edit_file_requested = pyqtSignal(str)  # 请求编辑文件
+    whole_commit_requested = pyqtSignal(str)  # 请求查看整个提交的补丁
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setup_ui()
         self.commit_hash = None
         self.other_commit_hash = None
+        self.changes_model = None
+        self._is_root_commit = False
+        self._diff_tree_thread = None
+        self._prefetch_thread = None
+        self._prefetch_threads = ThreadTracker(self)
+        self._prefetch_enabled = False
+        self._prefetch_started = False
+        # 待插入树中的 (目录节点，子节点) 队列，由定时器分页消费
+        self._pending_items = deque()
+        self._materialized_dirs = []
+        self._insert_timer = QTimer(self)
+        self._insert_timer.setInterval(0)
+        self._insert_timer.timeout.connect(self._insert_next_page)
 
     def setup_ui(self):
         layout = QVBoxLayout()
         layout.setContentsMargins(5, 5, 5, 5)
         self.setLayout(layout)
 
+        header_layout = QHBoxLayout()
         self.changes_label = QLabel("文件变化：")
-        layout.addWidget(self.changes_label)
+        header_layout.addWidget(self.changes_label)
+        header_layout.addStretch()
+        self.whole_commit_button = QPushButton("查看整个提交")
+        self.whole_commit_button.setEnabled(False)
+        self.whole_commit_button.clicked.connect(lambda: self.whole_commit_requested.emit(self.commit_hash))
+        header_layout.addWidget(self.whole_commit_button)
+        layout.addLayout(header_layout)
 
         self.changes_tree = QTreeWidget()
-        self.changes_tree.setHeaderLabels(["文件", "状态"])
-        self.changes_tree.setColumnCount(2)
+        self.changes_tree.setHeaderLabels(["文件", "状态", "行数"])
+        self.changes_tree.setColumnCount(3)
+        self.changes_tree.setUniformRowHeights(True)
         self.changes_tree.itemClicked.connect(self.on_file_clicked)
+        self.changes_tree.itemExpanded.connect(self._on_item_expanded)
         self.changes_tree.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.changes_tree.customContextMenuRequested.connect(self.show_context_menu)
         layout.addWidget(self.changes_tree)
 
     def update_changes(self, git_manager, commit):
-        """更新文件变化列表"""
+        """更新文件变化列表
+
+        在后台线程中流式读取 `git diff-tree` 的输出，边读边构建目录模型；
+        树节点按页插入，目录的子节点在展开时才创建。
+        """
+        self._stop_loading()
         self.changes_tree.clear()
         self.commit_hash = commit.hexsha
+        self.changes_model = ChangesTreeModel()
+        self.changes_model.root.populated = True
+        self._is_root_commit = not commit.parents
+        self.whole_commit_button.setEnabled(True)
+        self._setup_prefetch(git_manager, commit)
+
+        parent_sha = commit.parents[0].hexsha if commit.parents else None
+        self.changes_label.setText("文件变化：加载中...")
+        thread = DiffTreeThread(git_manager.repo.working_dir, commit.hexsha, parent_sha, self)
+        thread.records_ready.connect(self._on_records_ready)
+        thread.finished.connect(self._on_loading_finished)
+        thread.error.connect(self._on_loading_error)
+        self._diff_tree_thread = thread
+        thread.start()
+
+    def _setup_prefetch(self, git_manager, commit):
+        """为当前提交准备差异预取线程（合并提交在 CompareView 中走三方视图，不预取）"""
+        if self._prefetch_thread and self._prefetch_thread.git_manager is not git_manager:
+            self._prefetch_thread.stop()
+            self._prefetch_thread = None
+        self._prefetch_threads = ThreadTracker(self)
+        if self._prefetch_thread is None:
+            self._prefetch_thread = DiffPrefetchThread(git_manager, parent=self)
+            self._prefetch_threads.start(self._prefetch_thread)
+        self._prefetch_thread.clear_pending()
+        self._prefetch_enabled = len(commit.parents) <= 1
+        self._prefetch_started = False
+
+    def _prefetch_first_files(self):
+        """预取列表中最前面的若干个文件"""
+        if self._prefetch_enabled and not self._prefetch_started and self.changes_model:
+            self._prefetch_started = True
+            self._prefetch_thread.request(self.commit_hash, self.changes_model.files[:PREFETCH_FIRST_N])
+
+    def _prefetch_neighbours(self, file_path):
+        """预取选中文件前后的相邻文件"""
+        if self._prefetch_enabled and self.changes_model:
+            neighbours = self.changes_model.neighbours(file_path, PREFETCH_NEIGHBOURS)
+            self._prefetch_thread.request(self.commit_hash, neighbours, urgent=True)
 
-        try:
-            parent = commit.parents[0] if commit.parents else None
+    def _stop_loading(self):
+        """停止正在进行的加载"""
+        self._insert_timer.stop()
+        self._pending_items.clear()
+        self._materialized_dirs = []
+        if self._diff_tree_thread:
+            thread = self._diff_tree_thread
+            self._diff_tree_thread = None
+            thread.records_ready.disconnect(self._on_records_ready)
+            thread.finished.disconnect(self._on_loading_finished)
+            thread.error.disconnect(self._on_loading_error)
+            thread.cancel()
+            thread.wait()
+            thread.deleteLater()
 
-            if parent:
-                diff = parent.diff(commit)
-                for change in diff:
-                    path_parts = change.b_path.split("/") if change.change_type == "R" else change.a_path.split("/")
-                    self.add_file_to_tree(
-                        path_parts, change.change_type, old_path=change.a_path, is_comparing_with_workspace=False
+    def _on_records_ready(self, records):
+        """合并一批 diff-tree 记录到模型中"""
+        if self.sender() is not self._diff_tree_thread:
+            return  # 已被新的加载取代
+        model = self.changes_model
+        for record in records:
+            if isinstance(record, ChangedFile):
+                if self._is_root_commit:
+                    record.status = "新增"
+                parent_node, new_dir = model.add_file(record)
+                if new_dir is not None:
+                    if new_dir.parent.populated:
+                        self._pending_items.append((new_dir.parent, new_dir))
+                elif parent_node.populated:
+                    self._pending_items.append((parent_node, record))
+            else:
+                changed_file = model.apply_numstat(record)
+                if changed_file is not None and changed_file.item is not None:
+                    changed_file.item.setText(
+                        2, format_line_stats(changed_file.added, changed_file.deleted, changed_file.binary)
                     )
+        if self._pending_items and not self._insert_timer.isActive():
+            self._insert_timer.start()
+        if len(model.files) >= PREFETCH_FIRST_N:
+            self._prefetch_first_files()
+        self._update_summary()
+
+    def _on_loading_finished(self):
+        if self.sender() is not self._diff_tree_thread:
+            return
+        self._diff_tree_thread.deleteLater()
+        self._diff_tree_thread = None
+        self._update_summary()
+        self._prefetch_first_files()
+        if not self._insert_timer.isActive():
+            self._refresh_dir_items()
+            self._resize_columns()
+
+    def _on_loading_error(self, message):
+        if self.sender() is not self._diff_tree_thread:
+            return
+        self._diff_tree_thread.deleteLater()
+        self._diff_tree_thread = None
+        logging.error("获取文件变化失败：%s", message)
+        self.changes_label.setText("文件变化：")
+        error_item = QTreeWidgetItem(self.changes_tree)
+        error_item.setText(0, "获取文件变化失败")
+
+    def _update_summary(self):
+        """在标签中显示文件总数和行数统计"""
+        root = self.changes_model.root
+        loading = "（加载中...）" if self._diff_tree_thread else ""
+        self.changes_label.setText(
+            f"文件变化：{root.file_count} 个文件 {format_line_stats(root.added, root.deleted)}{loading}"
+        )
+
+    def _insert_next_page(self):
+        """从待插入队列中取出一页节点插入树中"""
+        for _ in range(min(PAGE_SIZE, len(self._pending_items))):
+            parent_node, child = self._pending_items.popleft()
+            self._create_item(parent_node, child)
+        if not self._pending_items:
+            self._insert_timer.stop()
+            self._refresh_dir_items()
+            self._resize_columns()
+
+    def _create_item(self, parent_node: ChangesDirNode, child):
+        """为模型节点创建树节点"""
+        parent_item = parent_node.item or self.changes_tree.invisibleRootItem()
+        item = QTreeWidgetItem(parent_item)
+        if isinstance(child, ChangesDirNode):
+            item.setText(0, child.name)
+            item.setData(0, DIR_ROLE, True)
+            item.setChildIndicatorPolicy(QTreeWidgetItem.ChildIndicatorPolicy.ShowIndicator)
+            child.item = item
+            self._materialized_dirs.append(child)
+            self._update_dir_item(child)
+            if self.changes_model.root.file_count <= AUTO_EXPAND_FILE_LIMIT:
+                item.setExpanded(True)
+        else:
+            item.setText(0, child.path.rsplit("/", 1)[-1])
+            item.setData(0, Qt.ItemDataRole.UserRole, False)
+            if child.status == "R":
+                item.setText(1, f"{child.old_path} -> {child.path}")
             else:
-                for item in commit.tree.traverse():
-                    if item.type == "blob":
-                        path_parts = item.path.split("/")
-                        self.add_file_to_tree(path_parts, "新增", is_comparing_with_workspace=False)
+                item.setText(1, child.status)
+            item.setText(2, format_line_stats(child.added, child.deleted, child.binary))
+            child.item = item
+
+    def _update_dir_item(self, node: ChangesDirNode):
+        node.item.setText(1, f"{node.file_count} 个文件")
+        node.item.setText(2, format_line_stats(node.added, node.deleted))
+
+    def _refresh_dir_items(self):
+        """刷新已创建的目录节点上的汇总统计"""
+        for node in self._materialized_dirs:
+            self._update_dir_item(node)
+
+    def _resize_columns(self):
+        for column in range(self.changes_tree.columnCount()):
+            self.changes_tree.resizeColumnToContents(column)
 
-            self.changes_tree.expandAll()
-            self.changes_tree.resizeColumnToContents(0)
-            self.changes_tree.resizeColumnToContents(1)
+    def _on_item_expanded(self, item):
+        """目录第一次展开时才创建它的子节点"""
+        if not item.data(0, DIR_ROLE) or not self.changes_model:
+            return
+        node = self._find_dir_node(item)
+        if node is None or node.populated:
+            return
+        node.populated = True
+        for child in self.changes_model.iter_children(node):
+            self._pending_items.append((node, child))
+        if not self._insert_timer.isActive():
+            self._insert_timer.start()
+
+    def _find_dir_node(self, item):
+        node = self.changes_model.root
+        for part in self.get_full_path(item).split("/"):
+            node = node.dirs.get(part)
+            if node is None:
+                return None
+        return node
 
-        except Exception:
-            logging.exception("获取文件变化失败")
-            error_item = QTreeWidgetItem(self.changes_tree)
-            error_item.setText(0, "获取文件变化失败")
+    @staticmethod
+    def _is_file_item(item):
+        return item.childCount() == 0 and not item.data(0, DIR_ROLE)
+
+    def clear_changes(self):
+        """停止加载并清空文件变化列表"""
+        self._stop_loading()
+        self.changes_tree.clear()
+        self.changes_model = None
+        self._prefetch_enabled = False
+        self.whole_commit_button.setEnabled(False)
 
     def add_file_to_tree(self, path_parts, status, parent=None, old_path=None, is_comparing_with_workspace=False):
         """递归添加文件到树形结构"""
@@ -115,15 +321,22 @@ class FileChangesView(QWidget):
 
     def on_file_clicked(self, item):
         """当点击文件时发出信号"""
-        if item and item.childCount() == 0:
+        if item and self._is_file_item(item):
             is_comparing_with_workspace = item.data(0, Qt.ItemDataRole.UserRole) or False
+            file_path = self.get_full_path(item)
+            changed_file = None
+            if not is_comparing_with_workspace:
+                self._prefetch_neighbours(file_path)
+                if self.changes_model and not self.other_commit_hash:
+                    # 模型中已有 numstat 和 blob sha，比较视图不必再调用 git 检查文件
+                    changed_file = self.changes_model.files_by_path.get(file_path)
             self.file_selected.emit(
-                self.get_full_path(item), self.commit_hash, self.other_commit_hash, is_comparing_with_workspace
+                file_path, self.commit_hash, self.other_commit_hash, is_comparing_with_workspace, changed_file
             )
 
     def show_no_differences_message(self, commit_hash):
         """显示无差异消息"""
-        self.changes_tree.clear()
+        self.clear_changes()
         self.commit_hash = commit_hash
 
         # 创建一个显示无差异的项目
@@ -141,7 +354,7 @@ class FileChangesView(QWidget):
     def show_context_menu(self, position):
         """显示右键菜单"""
         item = self.changes_tree.itemAt(position)
-        if item and item.childCount() == 0:
+        if item and self._is_file_item(item):
             menu = QMenu()
 
             # 添加与工作区比较选项
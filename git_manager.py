@@ -1,18 +1,105 @@
 import logging
 import os
-from typing import List, Optional
+import re
+import subprocess
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
 
 import git
 import git.exc
 import pathspec
 from git import GitCommandError
 
+from blame_table import UNCOMMITTED_HASH, BlameCommit, BlameTable
+
+# 提交元数据缓存的最大条目数
+COMMIT_CACHE_SIZE = 2000
+
+_FULL_SHA_RE = re.compile(r"^[0-9a-f]{40}$")
+# 作者/提交者行的格式: "Name <email> 1700000000 +0800"
+_IDENT_RE = re.compile(r"^(.*) <(.*)> (\d+) ([+-]\d{4})$")
+
+
+@dataclass(frozen=True)
+class CommitInfo:
+    """提交的元数据（不可变，可安全地在多个视图间共享）"""
+
+    hexsha: str
+    tree: str
+    parents: tuple[str, ...]
+    author_name: str
+    author_email: str
+    authored_date: int
+    committer_name: str
+    committer_email: str
+    committed_date: int
+    message: str
+
+    @property
+    def summary(self) -> str:
+        """提交信息的第一行"""
+        return self.message.strip().split("\n", 1)[0]
+
+
+def _parse_ident(value: str) -> tuple[str, str, int]:
+    """解析作者/提交者行，返回 (名称，邮箱，时间戳)"""
+    match = _IDENT_RE.match(value)
+    if not match:
+        return value, "", 0
+    return match.group(1), match.group(2), int(match.group(3))
+
+
+def parse_commit_object(hexsha: str, data: bytes) -> CommitInfo:
+    """解析 `git cat-file` 输出的原始 commit 对象"""
+    header, _, message = data.partition(b"\n\n")
+    tree = ""
+    parents = []
+    author = committer = ("", "", 0)
+    encoding = "utf-8"
+    for raw_line in header.split(b"\n"):
+        # 以空格开头的是上一字段（如 gpgsig）的续行，直接跳过
+        if raw_line.startswith(b" "):
+            continue
+        key, _, value = raw_line.decode("utf-8", errors="replace").partition(" ")
+        if key == "tree":
+            tree = value
+        elif key == "parent":
+            parents.append(value)
+        elif key == "author":
+            author = _parse_ident(value)
+        elif key == "committer":
+            committer = _parse_ident(value)
+        elif key == "encoding":
+            encoding = value
+    try:
+        text = message.decode(encoding, errors="replace")
+    except LookupError:
+        text = message.decode("utf-8", errors="replace")
+    return CommitInfo(
+        hexsha=hexsha,
+        tree=tree,
+        parents=tuple(parents),
+        author_name=author[0],
+        author_email=author[1],
+        authored_date=author[2],
+        committer_name=committer[0],
+        committer_email=committer[1],
+        committed_date=committer[2],
+        message=text,
+    )
+
 
 class GitManager:
     def __init__(self, repo_path: str):
         self.repo_path = repo_path
         self.repo: Optional[git.Repo] = None
         self.ignore_spec: Optional[pathspec.PathSpec] = None
+        # 提交元数据和 git.Commit 对象的 LRU 缓存，键为完整的 sha
+        self._commit_info_cache: OrderedDict[str, CommitInfo] = OrderedDict()
+        self._commit_object_cache: OrderedDict[str, git.Commit] = OrderedDict()
+        self._commit_cache_lock = threading.Lock()
 
     def initialize(self) -> bool:
         """初始化 Git 仓库"""
@@ -23,6 +110,187 @@ class GitManager:
         except git.InvalidGitRepositoryError:
             return False
 
+    def _cache_put(self, cache: OrderedDict, key: str, value) -> None:
+        """写入 LRU 缓存，超出容量时淘汰最久未使用的条目"""
+        with self._commit_cache_lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > COMMIT_CACHE_SIZE:
+                cache.popitem(last=False)
+
+    def _cache_get(self, cache: OrderedDict, key: str):
+        with self._commit_cache_lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def get_commit(self, rev: str) -> git.Commit:
+        """获取 git.Commit 对象，按完整 sha 缓存
+
+        git.Commit 的属性是惰性加载的，复用同一个对象可以避免重复读取提交对象。
+        """
+        if _FULL_SHA_RE.match(rev):
+            commit = self._cache_get(self._commit_object_cache, rev)
+            if commit is not None:
+                return commit
+        commit = self.repo.commit(rev)
+        self._cache_put(self._commit_object_cache, commit.hexsha, commit)
+        return commit
+
+    def get_commit_info(self, rev: str) -> Optional[CommitInfo]:
+        """获取单个提交的元数据，优先使用缓存"""
+        return self.load_commits([rev]).get(rev)
+
+    def load_commits(self, revs: Iterable[str]) -> dict[str, CommitInfo]:
+        """批量加载提交元数据
+
+        已缓存的提交直接返回，其余的通过一次 `git cat-file --batch` 调用读取。
+        返回 {传入的 rev: CommitInfo}，无法解析的 rev 不会出现在结果中。
+        """
+        result: dict[str, CommitInfo] = {}
+        if not self.repo:
+            return result
+
+        missing = []
+        for rev in dict.fromkeys(revs):
+            if not rev:
+                continue
+            info = self._cache_get(self._commit_info_cache, rev) if _FULL_SHA_RE.match(rev) else None
+            if info is not None:
+                result[rev] = info
+            else:
+                missing.append(rev)
+        if not missing:
+            return result
+
+        # ^{commit} 让 tag 等对象也能解引用到提交
+        for rev, hexsha, obj_type, data in self._cat_file_batch([f"{rev}^{{commit}}" for rev in missing]):
+            if obj_type != "commit":
+                continue
+            info = parse_commit_object(hexsha, data)
+            self._cache_put(self._commit_info_cache, hexsha, info)
+            result[rev[: -len("^{commit}")]] = info
+        return result
+
+    def read_blobs(self, shas: Iterable[str]) -> dict[str, bytes]:
+        """通过一次 `git cat-file --batch` 调用读取多个 blob 的内容"""
+        shas = [sha for sha in dict.fromkeys(shas) if sha]
+        if not self.repo or not shas:
+            return {}
+        return {rev: data for rev, _, obj_type, data in self._cat_file_batch(shas) if obj_type == "blob"}
+
+    def get_blob_sizes(self, specs: Iterable[str]) -> dict[str, int]:
+        """通过一次 `git cat-file --batch-check` 获取多个对象的大小（等价于 `cat-file -s`）
+
+        specs 为 "<rev>:<path>" 或 blob sha，不存在的对象不会出现在结果中。
+        """
+        specs = [spec for spec in dict.fromkeys(specs) if spec]
+        if not self.repo or not specs:
+            return {}
+        try:
+            proc = subprocess.run(
+                ["git", "cat-file", "--batch-check"],
+                input="".join(f"{spec}\n" for spec in specs).encode("utf-8"),
+                cwd=self.repo.working_dir,
+                capture_output=True,
+                check=True,
+            )
+        except (OSError, subprocess.CalledProcessError):
+            logging.exception("获取对象大小失败")
+            return {}
+        sizes = {}
+        for spec, line in zip(specs, proc.stdout.decode("utf-8", errors="replace").splitlines()):
+            parts = line.split(" ")
+            if len(parts) == 3 and parts[2].isdigit():
+                sizes[spec] = int(parts[2])
+        return sizes
+
+    def is_binary_by_attributes(self, file_path: str) -> bool:
+        """根据 .gitattributes 判断文件是否应按二进制处理（binary 或 -diff）"""
+        if not self.repo:
+            return False
+        try:
+            output = self.repo.git.check_attr("binary", "diff", "--", file_path)
+        except GitCommandError:
+            logging.exception("读取 gitattributes 失败")
+            return False
+        for line in output.splitlines():
+            # 输出格式："<path>: <attr>: <value>"
+            _, attr, value = line.rsplit(": ", 2)
+            if (attr == "binary" and value == "set") or (attr == "diff" and value == "unset"):
+                return True
+        return False
+
+    def is_binary_by_numstat(self, left_rev: str, right_rev: str, file_path: str) -> bool:
+        """git 的 numstat 对二进制文件输出 "-"，据此判断两个版本之间的文件是否为二进制"""
+        if not self.repo:
+            return False
+        try:
+            output = self.repo.git.diff("--numstat", left_rev, right_rev, "--", file_path)
+        except GitCommandError:
+            logging.exception("获取 numstat 失败")
+            return False
+        return output.startswith("-\t-\t")
+
+    def _cat_file_batch(self, revs: List[str]) -> List[tuple[str, str, str, bytes]]:
+        """执行 `git cat-file --batch`，返回 [(rev, sha, 类型，内容)]，不存在的对象会被跳过"""
+        batch_input = "".join(f"{rev}\n" for rev in revs).encode("utf-8")
+        try:
+            proc = subprocess.run(
+                ["git", "cat-file", "--batch"],
+                input=batch_input,
+                cwd=self.repo.working_dir,
+                capture_output=True,
+                check=True,
+            )
+        except (OSError, subprocess.CalledProcessError):
+            logging.exception("批量读取 git 对象失败")
+            return []
+
+        objects = []
+        output = proc.stdout
+        pos = 0
+        for rev in revs:
+            eol = output.find(b"\n", pos)
+            if eol < 0:
+                break
+            parts = output[pos:eol].decode("utf-8", errors="replace").split(" ")
+            pos = eol + 1
+            # 对象不存在时输出 "<rev> missing"（或 ambiguous）
+            if len(parts) != 3:
+                continue
+            hexsha, obj_type, size = parts[0], parts[1], int(parts[2])
+            objects.append((rev, hexsha, obj_type, output[pos : pos + size]))
+            pos += size + 1  # 对象内容后跟一个换行
+        return objects
+
+    def get_refs_map(self) -> dict[str, List[str]]:
+        """一次性获取所有引用，返回 {提交 sha: [引用名称]}"""
+        refs_map: dict[str, List[str]] = {}
+        if not self.repo:
+            return refs_map
+        try:
+            output = self.repo.git.for_each_ref(
+                "--format=%(objectname) %(*objectname) %(refname)", "refs/heads", "refs/remotes", "refs/tags"
+            )
+        except GitCommandError:
+            logging.exception("获取引用列表失败")
+            return refs_map
+        for line in output.splitlines():
+            parts = line.split(" ")
+            if len(parts) != 3:
+                continue
+            object_sha, peeled_sha, refname = parts
+            # 附注标签需要使用解引用后的提交 sha
+            sha = peeled_sha or object_sha
+            for prefix in ("refs/heads/", "refs/remotes/", "refs/tags/"):
+                if refname.startswith(prefix):
+                    refname = refname[len(prefix) :]
+                    break
+            refs_map.setdefault(sha, []).append(refname)
+        return refs_map
+
     def get_branches(self) -> List[str]:
         """获取所有分支"""
         if not self.repo:
@@ -115,44 +383,35 @@ class GitManager:
             print(f"获取提交历史失败：{e!s}")
             return []
 
-    def get_blame_data(self, file_path: str, commit_hash: str = "HEAD") -> List[dict]:
-        """获取文件的 blame 信息"""
-        # todo 新增行 有 bug
+    def get_blame_table(self, file_path: str, commit_hash: str = "HEAD") -> BlameTable:
+        """获取文件的 blame 信息，按提交去重保存（见 BlameTable），失败时返回空表"""
+        table = BlameTable()
         if not self.repo:
-            return []
+            return table
 
         try:
-            blame_target = commit_hash
-            print("blame_target is", blame_target)
-            blame_data = []
-            for commit, lines in self.repo.blame(blame_target, file_path):
-                for line_num_in_commit, line_content in enumerate(lines):
-                    # print("line_num_in_commit is", line_num_in_commit)
-                    # print("line_content is", line_content)
-                    # print("commit is", commit)
-                    uncommited_yet = False
-                    if commit.hexsha == "0000000000000000000000000000000000000000":
-                        uncommited_yet = True
-                    blame_data.append(
-                        {
-                            "commit_hash": commit.hexsha,
-                            "author_name": commit.author.name if not uncommited_yet else "未提交",
-                            "author_email": commit.author.email if not uncommited_yet else "未提交",
-                            "committed_date": f"{commit.committed_datetime.year}/{commit.committed_datetime.month}/{commit.committed_datetime.day}"
-                            if not uncommited_yet
-                            else "未提交",
-                            "line_number": line_num_in_commit + 1,  # 1-indexed
-                            "content": line_content.strip("\n"),
-                            "message": commit.message if not uncommited_yet else "未提交",
-                        }
-                    )
-            return blame_data
+            for commit, lines in self.repo.blame(commit_hash, file_path):
+                index = table.commit_index(commit.hexsha)
+                if index is None:
+                    if commit.hexsha == UNCOMMITTED_HASH:
+                        blame_commit = BlameCommit(commit.hexsha, "未提交", "未提交", "未提交", "未提交")
+                    else:
+                        committed = commit.committed_datetime
+                        blame_commit = BlameCommit(
+                            commit.hexsha,
+                            commit.author.name,
+                            commit.author.email,
+                            f"{committed.year}/{committed.month}/{committed.day}",
+                            commit.message,
+                        )
+                    index = table.add_commit(blame_commit)
+                table.append_lines(index, len(lines))
+            return table
         except git.GitCommandError:  # Catch specific error for file not found or not tracked
-            return []
-        except Exception as e:
+            return BlameTable()
+        except Exception:
             logging.exception("获取 blame 信息失败")
-            print(f"获取 blame 信息失败：{e!s}")
-            return []
+            return BlameTable()
 
     def fetch(self):
         """获取仓库"""
@@ -29,6 +29,7 @@ from git_manager import GitManager
 from settings import settings
 from threads import FetchThread, PullThread, PushThread  # Import PullThread and PushThread
 from views.commit_history_view import CommitHistoryView
+from views.commit_patch_view import CommitPatchView
 from views.folder_history_view import FolderHistoryView
 from views.side_bar_widget import SideBarWidget
 from views.top_bar_widget import TopBarWidget  # Import TopBarWidget
@@ -238,6 +239,7 @@ class GitManagerWindow(QMainWindow):
         self.file_changes_view.file_selected.connect(self.on_file_selected)
         self.file_changes_view.compare_with_working_requested.connect(self.show_compare_with_working_dialog)
         self.file_changes_view.edit_file_requested.connect(self.on_edit_file_requested)
+        self.file_changes_view.whole_commit_requested.connect(self.show_whole_commit)
 
         # 创建右侧垂直分割器，用于放置文件变化视图和 commit 详细信息视图
         right_splitter = QSplitter(Qt.Orientation.Vertical)
@@ -615,22 +617,30 @@ class GitManagerWindow(QMainWindow):
         """当选择提交时更新文件变化视图"""
         if not self.git_manager:
             return
-        self.current_commit = self.git_manager.repo.commit(commit_hash)
+        self.current_commit = self.git_manager.get_commit(commit_hash)
         self.file_changes_view.update_changes(self.git_manager, self.current_commit)
         # cursor 生成 - 同时更新 commit 详细信息视图
         self.commit_detail_view.update_commit_detail(self.git_manager, self.current_commit)
 
-    def on_file_selected(self, file_path, commit_hash=None, other_commit_hash=None, is_comparing_with_workspace=False):
+    def on_file_selected(
+        self, file_path, commit_hash=None, other_commit_hash=None, is_comparing_with_workspace=False, changed_file=None
+    ):
         """当选择文件时，在 TabWidget 中显示比较视图"""
-        _commit = self.git_manager.repo.commit(commit_hash) if commit_hash else self.current_commit
+        _commit = self.git_manager.get_commit(commit_hash) if commit_hash else self.current_commit
         if not _commit or not self.git_manager:
             return
-        other_commit = self.git_manager.repo.commit(other_commit_hash) if other_commit_hash else None
+        other_commit = self.git_manager.get_commit(other_commit_hash) if other_commit_hash else None
         self._on_file_selected(
-            file_path, _commit, other_commit=other_commit, is_comparing_with_workspace=is_comparing_with_workspace
+            file_path,
+            _commit,
+            other_commit=other_commit,
+            is_comparing_with_workspace=is_comparing_with_workspace,
+            changed_file=changed_file,
         )
 
-    def _on_file_selected(self, file_path, current_commit, other_commit=None, is_comparing_with_workspace=False):
+    def _on_file_selected(
+        self, file_path, current_commit, other_commit=None, is_comparing_with_workspace=False, changed_file=None
+    ):
         # 生成一个唯一的标签页标识符，例如 "commit_hash:file_path"
         # 为简化，我们先用 file_path 作为标题，并检查是否已存在
         # 更健壮的方式是存储一个映射：tab_key -> tab_index
@@ -653,11 +663,27 @@ class GitManagerWindow(QMainWindow):
             file_path,
             other_commit=other_commit,
             is_comparing_with_workspace=is_comparing_with_workspace,
+            changed_file=changed_file,
         )
 
         new_tab_index = self.compare_tab_widget.addTab(compare_view_instance, unique_tab_title)
         self.compare_tab_widget.setCurrentIndex(new_tab_index)
 
+    def show_whole_commit(self, commit_hash):
+        """在标签页中显示整个提交的补丁"""
+        if not self.git_manager or not commit_hash:
+            return
+        unique_tab_title = f"提交 {commit_hash[:7]}"
+        for i in range(self.compare_tab_widget.count()):
+            if self.compare_tab_widget.tabText(i) == unique_tab_title:
+                self.compare_tab_widget.setCurrentIndex(i)
+                return
+
+        commit_patch_view = CommitPatchView(self)
+        commit_patch_view.show_commit(self.git_manager, self.git_manager.get_commit(commit_hash))
+        new_tab_index = self.compare_tab_widget.addTab(commit_patch_view, unique_tab_title)
+        self.compare_tab_widget.setCurrentIndex(new_tab_index)
+
     # def close_compare_tab(self, index):
     #     """关闭比较视图的标签页"""
     #     widget_to_close = self.compare_tab_widget.widget(index)
@@ -668,7 +694,7 @@ class GitManagerWindow(QMainWindow):
     def show_compare_with_working_dialog(self, file_path, commit_hash=None, old_file_path=None):
         """显示与工作区比较的对话框"""
         try:
-            _commit = self.git_manager.repo.commit(commit_hash) if commit_hash else self.current_commit
+            _commit = self.git_manager.get_commit(commit_hash) if commit_hash else self.current_commit
             if not _commit or not self.git_manager:
                 return
 
@@ -0,0 +1,225 @@
+"""语法高亮调度
+
+QSyntaxHighlighter.rehighlight() 会在界面线程中一次性高亮文档的所有块，大文件打开时界面会卡住。
+这里把重新高亮改为任务：先同步高亮编辑器视口内可见的块，其余的块在事件循环空闲时分片高亮，
+每片不超过 SLICE_SECONDS。多个文档同时有任务时，有焦点的编辑器优先，其次是可见的编辑器（当前标签页），
+最后是隐藏的编辑器。
+"""
+
+import time
+import weakref
+from typing import Dict, List, Optional
+
+from PyQt6 import sip
+from PyQt6.QtCore import QPoint, QTimer
+from PyQt6.QtGui import QSyntaxHighlighter, QTextDocument
+from PyQt6.QtWidgets import QPlainTextEdit
+
+# 每个分片的最长时间（秒）
+SLICE_SECONDS = 0.008
+
+
+class _HighlightJob:
+    """一个文档的重新高亮任务，done[i] 表示第 i 块已经高亮"""
+
+    def __init__(self, highlighter: QSyntaxHighlighter, document: QTextDocument):
+        self.highlighter = highlighter
+        self.document = document
+        self.done = bytearray(b"\x01" * document.blockCount())
+        self.next = len(self.done)  # 之前的块都已高亮
+        self.char_count = document.characterCount()
+        self.pending_ranges: List[tuple] = []  # 块号尚未与 done 对齐的待高亮范围
+        self.slot = None  # 连接到 document.contentsChange 的槽
+
+    def reset(self):
+        self.done = bytearray(self.document.blockCount())
+        self.next = 0
+        self.char_count = self.document.characterCount()
+        self.pending_ranges.clear()
+
+    def mark(self, start: int, end: int):
+        """把 [start, end) 标记为待高亮"""
+        start = max(start, 0)
+        end = min(end, len(self.done))
+        if end > start:
+            self.done[start:end] = bytes(end - start)
+            self.next = min(self.next, start)
+
+    def on_contents_change(self, position: int, removed: int, added: int):
+        """文档修改后调整 done：修改的块已由 QSyntaxHighlighter 高亮，其后的块号随行数变化平移"""
+        document = self.document
+        char_count = document.characterCount()
+        expected = self.char_count - removed + added
+        self.char_count = char_count
+        if expected != char_count:
+            # setPlainText 等操作给出的修改范围不准确，整篇重新高亮
+            self.reset()
+            return
+        delta = document.blockCount() - len(self.done)
+        first = document.findBlock(position).blockNumber()
+        last = document.findBlock(position + added).blockNumber()
+        self.done[first : last + 1 - delta] = b"\x01" * (last + 1 - first)
+        if self.next > first:
+            self.next = max(first, self.next + delta)
+
+    def apply_pending_ranges(self) -> bool:
+        """标记块号已经对齐的待高亮范围，有范围被标记时返回 True"""
+        if not self.pending_ranges or len(self.done) != self.document.blockCount():
+            return False
+        for start, end in self.pending_ranges:
+            self.mark(start, end)
+        self.pending_ranges.clear()
+        return True
+
+    def highlight(self, start: int, end: int, deadline: Optional[float] = None) -> bool:
+        """高亮 [start, end) 中尚未高亮的块，到达 deadline 时返回 False"""
+        done = self.done
+        end = min(end, len(done))
+        number = done.find(0, start, end)
+        if number < 0:
+            return True
+        block = self.document.findBlockByNumber(number)
+        while number < end and block.isValid():
+            if not done[number]:
+                self.highlighter.rehighlightBlock(block)
+                done[number] = 1
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return False
+            block = block.next()
+            number += 1
+        return True
+
+    def highlight_rest(self, deadline: float) -> bool:
+        """按顺序高亮剩余的块，全部完成时返回 True"""
+        self.next = self.done.find(0, self.next)
+        if self.next < 0:
+            self.next = len(self.done)
+            return True
+        finished = self.highlight(self.next, len(self.done), deadline)
+        return finished and self.done.find(0) < 0
+
+    def is_valid(self) -> bool:
+        return not sip.isdeleted(self.highlighter) and not sip.isdeleted(self.document)
+
+
+class HighlightScheduler:
+    """按视口优先、空闲分片的方式重新高亮文档"""
+
+    def __init__(self):
+        self._jobs: Dict[int, _HighlightJob] = {}  # id(highlighter) -> 任务
+        self._editors = weakref.WeakSet()
+        self._timer: Optional[QTimer] = None
+
+    def register_editor(self, editor: QPlainTextEdit):
+        """登记编辑器，用于找到文档所在的视口和判断优先级"""
+        self._editors.add(editor)
+
+    def _editor_for(self, document: QTextDocument) -> Optional[QPlainTextEdit]:
+        for editor in list(self._editors):
+            if not sip.isdeleted(editor) and editor.document() is document:
+                return editor
+        return None
+
+    def _priority(self, job: _HighlightJob) -> int:
+        editor = self._editor_for(job.document)
+        if editor is None:
+            return 1
+        if editor.hasFocus():
+            return 0
+        return 1 if editor.isVisible() else 2
+
+    def rehighlight(self, highlighter: QSyntaxHighlighter, start: int = 0, end: Optional[int] = None):
+        """重新高亮第 start 到 end 块（不含 end，None 表示到文档末尾）
+
+        视口内的块立即高亮，其余的块在之后的事件循环中分片高亮。
+        """
+        document = highlighter.document()
+        if document is None:
+            return
+        job = self._jobs.get(id(highlighter))
+        if job is None or job.document is not document:
+            job = _HighlightJob(highlighter, document)
+            job.slot = lambda position, removed, added, job=job: self._on_contents_change(job, position, removed, added)
+            document.contentsChange.connect(job.slot)
+            self._jobs[id(highlighter)] = job
+        if start == 0 and end is None:
+            job.reset()
+
+        if end is None:
+            end = document.blockCount()
+        if len(job.done) == document.blockCount():
+            job.mark(start, end)
+        else:
+            # 文档修改后 QTextDocument 还未通知到本任务（contentsChange 的其它槽先执行），块号对齐后再标记
+            job.pending_ranges.append((start, end))
+            self._start_timer()
+            return
+
+        editor = self._editor_for(document)
+        if editor is not None and editor.isVisible():
+            self._highlight_visible(job, editor)
+        self._start_timer()
+
+    def _on_contents_change(self, job: _HighlightJob, position: int, removed: int, added: int):
+        job.on_contents_change(position, removed, added)
+        if job.apply_pending_ranges():
+            editor = self._editor_for(job.document)
+            if editor is not None and editor.isVisible():
+                self._highlight_visible(job, editor)
+
+    def cancel(self, highlighter: QSyntaxHighlighter):
+        job = self._jobs.pop(id(highlighter), None)
+        if job is not None:
+            self._finish_job(job)
+
+    def is_pending(self, highlighter: QSyntaxHighlighter) -> bool:
+        return id(highlighter) in self._jobs
+
+    def _highlight_visible(self, job: _HighlightJob, editor: QPlainTextEdit, deadline: Optional[float] = None) -> bool:
+        first = editor.firstVisibleBlock().blockNumber()
+        last = editor.cursorForPosition(QPoint(0, editor.viewport().height())).blockNumber()
+        return job.highlight(first, last + 1, deadline)
+
+    def _start_timer(self):
+        if self._timer is None:
+            self._timer = QTimer()
+            self._timer.setSingleShot(True)
+            self._timer.setInterval(0)
+            self._timer.timeout.connect(self._run_slice)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def _finish_job(self, job: _HighlightJob):
+        if not sip.isdeleted(job.document):
+            job.document.contentsChange.disconnect(job.slot)
+
+    def _run_slice(self):
+        deadline = time.perf_counter() + SLICE_SECONDS
+        jobs = []
+        for key, job in list(self._jobs.items()):
+            if not job.is_valid():
+                del self._jobs[key]
+                continue
+            job.apply_pending_ranges()
+            if len(job.done) == job.document.blockCount():
+                jobs.append((self._priority(job), key, job))
+        jobs.sort(key=lambda item: item[0])
+
+        # 先处理各可见编辑器视口内的块（例如滚动到了尚未高亮的位置）
+        for _, _, job in jobs:
+            editor = self._editor_for(job.document)
+            if editor is not None and editor.isVisible():
+                if not self._highlight_visible(job, editor, deadline):
+                    break
+        for _, key, job in jobs:
+            if time.perf_counter() >= deadline:
+                break
+            if job.highlight_rest(deadline):
+                del self._jobs[key]
+                self._finish_job(job)
+
+        if self._jobs:
+            self._timer.start()
+
+
+highlight_scheduler = HighlightScheduler()
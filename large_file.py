@@ -0,0 +1,56 @@
+"""工作区编辑器的大文件模式
+
+文件超过大小阈值时不一次性读入，而是在后台线程中分块读取并逐块追加到编辑器；
+读入后行数过多或存在超长行（例如压缩后的 js、导出的 SQL）时同样进入大文件模式。
+大文件模式下编辑器只读，不做语法高亮、行修改标记、blame 和概览栏，
+超长行按 max_line_length 折断显示，避免 QTextLayout 排版整行时卡住界面。
+"""
+
+from typing import Optional, Tuple
+
+from settings import settings
+
+# 后台读取时每块的字符数
+LOAD_CHUNK_CHARS = 1024 * 1024
+
+
+def is_large_file_size(size: int, thresholds: Optional[dict] = None) -> bool:
+    """文件大小是否超过阈值（需要分块读取）"""
+    thresholds = thresholds or settings.get_large_file_thresholds()
+    return size > thresholds["size"]
+
+
+def is_large_text(text: str, thresholds: Optional[dict] = None) -> bool:
+    """已读入的文本是否行数过多或存在超长行"""
+    thresholds = thresholds or settings.get_large_file_thresholds()
+    if text.count("\n") >= thresholds["lines"]:
+        return True
+    max_line_length = thresholds["max_line_length"]
+    # 只有总长度超过阈值时才需要逐行检查
+    return len(text) > max_line_length and any(len(line) > max_line_length for line in text.split("\n"))
+
+
+def split_long_lines(text: str, max_line_length: int) -> Tuple[str, int]:
+    """把超过 max_line_length 的行折断为多行，返回 (折断后的文本, 被折断的行数)"""
+    if len(text) <= max_line_length:
+        return text, 0
+    lines = text.split("\n")
+    if all(len(line) <= max_line_length for line in lines):
+        return text, 0
+    result = []
+    split_count = 0
+    for line in lines:
+        if len(line) <= max_line_length:
+            result.append(line)
+            continue
+        split_count += 1
+        result.extend(line[start : start + max_line_length] for start in range(0, len(line), max_line_length))
+    return "\n".join(result), split_count
+
+
+def describe_large_file(split_lines: bool = False) -> str:
+    """大文件模式的提示文字"""
+    text = "大文件模式：只读，已关闭语法高亮、修改标记和 blame"
+    if split_lines:
+        text += "；超长行已折断显示"
+    return text
@@ -0,0 +1,54 @@
+"""差异两侧的行号映射
+
+把行级差异块转换为单调的分段线性映射：每个块的起点和终点是一个断点 (源行号, 目标行号)，
+断点之间按比例插值，第一个断点之前和最后一个断点之后按斜率 1 外推。
+映射在每次差异计算后构建一次，之后每次查询只需一次二分查找。
+"""
+
+from bisect import bisect_right
+from typing import List
+
+
+class LineMapping:
+    """源文档行号（可带小数）到目标文档行号的单调分段线性映射"""
+
+    def __init__(self, sources: List[float], targets: List[float]):
+        self._sources = sources
+        self._targets = targets
+
+    @classmethod
+    def from_chunks(cls, chunks: list, reverse: bool = False) -> "LineMapping":
+        """由差异块构建映射
+
+        Args:
+            chunks: 按顺序排列的差异块（需要 left_start/left_end/right_start/right_end 属性）
+            reverse: 为 False 时从左侧映射到右侧，为 True 时从右侧映射到左侧
+        """
+        sources = [0]
+        targets = [0]
+        for chunk in chunks:
+            if reverse:
+                points = ((chunk.right_start, chunk.left_start), (chunk.right_end, chunk.left_end))
+            else:
+                points = ((chunk.left_start, chunk.right_start), (chunk.left_end, chunk.right_end))
+            for source, target in points:
+                if source == sources[-1] and target == targets[-1]:
+                    continue
+                sources.append(source)
+                targets.append(target)
+        return cls(sources, targets)
+
+    def map(self, line: float) -> float:
+        """返回源行号对应的目标行号
+
+        源侧为空的块（如左侧到右侧的插入块）在同一源行号上有两个断点，此时取靠后的断点，
+        即该行映射到插入内容之后。
+        """
+        index = bisect_right(self._sources, line) - 1
+        if index < 0:
+            return self._targets[0] + line - self._sources[0]
+        source, target = self._sources[index], self._targets[index]
+        if index + 1 == len(self._sources):
+            return target + line - source
+        next_source, next_target = self._sources[index + 1], self._targets[index + 1]
+        return target + (line - source) * (next_target - target) / (next_source - source)
@@ -0,0 +1,149 @@
+"""编辑时增量更新行修改标记
+
+保存暂存区版本的行和它与编辑器内容的完整差异块（含 equal 块）。文档修改后只需记录修改范围：
+修改行之前的行和之后的行都未变化，因此只要记录未变化的前缀行号和后缀行数，多次修改可以合并为一个范围。
+更新时把范围扩大到覆盖与之接触的修改块，在暂存区版本中对应的行之间重新计算差异，替换该范围内的差异块，
+之后的差异块按行数变化平移。每次按键的代价与修改范围附近的行数相关，而与文件大小无关。
+"""
+
+from typing import Callable, List, Optional, Sequence
+
+from diff_calculator import DiffCalculator, DiffChunk, diff_dict_from_chunks
+
+
+def _lines_text(lines: Sequence[str]) -> str:
+    # 每行以换行结尾，空行也能被 splitlines 保留
+    return "".join(line + "\n" for line in lines)
+
+
+class LineModificationTracker:
+    """暂存区版本与编辑器内容的行级差异，支持按修改范围增量更新"""
+
+    def __init__(self):
+        self.base_lines: Optional[List[str]] = None  # 暂存区版本的行，None 表示不跟踪（未跟踪的文件）
+        self.chunks: List[DiffChunk] = []
+        self.line_count = 0  # 编辑器内容的行数（与 str.splitlines 相同，末尾的空行不计）
+        self._pending: Optional[tuple] = None  # 待更新的范围 (未变化的前缀行数, 未变化的后缀行数)
+
+    @property
+    def active(self) -> bool:
+        return self.base_lines is not None
+
+    def reset(self, base_lines: List[str], chunks: List[DiffChunk], line_count: int):
+        """用完整差异的结果重新开始跟踪"""
+        self.base_lines = base_lines
+        self.chunks = list(chunks)
+        self.line_count = line_count
+        self._pending = None
+
+    def clear(self):
+        self.base_lines = None
+        self.chunks = []
+        self.line_count = 0
+        self._pending = None
+
+    def note_change(self, first_line: int, suffix_lines: int):
+        """记录一次修改：first_line 之前的行和最后 suffix_lines 行未变化"""
+        if not self.active:
+            return
+        if self._pending is not None:
+            first_line = min(first_line, self._pending[0])
+            suffix_lines = min(suffix_lines, self._pending[1])
+        self._pending = (first_line, suffix_lines)
+
+    def mark_all(self):
+        """整个文档都可能变化（例如 setPlainText）"""
+        self.note_change(0, 0)
+
+    @property
+    def has_pending(self) -> bool:
+        return self._pending is not None
+
+    def modifications(self) -> dict:
+        return diff_dict_from_chunks(self.chunks)
+
+    def update(self, line_count: int, get_lines: Callable[[int, int], List[str]], calculator: DiffCalculator) -> bool:
+        """重新计算待更新范围内的差异
+
+        Args:
+            line_count: 修改后的行数
+            get_lines: 返回修改后第 start 到 end 行（不含 end）的函数
+        Returns:
+            是否有待更新的范围
+        """
+        if self._pending is None or not self.active:
+            return False
+        first_line, suffix_lines = self._pending
+        self._pending = None
+        old_count = self.line_count
+        suffix_lines = min(suffix_lines, old_count, line_count)
+        old_end = old_count - suffix_lines
+        new_end = line_count - suffix_lines
+        start = min(first_line, old_end, new_end)
+
+        # 扩大范围到覆盖所有与之接触的修改块
+        changed = True
+        while changed:
+            changed = False
+            for chunk in self.chunks:
+                if chunk.type == "equal" or chunk.right_end < start or chunk.right_start > old_end:
+                    continue
+                if chunk.right_start < start:
+                    start, changed = chunk.right_start, True
+                if chunk.right_end > old_end:
+                    new_end += chunk.right_end - old_end
+                    old_end, changed = chunk.right_end, True
+
+        # 范围之前和之后的差异块保留（equal 块按范围截断），之后的块平移
+        delta = new_end - old_end
+        prefix: List[DiffChunk] = []
+        suffix: List[DiffChunk] = []
+        for chunk in self.chunks:
+            if chunk.type != "equal":
+                if chunk.right_end < start:
+                    prefix.append(chunk)
+                elif chunk.right_start > old_end:
+                    suffix.append(self._shifted(chunk, 0, delta))
+                continue
+            if chunk.right_start < start:
+                count = min(chunk.right_end, start) - chunk.right_start
+                prefix.append(self._shifted(chunk, 0, 0, count))
+            if chunk.right_end > old_end:
+                skip = max(old_end - chunk.right_start, 0)
+                suffix.append(self._shifted(chunk, skip, delta))
+        base_start = prefix[-1].left_end if prefix else 0
+        base_end = suffix[0].left_start if suffix else len(self.base_lines)
+
+        window = calculator.compute_diff(
+            _lines_text(self.base_lines[base_start:base_end]), _lines_text(get_lines(start, new_end))
+        )
+        middle = [
+            DiffChunk(
+                chunk.left_start + base_start,
+                chunk.left_end + base_start,
+                chunk.right_start + start,
+                chunk.right_end + start,
+                chunk.type,
+            )
+            for chunk in window
+        ]
+        self.chunks = prefix + middle + suffix
+        self.line_count = line_count
+        return True
+
+    @staticmethod
+    def _shifted(chunk: DiffChunk, skip: int, delta: int, count: Optional[int] = None) -> DiffChunk:
+        """跳过 equal 块的前 skip 行、只保留 count 行，右侧行号平移 delta；不修改原块（可能来自差异缓存）"""
+        if count is None:
+            count = chunk.right_end - chunk.right_start - skip
+            if chunk.type != "equal":
+                return DiffChunk(
+                    chunk.left_start, chunk.left_end, chunk.right_start + delta, chunk.right_end + delta, chunk.type
+                )
+        return DiffChunk(
+            chunk.left_start + skip,
+            chunk.left_start + skip + count,
+            chunk.right_start + skip + delta,
+            chunk.right_start + skip + count + delta,
+            chunk.type,
+        )
@@ -0,0 +1,123 @@
+"""三向合并差异
+
+以合并结果 (result) 为基准，把 parent1 -> result 和 result -> parent2 两个行级差异在 result 的行号上
+一次扫描合并（与 diff3 相同的做法）：在 result 中重叠或相邻的修改合并为一个区域，
+得到按顺序排列、覆盖三个文本所有行的区域列表，并为每个区域分类。
+"""
+
+from dataclasses import dataclass
+from typing import List, Sequence
+
+from diff_calculator import DiffChunk
+
+# 区域类型
+REGION_EQUAL = "equal"  # 三者相同
+REGION_PARENT1 = "parent1_diff"  # result 只与 parent1 不同（采用了 parent2 的内容）
+REGION_PARENT2 = "parent2_diff"  # result 只与 parent2 不同（采用了 parent1 的内容）
+REGION_BOTH = "both_diff"  # result 与两个父版本都不同，但两个父版本在此处相同
+REGION_CONFLICT = "conflict"  # 三者互不相同（两个父版本都修改了此处）
+
+
+@dataclass
+class MergeRegion:
+    parent1_start: int
+    parent1_end: int
+    result_start: int
+    result_end: int
+    parent2_start: int
+    parent2_end: int
+    type: str
+
+
+def compute_merge_regions(
+    parent1_chunks: List[DiffChunk],
+    parent2_chunks: List[DiffChunk],
+    parent1_lines: Sequence[str],
+    parent2_lines: Sequence[str],
+) -> List[MergeRegion]:
+    """合并两个行级差异，返回覆盖三个文本的区域列表
+
+    Args:
+        parent1_chunks: parent1 -> result 的差异块（左侧为 parent1）
+        parent2_chunks: result -> parent2 的差异块（左侧为 result）
+        parent1_lines/parent2_lines: 两个父版本的行，用于区分冲突和两侧相同的修改
+    """
+    # 两侧的修改统一表示为 (result 起点, result 终点, parent 起点, parent 终点)
+    hunks1 = [
+        (chunk.right_start, chunk.right_end, chunk.left_start, chunk.left_end)
+        for chunk in parent1_chunks
+        if chunk.type != "equal"
+    ]
+    hunks2 = [
+        (chunk.left_start, chunk.left_end, chunk.right_start, chunk.right_end)
+        for chunk in parent2_chunks
+        if chunk.type != "equal"
+    ]
+
+    regions = []
+    i = j = 0
+    # 修改之外 parent 行号与 result 行号之差
+    offset1 = offset2 = 0
+    result_pos = 0
+    while i < len(hunks1) or j < len(hunks2):
+        if j == len(hunks2) or (i < len(hunks1) and hunks1[i][0] <= hunks2[j][0]):
+            start = hunks1[i][0]
+        else:
+            start = hunks2[j][0]
+
+        if start > result_pos:
+            regions.append(
+                MergeRegion(
+                    result_pos + offset1,
+                    start + offset1,
+                    result_pos,
+                    start,
+                    result_pos + offset2,
+                    start + offset2,
+                    REGION_EQUAL,
+                )
+            )
+
+        # 吸收所有与当前区域重叠或相邻的修改
+        end = start
+        parent1_start, parent2_start = start + offset1, start + offset2
+        changed1 = changed2 = False
+        while True:
+            if i < len(hunks1) and hunks1[i][0] <= end:
+                end = max(end, hunks1[i][1])
+                offset1 = hunks1[i][3] - hunks1[i][1]
+                changed1 = True
+                i += 1
+            elif j < len(hunks2) and hunks2[j][0] <= end:
+                end = max(end, hunks2[j][1])
+                offset2 = hunks2[j][3] - hunks2[j][1]
+                changed2 = True
+                j += 1
+            else:
+                break
+        parent1_end, parent2_end = end + offset1, end + offset2
+
+        if changed1 and changed2:
+            same_parents = parent1_lines[parent1_start:parent1_end] == parent2_lines[parent2_start:parent2_end]
+            region_type = REGION_BOTH if same_parents else REGION_CONFLICT
+        elif changed1:
+            region_type = REGION_PARENT1
+        else:
+            region_type = REGION_PARENT2
+        regions.append(MergeRegion(parent1_start, parent1_end, start, end, parent2_start, parent2_end, region_type))
+        result_pos = end
+
+    result_count = len(parent1_lines) - offset1
+    if result_count > result_pos:
+        regions.append(
+            MergeRegion(
+                result_pos + offset1,
+                result_count + offset1,
+                result_pos,
+                result_count,
+                result_pos + offset2,
+                result_count + offset2,
+                REGION_EQUAL,
+            )
+        )
+    return regions
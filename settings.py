@@ -25,6 +25,23 @@ class Settings:
             "font_family": "Courier New",  # 默认字体
             "font_size": 12,  # 默认字体大小
             "code_style": "friendly",  # 代码风格设置
+            "diff_size_thresholds": {  # 差异视图按文件大小逐级降级的阈值（字节）
+                "char_diff": 512 * 1024,  # 超过后不再计算字符级差异
+                "syntax_highlight": 2 * 1024 * 1024,  # 超过后不再做语法高亮
+                "summary": 8 * 1024 * 1024,  # 超过后只显示摘要，需要手动加载
+                "max_line_length": 10000,  # 单行超过该长度（如压缩后的文件）时不做语法高亮
+            },
+            "large_file_thresholds": {  # 工作区编辑器进入大文件模式的阈值
+                "size": 16 * 1024 * 1024,  # 文件字节数，超过后分块读取
+                "lines": 200000,  # 行数
+                "max_line_length": 10000,  # 单行长度，超过后折断显示
+            },
+            "diff_algorithm": "histogram",  # 行级差异算法：histogram 或 difflib
+            "diff_cache": {  # 差异结果缓存
+                "memory_mb": 64,  # 内存预算
+                "disk_spill": False,  # 是否把淘汰的结果写入磁盘
+                "disk_mb": 256,  # 磁盘预算
+            },
             "splitter_state": None,  # 分割器状态
             "panel_widths": {  # 各面板的宽度设置
                 "file_tree": 250,
@@ -112,6 +129,47 @@ class Settings:
         self.settings["code_style"] = code_style
         self.save_settings()
 
+    def get_diff_size_thresholds(self):
+        """获取差异视图的降级阈值"""
+        thresholds = {
+            "char_diff": 512 * 1024,
+            "syntax_highlight": 2 * 1024 * 1024,
+            "summary": 8 * 1024 * 1024,
+            "max_line_length": 10000,
+        }
+        thresholds.update(self.settings.get("diff_size_thresholds", {}))
+        return thresholds
+
+    def set_diff_size_thresholds(self, thresholds):
+        """设置差异视图的降级阈值"""
+        self.settings["diff_size_thresholds"] = thresholds
+        self.save_settings()
+
+    def get_large_file_thresholds(self):
+        """获取工作区编辑器大文件模式的阈值"""
+        thresholds = {
+            "size": 16 * 1024 * 1024,
+            "lines": 200000,
+            "max_line_length": 10000,
+        }
+        thresholds.update(self.settings.get("large_file_thresholds", {}))
+        return thresholds
+
+    def get_diff_algorithm(self):
+        """获取行级差异算法名称"""
+        return self.settings.get("diff_algorithm", "histogram")
+
+    def set_diff_algorithm(self, algorithm):
+        """设置行级差异算法名称"""
+        self.settings["diff_algorithm"] = algorithm
+        self.save_settings()
+
+    def get_diff_cache_options(self):
+        """获取差异结果缓存的设置"""
+        options = {"memory_mb": 64, "disk_spill": False, "disk_mb": 256}
+        options.update(self.settings.get("diff_cache", {}))
+        return options
+
     def save_splitter_state(self, sizes):
         """保存分割器状态"""
         self.settings["splitter_state"] = sizes
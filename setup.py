@@ -15,5 +15,5 @@ setup(
     app=APP,
     data_files=DATA_FILES,
     options={"py2app": OPTIONS},
-    setup_requires=["py2app", "pygments>=2.19.1"],
+    setup_requires=["py2app", "pygments>=2.19.1,<2.22"],
 )
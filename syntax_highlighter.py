@@ -4,6 +4,8 @@ from pygments import lexers, styles  # 导入 Pygments 模块 (Import Pygments m
 from pygments.util import (
     ClassNotFound,  # 导入 Pygments 异常类 (Import Pygments exception class)
 )
+from PyQt6 import sip
+from PyQt6.QtCore import QTimer
 from PyQt6.QtGui import (  # 导入 QFont (Import QFont)
     QColor,
     QFont,
@@ -11,10 +13,83 @@ from PyQt6.QtGui import (  # 导入 QFont (Import QFont)
     QTextCharFormat,
 )
 
+from highlight_scheduler import highlight_scheduler
 from settings import settings
+from syntax_lexing import LexTables, lex_document, relex, token_run_cache
+from threads import SyntaxLexThread, ThreadTracker
+
+# 行数不超过该值时在界面线程中同步分析，否则在后台线程中分析整个文档
+SYNC_LEX_MAX_LINES = 5000
+# 后台分析完成前先同步分析文档开头的行数，使打开大文件时首屏立即有语法高亮
+PREFIX_LEX_LINES = 500
+
+
+class SyntaxStyleRegistry:
+    """进程内共享的词法分析器和样式格式表
+
+    词法分析器按语言缓存；格式表按 (代码风格, 字体, 字号) 缓存，设置中的代码风格或字体改变后
+    下一次取用时重新构建并丢弃旧的格式表。所有高亮器共享同一份对象，使用方不能修改。
+    """
+
+    def __init__(self):
+        self._lexers = {}  # 语言名称 -> 词法分析器
+        self._formats_key = None
+        self._formats = {}  # token 类型 -> QTextCharFormat
+
+    def lexer(self, language_name: str):
+        lexer = self._lexers.get(language_name)
+        if lexer is None:
+            try:
+                lexer = lexers.get_lexer_by_name(language_name)
+                logging.info("词法分析器已设置为：%s", language_name)
+            except ClassNotFound:
+                logging.warning("未找到语言 '%s' 的词法分析器，将使用纯文本模式。", language_name)
+                lexer = lexers.get_lexer_by_name("text")  # Fallback to plain text
+            self._lexers[language_name] = lexer
+        return lexer
+
+    def formats(self) -> dict:
+        # 您可以选择一个 Pygments 样式，例如 'default', 'monokai', 'emacs', 'friendly' 等
+        style_name = settings.get_code_style() or "friendly"  # 未设置时使用默认样式
+        key = (style_name, settings.get_font_family(), settings.get_font_size())
+        if key != self._formats_key:
+            self._formats = self._build_formats(style_name)
+            self._formats_key = key
+        return self._formats
+
+    @staticmethod
+    def _build_formats(style_name: str) -> dict:
+        try:
+            style = styles.get_style_by_name(style_name)
+        except ClassNotFound:
+            return {}  # 出错时不使用样式
+        style_formats = {}
+        for token_type, style_definition in style:
+            qt_format = QTextCharFormat()
+            if style_definition["color"]:
+                qt_format.setForeground(QColor(f"#{style_definition['color']}"))
+            if style_definition["bgcolor"]:  # 语法高亮也可能定义背景色
+                qt_format.setBackground(QColor(f"#{style_definition['bgcolor']}"))
+            if style_definition["bold"]:
+                qt_format.setFontWeight(QFont.Weight.Bold)
+            if style_definition["italic"]:
+                qt_format.setFontItalic(True)
+            if style_definition["underline"]:
+                qt_format.setFontUnderline(True)
+            style_formats[token_type] = qt_format
+        return style_formats
+
+
+syntax_style_registry = SyntaxStyleRegistry()
 
 
 class PygmentsHighlighterEngine:
+    """基于 Pygments 的语法高亮
+
+    对整个文档做词法分析并按行保存格式区间（见 syntax_lexing），highlightBlock 只按块号查表。
+    文档修改后只从修改行附近重新分析到词法状态收敛为止；整篇分析在文档较大时放到后台线程中进行。
+    """
+
     def __init__(self, highlighter: QSyntaxHighlighter):
         self.highlighter = highlighter
 
@@ -26,59 +101,148 @@ class PygmentsHighlighterEngine:
             QColor("#000000")
         )  # 设置默认前景色为黑色 (Set default foreground to black)
 
-    def _initialize_language_styling(self, language_name):
-        # 根据语言名称初始化词法分析器和样式 (Initialize lexer and styles based on language name)
-        try:
-            self.lexer = lexers.get_lexer_by_name(language_name)
-            logging.info("词法分析器已设置为：%s", language_name)
-        except ClassNotFound:
-            logging.warning("未找到语言 '%s' 的词法分析器，将使用纯文本模式。", language_name)
-            self.lexer = lexers.get_lexer_by_name("text")  # Fallback to plain text
+        self.enabled = True
+        self._tables = LexTables()
+        self._prefix_tables = False  # _tables 是否只包含文档开头部分行的结果
+        self._lines: list[str] = []  # 与 _tables 对应的文档各行
+        self._char_count = 0  # 分析时文档的字符数，用于检查修改范围是否可靠
+        self._document = None
+        self._lex_generation = 0
+        self._lex_thread = None
+        self._lex_threads = ThreadTracker(self.highlighter)
+        self._lex_scheduled = False
+        self._attach_document()
 
-        try:
-            # 您可以选择一个 Pygments 样式 (You can choose a Pygments style)
-            # 例如 'default', 'monokai', 'emacs', 'friendly' 等 (e.g., 'default', 'monokai', 'emacs', 'friendly', etc.)
-            style_name = settings.get_code_style()  # 从设置中获取代码风格 (Get code style from settings)
-            if not style_name:
-                style_name = "friendly"  # 如果未设置，则使用默认样式 (Use default style if not set)
-            style = styles.get_style_by_name(style_name)
-            self.style_formats = {}
-            for token_type, style_definition in style:
-                qt_format = QTextCharFormat()
-                if style_definition["color"]:
-                    qt_format.setForeground(QColor(f"#{style_definition['color']}"))
-                if style_definition[
-                    "bgcolor"
-                ]:  # 语法高亮也可能定义背景色 (Syntax highlighting might also define background color)
-                    qt_format.setBackground(QColor(f"#{style_definition['bgcolor']}"))
-                if style_definition["bold"]:
-                    qt_format.setFontWeight(QFont.Weight.Bold)
-                if style_definition["italic"]:
-                    qt_format.setFontItalic(True)
-                if style_definition["underline"]:
-                    qt_format.setFontUnderline(True)
-                self.style_formats[token_type] = qt_format
-        except ClassNotFound:
-            self.style_formats = {}  # 出错时清空样式 (Clear styles on error)
+    def _attach_document(self):
+        document = self.highlighter.document()
+        if document is not None and document is not self._document:
+            document.contentsChange.connect(self._on_contents_change)
+            self._document = document
+
+    def _initialize_language_styling(self, language_name):
+        # 根据语言名称初始化词法分析器和样式（从进程内共享的缓存中取得） (Initialize lexer and styles based on language name)
+        self.lexer = syntax_style_registry.lexer(language_name)
+        self.style_formats = syntax_style_registry.formats()
 
     def set_language(self, language_name):
         # 设置高亮的语言 (Set the language for highlighting)
         self._initialize_language_styling(language_name)
+        self._attach_document()
+        # 调用方随后会重新高亮，这里只做分析
+        self._lex_document(rehighlight=False)
 
-    def highlightBlock(self, text):
-        # 高亮当前文本块 (Highlight the current text block)
+    def set_enabled(self, enabled: bool):
+        """开启或关闭语法分析（大文件降级时关闭，不再分析文档）"""
+        if enabled == self.enabled:
+            return
+        self.enabled = enabled
+        self._lex_document(rehighlight=False)
 
-        if self.lexer:
-            try:
-                for index, token_type, token_text in self.lexer.get_tokens_unprocessed(text):
-                    if token_type in self.style_formats:
-                        # 获取语法高亮格式 (Get syntax highlighting format)
-                        syntax_format = self.style_formats[token_type]
-                        # 应用格式 (Apply format)
-                        self.highlighter.setFormat(index, len(token_text), syntax_format)
-            except Exception:
-                # Fallback: 确保在出错时至少应用默认格式 (Fallback: ensure default format is applied if error)
-                self.highlighter.setFormat(0, len(text), self.default_text_format)
+    def _lex_document(self, rehighlight: bool = True):
+        """整篇重新分析，较大的文档在后台线程中分析，结果到达后再重新高亮"""
+        self._lex_generation += 1
+        self._lex_scheduled = False
+        self._prefix_tables = False
+        self._cancel_lex_thread()
+        if self._document is None or self.lexer is None or not self.enabled:
+            self._tables = LexTables()
+            self._lines = []
+            return
+
+        lines = self._document.toPlainText().split("\n")
+        self._lines = lines
+        self._char_count = self._document.characterCount()
+        if len(lines) <= SYNC_LEX_MAX_LINES:
+            self._tables = lex_document(self.lexer, self.style_formats, lines, token_run_cache)
+            if rehighlight:
+                highlight_scheduler.rehighlight(self.highlighter)
+            return
+
+        self._tables = lex_document(self.lexer, self.style_formats, lines[:PREFIX_LEX_LINES], token_run_cache)
+        self._prefix_tables = True
+        thread = SyntaxLexThread(self._lex_generation, self.lexer, self.style_formats, list(lines), self.highlighter)
+        thread.lexed.connect(self._on_lexed)
+        thread.finished.connect(lambda generation, t=thread: self._on_lex_thread_finished(t))
+        self._lex_thread = thread
+        self._lex_threads.start(thread)
+
+    def _schedule_lex(self):
+        """在下一次事件循环中整篇重新分析，同一轮中的多次修改（以及随后的 set_language）只分析一次"""
+        self._lex_generation += 1
+        self._cancel_lex_thread()
+        self._tables = LexTables()
+        self._prefix_tables = False
+        self._lines = []
+        if not self._lex_scheduled:
+            self._lex_scheduled = True
+            QTimer.singleShot(0, self._run_scheduled_lex)
+
+    def _run_scheduled_lex(self):
+        if self._lex_scheduled and not sip.isdeleted(self.highlighter):
+            self._lex_document()
+
+    def _cancel_lex_thread(self):
+        if self._lex_thread is not None:
+            self._lex_thread.cancel()
+            self._lex_thread = None
+
+    def _on_lex_thread_finished(self, thread):
+        if thread is self._lex_thread:
+            self._lex_thread = None
+
+    def _on_lexed(self, generation: int, tables: LexTables):
+        if generation != self._lex_generation or sip.isdeleted(self.highlighter):
+            return
+        self._tables = tables
+        self._prefix_tables = False
+        highlight_scheduler.rehighlight(self.highlighter)
+
+    def _on_contents_change(self, position: int, removed: int, added: int):
+        """文档修改后只重新分析受影响的行（QSyntaxHighlighter 已先用旧结果高亮过修改的块）"""
+        if self.lexer is None or not self.enabled or sip.isdeleted(self.highlighter):
+            return
+        document = self._document
+        char_count = document.characterCount()
+        expected = self._char_count - removed + added
+        self._char_count = char_count
+        first_block = document.findBlock(position)
+        first = first_block.blockNumber()
+        last_block = document.findBlock(position + added)
+        # setPlainText 之后 position + added 可能超出文档末尾，此时 findBlock 返回无效的块（块号为 -1）
+        last = last_block.blockNumber() if last_block.isValid() else document.blockCount() - 1
+        delta = document.blockCount() - len(self._lines)
+        # setPlainText 等操作给出的修改范围不准确（字符数对不上），此时整篇重新分析
+        if (
+            self._lex_thread is not None
+            or not self._lines
+            or expected != char_count
+            or last - first >= SYNC_LEX_MAX_LINES
+        ):
+            self._schedule_lex()
+            return
+
+        changed_lines = []
+        block = first_block
+        for _ in range(first, last + 1):
+            changed_lines.append(block.text())
+            block = block.next()
+        self._lines[first : last + 1 - delta] = changed_lines
+        start, end = relex(
+            self._tables, self.lexer, self.style_formats, self._lines, first, last, delta, token_run_cache
+        )
+        highlight_scheduler.rehighlight(self.highlighter, start, end)
+
+    def highlightBlock(self, text):
+        # 高亮当前文本块：按块号查表 (Highlight the current text block by looking up the token runs)
+        tables = self._tables
+        block_number = self.highlighter.currentBlock().blockNumber()
+        if len(tables) != self.highlighter.document().blockCount():
+            # 后台分析完成前只有文档开头部分行的结果（最后一行的 token 可能被截断，不使用）；
+            # 其它情况为文档刚被修改、分析结果还未更新，跳过
+            if not self._prefix_tables or block_number >= len(tables) - 1:
+                return
+        for start, length, syntax_format in tables.runs[block_number]:
+            self.highlighter.setFormat(start, length, syntax_format)
 
 
 class CodeHighlighter(QSyntaxHighlighter):
@@ -88,7 +252,7 @@ class CodeHighlighter(QSyntaxHighlighter):
 
     def set_language(self, language_name):
         self.engine.set_language(language_name)
-        self.rehighlight()
+        highlight_scheduler.rehighlight(self)
 
     def highlightBlock(self, text):
         self.engine.highlightBlock(text)
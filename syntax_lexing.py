@@ -0,0 +1,624 @@
+"""整篇文档的增量词法分析
+
+对整个文档做词法分析（而不是逐行单独分析），按行保存格式区间以及行首的词法状态（Pygments RegexLexer 的状态栈），
+这样多行的文档字符串、块注释等都能正确高亮。文档修改后从修改行之前最近的检查点开始重新分析，
+直到修改范围之后某一行行首的状态与修改前相同（状态收敛）为止，之后各行的结果直接沿用。
+
+可能跨行匹配的规则（如 Python 的文档字符串规则，开头的空白可以包含换行符）在尝试时会看到之后各行的内容，
+因此分析时记录每一行中这类规则的尝试（试探）及其结果。修改后先在新文本中重新执行修改行之前的试探，
+结果改变时从改变的那一行之前的检查点开始重新分析。
+
+不是标准 RegexLexer 的词法分析器，或者有规则会向前查看到上一行的词法分析器无法取得状态，只能整篇重新分析。
+
+TokenRunCache 按行的内容和行首的状态缓存一行的结果，同时保存该行的试探，命中时在当前文本中重新执行试探，
+结果相同才使用。这样内容相同的行（差异视图的两侧、多个标签页中的同一文件）只需分析一次。
+"""
+
+import logging
+import re
+import threading
+from collections import OrderedDict
+from itertools import accumulate
+from re import _compiler as sre_compile
+from re import _constants as sre_constants
+from re import _parser as sre_parse
+from typing import List, Optional, Sequence
+
+from pygments.lexer import RegexLexer
+from pygments.token import Error, Whitespace, _TokenType
+
+from utils import count_utf16_code_units
+
+ROOT_STATE = ("root",)
+# 增量分析时先向修改范围之后分析的行数，未收敛时按倍数扩大
+RELEX_WINDOW_LINES = 256
+
+
+class LexTables:
+    """文档每一行的格式区间、行首的词法状态和跨行规则的试探
+
+    runs[i] 为第 i 行的 [(起点, 长度, QTextCharFormat)]，位置为 UTF-16 单位；
+    states[i] 为第 i 行行首的状态栈，行首位于某个 token 中间（如多行字符串）时为 None，不能作为检查点；
+    probes[i] 为第 i 行中可能跨行匹配的规则的尝试 ((行内位置, rexmatch, 匹配结束的行内位置或 -1), ...)。
+    """
+
+    def __init__(self, runs: Optional[list] = None, states: Optional[list] = None, probes: Optional[list] = None):
+        self.runs: List[tuple] = runs if runs is not None else []
+        self.states: List[Optional[tuple]] = states if states is not None else []
+        self.probes: List[tuple] = probes if probes is not None else [()] * len(self.runs)
+
+    def __len__(self):
+        return len(self.runs)
+
+
+# 匹配单个字符的正则表达式项
+_SINGLE_CHAR_OPS = (sre_constants.LITERAL, sre_constants.NOT_LITERAL, sre_constants.IN, sre_constants.ANY)
+_REPEAT_OPS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, sre_constants.POSSESSIVE_REPEAT)
+# 总是需要试探的规则（无法用行内的前缀排除）
+_ALWAYS = re.compile("").match
+_NEWLINE_ITEM = (sre_constants.LITERAL, ord("\n"))
+_NEWLINE_CATEGORIES = (
+    sre_constants.CATEGORY_SPACE,
+    sre_constants.CATEGORY_NOT_DIGIT,
+    sre_constants.CATEGORY_NOT_WORD,
+    sre_constants.CATEGORY_LINEBREAK,
+)
+# 词法分析器类 -> {状态: ((rexmatch, action, new_state, guard), ...)}，有规则会查看上一行时为 None
+_rule_tables: dict = {}
+
+
+def _matches_newline(item, flags: int) -> bool:
+    op, av = item
+    if op is sre_constants.LITERAL:
+        return av == _NEWLINE_ITEM[1]
+    if op is sre_constants.NOT_LITERAL:
+        return av != _NEWLINE_ITEM[1]
+    if op is sre_constants.ANY:
+        return bool(flags & re.DOTALL)
+    negate = found = False
+    for set_op, set_av in av:
+        if set_op is sre_constants.NEGATE:
+            negate = True
+        elif set_op is sre_constants.LITERAL:
+            found = found or set_av == _NEWLINE_ITEM[1]
+        elif set_op is sre_constants.RANGE:
+            found = found or set_av[0] <= _NEWLINE_ITEM[1] <= set_av[1]
+        elif set_op is sre_constants.CATEGORY:
+            found = found or set_av in _NEWLINE_CATEGORIES
+        else:
+            return sre_compile.compile(sre_parse.SubPattern(sre_parse.State(), [item]), flags).match("\n") is not None
+    return found != negate
+
+
+def _line_local(items, flags: int, final: bool) -> bool:
+    """items 的匹配是否不会查看行尾（换行符）之后的内容
+
+    只有位于整个表达式末尾、只匹配一次的单字符项可以匹配换行符；向后查找的内容不能匹配换行符。
+    """
+    for index, (op, av) in enumerate(items):
+        last = final and index == len(items) - 1
+        if op in _SINGLE_CHAR_OPS:
+            if not last and _matches_newline((op, av), flags):
+                return False
+        elif op is sre_constants.SUBPATTERN:
+            _group, add_flags, del_flags, sub = av
+            if not _line_local(sub, (flags | add_flags) & ~del_flags, last):
+                return False
+        elif op is sre_constants.ATOMIC_GROUP:
+            if not _line_local(av, flags, last):
+                return False
+        elif op is sre_constants.BRANCH:
+            if not all(_line_local(branch, flags, last) for branch in av[1]):
+                return False
+        elif op in _REPEAT_OPS:
+            _low, high, sub = av
+            if not _line_local(sub, flags, last and high == 1):
+                return False
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            direction, sub = av
+            if not _line_local(sub, flags, direction > 0):
+                return False
+        elif op is sre_constants.AT:
+            if av in (sre_constants.AT_BEGINNING_STRING, sre_constants.AT_END_STRING):
+                return False
+            if av in (sre_constants.AT_BEGINNING, sre_constants.AT_END) and not flags & re.MULTILINE:
+                return False
+        else:
+            # 反向引用等无法判断的项
+            return False
+    return True
+
+
+def _looks_behind_line(items, flags: int) -> bool:
+    """items 是否可能查看当前行之前的内容（能匹配换行符的向后查找）"""
+    for op, av in items:
+        if op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            direction, sub = av
+            if (direction < 0 and not _line_local(sub, flags, False)) or _looks_behind_line(sub, flags):
+                return True
+        elif op is sre_constants.SUBPATTERN:
+            _group, add_flags, del_flags, sub = av
+            if _looks_behind_line(sub, (flags | add_flags) & ~del_flags):
+                return True
+        elif op is sre_constants.ATOMIC_GROUP:
+            if _looks_behind_line(av, flags):
+                return True
+        elif op is sre_constants.BRANCH:
+            if any(_looks_behind_line(branch, flags) for branch in av[1]):
+                return True
+        elif op in _REPEAT_OPS:
+            if _looks_behind_line(av[2], flags):
+                return True
+        elif op is sre_constants.GROUPREF_EXISTS:
+            return True
+    return False
+
+
+def _at_document_start(op, av, flags: int) -> bool:
+    return op is sre_constants.AT and (
+        av is sre_constants.AT_BEGINNING_STRING or (av is sre_constants.AT_BEGINNING and not flags & re.MULTILINE)
+    )
+
+
+def _flatten(items) -> list:
+    """展开不改变标志的分组（试探条件不需要分组编号）"""
+    flat = []
+    for op, av in items:
+        if op is sre_constants.SUBPATTERN and not av[1] and not av[2]:
+            flat.extend(_flatten(av[3]))
+        else:
+            flat.append((op, av))
+    return flat
+
+
+def _line_local_prefix(items, flags: int, state) -> list:
+    """items 开头只查看行内内容的部分，items 匹配时这部分一定也匹配"""
+    items = _flatten(items)
+    prefix = []
+    for index, (op, av) in enumerate(items):
+        # 文档开头（\A）只在位置 0 匹配，也可以放入前缀
+        if _line_local([(op, av)], flags, False) or _at_document_start(op, av, flags):
+            prefix.append((op, av))
+            continue
+        if op is sre_constants.SUBPATTERN:
+            _group, add_flags, del_flags, sub = av
+            sub_prefix = _line_local_prefix(sub, (flags | add_flags) & ~del_flags, state)
+            if sub_prefix:
+                prefix.append(
+                    (sre_constants.SUBPATTERN, (None, add_flags, del_flags, sre_parse.SubPattern(state, sub_prefix)))
+                )
+        elif op in _REPEAT_OPS and len(av[2]) == 1 and av[2][0][0] in _SINGLE_CHAR_OPS:
+            # 单字符项的重复（如 \s*）：在行内的部分之后要么是换行符，要么是之后各项的前缀
+            low, _high, sub = av
+            no_newline = sre_parse.SubPattern(
+                state, [(sre_constants.ASSERT_NOT, (1, sre_parse.SubPattern(state, [_NEWLINE_ITEM]))), sub[0]]
+            )
+            rest = _line_local_prefix(items[index + 1 :], flags, state)
+            branches = [
+                sre_parse.SubPattern(
+                    state, [(sre_constants.MAX_REPEAT, (0, sre_constants.MAXREPEAT, no_newline)), _NEWLINE_ITEM]
+                ),
+                sre_parse.SubPattern(
+                    state, [(sre_constants.MAX_REPEAT, (low, sre_constants.MAXREPEAT, no_newline))] + rest
+                ),
+            ]
+            prefix.append((sre_constants.BRANCH, (None, branches)))
+        break
+    return prefix
+
+
+def _rule_guard(rexmatch):
+    """返回规则的试探条件：规则不会跨行时为 None，否则为只查看行内内容的前缀的 match
+
+    前缀不匹配时整个规则一定不匹配，不需要试探。规则会查看上一行时抛出 ValueError。
+    """
+    pattern = rexmatch.__self__
+    parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    flags = pattern.flags
+    if _looks_behind_line(parsed.data, flags):
+        raise ValueError(pattern.pattern)
+    if _line_local(parsed.data, flags, True):
+        return None
+    prefix = _line_local_prefix(parsed.data, flags, parsed.state)
+    if not prefix:
+        return _ALWAYS
+    return sre_compile.compile(sre_parse.SubPattern(parsed.state, prefix), flags).match
+
+
+def _rule_table(lexer) -> Optional[dict]:
+    """词法分析器每个状态的规则及其试探条件，有规则会查看上一行或无法分析规则时返回 None"""
+    lexer_class = type(lexer)
+    try:
+        return _rule_tables[lexer_class]
+    except KeyError:
+        pass
+    try:
+        table = {
+            state: tuple((rexmatch, action, new_state, _rule_guard(rexmatch)) for rexmatch, action, new_state in rules)
+            for state, rules in lexer._tokens.items()
+        }
+    except ValueError:
+        table = None
+    except Exception:
+        # re 的内部解析模块或 Pygments 的规则格式与预期不同，退回到整篇重新分析
+        logging.exception("无法分析 %s 的规则，不使用检查点", lexer_class.__name__)
+        table = None
+    _rule_tables[lexer_class] = table
+    return table
+
+
+def supports_checkpoints(lexer) -> bool:
+    """是否为使用标准分析循环的 RegexLexer（可以从任意检查点继续分析）"""
+    return (
+        isinstance(lexer, RegexLexer)
+        and type(lexer).get_tokens_unprocessed is RegexLexer.get_tokens_unprocessed
+        and _rule_table(lexer) is not None
+    )
+
+
+# 跨行规则试探的事件类型
+_PROBE = object()
+
+
+def _regex_events(lexer, text: str, pos: int, stack: Sequence[str]):
+    """与 RegexLexer.get_tokens_unprocessed 相同的分析循环
+
+    产生 (位置, token 类型, 文本)，每次匹配结束后额外产生 (位置, None, 状态栈)，状态栈为内部列表，使用方需要自行复制。
+    尝试可能跨行匹配的规则时额外产生 (位置, _PROBE, (rexmatch, 匹配结束位置或 -1))。
+    """
+    tokendefs = _rule_table(lexer)
+    statestack = list(stack)
+    statetokens = tokendefs[statestack[-1]]
+    while True:
+        for rexmatch, action, new_state, guard in statetokens:
+            if guard is None:
+                m = rexmatch(text, pos)
+            elif guard(text, pos):
+                m = rexmatch(text, pos)
+                yield pos, _PROBE, (rexmatch, m.end() if m else -1)
+            else:
+                # 前缀不匹配，规则一定不匹配
+                continue
+            if m:
+                if action is not None:
+                    if type(action) is _TokenType:
+                        yield pos, action, m.group()
+                    else:
+                        yield from action(lexer, m)
+                pos = m.end()
+                if new_state is not None:
+                    if isinstance(new_state, tuple):
+                        for state in new_state:
+                            if state == "#pop":
+                                if len(statestack) > 1:
+                                    statestack.pop()
+                            elif state == "#push":
+                                statestack.append(statestack[-1])
+                            else:
+                                statestack.append(state)
+                    elif isinstance(new_state, int):
+                        if abs(new_state) >= len(statestack):
+                            del statestack[1:]
+                        else:
+                            del statestack[new_state:]
+                    elif new_state == "#push":
+                        statestack.append(statestack[-1])
+                    statetokens = tokendefs[statestack[-1]]
+                yield pos, None, statestack
+                break
+        else:
+            if pos >= len(text):
+                return
+            if text[pos] == "\n":
+                # 行尾没有匹配时回到 root 状态
+                statestack = ["root"]
+                statetokens = tokendefs["root"]
+                yield pos, Whitespace, "\n"
+            else:
+                yield pos, Error, text[pos]
+            pos += 1
+            yield pos, None, statestack
+
+
+def _probes_hold(text: str, line_start: int, probes: tuple, limit: Optional[int] = None) -> bool:
+    """在 text 中重新执行一行的试探，结果都与记录相同（且匹配不超过 limit）时返回 True"""
+    for offset, rexmatch, end in probes:
+        m = rexmatch(text, line_start + offset)
+        if (m.end() - line_start if m else -1) != end or (limit is not None and line_start + end > limit):
+            return False
+    return True
+
+
+def _utf16_runs(line: str, runs: list) -> tuple:
+    if line.isascii():
+        return tuple(runs)
+    return tuple(
+        (count_utf16_code_units(line[:start]), count_utf16_code_units(line[start : start + length]), fmt)
+        for start, length, fmt in runs
+    )
+
+
+class TokenRunCache:
+    """按 (词法分析器, 行内容, 行首状态) 缓存一行的格式区间、下一行行首的状态和试探，进程内所有高亮器共享
+
+    只有首尾都位于 token 边界（没有跨行的 token）的行才会被缓存；行中跨行规则的试探结果与之后的行有关，
+    使用方需要在当前文本中重新执行试探，结果相同时才能使用缓存的结果。差异视图两侧的相同行、
+    在多个标签页中打开的同一个文件都可以直接复用结果。按条目数和估算的字节数以 LRU 淘汰；
+    格式表（代码风格）改变后清空。后台分析线程也会使用，因此加锁。
+    """
+
+    def __init__(self, max_entries: int = 200000, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, tuple] = OrderedDict()  # 键 -> (runs, 下一行状态, 试探, 字节数)
+        self._bytes = 0
+        self._formats = None
+        self._lock = threading.Lock()
+
+    def _check_formats(self, formats: dict):
+        if formats is not self._formats:
+            self._entries.clear()
+            self._bytes = 0
+            self._formats = formats
+
+    def get(self, lexer, formats: dict, line: str, state: tuple) -> Optional[tuple]:
+        """返回 (runs, 下一行行首状态, 试探)，未命中时返回 None"""
+        key = (lexer, line, state)
+        with self._lock:
+            self._check_formats(formats)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[:3]
+
+    def put(
+        self, lexer, formats: dict, line: str, state: tuple, runs: tuple, next_state: tuple, probes: tuple = ()
+    ) -> None:
+        key = (lexer, line, state)
+        size = len(line) + 64 * (len(runs) + len(state) + len(next_state) + len(probes)) + 128
+        with self._lock:
+            self._check_formats(formats)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[3]
+            self._entries[key] = (runs, next_state, probes, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted[3]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._bytes
+
+
+token_run_cache = TokenRunCache()
+
+
+def lex_range(
+    lexer,
+    formats: dict,
+    lines: Sequence[str],
+    start_line: int,
+    end_line: int,
+    stack: Sequence[str] = ROOT_STATE,
+    old_states: Optional[Sequence] = None,
+    converge_from: Optional[int] = None,
+    delta: int = 0,
+    cache: Optional[TokenRunCache] = None,
+):
+    """分析 lines[start_line:end_line]，返回 (runs, states, probes, 收敛行)
+
+    formats 为 token 类型到格式的映射，没有格式的 token 不保存。
+    old_states 为修改前各行的状态（新行号 L 对应旧行号 L - delta），从 converge_from 行开始，
+    某一行行首的状态与修改前相同时停止，此时 runs/states/probes 只包含收敛行之前的行，收敛行为该行的行号；
+    未收敛时返回 None。跨行的规则需要看到之后的内容，因此分析的文本包含 end_line 之后的所有行。
+    给出 cache 时，行首状态已知的行先查缓存，命中且试探的结果不变时跳过该行的分析。
+    """
+    count = end_line - start_line
+    if count <= 0:
+        return [], [], [], None
+    window = lines[start_line:end_line]
+    # 不是从文档开头分析时在前面补一个换行符，使 ^、\A 等与分析整个文档时的结果相同
+    position = 1 if start_line > 0 else 0
+    text = "\n" * position + "\n".join(lines[start_line:]) + "\n"
+    line_starts = []
+    for line in window:
+        line_starts.append(position)
+        position += len(line) + 1
+    text_end = position  # 最后一行换行符之后的位置
+
+    checkpoint = supports_checkpoints(lexer)
+    if not checkpoint:
+        cache = None
+    runs = [[] for _ in range(count)]
+    result_runs: List[Optional[tuple]] = [None] * count  # 来自缓存或已经换算为 UTF-16 的行
+    states: List[Optional[tuple]] = [None] * count
+    states[0] = tuple(stack)
+    line_probes: List[Optional[Sequence]] = [None] * count
+    converged = None
+
+    def converges(state_line: int, state: tuple) -> bool:
+        if converge_from is None or start_line + state_line < converge_from:
+            return False
+        old_line = start_line + state_line - delta
+        return 0 <= old_line < len(old_states) and old_states[old_line] == state
+
+    def cached(line_index: int, state: tuple) -> Optional[tuple]:
+        # 文档第一行中的 \A 等规则与位置有关，不使用缓存
+        if start_line + line_index == 0:
+            return None
+        hit = cache.get(lexer, formats, window[line_index], state)
+        if hit is None or not _probes_hold(text, line_starts[line_index], hit[2]):
+            return None
+        return hit
+
+    next_line = 0  # 下一个待分析的行，其行首状态已知
+    while next_line < count and converged is None:
+        if cache is not None:
+            hit = cached(next_line, states[next_line])
+            if hit is not None:
+                result_runs[next_line], state, line_probes[next_line] = hit
+                next_line += 1
+                if next_line < count:
+                    states[next_line] = state
+                    if converges(next_line, state):
+                        converged = start_line + next_line
+                continue
+
+        if checkpoint:
+            events = _regex_events(lexer, text, line_starts[next_line], states[next_line])
+        else:
+            events = lexer.get_tokens_unprocessed(text)
+        line = next_line  # 当前 token 所在的行（相对 start_line）
+        state_line = next_line + 1  # 下一个待记录状态的行
+        known_line = next_line  # 最近一个行首状态已知的行
+        for pos, token_type, value in events:
+            if token_type is None:
+                # 一次匹配结束，pos 处的行首状态为当前状态栈，跨过的行首位于 token 中间
+                stop = False
+                while state_line < count and line_starts[state_line] <= pos:
+                    if line_starts[state_line] == pos:
+                        state = tuple(value)
+                        states[state_line] = state
+                        if cache is not None and known_line == state_line - 1 and start_line + known_line > 0:
+                            # 上一行首尾都在 token 边界上，可以缓存
+                            result_runs[known_line] = _utf16_runs(window[known_line], runs[known_line])
+                            cache.put(
+                                lexer,
+                                formats,
+                                window[known_line],
+                                states[known_line],
+                                result_runs[known_line],
+                                state,
+                                tuple(line_probes[known_line] or ()),
+                            )
+                        known_line = state_line
+                        if converges(state_line, state):
+                            converged = start_line + state_line
+                            stop = True
+                            break
+                        if cache is not None and cached(state_line, state) is not None:
+                            # 之后的行从缓存中取得
+                            stop = True
+                            break
+                    state_line += 1
+                if stop or pos >= text_end:
+                    break
+                continue
+
+            if token_type is _PROBE:
+                while line + 1 < count and line_starts[line + 1] <= pos:
+                    line += 1
+                rexmatch, end = value
+                if line_probes[line] is None:
+                    line_probes[line] = []
+                line_start = line_starts[line]
+                line_probes[line].append((pos - line_start, rexmatch, end - line_start if end >= 0 else -1))
+                continue
+
+            fmt = formats.get(token_type)
+            if fmt is None:
+                continue
+            # 把 token 按行切分
+            while line + 1 < count and line_starts[line + 1] <= pos:
+                line += 1
+            start = pos
+            end = pos + len(value)
+            current = line
+            while current < count:
+                line_end = line_starts[current] + len(window[current])  # 换行符的位置
+                segment_end = min(end, line_end)
+                if segment_end > start:
+                    runs[current].append((start - line_starts[current], segment_end - start, fmt))
+                if end <= line_end + 1:
+                    break
+                current += 1
+                start = line_starts[current]
+        else:
+            state_line = count
+        next_line = state_line
+
+    if converged is not None:
+        count = converged - start_line
+    for i in range(count):
+        if result_runs[i] is None:
+            result_runs[i] = _utf16_runs(window[i], runs[i])
+    probes = [tuple(line_probes[i]) if line_probes[i] else () for i in range(count)]
+    return result_runs[:count], states[:count], probes, converged
+
+
+def lex_document(lexer, formats: dict, lines: Sequence[str], cache: Optional[TokenRunCache] = None) -> LexTables:
+    """分析整个文档"""
+    runs, states, probes, _ = lex_range(lexer, formats, lines, 0, len(lines), cache=cache)
+    return LexTables(runs, states, probes)
+
+
+def relex(
+    tables: LexTables,
+    lexer,
+    formats: dict,
+    lines: Sequence[str],
+    first_line: int,
+    last_line: int,
+    delta: int,
+    cache: Optional[TokenRunCache] = None,
+) -> tuple[int, int]:
+    """文档修改后更新 tables，返回需要重新高亮的新行号范围 [start, end)
+
+    Args:
+        tables: 修改前的分析结果，原地更新
+        lines: 修改后的所有行
+        first_line/last_line: 修改后发生变化的行（含两端）
+        delta: 修改后的行数减去修改前的行数
+    """
+    if not supports_checkpoints(lexer):
+        new_tables = lex_document(lexer, formats, lines, cache)
+        tables.runs, tables.states, tables.probes = new_tables.runs, new_tables.states, new_tables.probes
+        return 0, len(lines)
+
+    # 从修改行之前最近的检查点开始
+    start = _checkpoint_before(tables, first_line)
+    # 之前各行中跨行规则的试探可能看到修改的内容（例如补上文档字符串的结尾后原来不匹配的规则匹配了），
+    # 在新文本中重新执行，从第一个结果改变的试探所在行之前的检查点开始
+    text = "\n".join(lines) + "\n"
+    line_starts = list(accumulate((len(line) + 1 for line in lines[:first_line]), initial=0))
+    for line_number, probes in enumerate(tables.probes[:start]):
+        if probes and not _probes_hold(text, line_starts[line_number], probes, line_starts[first_line]):
+            start = _checkpoint_before(tables, line_number)
+            break
+    stack = tables.states[start] if start < len(tables.states) else ROOT_STATE
+
+    window = RELEX_WINDOW_LINES
+    while True:
+        end = min(len(lines), last_line + 1 + window)
+        runs, states, probes, converged = lex_range(
+            lexer, formats, lines, start, end, stack, tables.states, last_line + 1, delta, cache
+        )
+        if converged is not None or end == len(lines):
+            break
+        window *= 4
+
+    new_end = converged if converged is not None else len(lines)
+    old_end = new_end - delta
+    tables.runs[start:old_end] = runs
+    tables.states[start:old_end] = states
+    tables.probes[start:old_end] = probes
+    return start, new_end
+
+
+def _checkpoint_before(tables: LexTables, line_number: int) -> int:
+    """line_number 行及之前最近的可以作为检查点的行（没有分析结果时为 0）"""
+    start = min(line_number, len(tables.states) - 1)
+    while start > 0 and tables.states[start] is None:
+        start -= 1
+    return max(start, 0)
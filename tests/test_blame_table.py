@@ -0,0 +1,66 @@
+import os
+import sys
+import unittest
+
+from PyQt6.QtWidgets import QApplication
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from blame_table import BlameTable
+from editors.text_edit import SyncedTextEdit
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+def annotation(commit_hash, author="Alice", date="2024/1/2", message="summary\n\nbody"):
+    return {
+        "commit_hash": commit_hash,
+        "author_name": author,
+        "author_email": "alice@example.com",
+        "committed_date": date,
+        "message": message,
+    }
+
+
+class TestBlameTable(unittest.TestCase):
+    def test_from_blame_data_deduplicates_commits(self):
+        data = [annotation("a" * 40), annotation("a" * 40), None, annotation("b" * 40, author="Bob")]
+        table = BlameTable.from_blame_data(data)
+
+        self.assertEqual(len(table), 4)
+        self.assertEqual(len(table.commits), 2)
+        self.assertEqual(list(table.line_commits), [0, 0, -1, 1])
+        self.assertEqual(table.line_commits.itemsize, 4)
+        self.assertIsNone(table.commit_at(2))
+        self.assertIsNone(table.commit_at(4))
+        self.assertEqual(table.commit_at(3).author_name, "Bob")
+        self.assertEqual(table.commit_at(0).summary, "summary")
+
+
+class TestEditorBlame(unittest.TestCase):
+    def setUp(self):
+        self.editor = SyncedTextEdit()
+        self.editor.setPlainText("\n".join("line %d" % i for i in range(6)))
+
+    def test_set_blame_data_measures_each_commit_once(self):
+        data = [annotation("a" * 40)] * 3 + [annotation("b" * 40, author="Bob")] * 3
+        font_metrics = self.editor.fontMetrics()
+        self.editor.set_blame_data(data)
+
+        table = self.editor.blame_table
+        self.assertEqual([commit.display_string for commit in table.commits], ["2024/1/2 Alice", "2024/1/2 Bob"])
+        self.assertEqual(
+            self.editor.max_blame_display_width,
+            max(font_metrics.horizontalAdvance(commit.display_string) for commit in table.commits),
+        )
+        colors = list(self.editor.line_final_color_indices)
+        self.assertEqual(len(set(colors[:3])), 1)
+        self.assertEqual(len(set(colors[3:])), 1)
+        self.assertNotEqual(colors[2], colors[3])
+
+        self.editor.clear_blame_data()
+        self.assertFalse(self.editor.showing_blame)
+        self.assertEqual(len(self.editor.blame_table), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
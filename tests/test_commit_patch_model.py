@@ -0,0 +1,143 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from commit_patch_model import SEGMENT_LINES, PatchParser, parse_segment_lines
+from threads import CommitPatchThread
+
+PATCH = (
+    b"diff --git a/a.py b/a.py\n"
+    b"index 1111111..2222222 100644\n"
+    b"--- a/a.py\n"
+    b"+++ b/a.py\n"
+    b"@@ -1,3 +1,3 @@ def f():\n"
+    b" one\n"
+    b"-two\n"
+    b"+TWO\n"
+    b" three\n"
+    b"@@ -10,2 +10,3 @@\n"
+    b" ten\n"
+    b"+new\n"
+    b" eleven\n"
+    b"diff --git a/old.txt b/new.txt\n"
+    b"similarity index 100%\n"
+    b"rename from old.txt\n"
+    b"rename to new.txt\n"
+    b"diff --git a/img.png b/img.png\n"
+    b"new file mode 100644\n"
+    b"index 0000000..3333333\n"
+    b"Binary files /dev/null and b/img.png differ\n"
+)
+
+
+class TestPatchParser(unittest.TestCase):
+    def _parse(self, data, chunk_size):
+        parser = PatchParser()
+        files = []
+        # 按很小的块喂入，模拟流式读取时行被截断的情况
+        for i in range(0, len(data), chunk_size):
+            files.extend(parser.feed(data[i : i + chunk_size]))
+        files.extend(parser.finish())
+        return files
+
+    def test_parse_files_and_hunks(self):
+        files = self._parse(PATCH, 5)
+        self.assertEqual([f.path for f in files], ["a.py", "new.txt", "img.png"])
+        self.assertEqual([f.status for f in files], ["M", "R", "A"])
+        self.assertEqual(files[1].old_path, "old.txt")
+        self.assertTrue(files[2].binary)
+
+        py_file = files[0]
+        self.assertEqual((py_file.added, py_file.deleted), (2, 1))
+        self.assertEqual([h.line_count for h in py_file.hunks], [4, 3])
+        self.assertEqual((py_file.hunks[1].old_start, py_file.hunks[1].new_start), (10, 10))
+
+        # 通过记录的字节偏移量可以读回 hunk 内容并计算行号
+        hunk = py_file.hunks[0]
+        start, end = hunk.segment_range(0)
+        lines = parse_segment_lines(PATCH[start:end], hunk.old_start - 1, hunk.new_start - 1)
+        self.assertEqual(
+            lines,
+            [(" ", 1, 1, "one"), ("-", 2, 0, "two"), ("+", 0, 2, "TWO"), (" ", 3, 3, "three")],
+        )
+
+    def test_long_hunk_is_split_into_segments(self):
+        body = b"".join(b"+line %d\n" % i for i in range(SEGMENT_LINES + 5))
+        data = b"diff --git a/x b/x\n--- /dev/null\n+++ b/x\n@@ -0,0 +1,%d @@\n" % (SEGMENT_LINES + 5) + body
+        hunk = self._parse(data, 4096)[0].hunks[0]
+        self.assertEqual(hunk.segment_count, 2)
+        start, end = hunk.segment_range(1)
+        lines = parse_segment_lines(data[start:end], 0, hunk.segment_new_lines[1])
+        self.assertEqual(lines[0], ("+", 0, SEGMENT_LINES + 1, "line %d" % SEGMENT_LINES))
+        self.assertEqual(len(lines), 5)
+
+    def test_empty_line_is_blank_context(self):
+        # diff.suppressBlankEmpty=true 时空白上下文行没有前导空格
+        data = b"diff --git a/x b/x\n--- a/x\n+++ b/x\n@@ -1,4 +1,4 @@\n a\n\n-b\n+B\n c\n"
+        py_file = self._parse(data, 3)[0]
+        hunk = py_file.hunks[0]
+        self.assertEqual(hunk.line_count, 5)
+        start, end = hunk.segment_range(0)
+        lines = parse_segment_lines(data[start:end], 0, 0)
+        self.assertEqual(
+            lines,
+            [(" ", 1, 1, "a"), (" ", 2, 2, ""), ("-", 3, 0, "b"), ("+", 0, 3, "B"), (" ", 4, 4, "c")],
+        )
+
+
+class TestCommitPatchThread(unittest.TestCase):
+    def setUp(self):
+        self.repo_path = tempfile.mkdtemp()
+        subprocess.run(["git", "init", "-q"], cwd=self.repo_path, check=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.repo_path)
+
+    def test_reports_git_error(self):
+        thread = CommitPatchThread(self.repo_path, "0" * 40, None, os.path.join(self.repo_path, "patch"))
+        errors, files = [], []
+        thread.error.connect(errors.append)
+        thread.files_ready.connect(files.extend)
+        thread.run()
+        self.assertEqual(files, [])
+        self.assertEqual(len(errors), 1)
+        self.assertIn("fatal", errors[0])
+
+    def test_blank_context_lines_keep_their_prefix(self):
+        def git(*args):
+            subprocess.run(["git", *args], cwd=self.repo_path, check=True, capture_output=True)
+
+        git("config", "user.email", "test@example.com")
+        git("config", "user.name", "Test")
+        git("config", "diff.suppressBlankEmpty", "true")
+        path = os.path.join(self.repo_path, "a.txt")
+        with open(path, "w") as f:
+            f.write("a\n\nb\n")
+        git("add", ".")
+        git("commit", "-q", "-m", "init")
+        with open(path, "w") as f:
+            f.write("a\n\nB\n")
+        git("commit", "-q", "-a", "-m", "second")
+
+        patch_path = os.path.join(self.repo_path, "patch")
+        thread = CommitPatchThread(self.repo_path, "HEAD", "HEAD~1", patch_path)
+        files = []
+        thread.files_ready.connect(files.extend)
+        thread.run()
+        with open(patch_path, "rb") as f:
+            data = f.read()
+        hunk = files[0].hunks[0]
+        start, end = hunk.segment_range(0)
+        self.assertIn(b"\n \n", data[start:end])
+        self.assertEqual(
+            parse_segment_lines(data[start:end], hunk.old_start - 1, hunk.new_start - 1),
+            [(" ", 1, 1, "a"), (" ", 2, 2, ""), ("-", 3, 0, "b"), ("+", 0, 3, "B")],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import git
+from PyQt6.QtWidgets import QApplication
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from compare_view import CompareView
+from file_changes_model import ChangedFile, DiffTreeParser
+from git_manager import GitManager
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+OLD_CONTENT = "".join(f"line {i}\n" for i in range(20))
+NEW_CONTENT = OLD_CONTENT.replace("line 5\n", "line five\n")
+
+
+class TestCompareViewRename(unittest.TestCase):
+    def setUp(self):
+        self.repo_path = tempfile.mkdtemp()
+        self._git("init", "-q")
+        self._git("config", "user.email", "test@example.com")
+        self._git("config", "user.name", "Test")
+        self._write("old.txt", OLD_CONTENT)
+        self._git("add", ".")
+        self._git("commit", "-q", "-m", "init")
+        self._git("mv", "old.txt", "new.txt")
+        self._write("new.txt", NEW_CONTENT)
+        self._git("commit", "-q", "-a", "-m", "rename")
+        self.git_manager = GitManager(self.repo_path)
+        self.git_manager.initialize()
+        self.commit = git.Repo(self.repo_path).commit("HEAD")
+
+    def tearDown(self):
+        shutil.rmtree(self.repo_path)
+
+    def _git(self, *args):
+        return subprocess.run(["git", *args], cwd=self.repo_path, check=True, capture_output=True).stdout
+
+    def _write(self, rel_path, text):
+        with open(os.path.join(self.repo_path, rel_path), "w") as f:
+            f.write(text)
+
+    def _changed_file(self):
+        output = self._git("diff-tree", "-r", "-z", "-M", "--raw", "--no-commit-id", "HEAD")
+        entries = [entry for entry in DiffTreeParser().feed(output) if isinstance(entry, ChangedFile)]
+        self.assertEqual(len(entries), 1)
+        return entries[0]
+
+    def test_renamed_file_reads_parent_from_old_path(self):
+        changed_file = self._changed_file()
+        self.assertTrue(changed_file.status.startswith("R"))
+        self.assertEqual(changed_file.old_path, "old.txt")
+
+        view = CompareView()
+        # 预取缓存中没有该提交，走的是直接读取 blob 的路径
+        view.show_diff(self.git_manager, self.commit, "new.txt", changed_file=changed_file)
+        self.assertEqual(view.left_text, OLD_CONTENT)
+        self.assertEqual(view.right_text, NEW_CONTENT)
+
+        # "仍然加载"时保留重命名信息
+        view.load_anyway()
+        self.assertEqual(view.left_text, OLD_CONTENT)
+
+
+if __name__ == "__main__":
+    unittest.main()
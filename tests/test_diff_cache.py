@@ -0,0 +1,115 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import diff_match_patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from diff_cache import (
+    CHAR_DIFF_CHUNK_MAX_CHARS,
+    DiffResultCache,
+    create_char_differ,
+    decode_char_diff,
+    decode_chunks,
+    encode_char_diff,
+    encode_chunks,
+    text_blob_id,
+)
+from diff_calculator import DiffChunk, HistogramCalculator
+
+
+class CountingCalculator(HistogramCalculator):
+    def __init__(self):
+        self.calls = 0
+
+    def compute_diff(self, left_text, right_text):
+        self.calls += 1
+        return super().compute_diff(left_text, right_text)
+
+
+class TestDiffResultCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_text_blob_id_matches_git(self):
+        path = os.path.join(self.temp_dir, "a.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("hello\n中文\n")
+        git_sha = subprocess.run(["git", "hash-object", path], check=True, capture_output=True, text=True).stdout
+        self.assertEqual(text_blob_id("hello\n中文\n"), git_sha.strip())
+
+    def test_encode_roundtrip(self):
+        chunks = [DiffChunk(0, 2, 0, 2, "equal"), DiffChunk(2, 3, 2, 4, "replace"), DiffChunk(3, 3, 4, 5, "insert")]
+        self.assertEqual(decode_chunks(encode_chunks(chunks)), chunks)
+
+        dmp = diff_match_patch.diff_match_patch()
+        left, right = "hello world\nfoo", "hello there world\nbar"
+        diff_list = dmp.diff_main(left, right)
+        self.assertEqual(decode_char_diff(encode_char_diff(diff_list), left, right), diff_list)
+
+    def test_compute_diff_uses_cache(self):
+        cache = DiffResultCache()
+        calculator = CountingCalculator()
+        first = cache.compute_diff(calculator, "a\nb\n", "a\nc\n")
+        second = cache.compute_diff(calculator, "a\nb\n", "a\nc\n")
+        self.assertEqual(first, second)
+        self.assertEqual(calculator.calls, 1)
+        # 已知 blob sha 时与按内容计算的 id 相同，也能命中
+        cache.compute_diff(calculator, "a\nb\n", "a\nc\n", left_id=text_blob_id("a\nb\n"))
+        self.assertEqual(calculator.calls, 1)
+
+    def test_chunked_char_diff(self):
+        cache = DiffResultCache()
+        dmp = create_char_differ()
+        left = "same\nold line here\nkeep\nremoved\ntail"
+        right = "same\nnew line here\nkeep\ntail\n"
+        chunks = HistogramCalculator().compute_diff(left, right)
+        diff_list = cache.chunked_char_diff(dmp, left, right, chunks)
+        # 拼接后的结果必须能还原两侧的完整文本
+        self.assertEqual("".join(text for op, text in diff_list if op <= 0), left)
+        self.assertEqual("".join(text for op, text in diff_list if op >= 0), right)
+        self.assertIn((dmp.DIFF_EQUAL, "same\n"), diff_list)
+        self.assertIn((dmp.DIFF_DELETE, "removed\n"), diff_list)
+        # replace 块内是字符级差异
+        self.assertIn((dmp.DIFF_EQUAL, " line here\n"), diff_list)
+        self.assertEqual(cache.chunked_char_diff(dmp, left, right, chunks, cached_only=True), diff_list)
+
+    def test_chunked_char_diff_budget_and_fallback(self):
+        cache = DiffResultCache()
+        dmp = create_char_differ()
+        left = "x" * CHAR_DIFF_CHUNK_MAX_CHARS
+        right = "y" + "x" * CHAR_DIFF_CHUNK_MAX_CHARS
+        chunks = [DiffChunk(0, 1, 0, 1, "replace")]
+        self.assertEqual(
+            cache.chunked_char_diff(dmp, left, right, chunks), [(dmp.DIFF_DELETE, left), (dmp.DIFF_INSERT, right)]
+        )
+        # 差异块与文本不一致时退回整个文件的字符级差异
+        self.assertEqual(cache.chunked_char_diff(dmp, "ab", "abc", []), cache.char_diff(dmp, "ab", "abc"))
+        self.assertIsNone(cache.chunked_char_diff(dmp, "a\nb", "a\nc", [DiffChunk(0, 2, 0, 2, "replace")], True))
+
+    def test_memory_budget_and_disk_spill(self):
+        spill_dir = os.path.join(self.temp_dir, "spill")
+        cache = DiffResultCache(memory_budget=20, spill_dir=spill_dir, disk_budget=1024)
+        cache.put(("a",), b"0123456789")
+        cache.put(("b",), b"0123456789")
+        cache.put(("c",), b"0123456789")
+        self.assertLessEqual(cache.memory_bytes, 20)
+        self.assertEqual(len(os.listdir(spill_dir)), 1)
+        # 被淘汰的条目从磁盘读回
+        self.assertEqual(cache.get(("a",)), b"0123456789")
+
+        no_spill = DiffResultCache(memory_budget=20)
+        no_spill.put(("a",), b"0123456789")
+        no_spill.put(("b",), b"0123456789")
+        no_spill.put(("c",), b"0123456789")
+        self.assertIsNone(no_spill.get(("a",)))
+
+
+if __name__ == "__main__":
+    unittest.main()
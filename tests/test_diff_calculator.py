@@ -0,0 +1,109 @@
+import os
+import random
+import sys
+import time
+import unittest
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from diff_calculator import DiffChunk, DifflibCalculator, HistogramCalculator, create_diff_calculator
+
+
+def _lcs_length(a, b):
+    table = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i, x in enumerate(a):
+        for j, y in enumerate(b):
+            table[i + 1][j + 1] = table[i][j] + 1 if x == y else max(table[i][j + 1], table[i + 1][j])
+    return table[len(a)][len(b)]
+
+
+class TestHistogramCalculator(unittest.TestCase):
+    def _check_chunks(self, chunks, a, b):
+        """检查块连续覆盖两侧、equal 块内容相同，且不存在相邻的非 equal 块"""
+        i = j = 0
+        for chunk in chunks:
+            self.assertEqual((chunk.left_start, chunk.right_start), (i, j))
+            if chunk.type == "equal":
+                self.assertEqual(a[chunk.left_start : chunk.left_end], b[chunk.right_start : chunk.right_end])
+            i, j = chunk.left_end, chunk.right_end
+        self.assertEqual((i, j), (len(a), len(b)))
+        for first, second in zip(chunks, chunks[1:]):
+            self.assertFalse(first.type != "equal" and second.type != "equal")
+        return sum(chunk.left_end - chunk.left_start for chunk in chunks if chunk.type == "equal")
+
+    def test_same_chunks_as_difflib_for_simple_edit(self):
+        left = "a\nb\nc\nd\n"
+        right = "a\nx\nc\nd\ne\n"
+        self.assertEqual(
+            HistogramCalculator().compute_diff(left, right), DifflibCalculator().compute_diff(left, right)
+        )
+        self.assertEqual(
+            HistogramCalculator().compute_diff(left, right),
+            [
+                DiffChunk(0, 1, 0, 1, "equal"),
+                DiffChunk(1, 2, 1, 2, "replace"),
+                DiffChunk(2, 4, 2, 4, "equal"),
+                DiffChunk(4, 4, 4, 5, "insert"),
+            ],
+        )
+
+    def test_empty_sides(self):
+        self.assertEqual(HistogramCalculator().compute_diff("", ""), [])
+        self.assertEqual(HistogramCalculator().compute_diff("", "a\nb"), [DiffChunk(0, 0, 0, 2, "insert")])
+        self.assertEqual(HistogramCalculator().compute_diff("a\nb", ""), [DiffChunk(0, 2, 0, 0, "delete")])
+
+    def test_random_inputs_are_valid(self):
+        random.seed(0)
+        calculator = HistogramCalculator()
+        for _ in range(500):
+            a = [random.choice("abcde") for _ in range(random.randint(0, 15))]
+            b = [random.choice("abcde") for _ in range(random.randint(0, 15))]
+            self._check_chunks(calculator.compute_diff("\n".join(a), "\n".join(b)), a, b)
+
+    def test_myers_fallback_is_minimal(self):
+        random.seed(1)
+        calculator = HistogramCalculator()
+        calculator.MAX_CHAIN_LENGTH = -1  # 不使用锚点，全部走 Myers
+        for _ in range(300):
+            a = [random.choice("abc") for _ in range(random.randint(0, 12))]
+            b = [random.choice("abc") for _ in range(random.randint(0, 12))]
+            equal = self._check_chunks(calculator.compute_diff("\n".join(a), "\n".join(b)), a, b)
+            self.assertEqual(equal, _lcs_length(a, b))
+
+    def test_myers_cost_limit_is_valid(self):
+        random.seed(2)
+        calculator = HistogramCalculator()
+        calculator.MAX_CHAIN_LENGTH = -1
+        with patch("diff_calculator.MYERS_MIN_MAX_COST", 1):
+            for _ in range(300):
+                a = [random.choice("abc") for _ in range(random.randint(0, 30))]
+                b = [random.choice("abc") for _ in range(random.randint(0, 30))]
+                self._check_chunks(calculator.compute_diff("\n".join(a), "\n".join(b)), a, b)
+
+    def test_repeated_lines_stay_aligned(self):
+        # difflib 的 autojunk 会把大量重复的行当作垃圾行，导致几乎整个文件都被标记为修改
+        left = ["}", "", "    return x;"] * 2000
+        right = list(left)
+        right.insert(3000, "int y;")
+        del right[100]
+        chunks = HistogramCalculator().compute_diff("\n".join(left), "\n".join(right))
+        self.assertEqual(self._check_chunks(chunks, left, right), len(left) - 1)
+        self.assertEqual(sum(1 for chunk in chunks if chunk.type != "equal"), 2)
+
+    def test_shuffled_repeated_lines_are_bounded(self):
+        # 每行重复 80 次且顺序不同：没有可用的锚点，Myers 的编辑距离很大，需要在代价上限处放弃最优解
+        left = [str(i % 100) for i in range(8000)]
+        right = [str((i * 7) % 100) for i in range(8000)]
+        start = time.perf_counter()
+        chunks = HistogramCalculator().compute_diff("\n".join(left), "\n".join(right))
+        self.assertLess(time.perf_counter() - start, 15)
+        self._check_chunks(chunks, left, right)
+
+    def test_create_diff_calculator(self):
+        self.assertIsInstance(create_diff_calculator("difflib"), DifflibCalculator)
+        self.assertIsInstance(create_diff_calculator("histogram"), HistogramCalculator)
+        self.assertIsInstance(create_diff_calculator("unknown"), HistogramCalculator)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from diff_guard import (
+    LOAD_FULL,
+    LOAD_NO_CHAR_DIFF,
+    LOAD_NO_SYNTAX,
+    LOAD_SUMMARY,
+    DiffFileInfo,
+    inspect_changed_file,
+    inspect_commit_file,
+    inspect_workspace_file,
+    load_level_for,
+    load_level_for_texts,
+)
+from diff_prefetcher import PrefetchedDiff
+from file_changes_model import ChangedFile
+from git_manager import GitManager
+
+THRESHOLDS = {"char_diff": 10, "syntax_highlight": 20, "summary": 30, "max_line_length": 5}
+
+
+class TestLoadLevel(unittest.TestCase):
+    def test_size_thresholds(self):
+        self.assertEqual(load_level_for(DiffFileInfo("a", (5, 10)), THRESHOLDS), LOAD_FULL)
+        self.assertEqual(load_level_for(DiffFileInfo("a", (5, 11)), THRESHOLDS), LOAD_NO_CHAR_DIFF)
+        self.assertEqual(load_level_for(DiffFileInfo("a", (21,)), THRESHOLDS), LOAD_NO_SYNTAX)
+        self.assertEqual(load_level_for(DiffFileInfo("a", (31,)), THRESHOLDS), LOAD_SUMMARY)
+        self.assertEqual(load_level_for(DiffFileInfo("a", (1,), binary=True), THRESHOLDS), LOAD_SUMMARY)
+
+    def test_long_lines_disable_syntax(self):
+        self.assertEqual(load_level_for_texts(LOAD_FULL, ["ab\ncd\n", "x"], THRESHOLDS), LOAD_FULL)
+        self.assertEqual(load_level_for_texts(LOAD_FULL, ["ab\n", "abcdef\n"], THRESHOLDS), LOAD_NO_SYNTAX)
+        self.assertEqual(load_level_for_texts(LOAD_SUMMARY, ["abcdef"], THRESHOLDS), LOAD_SUMMARY)
+
+
+class TestInspectFile(unittest.TestCase):
+    def setUp(self):
+        self.repo_path = tempfile.mkdtemp()
+        self._git("init", "-q")
+        self._git("config", "user.email", "test@example.com")
+        self._git("config", "user.name", "Test")
+        self._write("a.txt", b"hello\n")
+        self._write("b.bin", b"\0\1bin")
+        self._write("c.dat", b"text\n")
+        self._write(".gitattributes", b"*.dat binary\n")
+        self._git("add", ".")
+        self._git("commit", "-q", "-m", "init")
+        self._write("a.txt", b"hello\nworld\n")
+        self._git("commit", "-q", "-a", "-m", "second")
+        self.git_manager = GitManager(self.repo_path)
+        self.git_manager.initialize()
+        self.head = self._git("rev-parse", "HEAD").decode().strip()
+        self.parent = self._git("rev-parse", "HEAD~1").decode().strip()
+
+    def tearDown(self):
+        shutil.rmtree(self.repo_path)
+
+    def _git(self, *args):
+        return subprocess.run(["git", *args], cwd=self.repo_path, check=True, capture_output=True).stdout
+
+    def _write(self, rel_path, data):
+        with open(os.path.join(self.repo_path, rel_path), "wb") as f:
+            f.write(data)
+
+    def test_text_file_sizes(self):
+        info = inspect_commit_file(self.git_manager, [self.parent, self.head], "a.txt")
+        self.assertEqual(sorted(info.sizes), [6, 12])
+        self.assertFalse(info.binary)
+
+    def test_binary_by_numstat_in_root_commit(self):
+        info = inspect_commit_file(self.git_manager, [None, self.parent], "b.bin")
+        self.assertTrue(info.binary)
+
+    def test_binary_by_attributes(self):
+        info = inspect_commit_file(self.git_manager, [self.parent, self.head], "c.dat")
+        self.assertTrue(info.binary)
+
+    def test_workspace_file_sniff(self):
+        self._write("a.txt", b"abc\0def")
+        info = inspect_workspace_file(self.git_manager, self.head, "a.txt")
+        self.assertEqual(info.sizes, (12, 7))
+        self.assertTrue(info.binary)
+
+    def test_changed_file_uses_model_data(self):
+        old_sha = self._git("rev-parse", f"{self.parent}:a.txt").decode().strip()
+        new_sha = self._git("rev-parse", f"{self.head}:a.txt").decode().strip()
+        changed_file = ChangedFile("a.txt", "M", old_sha=old_sha, new_sha=new_sha, added=1, deleted=0)
+        with patch.object(GitManager, "is_binary_by_numstat") as numstat, patch.object(
+            GitManager, "is_binary_by_attributes"
+        ) as attributes:
+            info = inspect_changed_file(self.git_manager, changed_file)
+        numstat.assert_not_called()
+        attributes.assert_not_called()
+        self.assertEqual(sorted(info.sizes), [6, 12])
+        self.assertFalse(info.binary)
+
+        binary_file = ChangedFile("c.dat", "M", binary=True)
+        self.assertTrue(inspect_changed_file(self.git_manager, binary_file).binary)
+
+    def test_changed_file_with_prefetched_diff_skips_git(self):
+        changed_file = ChangedFile("a.txt", "M", old_sha="1" * 40, new_sha="2" * 40, added=1, deleted=0)
+        prefetched = PrefetchedDiff("hello\n", "hello\nworld\n", [], "HistogramCalculator")
+        with patch.object(GitManager, "get_blob_sizes") as get_blob_sizes:
+            info = inspect_changed_file(self.git_manager, changed_file, prefetched)
+        get_blob_sizes.assert_not_called()
+        self.assertEqual(info.sizes, (6, 12))
+
+
+if __name__ == "__main__":
+    unittest.main()
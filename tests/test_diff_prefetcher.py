@@ -0,0 +1,80 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import git
+from PyQt6.QtWidgets import QApplication
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from diff_calculator import DifflibCalculator
+from diff_prefetcher import DiffPrefetchCache, PrefetchedDiff
+from file_changes_model import ChangedFile
+from git_manager import GitManager
+from threads import DiffPrefetchThread
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+class TestDiffPrefetchCache(unittest.TestCase):
+    def test_evicts_by_entries_and_bytes(self):
+        cache = DiffPrefetchCache(max_entries=2, max_bytes=10)
+        cache.put("c", "a", PrefetchedDiff("12", "34", [], "DifflibCalculator"))
+        cache.put("c", "b", PrefetchedDiff("12", "34", [], "DifflibCalculator"))
+        # 访问 a 使其成为最近使用的条目
+        self.assertIsNotNone(cache.get("c", "a"))
+        cache.put("c", "d", PrefetchedDiff("1", "2", [], "DifflibCalculator"))
+        self.assertFalse(cache.contains("c", "b"))
+        self.assertTrue(cache.contains("c", "a"))
+        # 超过字节预算时淘汰最旧的条目
+        cache.put("c", "e", PrefetchedDiff("1234", "5678", [], "DifflibCalculator"))
+        self.assertFalse(cache.contains("c", "a"))
+        self.assertTrue(cache.contains("c", "e"))
+
+
+class TestDiffPrefetchThread(unittest.TestCase):
+    def setUp(self):
+        self.repo_path = tempfile.mkdtemp()
+        self.repo = git.Repo.init(self.repo_path)
+        self.git_manager = GitManager(self.repo_path)
+        self.git_manager.initialize()
+
+    def tearDown(self):
+        shutil.rmtree(self.repo_path)
+
+    def _commit_file(self, content, message):
+        with open(os.path.join(self.repo_path, "a.txt"), "w") as f:
+            f.write(content)
+        self.repo.index.add(["a.txt"])
+        return self.repo.index.commit(message)
+
+    def test_prefetch_computes_diff_chunks(self):
+        first = self._commit_file("one\ntwo\n", "first")
+        second = self._commit_file("one\nthree\n", "second")
+        changed_file = ChangedFile(
+            path="a.txt",
+            status="M",
+            old_sha=first.tree["a.txt"].hexsha,
+            new_sha=second.tree["a.txt"].hexsha,
+        )
+        cache = DiffPrefetchCache()
+        thread = DiffPrefetchThread(self.git_manager, cache)
+        thread.start()
+        thread.request(second.hexsha, [changed_file])
+        # 等待后台线程处理完队列
+        for _ in range(200):
+            if cache.contains(second.hexsha, "a.txt"):
+                break
+            thread.msleep(10)
+        thread.stop()
+
+        entry = cache.get(second.hexsha, "a.txt")
+        self.assertIsNotNone(entry)
+        self.assertEqual(entry.left_text, "one\ntwo\n")
+        self.assertEqual(entry.right_text, "one\nthree\n")
+        self.assertEqual(entry.diff_chunks, DifflibCalculator().compute_diff("one\ntwo\n", "one\nthree\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import sys
+import unittest
+
+from PyQt6.QtCore import QEventLoop, QTimer
+from PyQt6.QtWidgets import QApplication
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from diff_cache import diff_result_cache
+from text_diff_viewer import DiffViewer
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+class TestDiffViewerAsync(unittest.TestCase):
+    def setUp(self):
+        diff_result_cache.clear()
+        self.viewer = DiffViewer()
+
+    def tearDown(self):
+        for thread in list(self.viewer._diff_threads):
+            thread.stop()
+
+    def _wait_for_threads(self, timeout_ms=5000):
+        loop = QEventLoop()
+        timer = QTimer()
+        timer.timeout.connect(lambda: loop.quit() if not self.viewer._diff_threads else None)
+        timer.start(10)
+        QTimer.singleShot(timeout_ms, loop.quit)
+        loop.exec()
+        timer.stop()
+
+    def test_texts_shown_before_diff_arrives(self):
+        self.viewer.set_texts("a\nb\nc", "a\nx\nc", "file.py")
+        # 文本立即显示，差异在后台计算
+        self.assertEqual(self.viewer.left_edit.toPlainText(), "a\nb\nc")
+        self.assertEqual(self.viewer.actual_diff_chunks, [])
+        self._wait_for_threads()
+        self.assertEqual([chunk.type for chunk in self.viewer.actual_diff_chunks], ["replace"])
+        self.assertTrue(self.viewer.left_edit.highlighter.diff_engine.diff_list)
+
+    def test_stale_results_are_dropped(self):
+        self.viewer.set_texts("1\n2\n3", "1\n3", "first.py")
+        self.viewer.set_texts("a\nb", "a\nb\nc", "second.py")
+        self._wait_for_threads()
+        self.assertEqual([chunk.type for chunk in self.viewer.actual_diff_chunks], ["insert"])
+
+    def test_cached_result_applied_synchronously(self):
+        self.viewer.set_texts("a\nb", "a\nc", "file.py")
+        self._wait_for_threads()
+        self.viewer.set_texts("a\nb", "a\nc", "file.py")
+        self.assertFalse(self.viewer._diff_threads)
+        self.assertEqual([chunk.type for chunk in self.viewer.actual_diff_chunks], ["replace"])
+
+    def test_finished_threads_release_quit_connections(self):
+        receivers = app.receivers(app.aboutToQuit)
+        for i in range(5):
+            self.viewer.set_texts(f"a\n{i}\nb", "a\nb\nc", f"file{i}.py")
+        self._wait_for_threads()
+        self.assertFalse(self.viewer._diff_threads)
+        self.assertEqual(app.receivers(app.aboutToQuit), receivers)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -18,6 +18,23 @@ DiffChunk = namedtuple(
 )
 
 
+def mock_wrapped_document(doc, block_count=100, lines_per_block=20):
+    """模拟每个块折行为固定行数的文档，滚动条的值为视觉行号"""
+
+    def block_at(number):
+        block = Mock()
+        block.blockNumber.return_value = number
+        block.firstLineNumber.return_value = number * lines_per_block
+        block.lineCount.return_value = lines_per_block
+        return block
+
+    doc.blockCount.return_value = block_count
+    doc.findBlockByNumber.side_effect = block_at
+    doc.findBlockByLineNumber.side_effect = lambda line: block_at(
+        min(line // lines_per_block, block_count - 1)
+    )
+
+
 class TestDiffViewerScroll(unittest.TestCase):
     def setUp(self):
         """设置测试环境"""
@@ -47,10 +64,8 @@ class TestDiffViewerScroll(unittest.TestCase):
         self.right_edit.document.return_value = self.right_doc
 
         # 设置文档属性
-        self.left_doc.blockCount.return_value = 100
-        self.right_doc.blockCount.return_value = 100
-        self.left_doc.size.return_value.height.return_value = 2000
-        self.right_doc.size.return_value.height.return_value = 2000
+        mock_wrapped_document(self.left_doc)
+        mock_wrapped_document(self.right_doc)
 
         # 设置滚动条属性
         self.left_scroll.maximum.return_value = 2000
@@ -76,13 +91,8 @@ class TestDiffViewerScroll(unittest.TestCase):
 
     def test_scroll_with_equal_chunks(self):
         """测试在相等块中滚动"""
-        # 计算平均行高
-        avg_line_height = 2000 // 100  # 20
-
-        # 模拟光标位置在第5行
-        cursor = Mock()
-        cursor.blockNumber.return_value = 5
-        self.left_edit.cursorForPosition.return_value = cursor
+        # 每个块折行为 20 行
+        avg_line_height = 20
 
         # 计算期望的滚动值
         expected_scroll = 5 * avg_line_height  # 100
@@ -96,13 +106,8 @@ class TestDiffViewerScroll(unittest.TestCase):
 
     def test_scroll_into_insert_chunk(self):
         """测试滚动进入插入块"""
-        # 计算平均行高
-        avg_line_height = 2000 // 100  # 20
-
-        # 模拟光标位置在第12行（在插入块中）
-        cursor = Mock()
-        cursor.blockNumber.return_value = 12
-        self.left_edit.cursorForPosition.return_value = cursor
+        # 每个块折行为 20 行
+        avg_line_height = 20
 
         # 计算期望的滚动值
         # 在插入块中，右侧行号需要加上插入的行数
@@ -117,11 +122,6 @@ class TestDiffViewerScroll(unittest.TestCase):
 
     def test_scroll_to_top(self):
         """测试滚动到顶部"""
-        # 模拟光标位置在第0行
-        cursor = Mock()
-        cursor.blockNumber.return_value = 0
-        self.left_edit.cursorForPosition.return_value = cursor
-
         # 调用滚动方法
         self.viewer._on_scroll(0, True)  # 滚动到顶部
 
@@ -130,13 +130,8 @@ class TestDiffViewerScroll(unittest.TestCase):
 
     def test_scroll_to_bottom(self):
         """测试滚动到底部"""
-        # 计算平均行高
-        avg_line_height = 2000 // 100  # 20
-
-        # 模拟光标位置在最后一行
-        cursor = Mock()
-        cursor.blockNumber.return_value = 99  # 最后一行
-        self.left_edit.cursorForPosition.return_value = cursor
+        # 每个块折行为 20 行
+        avg_line_height = 20
 
         # 计算期望的滚动值，考虑 diff_chunks 的累积差异
         # diff_chunks: [equal, insert(+5 lines), equal] -> accumulated_diff = +5
@@ -167,19 +162,12 @@ class TestDiffViewerScroll(unittest.TestCase):
             DiffChunk("equal", 20, 25, 18, 23),
         ]
 
-        # 计算平均行高
-        avg_line_height = 2000 // 100  # 20
-
-        # 模拟光标位置在第17行（在替换块中）
-        cursor = Mock()
-        cursor.blockNumber.return_value = 17
-        self.left_edit.cursorForPosition.return_value = cursor
+        # 每个块折行为 20 行
+        avg_line_height = 20
 
         # 计算期望的滚动值
-        # 在替换块中，右侧行号需要减去删除的行数
-        expected_scroll = (
-            320  # Updated expectation based on code's calculation (target_line=16)
-        )
+        # 替换块 [15, 20) -> [15, 18) 内按比例映射：17 -> 15 + 2 * 3 / 5 = 16.2
+        expected_scroll = int(16.2 * avg_line_height)  # 324
 
         # 调用滚动方法
         self.viewer._on_scroll(340, True)  # 17 * 20 = 340
@@ -245,12 +233,9 @@ class TestMergeDiffViewerScroll(unittest.TestCase):
         self.parent2_edit.document.return_value = self.parent2_doc
 
         # 设置文档属性
-        self.parent1_doc.blockCount.return_value = 100
-        self.result_doc.blockCount.return_value = 100
-        self.parent2_doc.blockCount.return_value = 100
-        self.parent1_doc.size.return_value.height.return_value = 2000
-        self.result_doc.size.return_value.height.return_value = 2000
-        self.parent2_doc.size.return_value.height.return_value = 2000
+        mock_wrapped_document(self.parent1_doc)
+        mock_wrapped_document(self.result_doc)
+        mock_wrapped_document(self.parent2_doc)
 
         # 设置滚动条属性
         self.parent1_scroll.maximum.return_value = 2000
@@ -285,13 +270,8 @@ class TestMergeDiffViewerScroll(unittest.TestCase):
 
     def test_scroll_parent1_to_result(self):
         """测试从 parent1 滚动到 result"""
-        # 计算平均行高
-        avg_line_height = 2000 // 100  # 20
-
-        # 模拟光标位置在第12行（在插入块中）
-        cursor = Mock()
-        cursor.blockNumber.return_value = 12
-        self.parent1_edit.cursorForPosition.return_value = cursor
+        # 每个块折行为 20 行
+        avg_line_height = 20
 
         # 计算期望的滚动值
         # 在插入块中，result 行号需要加上插入的行数
@@ -306,17 +286,12 @@ class TestMergeDiffViewerScroll(unittest.TestCase):
 
     def test_scroll_result_to_parent2(self):
         """测试从 result 滚动到 parent2"""
-        # 计算平均行高
-        avg_line_height = 2000 // 100  # 20
-
-        # 模拟光标位置在第12行（在删除块中）
-        cursor = Mock()
-        cursor.blockNumber.return_value = 12
-        self.result_edit.cursorForPosition.return_value = cursor
+        # 每个块折行为 20 行
+        avg_line_height = 20
 
         # 计算期望的滚动值
-        # 在删除块中，parent2 行号需要减去删除的行数
-        expected_scroll = (12 - 5) * avg_line_height  # 140
+        # 删除块内的行都对应 parent2 中删除位置所在的行
+        expected_scroll = 10 * avg_line_height  # 200
 
         # 调用滚动方法
         self.viewer._on_scroll(240, "result")  # 12 * 20 = 240
@@ -327,11 +302,6 @@ class TestMergeDiffViewerScroll(unittest.TestCase):
 
     def test_scroll_to_top(self):
         """测试滚动到顶部"""
-        # 模拟光标位置在第0行
-        cursor = Mock()
-        cursor.blockNumber.return_value = 0
-        self.parent1_edit.cursorForPosition.return_value = cursor
-
         # 调用滚动方法
         self.viewer._on_scroll(0, "parent1")
 
@@ -341,13 +311,8 @@ class TestMergeDiffViewerScroll(unittest.TestCase):
 
     def test_scroll_to_bottom(self):
         """测试滚动到底部"""
-        # 计算平均行高
-        avg_line_height = 2000 // 100  # 20
-
-        # 模拟光标位置在最后一行
-        cursor = Mock()
-        cursor.blockNumber.return_value = 99  # 最后一行
-        self.parent1_edit.cursorForPosition.return_value = cursor
+        # 每个块折行为 20 行
+        avg_line_height = 20
 
         # 计算期望的滚动值
         # parent1 -> result: 使用 parent1_chunks (含 insert +5), accumulated_diff = +5
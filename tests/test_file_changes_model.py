@@ -0,0 +1,96 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from file_changes_model import ChangedFile, ChangesTreeModel, DiffTreeParser, NumStat
+from threads import DiffTreeThread
+
+
+class TestDiffTreeParser(unittest.TestCase):
+    def setUp(self):
+        self.repo_path = tempfile.mkdtemp()
+        self._git("init", "-q")
+        self._git("config", "user.email", "test@example.com")
+        self._git("config", "user.name", "Test")
+        os.makedirs(os.path.join(self.repo_path, "d", "e"))
+        self._write("d/e/f.txt", b"a\nb\nc\n")
+        self._write("g.txt", b"x\n")
+        self._write("b.bin", b"\0\1bin")
+        self._git("add", ".")
+        self._git("commit", "-q", "-m", "init")
+        self._git("mv", "d/e/f.txt", "d/h.txt")
+        self._write("g.txt", b"x\ny\n")
+        self._write("b.bin", b"\0\2bin")
+        self._git("commit", "-q", "-a", "-m", "second")
+
+    def tearDown(self):
+        shutil.rmtree(self.repo_path)
+
+    def _git(self, *args):
+        return subprocess.run(["git", *args], cwd=self.repo_path, check=True, capture_output=True).stdout
+
+    def _write(self, rel_path, data):
+        with open(os.path.join(self.repo_path, rel_path), "wb") as f:
+            f.write(data)
+
+    def _parse(self, *rev_args, chunk_size=None):
+        output = self._git("diff-tree", "-r", "-z", "-M", "--raw", "--numstat", "--no-commit-id", *rev_args)
+        parser = DiffTreeParser()
+        if chunk_size is None:
+            return parser.feed(output)
+        records = []
+        # 按很小的块喂入，模拟流式读取时记录被截断的情况
+        for i in range(0, len(output), chunk_size):
+            records.extend(parser.feed(output[i : i + chunk_size]))
+        return records
+
+    def test_parse_rename_modify_and_binary(self):
+        records = self._parse("HEAD~1", "HEAD", chunk_size=7)
+        files = {r.path: r for r in records if isinstance(r, ChangedFile)}
+        stats = {r.path: r for r in records if isinstance(r, NumStat)}
+
+        self.assertEqual(files["d/h.txt"].status, "R")
+        self.assertEqual(files["d/h.txt"].old_path, "d/e/f.txt")
+        self.assertEqual(files["g.txt"].status, "M")
+        self.assertEqual((stats["g.txt"].added, stats["g.txt"].deleted), (1, 0))
+        self.assertEqual((stats["d/h.txt"].added, stats["d/h.txt"].deleted), (0, 0))
+        self.assertIsNone(stats["b.bin"].added)
+
+    def test_parse_root_commit(self):
+        records = self._parse("--root", "HEAD~1")
+        files = [r for r in records if isinstance(r, ChangedFile)]
+        self.assertEqual(sorted(f.path for f in files), ["b.bin", "d/e/f.txt", "g.txt"])
+        self.assertTrue(all(f.status == "A" for f in files))
+
+    def test_thread_reports_git_error(self):
+        thread = DiffTreeThread(self.repo_path, "0" * 40)
+        errors, records = [], []
+        thread.error.connect(errors.append)
+        thread.records_ready.connect(records.extend)
+        thread.run()
+        self.assertEqual(records, [])
+        self.assertEqual(len(errors), 1)
+        self.assertIn("fatal", errors[0])
+
+    def test_model_aggregates_counts(self):
+        model = ChangesTreeModel()
+        for record in self._parse("--root", "HEAD~1"):
+            if isinstance(record, ChangedFile):
+                model.add_file(record)
+            else:
+                model.apply_numstat(record)
+
+        self.assertEqual(model.root.file_count, 3)
+        self.assertEqual((model.root.added, model.root.deleted), (4, 0))
+        dir_e = model.root.dirs["d"].dirs["e"]
+        self.assertEqual(dir_e.path, "d/e")
+        self.assertEqual((dir_e.file_count, dir_e.added), (1, 3))
+        self.assertTrue(model.files_by_path["b.bin"].binary)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import git
+from PyQt6.QtCore import QEvent
+from PyQt6.QtGui import QFocusEvent
+from PyQt6.QtWidgets import QApplication, QWidget
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from editors.modified_text_edit import ModifiedTextEdit
+from git_manager import GitManager
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+def write_old(path, content):
+    """写入文件并把修改时间设为一分钟前，避免指纹因刚刚修改而不被记录"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    old = time.time() - 60
+    os.utime(path, (old, old))
+
+
+class TestFocusFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.repo_path = tempfile.mkdtemp()
+        self.repo = git.Repo.init(self.repo_path)
+        self.file_path = os.path.join(self.repo_path, "a.txt")
+        write_old(self.file_path, "one\ntwo\n")
+        self.repo.index.add([self.file_path])
+        self.repo.index.commit("init")
+
+        self.container = QWidget()
+        self.container.git_manager = GitManager(self.repo_path)
+        self.container.git_manager.initialize()
+        self.editor = ModifiedTextEdit(self.container)
+        self.editor.file_path = self.file_path
+        self.editor.setPlainText("one\ntwo\n")
+        self.editor.set_line_modifications(self.editor.get_diffs(self.container.git_manager))
+
+    def tearDown(self):
+        self.container.close()
+        shutil.rmtree(self.repo_path)
+
+    def focus_in(self):
+        with patch.object(ModifiedTextEdit, "get_diffs", wraps=self.editor.get_diffs) as get_diffs:
+            self.editor.focusInEvent(QFocusEvent(QEvent.Type.FocusIn))
+        return get_diffs.call_count
+
+    def test_unchanged_file_skips_refresh(self):
+        with patch.object(git.Git, "execute") as execute:
+            self.assertEqual(self.focus_in(), 0)
+        execute.assert_not_called()
+
+    def test_changed_file_refreshes(self):
+        write_old(self.file_path, "one\nthree\n")
+        self.assertEqual(self.focus_in(), 1)
+        self.assertEqual(self.editor.toPlainText(), "one\nthree\n")
+        self.assertEqual(self.editor.line_modifications, {2: "modified"})
+        self.assertEqual(self.focus_in(), 0)
+
+    def test_index_change_refreshes(self):
+        write_old(self.file_path, "one\nthree\n")
+        self.focus_in()
+        self.repo.index.add([self.file_path])
+        self.repo.index.write()
+        self.assertEqual(self.focus_in(), 1)
+        self.assertEqual(self.editor.line_modifications, {})
+
+    def test_invalidate_fingerprint(self):
+        self.editor.invalidate_fingerprint()
+        self.assertEqual(self.focus_in(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -253,7 +253,7 @@ class TestGitManagerFileStatus(unittest.TestCase):
         self.assertNotIn(self.initial_file_rel, statuses["staged"])
         self.assertNotIn(self.initial_file_rel, statuses["untracked"])
 
-    def test_get_blame_data_date_format(self):
+    def test_get_blame_table_date_format(self):
         test_dt = datetime(2023, 5, 8, 10, 0, 0, tzinfo=timezone.utc)
 
         with open(self.initial_file_abs, "a") as f:
@@ -263,21 +263,101 @@ class TestGitManagerFileStatus(unittest.TestCase):
         author = Actor("Test Blamer", "blamer@example.com")
         c = self.repo.index.commit("Blame date test commit", author=author, commit_date=test_dt, author_date=test_dt)
 
-        blame_entries = self.git_manager.get_blame_data(self.initial_file_abs, commit_hash=c.hexsha)
+        table = self.git_manager.get_blame_table(self.initial_file_abs, commit_hash=c.hexsha)
 
         entry_checked = False
         correct_date_found = False
         expected_date_str = f"{test_dt.year}/{test_dt.month}/{test_dt.day}"
-        for entry in blame_entries:
-            if entry["commit_hash"] == c.hexsha:
+        for commit in table.commits:
+            if commit.commit_hash == c.hexsha:
                 entry_checked = True
-                if entry["committed_date"] == expected_date_str:
+                if commit.committed_date == expected_date_str:
                     correct_date_found = True
                     break
 
         self.assertTrue(entry_checked, f"No blame entries from the test commit {c.hexsha} were found to check the date.")
         self.assertTrue(correct_date_found, f"Date format test failed. Expected {expected_date_str}, but was not found for commit {c.hexsha}.")
 
+    def test_get_blame_table(self):
+        with open(self.initial_file_abs, "a") as f:
+            f.write("\nline added in second commit\n")
+        self.repo.index.add([self.initial_file_rel])
+        c = self.repo.index.commit("Second commit for blame table")
+
+        table = self.git_manager.get_blame_table(self.initial_file_rel, commit_hash=c.hexsha)
+        line_commits = [
+            commit for commit, lines in self.repo.blame(c.hexsha, self.initial_file_rel) for _ in lines
+        ]
+
+        self.assertEqual(len(table), len(line_commits))
+        self.assertEqual(len(table.commits), len({commit.hexsha for commit in line_commits}))
+        for line_index, expected in enumerate(line_commits):
+            commit = table.commit_at(line_index)
+            self.assertEqual(commit.commit_hash, expected.hexsha)
+            self.assertEqual(commit.author_name, expected.author.name)
+            committed = expected.committed_datetime
+            self.assertEqual(commit.committed_date, f"{committed.year}/{committed.month}/{committed.day}")
+            self.assertEqual(commit.message, expected.message)
+
+
+class TestGitManagerCommitCache(unittest.TestCase):
+    def setUp(self):
+        self.repo_path = tempfile.mkdtemp()
+        self.repo = git.Repo.init(self.repo_path)
+        self.git_manager = GitManager(self.repo_path)
+        self.git_manager.initialize()
+
+        file_abs = os.path.join(self.repo_path, "a.txt")
+        author = Actor("Cache Author", "cache@example.com")
+        self.commits = []
+        for i in range(3):
+            with open(file_abs, "w") as f:
+                f.write(f"content {i}")
+            self.repo.index.add(["a.txt"])
+            self.commits.append(self.repo.index.commit(f"Commit {i}\n\nBody {i}", author=author, committer=author))
+
+    def tearDown(self):
+        shutil.rmtree(self.repo_path)
+
+    def test_load_commits_matches_gitpython(self):
+        shas = [c.hexsha for c in self.commits]
+        infos = self.git_manager.load_commits(shas)
+        self.assertEqual(list(infos.keys()), shas)
+        for commit in self.commits:
+            info = infos[commit.hexsha]
+            self.assertEqual(info.hexsha, commit.hexsha)
+            self.assertEqual(info.tree, commit.tree.hexsha)
+            self.assertEqual(info.parents, tuple(p.hexsha for p in commit.parents))
+            self.assertEqual(info.author_name, "Cache Author")
+            self.assertEqual(info.author_email, "cache@example.com")
+            self.assertEqual(info.committed_date, commit.committed_date)
+            self.assertEqual(info.message, commit.message)
+        self.assertEqual(infos[shas[0]].summary, "Commit 0")
+
+    def test_load_commits_uses_cache_and_skips_unknown(self):
+        sha = self.commits[-1].hexsha
+        first = self.git_manager.get_commit_info(sha)
+        # 第二次读取应直接命中缓存，返回同一个对象
+        self.assertIs(self.git_manager.get_commit_info(sha), first)
+        # 非完整 sha 的 rev 也能解析
+        self.assertEqual(self.git_manager.get_commit_info("HEAD").hexsha, sha)
+        infos = self.git_manager.load_commits(["0" * 40, sha])
+        self.assertEqual(list(infos.keys()), [sha])
+
+    def test_get_commit_returns_cached_object(self):
+        sha = self.commits[0].hexsha
+        self.assertIs(self.git_manager.get_commit(sha), self.git_manager.get_commit(sha))
+
+    def test_get_refs_map(self):
+        with self.repo.config_writer() as config:
+            config.set_value("user", "name", "Cache Author")
+            config.set_value("user", "email", "cache@example.com")
+        self.repo.create_tag("v1", ref=self.commits[0], message="annotated tag")
+        refs_map = self.git_manager.get_refs_map()
+        self.assertIn(self.repo.active_branch.name, refs_map[self.commits[-1].hexsha])
+        # 附注标签应解引用到提交
+        self.assertIn("v1", refs_map[self.commits[0].hexsha])
+
 
 if __name__ == "__main__":
     unittest.main()
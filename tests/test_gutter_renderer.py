@@ -0,0 +1,58 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+from PyQt6.QtWidgets import QApplication
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from editors.gutter_renderer import GutterRenderer
+from editors.modified_text_edit import ModifiedTextEdit
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+class TestGutterRenderer(unittest.TestCase):
+    def setUp(self):
+        self.editor = ModifiedTextEdit()
+        self.editor.resize(400, 300)
+        self.editor.setPlainText("\n".join("line %d" % i for i in range(2000)))
+        self.editor.show()
+        app.processEvents()
+
+    def tearDown(self):
+        self.editor.close()
+
+    def count_renders(self, action):
+        render_strip = GutterRenderer._render_strip
+        with patch.object(GutterRenderer, "_render_strip", autospec=True, side_effect=render_strip) as render:
+            action()
+            self.editor.line_number_area.repaint()
+        return render.call_count
+
+    def test_strip_reused_while_scrolling(self):
+        self.editor.line_number_area.repaint()
+        self.assertEqual(self.count_renders(lambda: self.editor.verticalScrollBar().setValue(10)), 0)
+        # 滚出条带范围后重新绘制
+        self.assertEqual(self.count_renders(lambda: self.editor.verticalScrollBar().setValue(1000)), 1)
+
+    def test_invalidated_by_modifications_and_blame(self):
+        self.editor.line_number_area.repaint()
+        self.assertEqual(self.count_renders(lambda: self.editor.set_line_modifications({3: "added"})), 1)
+        blame = [{"commit_hash": "a" * 40, "author_name": "Alice", "committed_date": "2024/1/2"}] * 2000
+        self.assertEqual(self.count_renders(lambda: self.editor.set_blame_data(blame)), 1)
+        self.assertEqual(self.count_renders(lambda: None), 0)
+
+    def test_modification_mark_painted(self):
+        self.editor.set_line_modifications({1: "added"})
+        image = self.editor.line_number_area.grab().toImage()
+        top = self.editor.blockBoundingGeometry(self.editor.document().firstBlock()).translated(
+            self.editor.contentOffset()
+        )
+        y = int(top.center().y())
+        colors = {image.pixelColor(x, y).name() for x in range(image.width())}
+        self.assertIn(ModifiedTextEdit.LINE_STATUS_COLORS["added"].name(), colors)
+
+
+if __name__ == "__main__":
+    unittest.main()
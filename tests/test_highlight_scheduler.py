@@ -0,0 +1,89 @@
+import os
+import sys
+import unittest
+
+from PyQt6.QtGui import QSyntaxHighlighter, QTextCursor
+from PyQt6.QtWidgets import QApplication
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from editors.text_edit import SyncedTextEdit
+from highlight_scheduler import highlight_scheduler
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+class CountingHighlighter(QSyntaxHighlighter):
+    def __init__(self, document):
+        super().__init__(document)
+        self.highlighted = []
+        self.texts = set()
+
+    def highlightBlock(self, text):
+        self.highlighted.append(self.currentBlock().blockNumber())
+        self.texts.add(text)
+
+
+class TestHighlightScheduler(unittest.TestCase):
+    def setUp(self):
+        self.editor = SyncedTextEdit()
+        self.editor.resize(400, 300)
+        self.highlighter = CountingHighlighter(self.editor.document())
+        self.editor.setPlainText("\n".join("line %d" % i for i in range(5000)))
+        self.editor.show()
+        app.processEvents()
+        self.highlighter.highlighted.clear()
+        self.highlighter.texts.clear()
+
+    def tearDown(self):
+        highlight_scheduler.cancel(self.highlighter)
+        self.editor.close()
+
+    def _run_until_done(self):
+        while highlight_scheduler.is_pending(self.highlighter):
+            app.processEvents()
+
+    def test_visible_blocks_first(self):
+        highlight_scheduler.rehighlight(self.highlighter)
+        # 视口内的块立即高亮，其余的块留给之后的分片
+        visible = self.editor.firstVisibleBlock().blockNumber()
+        self.assertIn(visible, self.highlighter.highlighted)
+        self.assertLess(len(self.highlighter.highlighted), 100)
+        self.assertTrue(highlight_scheduler.is_pending(self.highlighter))
+
+        self._run_until_done()
+        self.assertEqual(sorted(set(self.highlighter.highlighted)), list(range(5000)))
+        # 每个块只高亮一次
+        self.assertEqual(len(self.highlighter.highlighted), 5000)
+
+    def test_range(self):
+        self.editor.verticalScrollBar().setValue(3000)
+        highlight_scheduler.rehighlight(self.highlighter, 100, 200)
+        self._run_until_done()
+        self.assertEqual(sorted(self.highlighter.highlighted), list(range(100, 200)))
+
+    def test_edit_while_pending(self):
+        highlight_scheduler.rehighlight(self.highlighter)
+        cursor = QTextCursor(self.editor.document().findBlockByNumber(10))
+        cursor.insertText("a\nb\nc\n")
+        self.assertEqual(self.editor.document().blockCount(), 5003)
+        self._run_until_done()
+        # 修改之后的块号整体后移，按文本检查每一块都被高亮过
+        self.assertEqual(self.highlighter.texts, set(self.editor.toPlainText().split("\n")))
+
+    def test_hidden_editor_has_lower_priority(self):
+        other = SyncedTextEdit()
+        other_highlighter = CountingHighlighter(other.document())
+        other.setPlainText("x\n" * 10)
+        highlight_scheduler.rehighlight(other_highlighter)
+        highlight_scheduler.rehighlight(self.highlighter)
+        jobs = highlight_scheduler._jobs
+        self.assertGreater(
+            highlight_scheduler._priority(jobs[id(other_highlighter)]),
+            highlight_scheduler._priority(jobs[id(self.highlighter)]),
+        )
+        self._run_until_done()
+        highlight_scheduler.cancel(other_highlighter)
+
+
+if __name__ == "__main__":
+    unittest.main()
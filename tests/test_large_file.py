@@ -0,0 +1,79 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from PyQt6.QtWidgets import QApplication
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from editors.modified_text_edit import ModifiedTextEdit
+from large_file import is_large_text, split_long_lines
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+THRESHOLDS = {"size": 1024, "lines": 100, "max_line_length": 10}
+
+
+class TestLargeFileHelpers(unittest.TestCase):
+    def test_split_long_lines(self):
+        text, count = split_long_lines("short\n" + "x" * 25 + "\nend", 10)
+        self.assertEqual(text, "short\n" + "x" * 10 + "\n" + "x" * 10 + "\n" + "x" * 5 + "\nend")
+        self.assertEqual(count, 1)
+
+    def test_split_long_lines_unchanged(self):
+        self.assertEqual(split_long_lines("a\nb", 10), ("a\nb", 0))
+
+    def test_is_large_text(self):
+        self.assertFalse(is_large_text("a\nb\n", THRESHOLDS))
+        self.assertTrue(is_large_text("a\n" * 100, THRESHOLDS))
+        self.assertTrue(is_large_text("a\n" + "x" * 11, THRESHOLDS))
+
+
+class TestLargeFileEditor(unittest.TestCase):
+    def setUp(self):
+        self.editor = ModifiedTextEdit()
+        self.editor.resize(400, 300)
+        handle, self.file_path = tempfile.mkstemp(suffix=".txt")
+        os.close(handle)
+        self.editor.file_path = self.file_path
+
+    def tearDown(self):
+        self.editor.close()
+        os.remove(self.file_path)
+
+    def _wait_loaded(self):
+        deadline = time.time() + 10
+        while self.editor.is_loading() and time.time() < deadline:
+            app.processEvents()
+        self.assertFalse(self.editor.is_loading())
+
+    def test_load_in_chunks(self):
+        lines = ["line %d" % i for i in range(50000)] + ["y" * 25]
+        with open(self.file_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+
+        with patch("large_file.LOAD_CHUNK_CHARS", 4096), patch("threads.LOAD_CHUNK_CHARS", 4096), patch(
+            "settings.settings.get_large_file_thresholds", return_value=THRESHOLDS
+        ):
+            self.editor.load_large_file(self.file_path)
+            self._wait_loaded()
+
+        expected, _ = split_long_lines("\n".join(lines), THRESHOLDS["max_line_length"])
+        self.assertEqual(self.editor.toPlainText(), expected)
+        self.assertTrue(self.editor.large_file)
+        self.assertTrue(self.editor.isReadOnly())
+        self.assertFalse(self.editor.document().isModified())
+        self.assertEqual(self.editor.textCursor().position(), 0)
+        self.assertIn("超长行", self.editor.large_file_label.text())
+
+    def test_line_modifications_ignored(self):
+        with patch("settings.settings.get_large_file_thresholds", return_value=THRESHOLDS):
+            self.editor.load_large_file(self.file_path, "a\nb")
+        self.editor.set_line_modifications({1: "added"})
+        self.assertEqual(self.editor.line_modifications, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
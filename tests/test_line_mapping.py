@@ -0,0 +1,47 @@
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from diff_calculator import DiffChunk
+from line_mapping import LineMapping
+
+CHUNKS = [
+    DiffChunk(0, 5, 0, 5, "equal"),
+    DiffChunk(5, 5, 5, 8, "insert"),
+    DiffChunk(5, 8, 8, 8, "delete"),
+    DiffChunk(8, 15, 8, 15, "equal"),
+    DiffChunk(15, 20, 15, 18, "replace"),
+    DiffChunk(20, 25, 18, 23, "equal"),
+]
+
+
+class TestLineMapping(unittest.TestCase):
+    def test_forward(self):
+        mapping = LineMapping.from_chunks(CHUNKS)
+        self.assertEqual(mapping.map(3), 3)
+        # 插入块之后的行
+        self.assertEqual(mapping.map(5), 8)
+        # 删除块内的行都映射到删除位置
+        self.assertEqual(mapping.map(6.5), 8)
+        self.assertAlmostEqual(mapping.map(17), 16.2)
+        # 最后一个块之后按斜率 1 外推
+        self.assertEqual(mapping.map(30), 28)
+
+    def test_reverse(self):
+        mapping = LineMapping.from_chunks(CHUNKS, reverse=True)
+        self.assertEqual(mapping.map(6.5), 5)
+        self.assertEqual(mapping.map(8), 8)
+        self.assertEqual(mapping.map(28), 30)
+
+    def test_monotone(self):
+        mapping = LineMapping.from_chunks(CHUNKS)
+        values = [mapping.map(line / 4) for line in range(0, 120)]
+        self.assertEqual(values, sorted(values))
+
+    def test_empty_chunks_is_identity(self):
+        self.assertEqual(LineMapping.from_chunks([]).map(12.5), 12.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
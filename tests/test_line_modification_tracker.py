@@ -0,0 +1,119 @@
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import git
+from PyQt6.QtGui import QTextCursor
+from PyQt6.QtWidgets import QApplication, QWidget
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from diff_calculator import create_diff_calculator
+from editors.modified_text_edit import ModifiedTextEdit
+from git_manager import GitManager
+from line_modification_tracker import LineModificationTracker
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+def lines_text(lines):
+    return "".join(line + "\n" for line in lines)
+
+
+class TestLineModificationTracker(unittest.TestCase):
+    def setUp(self):
+        self.calculator = create_diff_calculator("histogram")
+
+    def assert_valid(self, tracker, base, current):
+        """差异块依次覆盖两侧的所有行，equal 块两侧内容相同"""
+        left = right = 0
+        for chunk in tracker.chunks:
+            self.assertEqual((chunk.left_start, chunk.right_start), (left, right))
+            if chunk.type == "equal":
+                self.assertEqual(base[chunk.left_start : chunk.left_end], current[chunk.right_start : chunk.right_end])
+            left, right = chunk.left_end, chunk.right_end
+        self.assertEqual((left, right), (len(base), len(current)))
+
+    def test_single_edit(self):
+        base = ["line %d" % i for i in range(100)]
+        current = list(base)
+        tracker = LineModificationTracker()
+        tracker.reset(base, self.calculator.compute_diff(lines_text(base), lines_text(current)), len(current))
+
+        current[50:51] = ["changed", "inserted"]
+        tracker.note_change(50, len(current) - 52)
+        requested = []
+
+        def get_lines(start, end):
+            requested.append((start, end))
+            return current[start:end]
+
+        self.assertTrue(tracker.update(len(current), get_lines, self.calculator))
+        self.assertEqual(requested, [(50, 52)])
+        self.assertEqual(tracker.modifications(), {51: "modified", 52: "modified"})
+        self.assert_valid(tracker, base, current)
+
+    def test_random_edits(self):
+        rng = random.Random(0)
+        for _ in range(300):
+            base = [rng.choice("abcde") for _ in range(rng.randint(0, 30))]
+            current = list(base)
+            tracker = LineModificationTracker()
+            tracker.reset(base, self.calculator.compute_diff(lines_text(base), lines_text(current)), len(current))
+            for _ in range(rng.randint(1, 6)):
+                start = rng.randint(0, len(current))
+                end = rng.randint(start, min(len(current), start + 3))
+                inserted = [rng.choice("abcdefx") for _ in range(rng.randint(0, 3))]
+                current[start:end] = inserted
+                tracker.note_change(start, len(current) - start - len(inserted))
+                if rng.random() < 0.5:
+                    tracker.update(len(current), lambda s, e: current[s:e], self.calculator)
+                    self.assert_valid(tracker, base, current)
+            tracker.update(len(current), lambda s, e: current[s:e], self.calculator)
+            self.assert_valid(tracker, base, current)
+
+
+class TestEditorLiveModifications(unittest.TestCase):
+    def setUp(self):
+        self.repo_path = tempfile.mkdtemp()
+        self.repo = git.Repo.init(self.repo_path)
+        self.file_path = os.path.join(self.repo_path, "a.txt")
+        content = "".join("line %d\n" % i for i in range(1000))
+        with open(self.file_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        self.repo.index.add([self.file_path])
+        self.repo.index.commit("init")
+
+        self.container = QWidget()
+        self.container.git_manager = GitManager(self.repo_path)
+        self.container.git_manager.initialize()
+        self.editor = ModifiedTextEdit(self.container)
+        self.editor.file_path = self.file_path
+        self.editor.setPlainText(content)
+        self.editor.set_line_modifications(self.editor.get_diffs(self.container.git_manager))
+
+    def tearDown(self):
+        self.container.close()
+        shutil.rmtree(self.repo_path)
+
+    def test_typing_updates_marks_without_full_diff(self):
+        cursor = QTextCursor(self.editor.document().findBlockByNumber(500))
+        with patch("editors.modified_text_edit.diff_result_cache.compute_diff") as full_diff:
+            cursor.insertText("edited ")
+            app.processEvents()
+            QTextCursor(self.editor.document().findBlockByNumber(700)).insertText("new line\n")
+            app.processEvents()
+        full_diff.assert_not_called()
+        self.assertEqual(self.editor.line_modifications, {501: "modified", 701: "added"})
+
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText("tail")
+        app.processEvents()
+        self.assertEqual(self.editor.line_modifications, {501: "modified", 701: "added", 1002: "added"})
+
+
+if __name__ == "__main__":
+    unittest.main()
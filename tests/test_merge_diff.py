@@ -0,0 +1,71 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from diff_calculator import HistogramCalculator
+from merge_diff import REGION_BOTH, REGION_CONFLICT, REGION_EQUAL, REGION_PARENT1, REGION_PARENT2, compute_merge_regions
+
+
+def merge_regions(parent1, result, parent2):
+    calculator = HistogramCalculator()
+    parent1_text, result_text, parent2_text = ("\n".join(lines) for lines in (parent1, result, parent2))
+    return compute_merge_regions(
+        calculator.compute_diff(parent1_text, result_text),
+        calculator.compute_diff(result_text, parent2_text),
+        parent1,
+        parent2,
+    )
+
+
+class TestMergeRegions(unittest.TestCase):
+    def test_classification(self):
+        parent1 = ["a", "b", "c", "d", "e", "f", "g"]
+        parent2 = ["a", "B", "c", "d", "E", "f", "x"]
+        result = ["a", "B", "c", "D", "e", "f", "y"]
+        regions = merge_regions(parent1, result, parent2)
+        self.assertEqual(
+            [(region.result_start, region.result_end, region.type) for region in regions],
+            [
+                (0, 1, REGION_EQUAL),
+                (1, 2, REGION_PARENT1),
+                (2, 3, REGION_EQUAL),
+                (3, 5, REGION_CONFLICT),
+                (5, 6, REGION_EQUAL),
+                (6, 7, REGION_CONFLICT),
+            ],
+        )
+        # 两个父版本相同，只有 result 不同
+        regions = merge_regions(["a", "b", "c"], ["a", "X", "c"], ["a", "b", "c"])
+        self.assertEqual([region.type for region in regions], [REGION_EQUAL, REGION_BOTH, REGION_EQUAL])
+        regions = merge_regions(["a", "b"], ["a", "b", "c"], ["a", "b", "c"])
+        self.assertEqual([region.type for region in regions], [REGION_EQUAL, REGION_PARENT1])
+        self.assertEqual((regions[1].parent1_start, regions[1].parent1_end), (2, 2))
+
+    def test_random_regions_cover_all_lines(self):
+        random.seed(2)
+        for _ in range(300):
+            texts = [[random.choice("abcd") for _ in range(random.randint(0, 12))] for _ in range(3)]
+            parent1, result, parent2 = texts
+            regions = merge_regions(parent1, result, parent2)
+            positions = (0, 0, 0)
+            for region in regions:
+                self.assertEqual((region.parent1_start, region.result_start, region.parent2_start), positions)
+                positions = (region.parent1_end, region.result_end, region.parent2_end)
+                p1 = parent1[region.parent1_start : region.parent1_end]
+                res = result[region.result_start : region.result_end]
+                p2 = parent2[region.parent2_start : region.parent2_end]
+                if region.type == REGION_EQUAL:
+                    self.assertTrue(p1 == res == p2)
+                elif region.type == REGION_PARENT1:
+                    self.assertEqual(res, p2)
+                elif region.type == REGION_PARENT2:
+                    self.assertEqual(res, p1)
+                elif region.type == REGION_BOTH:
+                    self.assertEqual(p1, p2)
+            self.assertEqual(positions, (len(parent1), len(result), len(parent2)))
+
+
+if __name__ == "__main__":
+    unittest.main()
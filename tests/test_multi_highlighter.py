@@ -4,7 +4,9 @@ from PyQt6.QtGui import QColor, QTextCharFormat, QTextDocument
 from PyQt6.QtWidgets import QApplication
 
 from diff_calculator import DiffChunk  # Assuming this is in diff_calculator
-from diff_highlighter import MultiHighlighter  # Assuming these are in diff_highlighter
+from diff_highlighter import DiffHighlighter, MultiHighlighter  # Assuming these are in diff_highlighter
+from merge_diff import REGION_CONFLICT, REGION_EQUAL, REGION_PARENT1
+from text_diff_viewer import MergeDiffViewer
 
 # QApplication instance is necessary for many Qt classes, including QTextDocument.
 # It's good practice to create it once, especially if running multiple tests.
@@ -170,5 +172,97 @@ class TestMultiHighlighterNewLineScenarios(unittest.TestCase):
         # )
 
 
+class TestBlockRunsTable(unittest.TestCase):
+    def test_runs_use_utf16_offsets_per_block(self):
+        left_text = "same\n😀 old\nkeep"
+        right_text = "same\n😀 new\nkeep"
+        doc_left = QTextDocument()
+        doc_right = QTextDocument()
+        doc_left.setPlainText(left_text)
+        doc_right.setPlainText(right_text)
+        highlighter_left = MultiHighlighter(doc_left, editor_type="left", other_document=doc_right)
+        highlighter_right = MultiHighlighter(doc_right, editor_type="right", other_document=doc_left)
+        chunks = [
+            DiffChunk(left_start=0, left_end=1, right_start=0, right_end=1, type="equal"),
+            DiffChunk(left_start=1, left_end=2, right_start=1, right_end=2, type="replace"),
+            DiffChunk(left_start=2, left_end=3, right_start=2, right_end=3, type="equal"),
+        ]
+        for highlighter in (highlighter_left, highlighter_right):
+            highlighter.set_diff_chunks(chunks)
+            highlighter.set_texts(left_text, right_text)
+
+        # 只有第二行有格式，emoji 占两个 UTF-16 单元，"old"/"new" 从第 3 个单元开始
+        left_runs = highlighter_left.diff_engine._block_runs
+        right_runs = highlighter_right.diff_engine._block_runs
+        self.assertEqual(list(left_runs), [1])
+        self.assertEqual([(start, length) for start, length, _ in left_runs[1]], [(3, 3)])
+        self.assertEqual([(start, length) for start, length, _ in right_runs[1]], [(3, 3)])
+        self.assertIs(left_runs[1][0][2], highlighter_left.diff_engine.deleted_format)
+        self.assertIs(right_runs[1][0][2], highlighter_right.diff_engine.inserted_format)
+
+
+class TestDiffHighlighterIndex(unittest.TestCase):
+    def _background(self, document, line_number):
+        for frange in document.findBlockByNumber(line_number).layout().formats():
+            if frange.format.hasProperty(QTextCharFormat.Property.BackgroundBrush):
+                return frange.format.background().color().name()
+        return None
+
+    def test_chunk_lookup_per_side(self):
+        document = QTextDocument()
+        document.setPlainText("a\nb\nc\nd")
+        highlighter = DiffHighlighter(document, editor_type="right")
+        highlighter.set_diff_chunks(
+            [
+                DiffChunk(left_start=0, left_end=1, right_start=0, right_end=1, type="equal"),
+                DiffChunk(left_start=1, left_end=1, right_start=1, right_end=3, type="insert"),
+                DiffChunk(left_start=1, left_end=2, right_start=3, right_end=4, type="equal"),
+            ]
+        )
+        highlighter.rehighlight()
+        self.assertEqual(
+            [self._background(document, line) for line in range(4)], [None, "#ccffcc", "#ccffcc", None]
+        )
+
+    def test_result_edit_conflict(self):
+        document = QTextDocument()
+        document.setPlainText("a\nb")
+        highlighter = DiffHighlighter(document, editor_type="result_edit")
+        highlighter.set_diff_chunks([DiffChunk(left_start=1, left_end=2, right_start=1, right_end=2, type="replace")])
+        highlighter.rehighlight()
+        self.assertEqual([self._background(document, line) for line in range(2)], [None, "#ffccff"])
+
+
+class TestMergeRegionFormats(unittest.TestCase):
+    def _format_at_line_start(self, document, line_number):
+        for frange in document.findBlockByNumber(line_number).layout().formats():
+            if frange.start == 0:
+                return frange.format
+        return None
+
+    def test_conflict_and_one_sided_regions_get_different_formats(self):
+        parent1 = "line a\nline b\nline c\nline d\nline e"
+        result = "line a\nline B\nline c\nline D\nline e"
+        parent2 = "line a\nline B\nline c\nline X\nline e"
+        viewer = MergeDiffViewer()
+        viewer.set_texts(parent1, result, parent2, "a.txt", None, None, None)
+        self.assertEqual(
+            [(region.result_start, region.type) for region in viewer.merge_regions if region.type != REGION_EQUAL],
+            [(1, REGION_PARENT1), (3, REGION_CONFLICT)],
+        )
+
+        highlighter = viewer.result_edit.highlighter
+        highlighter.rehighlight()
+        document = viewer.result_edit.document()
+        formats = highlighter.diff_engine.region_formats
+        # "line " 没有字符级差异，行首保留区域的整行背景
+        self.assertIsNone(self._format_at_line_start(document, 0))
+        one_sided = self._format_at_line_start(document, 1)
+        conflict = self._format_at_line_start(document, 3)
+        self.assertEqual(one_sided.background(), formats[REGION_PARENT1].background())
+        self.assertEqual(conflict.background(), formats[REGION_CONFLICT].background())
+        self.assertNotEqual(one_sided.background(), conflict.background())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import unittest
+from unittest.mock import patch
+
+from PyQt6.QtWidgets import QApplication
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from diff_calculator import DiffChunk, diff_dict_from_chunks
+from editors.modified_text_edit import ModifiedTextEdit, OverViewBar
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+class TestOverViewBar(unittest.TestCase):
+    def setUp(self):
+        self.editor = ModifiedTextEdit()
+        self.editor.setPlainText("".join("line %d\n" % i for i in range(1000)))
+        self.editor.resize(400, 300)
+        self.bar = self.editor.overview_bar
+
+    def tearDown(self):
+        self.editor.close()
+
+    def test_buckets_keep_highest_priority(self):
+        self.bar.set_line_ranges([(0, 100, "added"), (50, 51, "deleted"), (500, 1000, "modified")])
+        statuses, search = self.bar.compute_buckets(100, 1000)
+        self.assertEqual(statuses[0], OverViewBar.STATUS_CODES["added"])
+        self.assertEqual(statuses[5], OverViewBar.STATUS_CODES["deleted"])
+        self.assertEqual(statuses[20], 0)
+        self.assertEqual(statuses[99], OverViewBar.STATUS_CODES["modified"])
+        self.assertEqual(search, bytearray(100))
+
+    def test_ranges_from_chunks_match_modifications(self):
+        chunks = [
+            DiffChunk(0, 2, 0, 2, "equal"),
+            DiffChunk(2, 3, 2, 4, "replace"),
+            DiffChunk(3, 3, 4, 6, "insert"),
+            DiffChunk(3, 5, 6, 6, "delete"),
+        ]
+        by_line = {}
+        for start, end, status in OverViewBar._ranges_from_chunks(chunks):
+            for line in range(start, end):
+                by_line[line + 1] = status
+        self.assertEqual(by_line, diff_dict_from_chunks(chunks))
+
+    def test_paint_uses_cached_pixmap(self):
+        self.editor.set_line_modifications({line: "modified" for line in range(1, 1001)})
+        self.bar.grab()
+        with patch.object(OverViewBar, "compute_buckets") as compute:
+            self.bar.grab()
+            self.editor.verticalScrollBar().setValue(100)
+            self.bar.grab()
+        compute.assert_not_called()
+
+        self.bar.resize(self.bar.width(), self.bar.height() + 10)
+        with patch.object(OverViewBar, "compute_buckets", wraps=self.bar.compute_buckets) as compute:
+            self.bar.grab()
+        compute.assert_called_once()
+
+    def test_large_modification_count(self):
+        ranges = [(line, line + 1, "added") for line in range(100000)]
+        self.bar.set_line_ranges(ranges)
+        self.bar.grab()
+        start = time.perf_counter()
+        for _ in range(100):
+            self.bar.repaint()
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+    def test_search_hits(self):
+        self.editor.find_text("LINE 99", case_sensitive=False)
+        self.assertEqual(self.bar._search_lines, [99] + list(range(990, 1000)))
+        self.editor.clear_search_highlights()
+        self.assertEqual(self.bar._search_lines, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
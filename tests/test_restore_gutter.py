@@ -0,0 +1,63 @@
+import os
+import sys
+import unittest
+
+from PyQt6.QtCore import QPoint, QPointF, Qt
+from PyQt6.QtGui import QMouseEvent
+from PyQt6.QtWidgets import QApplication
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from diff_calculator import DiffChunk
+from text_diff_viewer import DiffViewer
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+class TestRestoreGutter(unittest.TestCase):
+    def setUp(self):
+        self.viewer = DiffViewer()
+        self.viewer.resize(800, 300)
+        self.viewer.show()
+        self.viewer.left_edit.setPlainText("\n".join("line %d" % i for i in range(2000)))
+        self.chunks = [DiffChunk(i, i + 1, i, i + 1, "replace") for i in range(0, 2000, 4)]
+        self.gutter = self.viewer.restore_gutter
+        self.gutter.show()
+        self.gutter.set_chunks(self.chunks)
+        app.processEvents()
+
+    def tearDown(self):
+        self.viewer.close()
+
+    def _click(self, y):
+        pos = QPointF(self.gutter.width() / 2, y)
+        event = QMouseEvent(
+            QMouseEvent.Type.MouseButtonPress,
+            pos,
+            QPointF(self.gutter.mapToGlobal(QPoint(int(pos.x()), y))),
+            Qt.MouseButton.LeftButton,
+            Qt.MouseButton.LeftButton,
+            Qt.KeyboardModifier.NoModifier,
+        )
+        self.gutter.mousePressEvent(event)
+
+    def test_only_visible_chunks_are_painted(self):
+        self.viewer.left_edit.verticalScrollBar().setValue(1000)
+        self.gutter.repaint()
+        starts = [chunk.left_start for chunk in self.gutter._marker_chunks]
+        self.assertTrue(starts)
+        self.assertLess(len(starts), 100)
+        self.assertGreaterEqual(starts[0], 1000)
+
+    def test_click_emits_chunk(self):
+        self.gutter.repaint()
+        clicked = []
+        self.gutter.restore_requested.connect(clicked.append)
+        self._click(self.gutter._marker_tops[1] + 2)
+        self.assertEqual(clicked, [self.chunks[1]])
+        # 标记之间的空白处不触发还原
+        self._click(self.gutter._marker_tops[1] - 2)
+        self.assertEqual(clicked, [self.chunks[1]])
+
+
+if __name__ == "__main__":
+    unittest.main()
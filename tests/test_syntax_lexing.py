@@ -0,0 +1,276 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from pygments.lexers import HtmlLexer, JavaLexer, JavascriptLexer, MarkdownLexer, PythonLexer
+from pygments.token import STANDARD_TYPES, Keyword, String
+
+import syntax_lexing
+from syntax_lexing import TokenRunCache, lex_document, relex
+from utils import count_utf16_code_units
+
+# 用 token 类型本身代替 QTextCharFormat，便于比较
+FORMATS = {String.Doc: String.Doc, Keyword: Keyword}
+
+SOURCE = ["def f():", '    """first', "    second", '    """', "    return 1"]
+
+# 每种 token 类型都有格式，用于和 Pygments 的结果逐个比较
+ALL_FORMATS = {token_type: token_type for token_type in STANDARD_TYPES}
+
+JAVASCRIPT_SOURCE = """/* block
+   comment */
+const re = /a[/]b\\/g, s = `x ${1 + `y`}
+z`;
+function f(a) {
+    // line comment
+    return a.replace(re, "q\\"") / 2;
+}
+"""
+
+JAVA_SOURCE = """package a.b;
+
+/**
+ * Javadoc
+ */
+@Deprecated
+public class A<T> extends B implements C {
+    private static final String S = "s\\n";
+    char c = '\\'';
+    int f(int x) { return x >>> 1; }
+}
+"""
+
+HTML_SOURCE = """<!DOCTYPE html>
+<html>
+<head>
+<style>
+body { color: red; }
+</style>
+<script type="text/javascript">
+var x = "</p>";
+/* comment */
+</script>
+</head>
+<body class="a"
+      id='b'>
+<!-- multi
+line -->
+<p>text &amp; more</p>
+</body>
+</html>
+"""
+
+MARKDOWN_SOURCE = """# Title
+
+Some *emphasis* and **strong** text with `code` and [link](http://example.com).
+
+- item one
+- item two
+  continued
+
+```python
+def f():
+    return 1
+```
+
+> quote
+> more
+
+1. first
+2. second
+"""
+
+
+class TestSyntaxLexing(unittest.TestCase):
+    def setUp(self):
+        self.lexer = PythonLexer()
+
+    def test_multiline_string(self):
+        tables = lex_document(self.lexer, FORMATS, SOURCE)
+        self.assertEqual(len(tables), len(SOURCE))
+        self.assertEqual(tables.runs[0], ((0, 3, Keyword),))
+        # 文档字符串中间的行也使用字符串格式
+        self.assertEqual(tables.runs[2], ((0, 10, String.Doc),))
+        self.assertEqual(tables.runs[4], ((4, 6, Keyword),))
+        # 位于字符串中间的行首不能作为检查点
+        self.assertIsNone(tables.states[2])
+        self.assertEqual(tables.states[4], ("root",))
+
+    def test_relex_matches_full_lex(self):
+        lines = SOURCE * 50
+        tables = lex_document(self.lexer, FORMATS, lines)
+        # 在第 0 行前插入一行文档字符串开头，之后所有行的含义都改变
+        lines = ['"""'] + lines
+        start, end = relex(tables, self.lexer, FORMATS, lines, 0, 0, 1)
+        full = lex_document(self.lexer, FORMATS, lines)
+        self.assertEqual((start, end), (0, len(lines)))
+        self.assertEqual(tables.runs, full.runs)
+        self.assertEqual(tables.states, full.states)
+
+        # 删除第 0 行
+        lines = lines[1:]
+        relex(tables, self.lexer, FORMATS, lines, 0, 0, -1)
+        full = lex_document(self.lexer, FORMATS, lines)
+        self.assertEqual(tables.runs, full.runs)
+        self.assertEqual(tables.states, full.states)
+
+    def test_relex_converges(self):
+        lines = SOURCE * 200
+        tables = lex_document(self.lexer, FORMATS, lines)
+        lines[100] = "    return 2"
+        start, end = relex(tables, self.lexer, FORMATS, lines, 100, 100, 0)
+        # 状态在修改行之后立即收敛，只需重新高亮修改的行
+        self.assertLessEqual(start, 100)
+        self.assertLess(end, 110)
+        full = lex_document(self.lexer, FORMATS, lines)
+        self.assertEqual(tables.runs, full.runs)
+
+    def test_relex_after_closing_docstring(self):
+        lines = ["def f():", '    """Doc', "    x = 1"]
+        tables = lex_document(self.lexer, FORMATS, lines)
+        # 补上文档字符串的结尾后，第 1 行行首的文档字符串规则才能匹配，需要从该行之前重新分析
+        lines[2] = '    x = 1"""'
+        start, _ = relex(tables, self.lexer, FORMATS, lines, 2, 2, 0)
+        full = lex_document(self.lexer, FORMATS, lines)
+        self.assertLessEqual(start, 1)
+        self.assertEqual(tables.runs, full.runs)
+        self.assertEqual(tables.states, full.states)
+        self.assertEqual(tables.runs[1], ((4, 6, String.Doc),))
+
+    def test_non_ascii_positions(self):
+        tables = lex_document(self.lexer, FORMATS, ['x = "😀"; def'])
+        # 位置按 UTF-16 计算，表情符号占两个单位
+        self.assertEqual(tables.runs[0], ((10, 3, Keyword),))
+
+    def test_window_grows_until_end(self):
+        lines = SOURCE * 20
+        tables = lex_document(self.lexer, FORMATS, lines)
+        lines = ['"""'] + lines
+        old_window = syntax_lexing.RELEX_WINDOW_LINES
+        syntax_lexing.RELEX_WINDOW_LINES = 2
+        try:
+            relex(tables, self.lexer, FORMATS, lines, 0, 0, 1)
+        finally:
+            syntax_lexing.RELEX_WINDOW_LINES = old_window
+        self.assertEqual(tables.runs, lex_document(self.lexer, FORMATS, lines).runs)
+
+
+def pygments_runs(lexer, lines):
+    """直接用 lexer.get_tokens_unprocessed 分析整个文本，按行切分 token，位置为 UTF-16 单位"""
+    text = "\n".join(lines) + "\n"
+    runs = [[] for _ in lines]
+    line = column = 0
+    for _pos, token_type, value in lexer.get_tokens_unprocessed(text):
+        for index, piece in enumerate(value.split("\n")):
+            if index:
+                line += 1
+                column = 0
+            length = count_utf16_code_units(piece)
+            if length and token_type in ALL_FORMATS and line < len(lines):
+                runs[line].append((column, length, token_type))
+            column += length
+    return [tuple(line_runs) for line_runs in runs]
+
+
+class TestMatchesPygments(unittest.TestCase):
+    """_regex_events 复制了 RegexLexer.get_tokens_unprocessed 的分析循环，升级 Pygments 后必须仍然相同"""
+
+    def _check(self, lexer, source):
+        self.assertTrue(syntax_lexing.supports_checkpoints(lexer))
+        lines = source.split("\n")
+        expected = pygments_runs(lexer, lines)
+        self.assertEqual(lex_document(lexer, ALL_FORMATS, lines).runs, expected)
+        cache = TokenRunCache()
+        self.assertEqual(lex_document(lexer, ALL_FORMATS, lines, cache).runs, expected)
+        self.assertEqual(lex_document(lexer, ALL_FORMATS, lines, cache).runs, expected)
+
+    def test_python(self):
+        # 最后一行的 $? 没有规则匹配，产生 Error token
+        self._check(PythonLexer(), "\n".join(SOURCE) + '\nx = f"{a!r:>{w}}" + r"\\d" + b\'\\x00\'\ny = $?\n')
+        with open(os.path.join(os.path.dirname(__file__), "..", "syntax_lexing.py"), encoding="utf-8") as f:
+            self._check(PythonLexer(), f.read())
+
+    def test_c_like(self):
+        self._check(JavascriptLexer(), JAVASCRIPT_SOURCE)
+        self._check(JavaLexer(), JAVA_SOURCE)
+
+    def test_html(self):
+        self._check(HtmlLexer(), HTML_SOURCE)
+
+    def test_markdown(self):
+        self._check(MarkdownLexer(), MARKDOWN_SOURCE)
+
+    def test_unparsable_rules_fall_back_to_full_lex(self):
+        class OtherPythonLexer(PythonLexer):
+            pass
+
+        lexer = OtherPythonLexer()
+        lines = SOURCE * 3
+        with patch("syntax_lexing._rule_guard", side_effect=TypeError), self.assertLogs(level="ERROR"):
+            self.assertFalse(syntax_lexing.supports_checkpoints(lexer))
+        self.assertEqual(lex_document(lexer, ALL_FORMATS, lines).runs, pygments_runs(lexer, lines))
+
+
+class TestTokenRunCache(unittest.TestCase):
+    def setUp(self):
+        self.lexer = PythonLexer()
+
+    def test_cached_lines_match_full_lex(self):
+        with open(os.path.join(os.path.dirname(__file__), "..", "syntax_lexing.py"), encoding="utf-8") as f:
+            lines = f.read().split("\n")
+        expected = lex_document(self.lexer, FORMATS, lines)
+        cache = TokenRunCache()
+        self.assertEqual(lex_document(self.lexer, FORMATS, lines, cache).runs, expected.runs)
+        self.assertGreater(len(cache), 0)
+        # 第二次全部来自缓存
+        self.assertEqual(lex_document(self.lexer, FORMATS, lines, cache).runs, expected.runs)
+        # 修改后的文档只有修改的行需要分析
+        lines[10] = "x = 1"
+        self.assertEqual(
+            lex_document(self.lexer, FORMATS, lines, cache).runs, lex_document(self.lexer, FORMATS, lines).runs
+        )
+
+    def test_cross_line_rules_not_reused(self):
+        cache = TokenRunCache()
+        # 文档字符串没有结束时第 1 行行首的文档字符串规则不匹配，该行的结果不能用于结束了的文档字符串
+        unclosed = ["def f():", '    """Doc', "    x = 1"]
+        lex_document(self.lexer, FORMATS, unclosed, cache)
+        closed = unclosed + ['    """']
+        self.assertEqual(
+            lex_document(self.lexer, FORMATS, closed, cache).runs, lex_document(self.lexer, FORMATS, closed).runs
+        )
+        self.assertEqual(
+            lex_document(self.lexer, FORMATS, unclosed, cache).runs, lex_document(self.lexer, FORMATS, unclosed).runs
+        )
+
+    def test_relex_with_cache(self):
+        lines = SOURCE * 50
+        cache = TokenRunCache()
+        tables = lex_document(self.lexer, FORMATS, lines, cache)
+        lines = ['"""'] + lines
+        relex(tables, self.lexer, FORMATS, lines, 0, 0, 1, cache)
+        self.assertEqual(tables.runs, lex_document(self.lexer, FORMATS, lines).runs)
+
+    def test_bounded(self):
+        cache = TokenRunCache(max_entries=10)
+        lex_document(self.lexer, FORMATS, ["x%d = %d" % (i, i) for i in range(100)], cache)
+        self.assertEqual(len(cache), 10)
+        cache = TokenRunCache(max_bytes=2000)
+        lex_document(self.lexer, FORMATS, ["x%d = %d" % (i, i) for i in range(100)], cache)
+        self.assertLessEqual(cache.memory_bytes, 2000)
+
+    def test_cleared_when_formats_change(self):
+        cache = TokenRunCache()
+        lex_document(self.lexer, FORMATS, SOURCE * 2, cache)
+        self.assertGreater(len(cache), 0)
+        other_formats = {Keyword: "keyword"}
+        # 文档第一行不使用缓存，查找第二行时发现格式表改变
+        tables = lex_document(self.lexer, other_formats, ["x = 1", "def f():"], cache)
+        self.assertEqual(tables.runs[1], ((0, 3, "keyword"),))
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+from pygments.token import Keyword
+from PyQt6.QtGui import QTextDocument
+from PyQt6.QtWidgets import QApplication
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from settings import settings
+from syntax_highlighter import CodeHighlighter, SyntaxStyleRegistry, syntax_style_registry
+from syntax_lexing import lex_document
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+
+class TestSyntaxStyleRegistry(unittest.TestCase):
+    def test_lexer_is_shared(self):
+        registry = SyntaxStyleRegistry()
+        self.assertIs(registry.lexer("python"), registry.lexer("python"))
+        # 未知语言回退到纯文本
+        self.assertEqual(registry.lexer("no-such-language").name, "Text only")
+
+    def test_formats_rebuilt_when_style_changes(self):
+        registry = SyntaxStyleRegistry()
+        with patch.object(settings, "get_code_style", return_value="friendly"):
+            formats = registry.formats()
+            self.assertIs(registry.formats(), formats)
+        with patch.object(settings, "get_code_style", return_value="monokai"):
+            monokai = registry.formats()
+        self.assertIsNot(monokai, formats)
+        self.assertNotEqual(monokai[Keyword].foreground().color(), formats[Keyword].foreground().color())
+
+    def test_highlighters_share_tables(self):
+        first = CodeHighlighter(QTextDocument())
+        second = CodeHighlighter(QTextDocument())
+        first.set_language("python")
+        second.set_language("python")
+        self.assertIs(first.engine.lexer, second.engine.lexer)
+        self.assertIs(first.engine.style_formats, second.engine.style_formats)
+        self.assertIs(first.engine.style_formats, syntax_style_registry.formats())
+
+
+class TestPygmentsHighlighterEngine(unittest.TestCase):
+    def test_change_past_document_end(self):
+        document = QTextDocument("a = 1\nb = 2")
+        highlighter = CodeHighlighter(document)
+        highlighter.set_language("python")
+        engine = highlighter.engine
+        # 不发出信号地换成字符数相同的内容，再报告一次超出文档末尾的修改范围（setPlainText 之后的情况）
+        document.blockSignals(True)
+        document.setPlainText("def f\nclass")
+        document.blockSignals(False)
+        count = document.characterCount()
+        engine._on_contents_change(0, count, count)
+        self.assertEqual(engine._lines, ["def f", "class"])
+        expected = lex_document(engine.lexer, engine.style_formats, engine._lines)
+        self.assertEqual(engine._tables.runs, expected.runs)
+
+
+if __name__ == "__main__":
+    unittest.main()
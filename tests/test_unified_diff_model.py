@@ -0,0 +1,53 @@
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from diff_calculator import HistogramCalculator
+from unified_diff_model import ROW_DELETE, ROW_EQUAL, ROW_INSERT, ROW_OMITTED, UnifiedDiffModel
+
+LEFT = "a\nb\nc\nd\ne\nf\ng\nh"
+RIGHT = "a\nb\nc\nX\ne\nf\ng\nh\ni"
+
+
+class TestUnifiedDiffModel(unittest.TestCase):
+    def setUp(self):
+        chunks = HistogramCalculator().compute_diff(LEFT, RIGHT)
+        self.model = UnifiedDiffModel(chunks, LEFT.splitlines(), RIGHT.splitlines())
+
+    def test_rows_and_text(self):
+        self.assertEqual(
+            list(self.model.lines()),
+            [
+                "   1    1  a",
+                "           ... (1 lines omitted) ...",
+                "   3    3  c",
+                "   4       d",
+                "        4  X",
+                "   5    5  e",
+                "           ... (2 lines omitted) ...",
+                "   8    8  h",
+                "        9  i",
+            ],
+        )
+        self.assertEqual(self.model.row_count, 9)
+        self.assertEqual(self.model.row_kind(1), ROW_OMITTED)
+        self.assertEqual(self.model.row_kind(3), ROW_DELETE)
+        self.assertEqual(self.model.row_info(4)[0::2], ("insert", 3))
+        self.assertEqual(self.model.line_text(7), "   8    8  h")
+        self.assertEqual(list(self.model.lines(7)), ["   8    8  h", "        9  i"])
+        self.assertIsNone(self.model.row_kind(9))
+
+    def test_expand_and_navigation(self):
+        self.assertEqual([self.model.change_row(i) for i in range(2)], [3, 8])
+        self.assertIsNone(self.model.expand(0))
+        self.assertEqual(self.model.expand(6), ["   6    6  f", "   7    7  g"])
+        self.assertEqual(self.model.row_count, 10)
+        self.assertEqual(self.model.row_kind(7), ROW_EQUAL)
+        self.assertEqual(self.model.row_kind(9), ROW_INSERT)
+        self.assertEqual([self.model.change_row(i) for i in range(2)], [3, 9])
+        self.assertEqual(self.model.text().splitlines()[6:8], ["   6    6  f", "   7    7  g"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,13 +2,21 @@ import logging
 import os
 from typing import Optional
 
-from PyQt6.QtCore import QPoint, Qt, QTimer
+from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QColor, QIcon, QKeyEvent, QTextCharFormat, QTextCursor
 from PyQt6.QtWidgets import QHBoxLayout, QPushButton, QTextEdit, QVBoxLayout, QWidget
 
-from diff_calculator import DiffCalculator, DiffChunk, DifflibCalculator
+from components.restore_gutter import RestoreGutter
+from diff_cache import diff_result_cache
+from diff_calculator import DiffCalculator, DiffChunk, create_diff_calculator
+from diff_guard import LOAD_FULL, apply_load_level
 from diff_highlighter import MultiHighlighter
 from editors.text_edit import SyncedTextEdit
+from highlight_scheduler import highlight_scheduler
+from line_mapping import LineMapping
+from merge_diff import REGION_EQUAL, compute_merge_regions
+from settings import settings
+from threads import DiffComputeThread, ThreadTracker
 from utils.language_map import LANGUAGE_MAP
 
 
@@ -20,13 +28,32 @@ class DiffViewer(QWidget):
         self.setup_ui()
         self._sync_vscroll_lock = False
         self._sync_hscroll_lock = False
+        self._line_mappings = {}  # (差异块属性名, 是否反向) -> (差异块列表, LineMapping)
 
-        # cursor 生成：添加反向还原按钮相关的属性
-        self.restore_buttons = []  # 存储所有的还原按钮
+        # cursor 生成：添加反向还原相关的属性
         self.right_edit_is_editable = False  # 标记右侧编辑器是否可编辑
 
-        # 设置差异计算器，默认为 DifflibCalculator
-        self.diff_calculator = diff_calculator or DifflibCalculator()
+        # 后台差异计算：每次计算递增 generation，用于丢弃过期的结果
+        self._diff_generation = 0
+        self._diff_thread = None
+        self._diff_threads = ThreadTracker(self)  # 所有尚未结束的线程（包括已取消的）
+
+        # 设置差异计算器，默认使用设置中的算法
+        self.diff_calculator = diff_calculator or create_diff_calculator(settings.get_diff_algorithm())
+        self.load_level = LOAD_FULL
+
+    def set_diff_calculator(self, diff_calculator: DiffCalculator):
+        """切换该视图使用的差异算法，下一次 set_texts 时生效"""
+        self.diff_calculator = diff_calculator
+
+    def set_load_level(self, level: int):
+        """设置大文件降级级别，在 set_texts 之前调用"""
+        self.load_level = level
+        for edit in self._diff_edits():
+            apply_load_level(edit.highlighter, level)
+
+    def _diff_edits(self):
+        return [self.left_edit, self.right_edit]
 
     def _scroll_to_current_diff(self):
         if 0 <= self.current_diff_index < len(self.actual_diff_chunks):
@@ -211,8 +238,14 @@ class DiffViewer(QWidget):
         self.left_edit.highlighter = MultiHighlighter(self.left_edit.document(), "left", self.right_edit.document())
         self.right_edit.highlighter = MultiHighlighter(self.right_edit.document(), "right", self.left_edit.document())
 
+        # 左右编辑器之间的还原栏，右侧可编辑时显示
+        self.restore_gutter = RestoreGutter(self.left_edit)
+        self.restore_gutter.restore_requested.connect(self._restore_chunk_to_right)
+        self.restore_gutter.hide()
+
         # 添加到布局
         editor_layout.addWidget(self.left_edit)
+        editor_layout.addWidget(self.restore_gutter)
         editor_layout.addWidget(self.right_edit)
 
         # Main layout
@@ -235,8 +268,12 @@ class DiffViewer(QWidget):
         right_file_path: str | None = None,
         left_commit_hash: str | None = None,
         right_commit_hash: str | None = None,
+        diff_chunks: list[DiffChunk] | None = None,
     ):
-        """设置要比较的文本"""
+        """设置要比较的文本
+
+        diff_chunks: 预先计算好的差异（例如来自预取缓存），为 None 时重新计算
+        """
         self.left_edit.clear_highlighted_line()
         self.right_edit.clear_highlighted_line()
         self.left_edit.clear_block_background()
@@ -260,13 +297,17 @@ class DiffViewer(QWidget):
         self.right_edit.current_commit_hash = right_commit_hash
 
         # 计算差异
-        self._compute_diff(left_text, right_text)
+        self._compute_diff(left_text, right_text, diff_chunks)
 
         language = LANGUAGE_MAP.get(file_path.split(".")[-1], "text")
         self.left_edit.highlighter.set_language(language)
         language = LANGUAGE_MAP.get(self.right_edit.file_path.split(".")[-1], "text")
         self.right_edit.highlighter.set_language(language)
 
+        self._update_empty_block_selections()
+
+    def _update_empty_block_selections(self):
+        """为左侧被整行删除的空行设置整行背景"""
         if hasattr(self.left_edit.highlighter, "empty_block_numbers"):
             selections = []
             for block_number in self.left_edit.highlighter.empty_block_numbers:
@@ -285,96 +326,102 @@ class DiffViewer(QWidget):
             if selections:
                 self.left_edit.setExtraSelections(selections)
 
-    def _compute_diff(self, left_text: str, right_text: str):
-        self.diff_chunks = self.diff_calculator.compute_diff(left_text, right_text)
+    def _compute_diff(
+        self,
+        left_text: str,
+        right_text: str,
+        diff_chunks: list[DiffChunk] | None = None,
+        rehighlight: bool = False,
+    ):
+        """计算差异
+
+        缓存命中时直接应用；否则先显示文本，在后台线程中计算行级和字符级差异，结果到达后再高亮。
+        rehighlight: 同步应用结果后是否重新高亮（set_texts 随后会设置语言并重新高亮，因此不需要）
+        """
+        self._diff_generation += 1
+        self._cancel_diff_thread()
+
+        if diff_chunks is None:
+            diff_chunks = diff_result_cache.lookup_diff(self.diff_calculator, left_text, right_text)
+        char_diff_enabled = self.left_edit.highlighter.char_diff_enabled
+        char_diff = []
+        if char_diff_enabled and diff_chunks is None:
+            char_diff = None
+        elif char_diff_enabled:
+            char_diff = diff_result_cache.chunked_char_diff(
+                self.left_edit.highlighter.diff_engine.dmp, left_text, right_text, diff_chunks, cached_only=True
+            )
+
+        self._apply_diff_chunks(diff_chunks or [])
+        self._apply_char_diff(char_diff or [])
+        if rehighlight:
+            self._rehighlight_diff()
+
+        if diff_chunks is None or char_diff is None:
+            thread = DiffComputeThread(
+                self._diff_generation,
+                self.diff_calculator,
+                left_text,
+                right_text,
+                diff_chunks=diff_chunks,
+                compute_char_diff=char_diff is None,
+                parent=self,
+            )
+            thread.chunks_ready.connect(self._on_diff_chunks_ready)
+            thread.char_diff_ready.connect(self._on_char_diff_ready)
+            thread.finished.connect(self._on_diff_thread_finished)
+            self._diff_thread = thread
+            self._diff_threads.start(thread)
+
+    def _cancel_diff_thread(self):
+        """取消正在进行的差异计算，已取消线程的结果会被丢弃"""
+        if self._diff_thread is not None:
+            self._diff_thread.cancel()
+            self._diff_thread = None
+
+    def _on_diff_thread_finished(self, generation: int):
+        thread = self.sender()
+        if thread is self._diff_thread:
+            self._diff_thread = None
+
+    def _on_diff_chunks_ready(self, generation: int, diff_chunks: list):
+        # 用户已经切换到其它文件时丢弃过期结果
+        if generation != self._diff_generation:
+            return
+        self._apply_diff_chunks(diff_chunks)
+        self._rehighlight_diff()
+
+    def _on_char_diff_ready(self, generation: int, diff_list: list):
+        if generation != self._diff_generation:
+            return
+        self._apply_char_diff(diff_list)
+        self._rehighlight_diff()
+
+    def _rehighlight_diff(self):
+        highlight_scheduler.rehighlight(self.left_edit.highlighter)
+        highlight_scheduler.rehighlight(self.right_edit.highlighter)
+        self._update_empty_block_selections()
+
+    def _apply_char_diff(self, diff_list: list):
+        self.left_edit.highlighter.set_char_diff(diff_list)
+        self.right_edit.highlighter.set_char_diff(diff_list)
+
+    def _apply_diff_chunks(self, diff_chunks: list[DiffChunk]):
+        self.diff_chunks = diff_chunks
 
         self.left_edit.highlighter.set_diff_chunks(self.diff_chunks)
         self.right_edit.highlighter.set_diff_chunks(self.diff_chunks)
 
-        self.left_edit.highlighter.set_texts(left_text, right_text)
-        self.right_edit.highlighter.set_texts(left_text, right_text)
-
-        logging.info(f"Total diff chunks from algorithm: {len(self.diff_chunks)}")
+        logging.info("Total diff chunks from algorithm: %d", len(self.diff_chunks))
         self.actual_diff_chunks = [chunk for chunk in self.diff_chunks if chunk.type != "equal"]
-        logging.info(f"Number of actual (non-equal) diff chunks: {len(self.actual_diff_chunks)}")
+        logging.info("Number of actual (non-equal) diff chunks: %d", len(self.actual_diff_chunks))
         self.current_diff_index = -1  # Start before the first diff
         self._update_button_states()  # Initial state for buttons
         # Special handling for enabling "Next" is now within _update_button_states
 
-        # cursor 生成：如果右侧可编辑，创建还原按钮
-        if self.right_edit_is_editable:
-            self._create_restore_buttons()
-
-    def _create_restore_buttons(self):
-        """cursor 生成：为左侧的每个修改块创建还原按钮"""
-        # 清除之前的按钮
-        self._clear_restore_buttons()
-
-        for chunk in self.actual_diff_chunks:
-            # 为 delete、replace 和 insert 类型的 chunk 创建按钮
-            if chunk.type in ["delete", "replace", "insert"]:
-                button = QPushButton("→")
-                button.setFixedSize(20, 20)
-                button.setStyleSheet("""
-                    QPushButton {
-                        background-color: #4CAF50;
-                        color: white;
-                        border: none;
-                        border-radius: 10px;
-                        font-weight: bold;
-                    }
-                    QPushButton:hover {
-                        background-color: #45a049;
-                    }
-                    QPushButton:pressed {
-                        background-color: #3d8b40;
-                    }
-                """)
-                button.setToolTip("点击将左侧内容还原到右侧")
-
-                # 连接点击事件，传递 chunk 信息
-                button.clicked.connect(lambda checked, c=chunk: self._restore_chunk_to_right(c))
-
-                # 设置按钮为左侧编辑器的子 widget
-                button.setParent(self.left_edit)
-                button.show()
-
-                self.restore_buttons.append(button)
-
-        # 定位按钮
-        self._position_restore_buttons()
-
-    def _clear_restore_buttons(self):
-        """cursor 生成：清除所有还原按钮"""
-        for button in self.restore_buttons:
-            button.deleteLater()
-        self.restore_buttons.clear()
-
-    def _position_restore_buttons(self):
-        """cursor 生成：定位还原按钮到合适的位置"""
-        for i, button in enumerate(self.restore_buttons):
-            # 找到对应的 chunk
-            chunk_index = 0
-            for chunk in self.actual_diff_chunks:
-                if chunk.type in ["delete", "replace", "insert"]:
-                    if chunk_index == i:
-                        # 计算按钮位置
-                        line_number = chunk.left_start
-                        if line_number <= self.left_edit.document().blockCount():
-                            block = self.left_edit.document().findBlockByNumber(line_number - 1)
-                            block_geometry = self.left_edit.blockBoundingGeometry(block)
-                            block_top = block_geometry.translated(self.left_edit.contentOffset()).top()
-
-                            # 将按钮放在左侧编辑器的右边边缘，避免被滚动条遮挡
-                            x = self.left_edit.width() - 45  # 增加更多的边距避免滚动条
-                            y = int(block_top) + 2
-
-                            print(
-                                f"-------------- chunk: {chunk}, line_number: {line_number}, block_top: {block_top}, x: {x}, y: {y}"
-                            )
-                            button.move(x, y)
-                        break
-                    chunk_index += 1
+        # cursor 生成：如果右侧可编辑，在还原栏中显示还原标记
+        self.restore_gutter.setVisible(self.right_edit_is_editable)
+        self.restore_gutter.set_chunks(self.actual_diff_chunks if self.right_edit_is_editable else [])
 
     def _restore_chunk_to_right(self, chunk: DiffChunk):
         """cursor 生成：将指定 chunk 的左侧内容还原到右侧"""
@@ -415,7 +462,7 @@ class DiffViewer(QWidget):
             # 重新计算 diff
             left_text = self.left_edit.toPlainText()
             right_text = self.right_edit.toPlainText()
-            self._compute_diff(left_text, right_text)
+            self._compute_diff(left_text, right_text, rehighlight=True)
 
             # cursor 生成：恢复滚动位置
             self.left_edit.verticalScrollBar().setValue(left_scroll_value)
@@ -476,103 +523,39 @@ class DiffViewer(QWidget):
             logging.info("Already at the last diff or no diffs to navigate forward to.")
         self._update_button_states()
 
-    def _calculate_target_line(self, current_line: int, diff_chunks: list, is_left_scroll: bool) -> int:
-        """计算目标行号
-        Args:
-            current_line: 当前行号
-            diff_chunks: 差异块列表
-            is_left_scroll: 是否是左侧滚动
-        Returns:
-            int: 目标行号
-        """
-        target_line = current_line
-        accumulated_diff = 0
-        for chunk in diff_chunks:
-            if chunk.type != "equal":
-                source_start = chunk.left_start if is_left_scroll else chunk.right_start
-                source_end = chunk.left_end if is_left_scroll else chunk.right_end
-                target_start = chunk.right_start if is_left_scroll else chunk.left_start
-                target_end = chunk.right_end if is_left_scroll else chunk.left_end
-
-                if source_start <= current_line:
-                    # 计算差异块的大小差异
-                    source_size = source_end - source_start
-                    target_size = target_end - target_start
-                    size_diff = target_size - source_size
-
-                    # 如果在差异块内，根据相对位置调整
-                    if current_line < source_end:
-                        # 计算在差异块内的精确位置
-                        block_progress = (current_line - source_start) / max(1, source_size)
-                        # 调整目标行号，考虑差异块内的相对位置
-                        if target_size == 0 and chunk.type == "delete":
-                            # 对于删除块，使用当前行号减去删除的行数
-                            logging.debug(
-                                "current_line: %d, source_end: %d, source_start: %d, chunk type %s",
-                                current_line,
-                                source_end,
-                                source_start,
-                                chunk.type,
-                            )
-                            target_line = current_line - (source_end - source_start)
-                        else:
-                            # 对于其他类型的块，使用相对位置计算
-                            logging.debug(
-                                "block_progress: %f, target_size: %d, target_start: %d",
-                                block_progress,
-                                target_size,
-                                target_start,
-                            )
-                            target_line = target_start + int(block_progress * target_size)
-                        logging.debug(
-                            "在差异块内 [%d, %d] -> [%d, %d]",
-                            source_start,
-                            source_end,
-                            target_start,
-                            target_end,
-                        )
-                        print(chunk)
-                        logging.debug("块内进度：%.2f, 目标行：%d", block_progress, target_line)
-                        break
-                    else:
-                        # 如果已经过了这个差异块，直接累加差异
-                        accumulated_diff += size_diff
-                        logging.debug(
-                            "经过差异块 [%d, %d] -> [%d, %d]",
-                            source_start,
-                            source_end,
-                            target_start,
-                            target_end,
-                        )
-                        logging.debug("累计调整：%d", accumulated_diff)
-
-        # 如果不在任何差异块内，应用累计的差异
-        if target_line == current_line:
-            target_line += accumulated_diff
-        return target_line
-
-    def _calculate_scroll_value(self, target_edit: SyncedTextEdit, target_line: int) -> int:
-        """计算滚动值
+    def _line_mapping(self, attr: str, reverse: bool) -> LineMapping:
+        """返回差异块属性 attr 对应的行号映射，差异块列表被替换后才重新构建
+
         Args:
-            target_edit: 目标编辑器
-            target_line: 目标行号
-        Returns:
-            int: 滚动值
+            attr: 保存差异块列表的属性名，如 "diff_chunks"
+            reverse: 为 False 时从左侧映射到右侧，为 True 时从右侧映射到左侧
         """
-        # 计算目标文档中的滚动值
-        target_bar = target_edit.verticalScrollBar()
-        target_max = target_bar.maximum()
-
-        # 根据目标行号计算滚动值
-        target_doc_height = target_edit.document().size().height()
-        target_line_count = target_edit.document().blockCount()
-        avg_line_height = target_doc_height / target_line_count if target_line_count > 0 else 0
-
-        # 直接使用目标行号计算滚动值
-        target_scroll = int(target_line * avg_line_height)
-
-        # 确保滚动值在有效范围内
-        return max(0, min(target_scroll, target_max))
+        chunks = getattr(self, attr, [])
+        cached = self._line_mappings.get((attr, reverse))
+        if cached is None or cached[0] is not chunks:
+            cached = (chunks, LineMapping.from_chunks(chunks, reverse))
+            self._line_mappings[(attr, reverse)] = cached
+        return cached[1]
+
+    @staticmethod
+    def _scroll_value_to_line(edit: SyncedTextEdit, value: int) -> float:
+        """把滚动条的值（视觉行号，包括折行）换算为带块内进度的块号"""
+        block = edit.document().findBlockByLineNumber(value)
+        line_count = max(1, block.lineCount())
+        progress = min(max((value - block.firstLineNumber()) / line_count, 0.0), 1.0)
+        return block.blockNumber() + progress
+
+    @staticmethod
+    def _line_to_scroll_value(edit: SyncedTextEdit, line: float) -> int:
+        """把带块内进度的块号按目标文档的折行换算为滚动条的值，并限制在有效范围内"""
+        bar = edit.verticalScrollBar()
+        doc = edit.document()
+        block_number = int(line)
+        if block_number >= doc.blockCount():
+            return bar.maximum()
+        block = doc.findBlockByNumber(max(0, block_number))
+        value = block.firstLineNumber() + (line - block_number) * max(1, block.lineCount())
+        return max(0, min(int(value), bar.maximum()))
 
     def _on_scroll(self, value, is_left_scroll: bool):
         """统一处理滚动事件
@@ -585,37 +568,13 @@ class DiffViewer(QWidget):
 
         self._sync_vscroll_lock = True
         try:
-            logging.debug("\n=== %s 滚动事件开始 ===", "左侧" if is_left_scroll else "右侧")
-
-            # 获取源编辑器和目标编辑器
             source_edit = self.left_edit if is_left_scroll else self.right_edit
             target_edit = self.right_edit if is_left_scroll else self.left_edit
 
-            # 获取当前视口中的行
-            cursor = source_edit.cursorForPosition(QPoint(0, 0))
-            current_line = cursor.blockNumber()
-            logging.debug("当前视口起始行：%d", current_line)
-
-            # 计算目标行号
-            target_line = self._calculate_target_line(current_line, self.diff_chunks, is_left_scroll)
-
-            # 计算滚动值
-            target_scroll = self._calculate_scroll_value(target_edit, target_line)
-            logging.debug(
-                "目标编辑器：%s, 目标行：%d, 目标滚动值：%d",
-                target_edit.objectName(),
-                target_line,
-                target_scroll,
-            )
-
-            # 设置滚动条位置
-            target_edit.verticalScrollBar().setValue(target_scroll)
-
-            logging.debug("=== %s 滚动事件结束 ===\n", "左侧" if is_left_scroll else "右侧")
-
-            # cursor 生成：滚动后重新定位还原按钮
-            if self.restore_buttons:
-                self._position_restore_buttons()
+            # 视口顶部所在的行经行号映射得到目标行，再换算为目标编辑器的滚动值
+            source_line = self._scroll_value_to_line(source_edit, value)
+            target_line = self._line_mapping("diff_chunks", not is_left_scroll).map(source_line)
+            target_edit.verticalScrollBar().setValue(self._line_to_scroll_value(target_edit, target_line))
 
         finally:
             self._sync_vscroll_lock = False
@@ -633,23 +592,20 @@ class DiffViewer(QWidget):
         finally:
             self._sync_hscroll_lock = False
 
-    def resizeEvent(self, event):
-        """cursor 生成：窗口大小改变时重新定位还原按钮"""
-        super().resizeEvent(event)
-        if self.restore_buttons:
-            # 延迟执行以确保布局完成
-            QTimer.singleShot(10, self._position_restore_buttons)
-
 
 class MergeDiffViewer(DiffViewer):
     def __init__(self, diff_calculator: DiffCalculator | None = None):
         super().__init__(diff_calculator)
         self.parent1_chunks = []
         self.parent2_chunks = []
-        self.merged_actual_diff_chunks = []  # For navigation across all 3 panes
+        self.merge_regions = []  # 覆盖三个文本的合并区域
+        self.merged_actual_diff_chunks = []  # 非 equal 的合并区域，用于三栏导航
         self.current_merged_diff_index = -1  # Index for merged navigation
         self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)  # Allow MergeDiffViewer to receive focus
 
+    def _diff_edits(self):
+        return [self.parent1_edit, self.result_edit, self.parent2_edit]
+
     def setup_ui(self):
         # layout = QHBoxLayout() # Original layout variable, not used now for main structure
         # layout.setSpacing(0)
@@ -758,9 +714,9 @@ class MergeDiffViewer(DiffViewer):
     def _compute_diffs(self, parent1_text: str, result_text: str, parent2_text: str):
         """计算三个文本之间的差异"""
         # 计算 parent1 和 result 的差异
-        self.parent1_chunks = self.diff_calculator.compute_diff(parent1_text, result_text)
+        self.parent1_chunks = diff_result_cache.compute_diff(self.diff_calculator, parent1_text, result_text)
         # 计算 result 和 parent2 的差异
-        self.parent2_chunks = self.diff_calculator.compute_diff(result_text, parent2_text)
+        self.parent2_chunks = diff_result_cache.compute_diff(self.diff_calculator, result_text, parent2_text)
 
         # 设置高亮
         self.parent1_edit.highlighter.set_diff_chunks(self.parent1_chunks)
@@ -769,96 +725,36 @@ class MergeDiffViewer(DiffViewer):
         self.parent2_edit.highlighter.set_diff_chunks(self.parent2_chunks)
         self.parent2_edit.highlighter.set_texts(result_text, parent2_text)
 
-        # 为 result 编辑器创建转换后的差异块 (result_edit 仍使用 DiffHighlighter)
-        # This logic seems to be for highlighting the result_edit pane, not for navigation.
-        # We'll keep it for that purpose.
-        result_chunks_for_highlighting = []
-        result_lines = result_text.splitlines()
-        line_status = {}
-        for i in range(len(result_lines)):
-            line_status[i] = [True, True]
-        for chunk in self.parent1_chunks:
-            if chunk.type != "equal":
-                for i in range(chunk.right_start, chunk.right_end):
-                    if i < len(result_lines):
-                        line_status[i][0] = False
-        for chunk in self.parent2_chunks:
-            if chunk.type != "equal":
-                for i in range(chunk.left_start, chunk.left_end):
-                    if i < len(result_lines):
-                        line_status[i][1] = False
-
-        current_highlight_chunk = None
-        for line_num, (in_parent1, in_parent2) in line_status.items():
-            chunk_type = None
-            if not in_parent1 and not in_parent2:
-                chunk_type = "conflict"
-            elif not in_parent1:
-                chunk_type = "parent1_diff"
-            elif not in_parent2:
-                chunk_type = "parent2_diff"
-
-            if chunk_type:
-                if current_highlight_chunk is None or current_highlight_chunk.type != chunk_type:
-                    if current_highlight_chunk:
-                        result_chunks_for_highlighting.append(current_highlight_chunk)
-                    current_highlight_chunk = DiffChunk(
-                        type=chunk_type,
-                        left_start=line_num,
-                        left_end=line_num + 1,
-                        right_start=line_num,
-                        right_end=line_num + 1,
-                    )
-                else:
-                    current_highlight_chunk.left_end = line_num + 1
-                    current_highlight_chunk.right_end = line_num + 1
-            elif current_highlight_chunk:
-                result_chunks_for_highlighting.append(current_highlight_chunk)
-                current_highlight_chunk = None
-        if current_highlight_chunk:
-            result_chunks_for_highlighting.append(current_highlight_chunk)
-
-        self.result_edit.highlighter.set_diff_chunks(result_chunks_for_highlighting)
-        self.result_edit.highlighter.set_merge_texts(parent1_text, parent2_text, result_text)
-
-        # Prepare merged actual diff chunks for navigation
-        self.merged_actual_diff_chunks = []
-        # Tag chunks with their origin and original chunk data
-        for chunk in self.parent1_chunks:
-            if chunk.type != "equal":
-                # For P1 vs R diffs, primary sort key is result_start (chunk.right_start)
-                self.merged_actual_diff_chunks.append(
-                    {"origin": "p1_result", "chunk": chunk, "sort_key": chunk.right_start}
-                )
-
-        for chunk in self.parent2_chunks:
-            if chunk.type != "equal":
-                # For R vs P2 diffs, primary sort key is result_start (chunk.left_start)
-                self.merged_actual_diff_chunks.append(
-                    {"origin": "result_p2", "chunk": chunk, "sort_key": chunk.left_start}
-                )
-
-        # Sort all diffs based on their starting line in the result pane
-        self.merged_actual_diff_chunks.sort(key=lambda x: x["sort_key"])
-
-        # Remove duplicate diffs that might occur if a change in Result affects both P1 and P2 identically
-        # This is a simple deduplication. More sophisticated logic might be needed if chunks can overlap partially.
-        unique_merged_chunks = []
-        seen_keys = set()
-        for item in self.merged_actual_diff_chunks:
-            # Create a unique key for the chunk based on its position in the result pane and type
-            # Chunks from p1_result: (type, p1_start, p1_end, result_start, result_end)
-            # Chunks from result_p2: (type, result_start, result_end, p2_start, p2_end)
-            # We need a canonical representation for deduplication.
-            # Key: (result_start, result_end, type_of_change_in_result, content_implication)
-            # This is complex. For now, let's use a simpler key based on result lines and origin for sorting,
-            # and rely on visual non-duplication for now. True semantic deduplication is harder.
-            # Simpler approach: if two consecutive chunks (after sorting) refer to the exact same
-            # lines in the result view and have compatible types, consider merging or picking one.
-            # For now, we'll keep them and let navigation step through them.
-            # The sorting should already group related changes.
-            pass  # No explicit deduplication for now, sorting is the primary organization
+        # 三向合并：在 result 的行号上合并两个差异，得到按顺序排列的合并区域
+        self.merge_regions = compute_merge_regions(
+            self.parent1_chunks, self.parent2_chunks, parent1_text.splitlines(), parent2_text.splitlines()
+        )
+        changed_regions = [region for region in self.merge_regions if region.type != REGION_EQUAL]
+        self.result_edit.highlighter.set_diff_chunks(
+            [
+                DiffChunk(region.result_start, region.result_end, region.result_start, region.result_end, region.type)
+                for region in changed_regions
+            ]
+        )
+        # 按区域类型（冲突、两侧都不同、只与一侧不同）整行着色
+        self.result_edit.highlighter.set_merge_regions(self.merge_regions)
+        # 字符级差异只在 parent -> result 的差异块内计算，parent2_chunks 的方向是 result -> parent2，需要反转
+        reversed_parent2_chunks = [
+            DiffChunk(
+                chunk.right_start,
+                chunk.right_end,
+                chunk.left_start,
+                chunk.left_end,
+                {"insert": "delete", "delete": "insert"}.get(chunk.type, chunk.type),
+            )
+            for chunk in self.parent2_chunks
+        ]
+        self.result_edit.highlighter.set_merge_texts(
+            parent1_text, parent2_text, result_text, self.parent1_chunks, reversed_parent2_chunks
+        )
 
+        # 导航按合并区域进行，每个区域只出现一次
+        self.merged_actual_diff_chunks = changed_regions
         self.current_merged_diff_index = -1
         self._update_merged_button_states()
 
@@ -934,91 +830,37 @@ class MergeDiffViewer(DiffViewer):
             logging.warning(f"MergeDiffViewer: Invalid current_merged_diff_index: {self.current_merged_diff_index}")
             return
 
-        merged_chunk_item = self.merged_actual_diff_chunks[self.current_merged_diff_index]
-        origin = merged_chunk_item["origin"]
-        chunk = merged_chunk_item["chunk"]  # This is the original DiffChunk
-
+        region = self.merged_actual_diff_chunks[self.current_merged_diff_index]
         logging.info(
-            f"MergeDiffViewer: Scrolling to diff chunk index {self.current_merged_diff_index}: "
-            f"Origin: {origin}, Type: {chunk.type}, "
-            f"P1/Res_L: {chunk.left_start}-{chunk.left_end}, Res_R/P2: {chunk.right_start}-{chunk.right_end}"
+            "MergeDiffViewer: Scrolling to merge region %d: Type: %s, P1: %d-%d, Result: %d-%d, P2: %d-%d",
+            self.current_merged_diff_index,
+            region.type,
+            region.parent1_start,
+            region.parent1_end,
+            region.result_start,
+            region.result_end,
+            region.parent2_start,
+            region.parent2_end,
         )
 
-        # Clear previous highlights on all panes
-        for editor in [self.parent1_edit, self.result_edit, self.parent2_edit]:
+        panes = (
+            (self.parent1_edit, region.parent1_start, region.parent1_end),
+            (self.parent2_edit, region.parent2_start, region.parent2_end),
+            (self.result_edit, region.result_start, region.result_end),
+        )
+        for editor, start, end in panes:
             editor.clear_highlighted_line()
             editor.clear_block_background()
+            if end > start:
+                editor.set_highlighted_line(start)
+                editor.set_block_background(start, end)
+            else:
+                # 该侧没有对应的行，标记区域所在位置的前一行
+                editor.set_highlighted_line(max(0, start - 1))
 
-        # Determine target lines for scrolling and highlighting
-        # These are 0-indexed
-        p1_target_line, res_target_line, p2_target_line = -1, -1, -1
-
-        if origin == "p1_result":  # Parent1 vs Result
-            p1_scroll_to = chunk.left_start
-            res_scroll_to = chunk.right_start
-            # p2_scroll_to will be synced by _on_scroll based on result_edit's scroll
-
-            # Highlighting for P1 vs Result
-            if chunk.type == "insert":  # Insert in Result (right side of p1_result diff)
-                self.result_edit.set_highlighted_line(chunk.right_start)
-                self.result_edit.set_block_background(chunk.right_start, chunk.right_end)
-                # Left (P1) has a "gap", scroll to line before insertion if possible
-                p1_scroll_to = max(0, chunk.left_start - 1) if chunk.left_start > 0 else 0
-                self.parent1_edit.set_highlighted_line(p1_scroll_to)
-            elif chunk.type == "delete":  # Delete in Result (means content present in P1 is missing in Result)
-                self.parent1_edit.set_highlighted_line(chunk.left_start)
-                self.parent1_edit.set_block_background(chunk.left_start, chunk.left_end)
-                # Right (Result) has a "gap", scroll to line before deletion
-                res_scroll_to = max(0, chunk.right_start - 1) if chunk.right_start > 0 else 0
-                self.result_edit.set_highlighted_line(res_scroll_to)
-            elif chunk.type == "replace":
-                self.parent1_edit.set_highlighted_line(chunk.left_start)
-                self.parent1_edit.set_block_background(chunk.left_start, chunk.left_end)
-                self.result_edit.set_highlighted_line(chunk.right_start)
-                self.result_edit.set_block_background(chunk.right_start, chunk.right_end)
-
-            self.parent1_edit.scroll_to_line(p1_scroll_to)
-            self.result_edit.scroll_to_line(res_scroll_to)
-            # self.parent2_edit will be synced via _on_scroll triggered by result_edit
-
-        elif origin == "result_p2":  # Result vs Parent2
-            res_scroll_to = chunk.left_start  # Result is left side of result_p2 diff
-            p2_scroll_to = chunk.right_start  # Parent2 is right side of result_p2 diff
-            # p1_scroll_to will be synced by _on_scroll based on result_edit's scroll
-
-            # Highlighting for Result vs Parent2
-            if chunk.type == "insert":  # Insert in Parent2 (right side of result_p2 diff)
-                self.parent2_edit.set_highlighted_line(chunk.right_start)
-                self.parent2_edit.set_block_background(chunk.right_start, chunk.right_end)
-                # Left (Result) has a "gap"
-                res_scroll_to = max(0, chunk.left_start - 1) if chunk.left_start > 0 else 0
-                self.result_edit.set_highlighted_line(res_scroll_to)
-            elif chunk.type == "delete":  # Delete in Parent2 (means content present in Result is missing in P2)
-                self.result_edit.set_highlighted_line(chunk.left_start)
-                self.result_edit.set_block_background(chunk.left_start, chunk.left_end)
-                # Right (P2) has a "gap"
-                p2_scroll_to = max(0, chunk.right_start - 1) if chunk.right_start > 0 else 0
-                self.parent2_edit.set_highlighted_line(p2_scroll_to)
-            elif chunk.type == "replace":
-                self.result_edit.set_highlighted_line(chunk.left_start)
-                self.result_edit.set_block_background(chunk.left_start, chunk.left_end)
-                self.parent2_edit.set_highlighted_line(chunk.right_start)
-                self.parent2_edit.set_block_background(chunk.right_start, chunk.right_end)
-
-            self.result_edit.scroll_to_line(res_scroll_to)
-            self.parent2_edit.scroll_to_line(p2_scroll_to)
-            # self.parent1_edit will be synced via _on_scroll triggered by result_edit
-
-        # The _on_scroll mechanism should handle syncing the third pane.
-        # We explicitly scroll two panes involved in the direct diff.
-        # For example, if result_edit is scrolled, its _on_scroll handler
-        # will try to sync parent1_edit and parent2_edit.
-        # We need to ensure this doesn't cause infinite loops or fight with explicit scrolls.
-        # The _sync_vscroll_lock in _on_scroll should prevent this.
-        # One of the explicit scrolls (e.g. self.result_edit.scroll_to_line) will trigger
-        # the _on_scroll logic which will then sync the other panes.
-
-        logging.info("MergeDiffViewer: Called scroll_to_line for relevant editors.")
+        # 依次滚动三个编辑器，最后滚动 result，其余两侧由 _on_scroll 按行号映射同步
+        for editor, start, end in panes:
+            editor.scroll_to_line(max(0, start - 1) if end == start else start)
 
     def keyPressEvent(self, event: QKeyEvent):
         """Handle key presses for navigation."""
@@ -1049,62 +891,29 @@ class MergeDiffViewer(DiffViewer):
 
         self._sync_vscroll_lock = True
         try:
-            logging.debug("\n=== %s 滚动事件开始 ===", source)
-
-            # 获取所有编辑器
             editors = {
                 "parent1": self.parent1_edit,
                 "result": self.result_edit,
                 "parent2": self.parent2_edit,
             }
 
-            source_edit = editors[source]
-
-            # 获取当前视口中的行
-            cursor = source_edit.cursorForPosition(QPoint(0, 0))
-            current_line = cursor.blockNumber()
-            logging.debug("当前视口起始行：%d", current_line)
+            # 先映射到 result 的行号：parent1_chunks 为 parent1 -> result，parent2_chunks 为 result -> parent2
+            result_line = self._scroll_value_to_line(editors[source], value)
+            if source == "parent1":
+                result_line = self._line_mapping("parent1_chunks", False).map(result_line)
+            elif source == "parent2":
+                result_line = self._line_mapping("parent2_chunks", True).map(result_line)
+            target_lines = {
+                "parent1": self._line_mapping("parent1_chunks", True).map(result_line),
+                "result": result_line,
+                "parent2": self._line_mapping("parent2_chunks", False).map(result_line),
+            }
 
             # 同步其他编辑器的滚动
             for target_name, target_edit in editors.items():
                 if target_name != source:
-                    # 根据源和目标确定使用哪个差异块
-                    if source == "parent1" and target_name == "result":
-                        diff_chunks = self.parent1_chunks
-                        is_left_scroll = True
-                    elif source == "result" and target_name == "parent1":
-                        diff_chunks = self.parent1_chunks
-                        is_left_scroll = False
-                    elif source == "result" and target_name == "parent2":
-                        diff_chunks = self.parent2_chunks
-                        is_left_scroll = True
-                    elif source == "parent2" and target_name == "result":
-                        diff_chunks = self.parent2_chunks
-                        is_left_scroll = False
-                    elif source == "parent1" and target_name == "parent2":
-                        # 通过 parent1->result 和 result->parent2 的差异推导出 parent1->parent2 的差异
-                        diff_chunks = self.parent1_chunks + self.parent2_chunks
-                        is_left_scroll = True
-                    elif source == "parent2" and target_name == "parent1":
-                        # 通过 parent2->result 和 result->parent1 的差异推导出 parent2->parent1 的差异
-                        diff_chunks = self.parent2_chunks + self.parent1_chunks
-                        is_left_scroll = False
-                    else:
-                        # 如果不需要考虑差异块，直接使用行号同步
-                        diff_chunks = []
-                        is_left_scroll = True
-
-                    # 计算目标行号
-                    target_line = self._calculate_target_line(current_line, diff_chunks, is_left_scroll)
-
-                    # 计算滚动值
-                    target_scroll = self._calculate_scroll_value(target_edit, target_line)
-                    logging.debug("目标行：%d, 目标滚动值：%d", target_line, target_scroll)
-
-                    # 设置滚动条位置
-                    target_edit.verticalScrollBar().setValue(target_scroll)
-
-            logging.debug("=== %s 滚动事件结束 ===\n", source)
+                    target_line = target_lines[target_name]
+                    target_edit.verticalScrollBar().setValue(self._line_to_scroll_value(target_edit, target_line))
 
         finally:
             self._sync_vscroll_lock = False
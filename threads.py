@@ -1,14 +1,75 @@
 import asyncio
+import logging
 import os
-from typing import TYPE_CHECKING
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
 
 import aiohttp
-from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.QtCore import QCoreApplication, QObject, QThread, pyqtSignal
+
+from commit_patch_model import PatchParser
+from diff_cache import create_char_differ, diff_result_cache
+from diff_calculator import create_diff_calculator
+from diff_prefetcher import PREFETCH_MAX_BLOB_SIZE, PrefetchedDiff, diff_prefetch_cache
+from file_changes_model import DiffTreeParser
+from large_file import LOAD_CHUNK_CHARS, split_long_lines
+from settings import settings
+from syntax_lexing import lex_document, token_run_cache
 
 if TYPE_CHECKING:
     from git_manager import GitManager
 
 
+class ThreadTracker(QObject):
+    """跟踪一个对象启动的后台线程
+
+    线程运行期间，程序退出（aboutToQuit）或所有者销毁时调用 stop 停止线程；线程结束（finished）后
+    断开这两个连接，等待线程退出并 deleteLater，不会在 aboutToQuit 上为每个线程留下一个永久的连接。
+    """
+
+    def __init__(self, owner: QObject):
+        super().__init__(owner)
+        self._connections: dict = {}  # 线程 -> [(信号, 连接)]
+
+    def __iter__(self):
+        return iter(list(self._connections))
+
+    def __len__(self):
+        return len(self._connections)
+
+    def start(self, thread: QThread, stop=None, release_on_finish: bool = True):
+        """启动线程
+
+        stop 默认为 thread.stop；release_on_finish 为 False 时由调用者在适当的时候调用 release()。
+        """
+        stop = stop or thread.stop
+        owner = self.parent()
+        connections = [(owner.destroyed, owner.destroyed.connect(stop))]
+        app = QCoreApplication.instance()
+        if app:
+            connections.append((app.aboutToQuit, app.aboutToQuit.connect(stop)))
+        self._connections[thread] = connections
+        if release_on_finish:
+            thread.finished.connect(self._on_thread_finished)
+        thread.start()
+
+    def release(self, thread: QThread):
+        """断开线程的停止连接，等待线程退出并 deleteLater"""
+        connections = self._connections.pop(thread, None)
+        if connections is None:
+            return
+        for signal, connection in connections:
+            signal.disconnect(connection)
+        thread.wait()
+        thread.deleteLater()
+
+    def _on_thread_finished(self, *args):
+        self.release(self.sender())
+
+
 class FetchThread(QThread):
     finished = pyqtSignal(bool, str)
 
@@ -151,3 +212,389 @@ class FileIndexThread(QThread):
             self.finished.emit()
         except Exception as e:
             self.error.emit(str(e))
+
+
+class DiffTreeThread(QThread):
+    """在后台流式读取 `git diff-tree` 输出的线程
+
+    每解析出 BATCH_SIZE 条记录就通过 records_ready 发送一批，界面可以边读边显示。
+    """
+
+    BATCH_SIZE = 2000
+    READ_SIZE = 64 * 1024
+
+    records_ready = pyqtSignal(list)  # ChangedFile / NumStat 记录列表
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+
+    def __init__(self, repo_path: str, commit_sha: str, parent_sha: Optional[str] = None, parent=None):
+        super().__init__(parent)
+        self.repo_path = repo_path
+        self.commit_sha = commit_sha
+        self.parent_sha = parent_sha
+        self._cancelled = False
+        self._process: Optional[subprocess.Popen] = None
+
+    def cancel(self):
+        """取消读取，终止 git 进程"""
+        self._cancelled = True
+        if self._process and self._process.poll() is None:
+            self._process.kill()
+
+    def run(self):
+        cmd = ["git", "diff-tree", "-r", "-z", "-M", "--raw", "--numstat", "--no-commit-id"]
+        if self.parent_sha:
+            cmd += [self.parent_sha, self.commit_sha]
+        else:
+            # 根提交没有父提交，使用 --root 与空树比较
+            cmd += ["--root", self.commit_sha]
+        # stderr 写入临时文件，避免 git 写满 stderr 管道后阻塞在读取 stdout 上
+        stderr_file = tempfile.TemporaryFile()
+        try:
+            self._process = subprocess.Popen(cmd, cwd=self.repo_path, stdout=subprocess.PIPE, stderr=stderr_file)
+            parser = DiffTreeParser()
+            batch = []
+            while not self._cancelled:
+                data = self._process.stdout.read1(self.READ_SIZE)
+                if not data:
+                    break
+                batch.extend(parser.feed(data))
+                if len(batch) >= self.BATCH_SIZE:
+                    self.records_ready.emit(batch)
+                    batch = []
+            if self._cancelled:
+                return
+            if batch:
+                self.records_ready.emit(batch)
+            if self._process.wait() != 0:
+                stderr_file.seek(0)
+                self.error.emit(stderr_file.read().decode("utf-8", errors="replace"))
+                return
+            self.finished.emit()
+        except Exception as e:
+            self.error.emit(str(e))
+        finally:
+            if self._process:
+                self._process.stdout.close()
+            stderr_file.close()
+
+
+class DiffComputeThread(QThread):
+    """在后台计算行级差异和字符级差异
+
+    行级差异先通过 chunks_ready 发送（已提供 diff_chunks 时跳过），字符级差异只在差异块内计算，
+    随后通过 char_diff_ready 发送，界面可以逐步显示。
+    generation 用于界面丢弃过期的结果；cancel() 之后不再发送结果（正在进行的单步计算无法中断，
+    但字符级差异受 diff_match_patch 的 Diff_Timeout 限制）。
+    """
+
+    chunks_ready = pyqtSignal(int, list)
+    char_diff_ready = pyqtSignal(int, list)
+    finished = pyqtSignal(int)
+
+    def __init__(
+        self,
+        generation: int,
+        diff_calculator,
+        left_text: str,
+        right_text: str,
+        diff_chunks: Optional[list] = None,
+        compute_char_diff: bool = True,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.generation = generation
+        self.diff_calculator = diff_calculator
+        self.left_text = left_text
+        self.right_text = right_text
+        self.diff_chunks = diff_chunks
+        self.compute_char_diff = compute_char_diff
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def stop(self):
+        """取消并等待线程结束"""
+        self.cancel()
+        self.wait()
+
+    def run(self):
+        try:
+            chunks = self.diff_chunks
+            if chunks is None:
+                chunks = diff_result_cache.compute_diff(self.diff_calculator, self.left_text, self.right_text)
+                if self._cancelled:
+                    return
+                self.chunks_ready.emit(self.generation, chunks)
+            if self.compute_char_diff and not self._cancelled:
+                diff_list = diff_result_cache.chunked_char_diff(
+                    create_char_differ(), self.left_text, self.right_text, chunks
+                )
+                if not self._cancelled:
+                    self.char_diff_ready.emit(self.generation, diff_list)
+        except Exception:
+            logging.exception("计算文件差异失败")
+        finally:
+            self.finished.emit(self.generation)
+
+
+class SyntaxLexThread(QThread):
+    """在后台对整个文档做词法分析，结果（LexTables）通过 lexed 发送，generation 用于丢弃过期的结果"""
+
+    lexed = pyqtSignal(int, object)
+    finished = pyqtSignal(int)
+
+    def __init__(self, generation: int, lexer, formats: dict, lines: list, parent=None):
+        super().__init__(parent)
+        self.generation = generation
+        self.lexer = lexer
+        self.formats = formats
+        self.lines = lines
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def stop(self):
+        """取消并等待线程结束"""
+        self.cancel()
+        self.wait()
+
+    def run(self):
+        try:
+            tables = lex_document(self.lexer, self.formats, self.lines, token_run_cache)
+            if not self._cancelled:
+                self.lexed.emit(self.generation, tables)
+        except Exception:
+            logging.exception("语法分析失败")
+        finally:
+            self.finished.emit(self.generation)
+
+
+class FileLoadThread(QThread):
+    """在后台分块读取大文件，每块以完整的行结束（超长行已折断），通过 chunk_loaded 依次发送"""
+
+    chunk_loaded = pyqtSignal(int, str)
+    loaded = pyqtSignal(int, bool)  # generation, 是否折断了超长行
+    finished = pyqtSignal(int)
+
+    def __init__(self, generation: int, file_path: str, max_line_length: int, parent=None):
+        super().__init__(parent)
+        self.generation = generation
+        self.file_path = file_path
+        self.max_line_length = max_line_length
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def stop(self):
+        """取消并等待线程结束"""
+        self.cancel()
+        self.wait()
+
+    def run(self):
+        try:
+            split = False  # 是否折断了超长行
+            pending = ""  # 上一块末尾不完整的行
+            with open(self.file_path, "r", encoding="utf-8", errors="replace") as f:
+                while not self._cancelled:
+                    data = f.read(LOAD_CHUNK_CHARS)
+                    if not data:
+                        break
+                    data = pending + data
+                    end = data.rfind("\n") + 1
+                    if end == 0:
+                        if len(data) <= self.max_line_length:
+                            pending = data
+                            continue
+                        # 整块都在同一行中，按折断长度的整数倍切开
+                        end = len(data) - len(data) % self.max_line_length
+                        chunk, pending = data[:end] + "\n", data[end:]
+                        split = True
+                    else:
+                        chunk, pending = data[:end], data[end:]
+                    chunk, count = split_long_lines(chunk, self.max_line_length)
+                    split = split or count > 0
+                    self.chunk_loaded.emit(self.generation, chunk)
+            if not self._cancelled:
+                if pending:
+                    chunk, count = split_long_lines(pending, self.max_line_length)
+                    split = split or count > 0
+                    self.chunk_loaded.emit(self.generation, chunk)
+                self.loaded.emit(self.generation, split)
+        except Exception:
+            logging.exception("读取大文件失败")
+        finally:
+            self.finished.emit(self.generation)
+
+
+class DiffPrefetchThread(QThread):
+    """在后台预取变化文件的新旧内容并计算差异的线程
+
+    任务按 (提交 sha, 文件路径) 去重；urgent 任务（选中文件的相邻文件）插到队首。
+    """
+
+    BATCH_SIZE = 8
+    NULL_SHA = "0" * 40
+
+    def __init__(self, git_manager: "GitManager", cache=None, parent=None):
+        super().__init__(parent)
+        self.git_manager = git_manager
+        self.cache = cache or diff_prefetch_cache
+        self.diff_calculator = create_diff_calculator(settings.get_diff_algorithm())
+        self._pending: OrderedDict = OrderedDict()  # (commit_sha, path) -> ChangedFile
+        self._condition = threading.Condition()
+        self._stopped = False
+
+    def request(self, commit_sha: str, changed_files: list, urgent: bool = False):
+        """添加预取任务"""
+        with self._condition:
+            for changed_file in reversed(changed_files) if urgent else changed_files:
+                if changed_file.binary:
+                    continue
+                key = (commit_sha, changed_file.path)
+                if self.cache.contains(*key):
+                    continue
+                self._pending[key] = changed_file
+                self._pending.move_to_end(key, last=not urgent)
+            self._condition.notify()
+
+    def clear_pending(self):
+        """丢弃还未开始的任务（例如切换了提交）"""
+        with self._condition:
+            self._pending.clear()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._pending.clear()
+            self._condition.notify()
+        self.wait()
+
+    def run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                jobs = [self._pending.popitem(last=False) for _ in range(min(self.BATCH_SIZE, len(self._pending)))]
+            try:
+                self._prefetch(jobs)
+            except Exception:
+                logging.exception("预取文件差异失败")
+
+    def _prefetch(self, jobs):
+        shas = []
+        for _, changed_file in jobs:
+            shas.extend(sha for sha in (changed_file.old_sha, changed_file.new_sha) if sha != self.NULL_SHA)
+        blobs = self.git_manager.read_blobs(shas)
+
+        for (commit_sha, file_path), changed_file in jobs:
+            texts = []
+            for sha in (changed_file.old_sha, changed_file.new_sha):
+                data = b"" if sha == self.NULL_SHA else blobs.get(sha)
+                # 读取失败、过大或二进制内容都不预取
+                if data is None or len(data) > PREFETCH_MAX_BLOB_SIZE or b"\0" in data:
+                    break
+                texts.append(data.decode("utf-8", errors="replace"))
+            else:
+                left_text, right_text = texts
+                entry = PrefetchedDiff(
+                    left_text,
+                    right_text,
+                    diff_result_cache.compute_diff(
+                        self.diff_calculator,
+                        left_text,
+                        right_text,
+                        left_id=None if changed_file.old_sha == self.NULL_SHA else changed_file.old_sha,
+                        right_id=None if changed_file.new_sha == self.NULL_SHA else changed_file.new_sha,
+                    ),
+                    type(self.diff_calculator).__name__,
+                )
+                self.cache.put(commit_sha, file_path, entry)
+
+
+class CommitPatchThread(QThread):
+    """用一个 `git diff-tree -p` 进程流式读取整个提交的补丁
+
+    原始输出写入 patch_file_path 指向的临时文件，解析出的文件索引分批通过 files_ready 发送。
+    """
+
+    READ_SIZE = 64 * 1024
+    BATCH_SIZE = 200
+
+    files_ready = pyqtSignal(list)  # PatchFile 列表
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+
+    def __init__(self, repo_path: str, commit_sha: str, parent_sha: Optional[str], patch_file_path: str, parent=None):
+        super().__init__(parent)
+        self.repo_path = repo_path
+        self.commit_sha = commit_sha
+        self.parent_sha = parent_sha
+        self.patch_file_path = patch_file_path
+        self._cancelled = False
+        self._process: Optional[subprocess.Popen] = None
+
+    def cancel(self):
+        """取消读取，终止 git 进程"""
+        self._cancelled = True
+        if self._process and self._process.poll() is None:
+            self._process.kill()
+
+    def run(self):
+        # 关闭 diff.suppressBlankEmpty，保证空白上下文行仍以空格开头
+        cmd = [
+            "git",
+            "-c",
+            "core.quotepath=false",
+            "-c",
+            "diff.suppressBlankEmpty=false",
+            "diff-tree",
+            "-r",
+            "-p",
+            "-M",
+            "--no-color",
+            "--no-commit-id",
+        ]
+        if self.parent_sha:
+            cmd += [self.parent_sha, self.commit_sha]
+        else:
+            cmd += ["--root", self.commit_sha]
+        # stderr 写入临时文件，避免 git 写满 stderr 管道后阻塞在读取 stdout 上
+        stderr_file = tempfile.TemporaryFile()
+        try:
+            self._process = subprocess.Popen(cmd, cwd=self.repo_path, stdout=subprocess.PIPE, stderr=stderr_file)
+            parser = PatchParser()
+            batch = []
+            with open(self.patch_file_path, "wb") as patch_file:
+                while not self._cancelled:
+                    data = self._process.stdout.read1(self.READ_SIZE)
+                    if not data:
+                        break
+                    # 先写入并刷新，保证发送出去的索引所指向的内容已经可以读取
+                    patch_file.write(data)
+                    patch_file.flush()
+                    batch.extend(parser.feed(data))
+                    if len(batch) >= self.BATCH_SIZE:
+                        self.files_ready.emit(batch)
+                        batch = []
+            if self._cancelled:
+                return
+            batch.extend(parser.finish())
+            if batch:
+                self.files_ready.emit(batch)
+            if self._process.wait() != 0:
+                stderr_file.seek(0)
+                self.error.emit(stderr_file.read().decode("utf-8", errors="replace"))
+                return
+            self.finished.emit()
+        except Exception as e:
+            self.error.emit(str(e))
+        finally:
+            if self._process:
+                self._process.stdout.close()
+            stderr_file.close()
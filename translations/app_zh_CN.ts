@@ -135,6 +135,11 @@
       <source>Code Style:</source>
       <translation>代码风格：</translation>
     </message>
+    <message>
+      <location filename="../dialogs/settings_dialog.py" line="74" />
+      <source>Diff Algorithm:</source>
+      <translation>差异算法：</translation>
+    </message>
     <message>
       <location filename="../dialogs/settings_dialog.py" line="73" />
       <source>API URL:</source>
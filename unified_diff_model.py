@@ -0,0 +1,144 @@
+"""统一差异视图的行模型
+
+统一视图中的行由若干段组成，每段是同一差异块中同一类型的连续行（或一行省略提示），
+段的信息保存在紧凑的整数数组中，行号到 (类型, 差异块, 原始行号) 的映射通过二分查找段的起始行得到，
+行的文本在需要时才根据原始行生成。模型自身的索引大小与段数相关，而与文件行数无关；
+但 UnifiedDiffViewer 仍会把所有显示的行（折叠后）写入文档，文档占用的内存随显示的行数增长。
+"""
+
+from array import array
+from bisect import bisect_right
+from typing import Iterator, List, Optional, Tuple
+
+from diff_calculator import DiffChunk
+
+# 行类型
+ROW_EQUAL = 0
+ROW_DELETE = 1
+ROW_INSERT = 2
+ROW_OMITTED = 3  # 被折叠的相同行，显示为一行提示
+
+ROW_TYPE_NAMES = ("equal", "delete", "insert", "omitted")
+
+
+class UnifiedDiffModel:
+    """按差异块生成统一差异视图的行，相同的长块只保留前后 context_lines 行，中间折叠为一行提示"""
+
+    def __init__(
+        self, diff_chunks: List[DiffChunk], left_lines: List[str], right_lines: List[str], context_lines: int = 1
+    ):
+        self.diff_chunks = diff_chunks
+        self.left_lines = left_lines
+        self.right_lines = right_lines
+        self.context_lines = context_lines
+
+        self._starts = array("i")  # 段在统一视图中的起始行
+        self._kinds = array("b")  # 段的行类型
+        self._chunk_indexes = array("i")  # 段所属差异块在 diff_chunks 中的下标
+        self._line_starts = array("i")  # 段首行的原始行号（insert 为右侧，其余为左侧）
+        self._counts = array("i")  # 段包含的原始行数（省略段只显示一行）
+        self._change_rows = array("i")  # 每个非 equal 差异块的第一行，用于按下标跳转
+        self.row_count = 0
+        self._build()
+
+    def _add_segment(self, kind: int, chunk_index: int, line_start: int, count: int):
+        if count <= 0:
+            return
+        self._starts.append(self.row_count)
+        self._kinds.append(kind)
+        self._chunk_indexes.append(chunk_index)
+        self._line_starts.append(line_start)
+        self._counts.append(count)
+        self.row_count += 1 if kind == ROW_OMITTED else count
+
+    def _build(self):
+        context = self.context_lines
+        for chunk_index, chunk in enumerate(self.diff_chunks):
+            if chunk.type == "equal":
+                size = chunk.left_end - chunk.left_start
+                if size <= 2 * context:
+                    self._add_segment(ROW_EQUAL, chunk_index, chunk.left_start, size)
+                else:
+                    self._add_segment(ROW_EQUAL, chunk_index, chunk.left_start, context)
+                    self._add_segment(ROW_OMITTED, chunk_index, chunk.left_start + context, size - 2 * context)
+                    self._add_segment(ROW_EQUAL, chunk_index, chunk.left_end - context, context)
+                continue
+            self._change_rows.append(self.row_count)
+            if chunk.type in ("delete", "replace"):
+                self._add_segment(ROW_DELETE, chunk_index, chunk.left_start, chunk.left_end - chunk.left_start)
+            if chunk.type in ("insert", "replace"):
+                self._add_segment(ROW_INSERT, chunk_index, chunk.right_start, chunk.right_end - chunk.right_start)
+
+    def _segment_at(self, row: int) -> int:
+        return bisect_right(self._starts, row) - 1
+
+    def row_kind(self, row: int) -> Optional[int]:
+        """返回行类型，行号超出范围时返回 None"""
+        if not 0 <= row < self.row_count:
+            return None
+        return self._kinds[self._segment_at(row)]
+
+    def row_info(self, row: int) -> Optional[Tuple[str, DiffChunk, int]]:
+        """返回 (类型名, 差异块, 原始行号)，省略行的原始行号为 -1"""
+        if not 0 <= row < self.row_count:
+            return None
+        segment = self._segment_at(row)
+        kind = self._kinds[segment]
+        chunk = self.diff_chunks[self._chunk_indexes[segment]]
+        if kind == ROW_OMITTED:
+            return ROW_TYPE_NAMES[kind], chunk, -1
+        return ROW_TYPE_NAMES[kind], chunk, self._line_starts[segment] + row - self._starts[segment]
+
+    def change_row(self, index: int) -> int:
+        """第 index 个非 equal 差异块在统一视图中的第一行"""
+        return self._change_rows[index]
+
+    def _format_line(self, kind: int, chunk: DiffChunk, line: int) -> str:
+        if kind == ROW_DELETE:
+            return f"{line + 1:>4}       {self.left_lines[line]}"
+        if kind == ROW_INSERT:
+            return f"     {line + 1:>4}  {self.right_lines[line]}"
+        right_line = chunk.right_start + line - chunk.left_start
+        return f"{line + 1:>4} {right_line + 1:>4}  {self.left_lines[line]}"
+
+    def _segment_lines(self, segment: int, first: int = 0) -> Iterator[str]:
+        kind = self._kinds[segment]
+        if kind == ROW_OMITTED:
+            yield f"{'':>4} {'':>4}  ... ({self._counts[segment]} lines omitted) ..."
+            return
+        chunk = self.diff_chunks[self._chunk_indexes[segment]]
+        line_start = self._line_starts[segment]
+        for line in range(line_start + first, line_start + self._counts[segment]):
+            yield self._format_line(kind, chunk, line)
+
+    def line_text(self, row: int) -> str:
+        segment = self._segment_at(row)
+        return next(self._segment_lines(segment, row - self._starts[segment]))
+
+    def lines(self, start: int = 0) -> Iterator[str]:
+        """从第 start 行开始依次生成各行的文本"""
+        if not 0 <= start < self.row_count:
+            return
+        segment = self._segment_at(start)
+        yield from self._segment_lines(segment, start - self._starts[segment])
+        for segment in range(segment + 1, len(self._starts)):
+            yield from self._segment_lines(segment)
+
+    def text(self) -> str:
+        return "\n".join(self.lines())
+
+    def expand(self, row: int) -> Optional[List[str]]:
+        """展开 row 处被折叠的相同行，返回替换该行的文本行；row 不是省略行时返回 None"""
+        if self.row_kind(row) != ROW_OMITTED:
+            return None
+        segment = self._segment_at(row)
+        count = self._counts[segment]
+        self._kinds[segment] = ROW_EQUAL
+        # 之后各段的起始行整体后移
+        for index in range(segment + 1, len(self._starts)):
+            self._starts[index] += count - 1
+        shift = bisect_right(self._change_rows, row)
+        for index in range(shift, len(self._change_rows)):
+            self._change_rows[index] += count - 1
+        self.row_count += count - 1
+        return list(self._segment_lines(segment))
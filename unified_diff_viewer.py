@@ -1,13 +1,16 @@
 import os
-from typing import Dict, Tuple
 
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QColor, QIcon, QTextCharFormat
+from PyQt6.QtCore import QEvent, Qt
+from PyQt6.QtGui import QColor, QIcon, QTextCharFormat, QTextCursor
 from PyQt6.QtWidgets import QHBoxLayout, QPushButton, QVBoxLayout, QWidget
 
-from diff_calculator import DiffCalculator, DifflibCalculator
+from diff_cache import diff_result_cache
+from diff_calculator import DiffCalculator, create_diff_calculator
+from diff_guard import LOAD_FULL, apply_load_level
 from diff_highlighter import MultiHighlighter
 from editors.text_edit import SyncedTextEdit
+from settings import settings
+from unified_diff_model import ROW_DELETE, ROW_INSERT, ROW_OMITTED, UnifiedDiffModel
 from utils.language_map import LANGUAGE_MAP
 
 
@@ -16,32 +19,34 @@ class UnifiedHighlighter(MultiHighlighter):
     为统一差异视图提供高亮功能的类。
     """
 
-    def __init__(self, document, unified_line_mapping: Dict[int, Tuple[str, any, int]]):
+    def __init__(self, document, model: UnifiedDiffModel | None = None):
         super().__init__(document, "unified", None)
-        self.unified_line_mapping = unified_line_mapping
+        self.model = model
         self.insert_format = QTextCharFormat()
         self.insert_format.setBackground(QColor(200, 255, 200))  # 浅绿色
         self.delete_format = QTextCharFormat()
         self.delete_format.setBackground(QColor(255, 200, 200))  # 浅红色
+        self.omitted_format = QTextCharFormat()
+        self.omitted_format.setForeground(QColor(128, 128, 128))  # 灰色文字
+
+    def set_model(self, model: UnifiedDiffModel):
+        self.model = model
 
     def highlightBlock(self, text):
         # 首先应用语法高亮
         super().highlightBlock(text)
 
         # 然后应用差异高亮
-        block_number = self.currentBlock().blockNumber()
-        if block_number in self.unified_line_mapping:
-            line_type, chunk, original_line = self.unified_line_mapping[block_number]
-
-            if line_type == "insert":
-                self.setFormat(0, len(text), self.insert_format)
-            elif line_type == "delete":
-                self.setFormat(0, len(text), self.delete_format)
-            elif line_type == "omitted":
-                # 为省略行设置特殊格式
-                omitted_format = QTextCharFormat()
-                omitted_format.setForeground(QColor(128, 128, 128))  # 灰色文字
-                self.setFormat(0, len(text), omitted_format)
+        if self.model is None:
+            return
+        row_kind = self.model.row_kind(self.currentBlock().blockNumber())
+        if row_kind == ROW_INSERT:
+            self.setFormat(0, len(text), self.insert_format)
+        elif row_kind == ROW_DELETE:
+            self.setFormat(0, len(text), self.delete_format)
+        elif row_kind == ROW_OMITTED:
+            # 为省略行设置特殊格式
+            self.setFormat(0, len(text), self.omitted_format)
 
 
 class UnifiedDiffViewer(QWidget):
@@ -53,9 +58,18 @@ class UnifiedDiffViewer(QWidget):
         super().__init__()
         self.actual_diff_chunks = []
         self.current_diff_index = -1
-        self.unified_line_mapping = {}  # 映射统一行号到原始行号
+        self.model = UnifiedDiffModel([], [], [])  # 统一视图的行模型
         self.setup_ui()
-        self.diff_calculator = diff_calculator or DifflibCalculator()
+        self.diff_calculator = diff_calculator or create_diff_calculator(settings.get_diff_algorithm())
+        self.load_level = LOAD_FULL
+
+    def set_diff_calculator(self, diff_calculator: DiffCalculator):
+        """切换该视图使用的差异算法，下一次 set_texts 时生效"""
+        self.diff_calculator = diff_calculator
+
+    def set_load_level(self, level: int):
+        """设置大文件降级级别，在 set_texts 之前调用"""
+        self.load_level = level
 
     def _create_icon_button(self, icon_path: str, tooltip: str) -> QPushButton:
         """创建带SVG图标的按钮"""
@@ -109,6 +123,9 @@ class UnifiedDiffViewer(QWidget):
         self.unified_edit = SyncedTextEdit()
         self.unified_edit.setObjectName("unified_edit")
         self.unified_edit.setReadOnly(True)
+        self.unified_edit.highlighter = UnifiedHighlighter(self.unified_edit.document())
+        # 点击省略行时展开被折叠的相同行
+        self.unified_edit.viewport().installEventFilter(self)
 
         # 主布局
         main_layout = QVBoxLayout()
@@ -124,107 +141,43 @@ class UnifiedDiffViewer(QWidget):
     ):
         """
         设置要比较的文本，并生成统一的差异视图。
+
+        折叠后显示的所有行都会写入编辑器的文档，行模型负责行类型、行号映射和跳转。
         """
-        self.diff_chunks = self.diff_calculator.compute_diff(left_text, right_text)
+        self.diff_chunks = diff_result_cache.compute_diff(self.diff_calculator, left_text, right_text)
         self.actual_diff_chunks = [chunk for chunk in self.diff_chunks if chunk.type != "equal"]
         self.current_diff_index = -1
 
-        unified_text = self._format_unified_text(left_text, right_text)
-        self.unified_edit.setPlainText(unified_text)
-
-        self.unified_edit.highlighter = UnifiedHighlighter(self.unified_edit.document(), self.unified_line_mapping)
-        self.unified_edit.highlighter.set_language(LANGUAGE_MAP.get(file_path.split(".")[-1], "text"))
+        self.model = UnifiedDiffModel(self.diff_chunks, left_text.splitlines(), right_text.splitlines())
+        highlighter = self.unified_edit.highlighter
+        highlighter.set_model(self.model)
+        apply_load_level(highlighter, self.load_level)
+        self.unified_edit.setPlainText(self.model.text())
+        highlighter.set_language(LANGUAGE_MAP.get(file_path.split(".")[-1], "text"))
 
         self._update_button_states()
 
-    def _format_unified_text(self, left_text: str, right_text: str) -> str:
-        """
-        将左右文本格式化为统一的差异格式。
-        """
-        left_lines = left_text.splitlines()
-        right_lines = right_text.splitlines()
-        unified_lines = []
-        self.unified_line_mapping.clear()
-        unified_line_num = 0
-        context_lines = 1  # 在变更前后显示的上下文行数
-
-        for chunk_idx, chunk in enumerate(self.diff_chunks):
-            if chunk.type == "equal":
-                chunk_size = chunk.left_end - chunk.left_start
-
-                # 如果chunk很小，就完全显示；否则省略中间部分
-                if chunk_size <= 2 * context_lines:
-                    for i in range(chunk.left_start, chunk.left_end):
-                        left_line_num = i + 1
-                        right_line_num = chunk.right_start + (i - chunk.left_start) + 1
-                        line_content = left_lines[i]
-                        formatted_line = f"{left_line_num:>4} {right_line_num:>4}  {line_content}"
-                        unified_lines.append(formatted_line)
-                        self.unified_line_mapping[unified_line_num] = ("equal", chunk, i)
-                        unified_line_num += 1
-                else:
-                    # 显示开头的几行
-                    for i in range(chunk.left_start, min(chunk.left_start + context_lines, chunk.left_end)):
-                        left_line_num = i + 1
-                        right_line_num = chunk.right_start + (i - chunk.left_start) + 1
-                        line_content = left_lines[i]
-                        formatted_line = f"{left_line_num:>4} {right_line_num:>4}  {line_content}"
-                        unified_lines.append(formatted_line)
-                        self.unified_line_mapping[unified_line_num] = ("equal", chunk, i)
-                        unified_line_num += 1
-
-                    # 添加省略号
-                    omitted_count = chunk_size - 2 * context_lines
-                    if omitted_count > 0:
-                        formatted_line = f"{'':>4} {'':>4}  ... ({omitted_count} lines omitted) ..."
-                        unified_lines.append(formatted_line)
-                        self.unified_line_mapping[unified_line_num] = ("omitted", chunk, -1)
-                        unified_line_num += 1
-
-                    # 显示结尾的几行
-                    for i in range(
-                        max(chunk.left_end - context_lines, chunk.left_start + context_lines), chunk.left_end
-                    ):
-                        left_line_num = i + 1
-                        right_line_num = chunk.right_start + (i - chunk.left_start) + 1
-                        line_content = left_lines[i]
-                        formatted_line = f"{left_line_num:>4} {right_line_num:>4}  {line_content}"
-                        unified_lines.append(formatted_line)
-                        self.unified_line_mapping[unified_line_num] = ("equal", chunk, i)
-                        unified_line_num += 1
-            elif chunk.type == "delete":
-                for i in range(chunk.left_start, chunk.left_end):
-                    left_line_num = i + 1
-                    line_content = left_lines[i]
-                    formatted_line = f"{left_line_num:>4}       {line_content}"
-                    unified_lines.append(formatted_line)
-                    self.unified_line_mapping[unified_line_num] = ("delete", chunk, i)
-                    unified_line_num += 1
-            elif chunk.type == "insert":
-                for i in range(chunk.right_start, chunk.right_end):
-                    right_line_num = i + 1
-                    line_content = right_lines[i]
-                    formatted_line = f"     {right_line_num:>4}  {line_content}"
-                    unified_lines.append(formatted_line)
-                    self.unified_line_mapping[unified_line_num] = ("insert", chunk, i)
-                    unified_line_num += 1
-            elif chunk.type == "replace":
-                for i in range(chunk.left_start, chunk.left_end):
-                    left_line_num = i + 1
-                    line_content = left_lines[i]
-                    formatted_line = f"{left_line_num:>4}       {line_content}"
-                    unified_lines.append(formatted_line)
-                    self.unified_line_mapping[unified_line_num] = ("delete", chunk, i)
-                    unified_line_num += 1
-                for i in range(chunk.right_start, chunk.right_end):
-                    right_line_num = i + 1
-                    line_content = right_lines[i]
-                    formatted_line = f"     {right_line_num:>4}  {line_content}"
-                    unified_lines.append(formatted_line)
-                    self.unified_line_mapping[unified_line_num] = ("insert", chunk, i)
-                    unified_line_num += 1
-
-        return "\n".join(unified_lines)
+    def eventFilter(self, obj, event):
+        if (
+            event.type() == QEvent.Type.MouseButtonRelease
+            and event.button() == Qt.MouseButton.LeftButton
+            and obj is self.unified_edit.viewport()
+        ):
+            row = self.unified_edit.cursorForPosition(event.position().toPoint()).blockNumber()
+            if self.model.row_kind(row) == ROW_OMITTED:
+                self.expand_row(row)
+        return super().eventFilter(obj, event)
+
+    def expand_row(self, row: int) -> bool:
+        """展开 row 处折叠的相同行，只替换文档中的这一行"""
+        lines = self.model.expand(row)
+        if lines is None:
+            return False
+        block = self.unified_edit.document().findBlockByNumber(row)
+        cursor = QTextCursor(block)
+        cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock, QTextCursor.MoveMode.KeepAnchor)
+        cursor.insertText("\n".join(lines))
+        return True
 
     def _update_button_states(self):
         num_actual_diffs = len(self.actual_diff_chunks)
@@ -254,15 +207,6 @@ class UnifiedDiffViewer(QWidget):
         滚动到当前差异块的位置。
         """
         if 0 <= self.current_diff_index < len(self.actual_diff_chunks):
-            chunk = self.actual_diff_chunks[self.current_diff_index]
-
-            # 找到该差异块在统一视图中的第一行
-            target_line = -1
-            for unified_line, (line_type, mapped_chunk, original_line) in self.unified_line_mapping.items():
-                if mapped_chunk == chunk:
-                    target_line = unified_line
-                    break
-
-            if target_line != -1:
-                self.unified_edit.scroll_to_line(target_line)
-                self.unified_edit.set_highlighted_line(target_line)
+            target_line = self.model.change_row(self.current_diff_index)
+            self.unified_edit.scroll_to_line(target_line)
+            self.unified_edit.set_highlighted_line(target_line)
@@ -0,0 +1,431 @@
+"""整个提交的补丁视图
+
+用一个 `git diff-tree -p` 进程流式读取提交的全部改动，在一个虚拟化的滚动区域中按行绘制。
+只有可见的片段会从临时文件中读取并做语法高亮，文件可以折叠。
+"""
+
+import logging
+import os
+import tempfile
+from bisect import bisect_right
+from collections import OrderedDict
+from functools import partial
+
+from pygments import lexers, styles
+from pygments.util import ClassNotFound
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtGui import QColor, QFont, QFontMetrics, QPainter
+from PyQt6.QtWidgets import QAbstractScrollArea, QHBoxLayout, QLabel, QPushButton, QVBoxLayout, QWidget
+
+from commit_patch_model import SEGMENT_LINES, PatchFile, parse_segment_lines
+from settings import settings
+from threads import CommitPatchThread, ThreadTracker
+from utils.language_map import LANGUAGE_MAP
+
+# 缓存的片段数量上限（每个片段最多 SEGMENT_LINES 行）
+SEGMENT_CACHE_SIZE = 64
+TAB_SIZE = 4
+
+# 行类型
+ROW_FILE_HEADER = 0
+ROW_BINARY = 1
+ROW_HUNK_HEADER = 2
+ROW_LINE = 3
+
+
+class PatchCanvas(QAbstractScrollArea):
+    """虚拟化的补丁绘制区域，只绘制和加载可见的行"""
+
+    LINE_BACKGROUNDS = {
+        "+": QColor(230, 255, 237),
+        "-": QColor(255, 235, 233),
+    }
+    FILE_HEADER_BACKGROUND = QColor(240, 240, 240)
+    HUNK_HEADER_BACKGROUND = QColor(241, 248, 255)
+    GUTTER_BACKGROUND = QColor(248, 248, 248)
+    MUTED_COLOR = QColor(128, 128, 128)
+    TEXT_COLOR = QColor(0, 0, 0)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.patch_path = None
+        self._patch_handle = None
+        self.files: list[PatchFile] = []
+        self.collapsed: set[int] = set()
+        # 每个文件第一行（文件头）的行号，最后一个元素为总行数
+        self._file_row_starts = [0]
+        # 每个文件内各 hunk 头相对于文件头的行偏移，最后一个元素为该文件展开后的行数
+        self._hunk_row_starts: list[list[int]] = []
+        self._segment_cache: OrderedDict = OrderedDict()
+        self._lexers: dict = {}
+        self._max_columns = 0
+
+        font = QFont("Courier New", 10)
+        font.setStyleHint(QFont.StyleHint.Monospace)
+        self.setFont(font)
+        self._bold_font = QFont(font)
+        self._bold_font.setBold(True)
+        self._italic_font = QFont(font)
+        self._italic_font.setItalic(True)
+        self._metrics = QFontMetrics(font)
+        self._bold_metrics = QFontMetrics(self._bold_font)
+        self._italic_metrics = QFontMetrics(self._italic_font)
+        self.row_height = self._metrics.height() + 2
+        self.char_width = self._metrics.horizontalAdvance("M")
+        self.gutter_width = self.char_width * 14
+        self._token_styles = self._load_token_styles()
+
+    def _load_token_styles(self) -> dict:
+        """把 Pygments 样式转换为 {token 类型：(颜色，粗体，斜体)}"""
+        try:
+            style = styles.get_style_by_name(settings.get_code_style() or "friendly")
+        except ClassNotFound:
+            return {}
+        token_styles = {}
+        for token_type, style_definition in style:
+            if style_definition["color"] or style_definition["bold"] or style_definition["italic"]:
+                color = QColor(f"#{style_definition['color']}") if style_definition["color"] else self.TEXT_COLOR
+                token_styles[token_type] = (color, style_definition["bold"], style_definition["italic"])
+        return token_styles
+
+    def set_patch_path(self, patch_path: str):
+        self.close_patch()
+        self.patch_path = patch_path
+
+    def close_patch(self):
+        if self._patch_handle:
+            self._patch_handle.close()
+            self._patch_handle = None
+
+    def clear(self):
+        self.close_patch()
+        self.files = []
+        self.collapsed.clear()
+        self._file_row_starts = [0]
+        self._hunk_row_starts = []
+        self._segment_cache.clear()
+        self._max_columns = 0
+        self._update_scrollbars()
+        self.viewport().update()
+
+    def add_files(self, files: list[PatchFile]):
+        """追加解析完成的文件"""
+        for patch_file in files:
+            starts = [1]
+            if patch_file.binary or not patch_file.hunks:
+                starts.append(2)
+            else:
+                for hunk in patch_file.hunks:
+                    starts.append(starts[-1] + 1 + hunk.line_count)
+            self.files.append(patch_file)
+            self._hunk_row_starts.append(starts)
+            self._file_row_starts.append(self._file_row_starts[-1] + self._file_row_count(len(self.files) - 1))
+        self._update_scrollbars()
+        self.viewport().update()
+
+    def set_all_collapsed(self, collapsed: bool):
+        self.collapsed = set(range(len(self.files))) if collapsed else set()
+        self._rebuild_row_starts()
+
+    def toggle_file(self, file_index: int):
+        self.collapsed.symmetric_difference_update({file_index})
+        self._rebuild_row_starts()
+
+    def scroll_to_file(self, file_index: int):
+        self.verticalScrollBar().setValue(self._file_row_starts[file_index])
+
+    def _file_row_count(self, file_index: int) -> int:
+        if file_index in self.collapsed:
+            return 1
+        return self._hunk_row_starts[file_index][-1]
+
+    def _rebuild_row_starts(self):
+        starts = [0]
+        for file_index in range(len(self.files)):
+            starts.append(starts[-1] + self._file_row_count(file_index))
+        self._file_row_starts = starts
+        self._update_scrollbars()
+        self.viewport().update()
+
+    @property
+    def total_rows(self) -> int:
+        return self._file_row_starts[-1]
+
+    def visible_row_count(self) -> int:
+        return max(1, self.viewport().height() // self.row_height)
+
+    def _update_scrollbars(self):
+        visible_rows = self.visible_row_count()
+        vbar = self.verticalScrollBar()
+        vbar.setPageStep(visible_rows)
+        vbar.setSingleStep(1)
+        vbar.setRange(0, max(0, self.total_rows - visible_rows))
+        hbar = self.horizontalScrollBar()
+        content_width = self.gutter_width + self._max_columns * self.char_width + self.char_width * 2
+        hbar.setPageStep(self.viewport().width())
+        hbar.setSingleStep(self.char_width * 4)
+        hbar.setRange(0, max(0, content_width - self.viewport().width()))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_scrollbars()
+
+    def locate_row(self, row: int):
+        """把全局行号映射为 (行类型，文件序号，hunk 序号，hunk 内行号)"""
+        file_index = bisect_right(self._file_row_starts, row) - 1
+        relative = row - self._file_row_starts[file_index]
+        if relative == 0:
+            return ROW_FILE_HEADER, file_index, -1, -1
+        patch_file = self.files[file_index]
+        if patch_file.binary or not patch_file.hunks:
+            return ROW_BINARY, file_index, -1, -1
+        hunk_starts = self._hunk_row_starts[file_index]
+        hunk_index = bisect_right(hunk_starts, relative) - 1
+        line_index = relative - hunk_starts[hunk_index] - 1
+        if line_index < 0:
+            return ROW_HUNK_HEADER, file_index, hunk_index, -1
+        return ROW_LINE, file_index, hunk_index, line_index
+
+    def _load_segment(self, file_index: int, hunk_index: int, segment: int):
+        """读取一个片段并做语法高亮，结果放入 LRU 缓存"""
+        key = (file_index, hunk_index, segment)
+        lines = self._segment_cache.get(key)
+        if lines is not None:
+            self._segment_cache.move_to_end(key)
+            return lines
+
+        patch_file = self.files[file_index]
+        hunk = patch_file.hunks[hunk_index]
+        start, end = hunk.segment_range(segment)
+        if self._patch_handle is None:
+            self._patch_handle = open(self.patch_path, "rb")
+        self._patch_handle.seek(start)
+        data = self._patch_handle.read(end - start)
+
+        lexer = self._get_lexer(patch_file.path)
+        max_columns = self._max_columns
+        lines = []
+        for kind, old_line, new_line, text in parse_segment_lines(
+            data,
+            hunk.old_start - 1 + hunk.segment_old_lines[segment],
+            hunk.new_start - 1 + hunk.segment_new_lines[segment],
+        ):
+            text = text.rstrip("\r").expandtabs(TAB_SIZE)
+            runs = self._highlight_line(lexer, text) if kind != "\\" else [(text, self.MUTED_COLOR, False, True)]
+            lines.append((kind, old_line, new_line, runs))
+            self._max_columns = max(self._max_columns, len(text))
+
+        if self._max_columns != max_columns:
+            # 绘制过程中不能直接修改滚动条范围，推迟到事件循环中更新
+            QTimer.singleShot(0, self._update_scrollbars)
+        self._segment_cache[key] = lines
+        while len(self._segment_cache) > SEGMENT_CACHE_SIZE:
+            self._segment_cache.popitem(last=False)
+        return lines
+
+    def _get_lexer(self, file_path: str):
+        language = LANGUAGE_MAP.get(file_path.rsplit(".", 1)[-1], "text")
+        lexer = self._lexers.get(language)
+        if lexer is None:
+            try:
+                lexer = lexers.get_lexer_by_name(language)
+            except ClassNotFound:
+                lexer = lexers.get_lexer_by_name("text")
+            self._lexers[language] = lexer
+        return lexer
+
+    def _highlight_line(self, lexer, text: str) -> list:
+        """返回 [(文本，颜色，粗体，斜体)]"""
+        runs = []
+        try:
+            for _, token_type, token_text in lexer.get_tokens_unprocessed(text):
+                token_text = token_text.rstrip("\n")
+                if not token_text:
+                    continue
+                # 没有定义样式的 token 向上查找父类型的样式
+                style = None
+                while token_type is not None and style is None:
+                    style = self._token_styles.get(token_type)
+                    token_type = token_type.parent
+                color, bold, italic = style or (self.TEXT_COLOR, False, False)
+                runs.append((token_text, color, bold, italic))
+        except Exception:
+            logging.exception("补丁语法高亮失败")
+            runs = [(text, self.TEXT_COLOR, False, False)]
+        return runs
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.setFont(self.font())
+        width = self.viewport().width()
+        first_row = self.verticalScrollBar().value()
+        x_offset = self.horizontalScrollBar().value()
+        ascent = self._metrics.ascent() + 1
+        last_row = min(self.total_rows, first_row + self.visible_row_count() + 1)
+
+        for row in range(first_row, last_row):
+            y = (row - first_row) * self.row_height
+            row_type, file_index, hunk_index, line_index = self.locate_row(row)
+            patch_file = self.files[file_index]
+
+            if row_type == ROW_FILE_HEADER:
+                painter.fillRect(0, y, width, self.row_height, self.FILE_HEADER_BACKGROUND)
+                marker = "▶" if file_index in self.collapsed else "▼"
+                painter.setFont(self._bold_font)
+                painter.setPen(self.TEXT_COLOR)
+                painter.drawText(
+                    4,
+                    y + ascent,
+                    f"{marker} {patch_file.status}  {patch_file.display_name}  +{patch_file.added} -{patch_file.deleted}",
+                )
+                painter.setFont(self.font())
+            elif row_type == ROW_BINARY:
+                painter.setPen(self.MUTED_COLOR)
+                text = "二进制文件" if patch_file.binary else "无文本改动"
+                painter.drawText(self.gutter_width + 4 - x_offset, y + ascent, text)
+            elif row_type == ROW_HUNK_HEADER:
+                painter.fillRect(0, y, width, self.row_height, self.HUNK_HEADER_BACKGROUND)
+                painter.setPen(self.MUTED_COLOR)
+                painter.drawText(self.gutter_width + 4 - x_offset, y + ascent, patch_file.hunks[hunk_index].header)
+            else:
+                segment, index = divmod(line_index, SEGMENT_LINES)
+                lines = self._load_segment(file_index, hunk_index, segment)
+                if index >= len(lines):
+                    continue
+                kind, old_line, new_line, runs = lines[index]
+                background = self.LINE_BACKGROUNDS.get(kind)
+                if background:
+                    painter.fillRect(0, y, width, self.row_height, background)
+                self._draw_runs(painter, self.gutter_width + 4 - x_offset, y + ascent, runs)
+                # 行号区域最后绘制，覆盖水平滚动后移入左侧的文本
+                painter.fillRect(0, y, self.gutter_width, self.row_height, background or self.GUTTER_BACKGROUND)
+                painter.setPen(self.MUTED_COLOR)
+                columns = 6
+                if old_line:
+                    painter.drawText(self.char_width, y + ascent, str(old_line).rjust(columns))
+                if new_line:
+                    painter.drawText(self.char_width * (columns + 1), y + ascent, str(new_line).rjust(columns))
+                if kind in ("+", "-"):
+                    painter.drawText(self.char_width * (columns * 2 + 1), y + ascent, kind)
+
+    def _draw_runs(self, painter: QPainter, x: int, baseline: int, runs: list):
+        viewport_width = self.viewport().width()
+        for text, color, bold, italic in runs:
+            if x > viewport_width:
+                break
+            if bold:
+                font, metrics = self._bold_font, self._bold_metrics
+            elif italic:
+                font, metrics = self._italic_font, self._italic_metrics
+            else:
+                font, metrics = self.font(), self._metrics
+            painter.setFont(font)
+            painter.setPen(color)
+            painter.drawText(x, baseline, text)
+            x += metrics.horizontalAdvance(text)
+        painter.setFont(self.font())
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton and self.total_rows:
+            row = self.verticalScrollBar().value() + int(event.position().y()) // self.row_height
+            if row < self.total_rows:
+                row_type, file_index, _, _ = self.locate_row(row)
+                if row_type == ROW_FILE_HEADER:
+                    self.toggle_file(file_index)
+                    return
+        super().mousePressEvent(event)
+
+
+def _release_patch_resources(thread: CommitPatchThread, canvas: PatchCanvas, patch_path: str):
+    """停止读取线程并删除临时文件"""
+    thread.cancel()
+    thread.wait()
+    canvas.close_patch()
+    try:
+        os.remove(patch_path)
+    except OSError:
+        pass
+
+
+class CommitPatchView(QWidget):
+    """显示整个提交改动的视图"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.commit_hash = None
+        self._thread = None
+        self._threads = ThreadTracker(self)
+        self._patch_path = None
+        self._added = 0
+        self._deleted = 0
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
+
+        top_layout = QHBoxLayout()
+        self.summary_label = QLabel("")
+        top_layout.addWidget(self.summary_label)
+        top_layout.addStretch()
+        self.collapse_all_button = QPushButton("全部折叠")
+        self.collapse_all_button.clicked.connect(lambda: self.canvas.set_all_collapsed(True))
+        top_layout.addWidget(self.collapse_all_button)
+        self.expand_all_button = QPushButton("全部展开")
+        self.expand_all_button.clicked.connect(lambda: self.canvas.set_all_collapsed(False))
+        top_layout.addWidget(self.expand_all_button)
+        layout.addLayout(top_layout)
+
+        self.canvas = PatchCanvas(self)
+        layout.addWidget(self.canvas)
+
+    def show_commit(self, git_manager, commit):
+        """开始流式加载提交的补丁"""
+        self._stop()
+        self.commit_hash = commit.hexsha
+        self.canvas.clear()
+        self._added = self._deleted = 0
+
+        fd, self._patch_path = tempfile.mkstemp(prefix="mygit_patch_", suffix=".diff")
+        os.close(fd)
+        self.canvas.set_patch_path(self._patch_path)
+
+        parent_sha = commit.parents[0].hexsha if commit.parents else None
+        thread = CommitPatchThread(git_manager.repo.working_dir, commit.hexsha, parent_sha, self._patch_path)
+        thread.files_ready.connect(self._on_files_ready)
+        thread.finished.connect(self._on_finished)
+        thread.error.connect(self._on_error)
+        self._thread = thread
+        self._update_summary(loading=True)
+        # 视图销毁或程序退出时释放线程和临时文件；临时文件在显示期间一直需要，线程结束后也不释放
+        release = partial(_release_patch_resources, thread, self.canvas, self._patch_path)
+        self._threads.start(thread, stop=release, release_on_finish=False)
+
+    def _stop(self):
+        if self._thread:
+            self._thread.files_ready.disconnect(self._on_files_ready)
+            self._thread.finished.disconnect(self._on_finished)
+            self._thread.error.disconnect(self._on_error)
+            _release_patch_resources(self._thread, self.canvas, self._patch_path)
+            self._threads.release(self._thread)
+            self._thread = None
+
+    def _on_files_ready(self, files):
+        self.canvas.add_files(files)
+        self._added += sum(f.added for f in files)
+        self._deleted += sum(f.deleted for f in files)
+        self._update_summary(loading=True)
+
+    def _on_finished(self):
+        self._update_summary(loading=False)
+
+    def _on_error(self, message):
+        logging.error("读取提交补丁失败：%s", message)
+        self.summary_label.setText(f"读取提交补丁失败：{message}")
+
+    def _update_summary(self, loading: bool):
+        loading_text = "（加载中...）" if loading else ""
+        self.summary_label.setText(
+            f"提交 {self.commit_hash[:8]}：{len(self.canvas.files)} 个文件 +{self._added} -{self._deleted}{loading_text}"
+        )
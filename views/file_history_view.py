@@ -141,7 +141,7 @@ class FileHistoryView(QWidget):
             # 尝试在主窗口的标签页中打开比较视图
             main_window = self.window()
             if hasattr(main_window, "compare_view"):
-                current_commit: git.Commit = main_window.git_manager.repo.commit(commit_hash)
+                current_commit: git.Commit = main_window.git_manager.get_commit(commit_hash)
                 main_window.compare_view.show_diff(main_window.git_manager, current_commit, file_path)
                 # 切换到统一视图
                 if main_window.compare_view.stacked_widget.currentIndex() == 0:
@@ -197,7 +197,7 @@ class FileHistoryView(QWidget):
 
         try:
             # 获取 git.Commit 对象
-            commit: git.Commit = self.git_manager.repo.commit(commit_hash)
+            commit: git.Commit = self.git_manager.get_commit(commit_hash)
 
             # 获取 WorkspaceExplorer 窗口
             main_window = self.window()
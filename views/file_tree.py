@@ -208,10 +208,10 @@ class FileTreeWidget(QTreeWidget):
                 target_editor.clear_blame_data()  # Ensure clean state
                 return
 
-            blame_data_list = git_manager.get_blame_data(relative_file_path)
+            blame_table = git_manager.get_blame_table(relative_file_path)
 
-            if blame_data_list:
-                target_editor.set_blame_data(blame_data_list)
+            if blame_table:
+                target_editor.set_blame_data(blame_table)
                 print(f"Blame annotations shown for {os.path.basename(file_path)}.")
             else:
                 print(f"No blame information available for {os.path.basename(file_path)}.")
@@ -21,6 +21,7 @@ from components.file_quick_search_popup import FileQuickSearchPopup  # 新增导
 from components.file_search_widget import FileSearchWidget
 from editors.modified_text_edit import ModifiedTextEdit
 from file_changes_view import FileChangesView
+from large_file import is_large_file_size, is_large_text
 from settings import settings
 from syntax_highlighter import CodeHighlighter
 from threads import FileIndexThread
@@ -124,6 +125,7 @@ class WorkspaceExplorer(QWidget):
             get_main_window_by_parent(self).show_compare_with_working_dialog
         )
         self.file_changes_view.edit_file_requested.connect(self.open_file_in_tab)
+        self.file_changes_view.whole_commit_requested.connect(get_main_window_by_parent(self).show_whole_commit)
 
         # 创建标签页组件
         self.tab_widget = QTabWidget()
@@ -199,19 +201,28 @@ class WorkspaceExplorer(QWidget):
                         text_edit.ensureCursorVisible()
                     return
 
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-
             # 创建新的文本编辑器
             text_edit = ModifiedTextEdit(self)
             text_edit.setProperty("file_path", file_path)
             text_edit.file_path = file_path
-            text_edit.setPlainText(content)
-            text_edit.set_editable()
 
-            text_edit.highlighter = CodeHighlighter(text_edit.document())
-            language = LANGUAGE_MAP.get(file_path.split(".")[-1], "text")
-            text_edit.highlighter.set_language(language)
+            thresholds = settings.get_large_file_thresholds()
+            if is_large_file_size(os.path.getsize(file_path), thresholds):
+                # 超过大小阈值的文件在后台分块读取
+                text_edit.load_large_file(file_path)
+            else:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    content = f.read()
+                if is_large_text(content, thresholds):
+                    text_edit.load_large_file(file_path, content)
+                else:
+                    # 先在空文档上创建高亮器，否则 QSyntaxHighlighter 会在下一次事件循环中同步高亮整个文档
+                    text_edit.highlighter = CodeHighlighter(text_edit.document())
+                    text_edit.setPlainText(content)
+                    text_edit.set_editable()
+
+                    language = LANGUAGE_MAP.get(file_path.split(".")[-1], "text")
+                    text_edit.highlighter.set_language(language)
 
             # 添加新标签页
             file_name = os.path.basename(file_path)
@@ -237,8 +248,9 @@ class WorkspaceExplorer(QWidget):
                 logging.error("GitManager not found.")
                 return
 
-            diffs = text_edit.get_diffs(main_git_window.git_manager)
-            text_edit.set_line_modifications(diffs)
+            if not text_edit.large_file:
+                diffs = text_edit.get_diffs(main_git_window.git_manager)
+                text_edit.set_line_modifications(diffs)
 
             if main_git_window and hasattr(main_git_window, handler_name):
                 try:
@@ -278,6 +290,8 @@ class WorkspaceExplorer(QWidget):
 
                 # 检查文件路径是否匹配
                 if tab_widget.file_path == file_path:
+                    if hasattr(tab_widget, "invalidate_fingerprint"):
+                        tab_widget.invalidate_fingerprint()
                     if event_type == "deleted":
                         # 文件被删除，关闭对应的标签页
                         self.tab_widget.removeTab(i)
@@ -285,7 +299,11 @@ class WorkspaceExplorer(QWidget):
                         break
                     elif event_type == "updated":
                         # 文件被更新，重新加载内容
-                        if os.path.exists(file_path):
+                        if os.path.exists(file_path) and getattr(tab_widget, "large_file", False):
+                            # 大文件重新分块读取，不计算修改标记
+                            tab_widget.load_large_file(file_path)
+                            logging.info("大文件 %s 已更新，重新加载", file_path)
+                        elif os.path.exists(file_path):
                             with open(file_path, "r", encoding="utf-8") as f:
                                 content = f.read()
 